@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Aggregation pushdown for factory_iot_data.
+
+Dashboards need min/max/avg/sum/count of `Value` per BuildingID and
+MetricType, not the raw rows. `factory_iot_dataConnection.groupBy` computes
+those in Fabric, so an AggregateRequest is compiled into a single query:
+
+    factory_iot_datas(filter: $filter) {
+      groupBy(fields: [BuildingID, MetricType]) {
+        fields { BuildingID MetricType }
+        aggregations { avg_Value: avg(field: Value) max_Value: max(field: Value) }
+      }
+    }
+
+and the nested groups are decoded into flat records, one per group:
+`{"BuildingID": ..., "MetricType": ..., "avg_Value": ..., "max_Value": ...}`.
+
+Aggregates the schema cannot push down (median, percentiles, standard
+deviation, or any aggregate of a non-numeric field) are computed locally
+instead, from a pull of only the grouping and aggregated columns.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from fabric_query_cost import load_schema
+from fabric_stream import stream_query
+
+# Aggregation functions of factory_iot_dataAggregations.
+PUSHDOWN_FUNCTIONS = ("max", "min", "avg", "sum", "count")
+
+# Functions only computed locally, besides percentiles such as p95.
+LOCAL_FUNCTIONS = ("median", "stddev", "variance")
+
+# Modes an aggregate request ran in
+PUSHDOWN = "pushdown"
+LOCAL = "local"
+
+# Rows per request when aggregating locally.
+DEFAULT_PAGE_SIZE = 1000
+
+_PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+
+# Operators of FloatFilterInput, used by `having`: (operand, value) -> bool.
+_HAVING_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda operand, value: value == operand,
+    "neq": lambda operand, value: value != operand,
+    "gt": lambda operand, value: value is not None and value > operand,
+    "gte": lambda operand, value: value is not None and value >= operand,
+    "lt": lambda operand, value: value is not None and value < operand,
+    "lte": lambda operand, value: value is not None and value <= operand,
+    "in": lambda operand, value: value in operand,
+    "isNull": lambda operand, value: (value is None) == operand,
+}
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    """Linearly interpolated percentile of sorted values."""
+    if not values:
+        return None
+    rank = (len(values) - 1) * percent / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _variance(values: List[float]) -> Optional[float]:
+    """Sample variance."""
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    return sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+
+def aggregate_values(function: str, values: Iterable[Any], distinct: bool = False) -> Optional[float]:
+    """
+    Compute an aggregate over the values of one group.
+
+    Null values are ignored, as in SQL; `count` counts the non-null values and
+    the other functions return None for an empty group.
+
+    Args:
+        function: max, min, avg, sum, count, median, stddev, variance or a
+            percentile such as p95
+        values: Values of the aggregated field in the group
+        distinct: Aggregate each distinct value once
+
+    Returns:
+        The aggregate
+
+    Raises:
+        ValueError: If the function is unknown
+    """
+    if function not in PUSHDOWN_FUNCTIONS and function not in LOCAL_FUNCTIONS and not _PERCENTILE.match(function):
+        raise ValueError(f"Unknown aggregation function: {function}")
+    present = [value for value in values if value is not None]
+    if distinct:
+        present = list(dict.fromkeys(present))
+    if function == "count":
+        return len(present)
+    if not present:
+        return None
+    if function == "max":
+        return max(present)
+    if function == "min":
+        return min(present)
+    if function == "sum":
+        return sum(present)
+    if function == "avg":
+        return sum(present) / len(present)
+    if function == "median":
+        return _percentile(sorted(present), 50)
+    if function == "variance":
+        return _variance(present)
+    if function == "stddev":
+        variance = _variance(present)
+        return math.sqrt(variance) if variance is not None else None
+    return _percentile(sorted(present), float(_PERCENTILE.match(function).group(1)))
+
+
+def having_matches(value: Any, having: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a FloatFilterInput `having` condition against an aggregate."""
+    for operator, operand in (having or {}).items():
+        if operand is None and operator != "eq":
+            continue
+        if not _HAVING_OPERATORS[operator](operand, value):
+            return False
+    return True
+
+
+class Aggregate:
+    """One aggregate of a request, such as the average of Value."""
+
+    def __init__(
+        self,
+        function: str,
+        field: str = "Value",
+        distinct: bool = False,
+        having: Optional[Dict[str, Any]] = None,
+        alias: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the aggregate.
+
+        Args:
+            function: max, min, avg, sum, count, median, stddev, variance or pNN
+            field: Field to aggregate
+            distinct: Aggregate each distinct value once
+            having: FloatFilterInput on the aggregate; groups failing it are dropped
+            alias: Key of the aggregate in the records (default: function_field)
+        """
+        if function not in PUSHDOWN_FUNCTIONS and function not in LOCAL_FUNCTIONS and not _PERCENTILE.match(function):
+            raise ValueError(f"Unknown aggregation function: {function}")
+        self.function = function
+        self.field = field
+        self.distinct = distinct
+        self.having = having
+        self.alias = alias or f"{function}_{'distinct_' if distinct else ''}{field}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Aggregate":
+        """Parse `function`, `function:field` or `function:field:distinct`."""
+        parts = spec.split(":")
+        return cls(parts[0], parts[1] if len(parts) > 1 and parts[1] else "Value", distinct=parts[2:] == ["distinct"])
+
+    def __repr__(self) -> str:
+        return f"Aggregate({self.alias})"
+
+
+class AggregateRequest:
+    """Aggregates of factory_iot_data, optionally filtered and grouped."""
+
+    def __init__(
+        self,
+        aggregates: Sequence[Aggregate],
+        group_by: Sequence[str] = (),
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Initialize the request.
+
+        Args:
+            aggregates: Aggregates to compute for each group
+            group_by: Scalar fields to group by (none: one group for all rows)
+            filter: factory_iot_dataFilterInput applied before grouping
+        """
+        if not aggregates:
+            raise ValueError("At least one aggregate is required")
+        aliases = [aggregate.alias for aggregate in aggregates]
+        if len(set(aliases)) != len(aliases):
+            raise ValueError(f"Duplicate aggregate aliases: {aliases}")
+        self.aggregates = list(aggregates)
+        self.group_by = list(group_by)
+        self.filter = filter
+
+    def unsupported(self, numeric_fields: Sequence[str], functions: Sequence[str] = PUSHDOWN_FUNCTIONS) -> List[Aggregate]:
+        """Return the aggregates that cannot be pushed down to groupBy."""
+        return [
+            aggregate
+            for aggregate in self.aggregates
+            if aggregate.function not in functions or aggregate.field not in numeric_fields
+        ]
+
+    def to_query(self) -> Tuple[str, Dict[str, Any]]:
+        """
+        Compile the request into a single groupBy query.
+
+        Returns:
+            The query and its variables
+        """
+        definitions = ["$filter: factory_iot_dataFilterInput"]
+        variables: Dict[str, Any] = {"filter": self.filter}
+        selections = []
+        for index, aggregate in enumerate(self.aggregates):
+            arguments = [f"field: {aggregate.field}"]
+            if aggregate.having:
+                definitions.append(f"$having{index}: FloatFilterInput")
+                variables[f"having{index}"] = aggregate.having
+                arguments.append(f"having: $having{index}")
+            if aggregate.distinct:
+                arguments.append("distinct: true")
+            selections.append(f"{aggregate.alias}: {aggregate.function}({', '.join(arguments)})")
+        group_fields = " ".join(self.group_by) or "__typename"
+        query = (
+            f"query ({', '.join(definitions)}) {{\n"
+            f"  factory_iot_datas(filter: $filter) {{\n"
+            f"    groupBy(fields: [{', '.join(self.group_by)}]) {{\n"
+            f"      fields {{ {group_fields} }}\n"
+            f"      aggregations {{ {' '.join(selections)} }}\n"
+            f"    }}\n"
+            f"  }}\n"
+            f"}}"
+        )
+        return query, variables
+
+    def decode(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Flatten the groups of a groupBy response into records.
+
+        Args:
+            body: Decoded response body
+
+        Returns:
+            One record per group with the grouping fields and the aggregates,
+            sorted by the grouping fields
+        """
+        groups = body["data"]["factory_iot_datas"]["groupBy"]
+        records = []
+        for group in groups:
+            fields = group.get("fields") or {}
+            aggregations = group.get("aggregations") or {}
+            record = {name: fields.get(name) for name in self.group_by}
+            record.update((aggregate.alias, aggregations.get(aggregate.alias)) for aggregate in self.aggregates)
+            records.append(record)
+        return self._sorted(records)
+
+    def aggregate_rows(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Compute the request locally from rows already filtered.
+
+        Args:
+            rows: Rows holding at least the grouping and aggregated fields
+
+        Returns:
+            Records in the same shape as `decode`
+        """
+        fields = sorted({aggregate.field for aggregate in self.aggregates})
+        groups: Dict[Tuple[Any, ...], Dict[str, List[Any]]] = {}
+        for row in rows:
+            key = tuple(row.get(name) for name in self.group_by)
+            columns = groups.get(key)
+            if columns is None:
+                columns = groups[key] = {field: [] for field in fields}
+            for field in fields:
+                columns[field].append(row.get(field))
+        if not groups and not self.group_by:
+            groups[()] = {field: [] for field in fields}
+
+        records = []
+        for key, columns in groups.items():
+            record = dict(zip(self.group_by, key))
+            for aggregate in self.aggregates:
+                value = aggregate_values(aggregate.function, columns[aggregate.field], aggregate.distinct)
+                if not having_matches(value, aggregate.having):
+                    break
+                record[aggregate.alias] = value
+            else:
+                records.append(record)
+        return self._sorted(records)
+
+    def _sorted(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return sorted(records, key=lambda record: [(record[name] is not None, record[name] or "") for name in self.group_by])
+
+
+class AggregateClient:
+    """Runs aggregate requests against the Fabric GraphQL API."""
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        fallback: bool = True,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            url: Fabric GraphQL endpoint (directly or through APIM)
+            headers: Request headers (authentication, subscription key)
+            page_size: Rows per request when aggregating locally
+            fallback: Aggregate locally when the groupBy query fails
+            session: Session to send requests with
+        """
+        self.url = url
+        self.headers = headers
+        self.page_size = page_size
+        self.fallback = fallback
+        self.session = session or requests.Session()
+        self.numeric_fields = list(load_schema().get_type("factory_iot_dataNumericAggregateFields").values)
+        self.mode: Optional[str] = None
+        self.requests = 0
+        self.bytes_received = 0
+        self.rows_scanned = 0
+
+    def aggregate(self, request: AggregateRequest, local: bool = False) -> List[Dict[str, Any]]:
+        """
+        Run an aggregate request, pushed down when the schema supports it.
+
+        Args:
+            request: Request to run
+            local: Always aggregate locally
+
+        Returns:
+            One record per group
+
+        Raises:
+            RuntimeError: If the groupBy query fails and fallback is disabled
+        """
+        if not local and not request.unsupported(self.numeric_fields):
+            query, variables = request.to_query()
+            response = self.session.post(self.url, json={"query": query, "variables": variables}, headers=self.headers)
+            self.requests += 1
+            self.bytes_received += len(response.content)
+            body = response.json() if response.ok else {"errors": [{"message": f"HTTP {response.status_code}"}]}
+            if not body.get("errors"):
+                self.mode = PUSHDOWN
+                return request.decode(body)
+            if not self.fallback:
+                raise RuntimeError("GraphQL errors: " + json.dumps(body["errors"], indent=2))
+        self.mode = LOCAL
+        return request.aggregate_rows(self._rows(request))
+
+    def _rows(self, request: AggregateRequest) -> Iterable[Dict[str, Any]]:
+        """Pull the filtered rows, projected on the fields the request needs."""
+        fields = list(dict.fromkeys(request.group_by + [aggregate.field for aggregate in request.aggregates]))
+        query = (
+            "query ($first: Int!, $after: String, $filter: factory_iot_dataFilterInput) {\n"
+            f"  factory_iot_datas(first: $first, after: $after, filter: $filter) {{ items {{ {' '.join(fields)} }} endCursor hasNextPage }}\n"
+            "}"
+        )
+        after = None
+        while True:
+            variables = {"first": self.page_size, "after": after, "filter": request.filter}
+            connection = stream_query(self.url, query, variables, self.headers, root="factory_iot_datas", session=self.session)
+            self.requests += 1
+            for item in connection:
+                self.rows_scanned += 1
+                yield item
+            if connection.errors:
+                raise RuntimeError("GraphQL errors: " + json.dumps(connection.errors, indent=2))
+            if not connection.has_next_page or connection.end_cursor is None:
+                return
+            after = connection.end_cursor
+
+
+def print_records(records: List[Dict[str, Any]]) -> None:
+    """Print records as an aligned table."""
+    if not records:
+        print("(no groups)")
+        return
+    columns = list(records[0])
+    cells = [[("" if record[column] is None else f"{record[column]:.4g}" if isinstance(record[column], float) else str(record[column])) for column in columns] for record in records]
+    widths = [max(len(column), *(len(row[index]) for row in cells)) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def main():
+    """Main entry point for the aggregate command."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Aggregate factory_iot_data in Fabric with groupBy")
+    parser.add_argument("--url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="GraphQL endpoint (default: FABRIC_GRAPHQL_API_URL)")
+    parser.add_argument("--group-by", default="BuildingID,MetricType", help="Comma-separated fields to group by (default: BuildingID,MetricType)")
+    parser.add_argument(
+        "--agg",
+        default="min,max,avg,count",
+        help="Comma-separated aggregates: function[:field[:distinct]], e.g. avg,p95,count:DeviceID:distinct (default: min,max,avg,count)",
+    )
+    parser.add_argument("--filter", help="factory_iot_dataFilterInput as JSON")
+    parser.add_argument("--local", action="store_true", help="Aggregate locally even when groupBy could be used")
+    parser.add_argument("--json", action="store_true", help="Print the records as JSON")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("Error: --url or FABRIC_GRAPHQL_API_URL is required")
+        sys.exit(1)
+    headers = {"Content-Type": "application/json"}
+    if os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY"):
+        headers["Ocp-Apim-Subscription-Key"] = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
+
+    request = AggregateRequest(
+        [Aggregate.parse(spec) for spec in args.agg.split(",")],
+        [field for field in args.group_by.split(",") if field],
+        json.loads(args.filter) if args.filter else None,
+    )
+    client = AggregateClient(args.url, headers)
+    records = client.aggregate(request, local=args.local)
+    if args.json:
+        print(json.dumps(records, indent=2))
+    else:
+        print_records(records)
+    if client.mode == PUSHDOWN:
+        print(f"{len(records)} groups, pushed down: {client.requests} request, {client.bytes_received} bytes", file=sys.stderr)
+    else:
+        print(f"{len(records)} groups, aggregated locally: {client.requests} requests, {client.rows_scanned} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
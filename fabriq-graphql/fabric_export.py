@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Columnar export of the factory_iot_data table.
+
+The export follows `endCursor`/`hasNextPage` through `factory_iot_datas`,
+streaming each page, and writes the rows into a compact columnar file
+instead of JSON text:
+
+* Timestamp is stored as int64 microseconds since the Unix epoch (UTC)
+* Value is stored as float64 (NaN for null)
+* BuildingID, MetricType, Unit and Status are dictionary-encoded as int32
+  codes (-1 for null) into a dictionary kept in the footer
+* DeviceID and Location are stored as UTF-8 strings with int32 lengths
+
+Rows are buffered into row groups of a bounded size; each column of a row
+group is written as one zlib-compressed chunk, so memory stays bounded
+whatever the size of the table. The footer records the offset of every
+chunk, allowing a reader to decode row groups independently.
+
+File layout: MAGIC, row group chunks, footer (JSON), footer length (uint32
+little-endian), MAGIC.
+"""
+
+import argparse
+import calendar
+import json
+import math
+import os
+import re
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from fabric_stream import stream_query
+
+MAGIC = b"FIOTCOL1"
+FORMAT_VERSION = 1
+
+# Column types
+TIMESTAMP = "timestamp"
+FLOAT64 = "float64"
+DICTIONARY = "dictionary"
+STRING = "string"
+
+# Columns of factory_iot_data, in file order.
+COLUMNS: List[Tuple[str, str]] = [
+    ("Timestamp", TIMESTAMP),
+    ("BuildingID", DICTIONARY),
+    ("DeviceID", STRING),
+    ("Location", STRING),
+    ("MetricType", DICTIONARY),
+    ("Value", FLOAT64),
+    ("Unit", DICTIONARY),
+    ("Status", DICTIONARY),
+]
+
+# Sentinel stored for a null timestamp.
+NULL_TIMESTAMP = -(2 ** 63)
+
+DEFAULT_CHUNK_ROWS = 65536
+DEFAULT_PAGE_SIZE = 2000
+
+EXPORT_QUERY = """
+query ($first: Int!, $after: String) {
+  factory_iot_datas(first: $first, after: $after) {
+    items {
+      Timestamp
+      BuildingID
+      DeviceID
+      Location
+      MetricType
+      Value
+      Unit
+      Status
+    }
+    endCursor
+    hasNextPage
+  }
+}
+"""
+
+_TIMESTAMP = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d+))?\s*(Z|[+-]\d\d:?\d\d)?$"
+)
+_LITTLE_ENDIAN = sys.byteorder == "little"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_timestamp(value: Optional[str]) -> int:
+    """
+    Convert an ISO-8601 timestamp to microseconds since the epoch.
+
+    Timestamps without an offset are taken as UTC.
+
+    Args:
+        value: Timestamp string, or None
+
+    Returns:
+        Microseconds since 1970-01-01T00:00:00Z, or NULL_TIMESTAMP for None
+
+    Raises:
+        ValueError: If the value is not an ISO-8601 timestamp
+    """
+    if value is None:
+        return NULL_TIMESTAMP
+    match = _TIMESTAMP.match(value)
+    if not match:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second)))
+    micros = int((fraction or "0")[:6].ljust(6, "0"))
+    if offset and offset != "Z":
+        sign = -1 if offset[0] == "+" else 1
+        digits = offset[1:].replace(":", "")
+        seconds += sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+    return seconds * 1_000_000 + micros
+
+
+def format_timestamp(micros: int) -> Optional[str]:
+    """Convert microseconds since the epoch back to an ISO-8601 UTC string."""
+    if micros == NULL_TIMESTAMP:
+        return None
+    return (_EPOCH + timedelta(microseconds=micros)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _pack(values: array) -> bytes:
+    if not _LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+class ColumnarWriter:
+    """Writes factory_iot_data rows into a columnar file, one row group at a time."""
+
+    def __init__(
+        self,
+        path: str,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        compression_level: int = 6,
+    ) -> None:
+        """
+        Open a file for writing.
+
+        Args:
+            path: File to create
+            chunk_rows: Rows buffered in memory before a row group is written
+            compression_level: zlib level of each column chunk (0 stores them
+                uncompressed)
+        """
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.compression_level = compression_level
+        self.rows_written = 0
+        self.dictionaries: Dict[str, List[str]] = {name: [] for name, kind in COLUMNS if kind == DICTIONARY}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self.dictionaries}
+        self._row_groups: List[Dict[str, Any]] = []
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._buffered = 0
+        self._columns: Dict[str, Any] = {}
+        for name, kind in COLUMNS:
+            if kind == TIMESTAMP:
+                self._columns[name] = array("q")
+            elif kind == FLOAT64:
+                self._columns[name] = array("d")
+            elif kind == DICTIONARY:
+                self._columns[name] = array("i")
+            else:
+                self._columns[name] = []
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """
+        Append one row.
+
+        Args:
+            row: Item of `factory_iot_datas`, keyed by column name
+        """
+        for name, kind in COLUMNS:
+            value = row.get(name)
+            if kind == TIMESTAMP:
+                self._columns[name].append(parse_timestamp(value))
+            elif kind == FLOAT64:
+                self._columns[name].append(math.nan if value is None else float(value))
+            elif kind == DICTIONARY:
+                self._columns[name].append(self._encode(name, value))
+            else:
+                self._columns[name].append(value)
+        self._buffered += 1
+        if self._buffered >= self.chunk_rows:
+            self.flush()
+
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.dictionaries[name].append(value)
+        return code
+
+    def flush(self) -> None:
+        """Write the buffered rows as a row group."""
+        if not self._buffered:
+            return
+        chunks = []
+        for name, kind in COLUMNS:
+            values = self._columns[name]
+            if kind == STRING:
+                encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+                lengths = array("i", (len(data) if value is not None else -1 for data, value in zip(encoded, values)))
+                raw = _pack(lengths) + b"".join(encoded)
+            else:
+                raw = _pack(values)
+            data = zlib.compress(raw, self.compression_level) if self.compression_level else raw
+            chunks.append([self._file.tell(), len(data)])
+            self._file.write(data)
+
+        timestamps = [value for value in self._columns["Timestamp"] if value != NULL_TIMESTAMP]
+        self._row_groups.append({
+            "rows": self._buffered,
+            "chunks": chunks,
+            "min_timestamp": min(timestamps) if timestamps else None,
+            "max_timestamp": max(timestamps) if timestamps else None,
+        })
+        self.rows_written += self._buffered
+        self._reset()
+
+    def close(self) -> None:
+        """Write the last row group and the footer, and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        footer = json.dumps({
+            "version": FORMAT_VERSION,
+            "columns": [{"name": name, "type": kind} for name, kind in COLUMNS],
+            "compression": "zlib" if self.compression_level else "none",
+            "rows": self.rows_written,
+            "dictionaries": self.dictionaries,
+            "row_groups": self._row_groups,
+        }).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(struct.pack("<I", len(footer)))
+        self._file.write(MAGIC)
+        self._file.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ColumnarReader:
+    """Reads a columnar file written by ColumnarWriter."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open a file and read its footer.
+
+        Args:
+            path: File to read
+
+        Raises:
+            ValueError: If the file is not a columnar export
+        """
+        self.path = path
+        self._file: BinaryIO = open(path, "rb")
+        trailer_size = 4 + len(MAGIC)
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        self._file.seek(0)
+        if size < len(MAGIC) + trailer_size or self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a factory_iot_data columnar file")
+        self._file.seek(size - trailer_size)
+        footer_length, magic = struct.unpack("<I", self._file.read(4))[0], self._file.read(len(MAGIC))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is truncated")
+        self._file.seek(size - trailer_size - footer_length)
+        footer = json.loads(self._file.read(footer_length))
+
+        self.columns: List[Tuple[str, str]] = [(column["name"], column["type"]) for column in footer["columns"]]
+        self.rows: int = footer["rows"]
+        self.dictionaries: Dict[str, List[str]] = footer["dictionaries"]
+        self.row_groups: List[Dict[str, Any]] = footer["row_groups"]
+        self._compressed = footer["compression"] == "zlib"
+
+    def read_row_group(self, index: int, columns: Optional[List[str]] = None) -> Dict[str, list]:
+        """
+        Decode one row group.
+
+        Args:
+            index: Row group number
+            columns: Columns to decode (default: all)
+
+        Returns:
+            Values per column: Timestamp as epoch microseconds (None for
+            null), Value as floats (None for NaN), other columns as strings
+        """
+        row_group = self.row_groups[index]
+        result: Dict[str, list] = {}
+        for (name, kind), (offset, length) in zip(self.columns, row_group["chunks"]):
+            if columns is not None and name not in columns:
+                continue
+            self._file.seek(offset)
+            raw = self._file.read(length)
+            if self._compressed:
+                raw = zlib.decompress(raw)
+            if kind == TIMESTAMP:
+                result[name] = [None if value == NULL_TIMESTAMP else value for value in _unpack("q", raw)]
+            elif kind == FLOAT64:
+                result[name] = [None if math.isnan(value) else value for value in _unpack("d", raw)]
+            elif kind == DICTIONARY:
+                dictionary = self.dictionaries[name]
+                result[name] = [dictionary[code] if code >= 0 else None for code in _unpack("i", raw)]
+            else:
+                count = row_group["rows"]
+                lengths = _unpack("i", raw[:4 * count])
+                values: List[Optional[str]] = []
+                position = 4 * count
+                for size in lengths:
+                    if size < 0:
+                        values.append(None)
+                    else:
+                        values.append(raw[position:position + size].decode("utf-8"))
+                        position += size
+                result[name] = values
+        return result
+
+    def read_columns(self, columns: Optional[List[str]] = None) -> Dict[str, list]:
+        """Decode every row group and concatenate the columns."""
+        result: Dict[str, list] = {}
+        for index in range(len(self.row_groups)):
+            for name, values in self.read_row_group(index, columns).items():
+                result.setdefault(name, []).extend(values)
+        return result
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield the rows as dictionaries, one row group in memory at a time."""
+        for index in range(len(self.row_groups)):
+            group = self.read_row_group(index)
+            names = list(group)
+            for values in zip(*(group[name] for name in names)):
+                yield dict(zip(names, values))
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
+
+    def __enter__(self) -> "ColumnarReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def export_factory_iot_data(
+    url: str,
+    path: str,
+    headers: Optional[Dict[str, str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    session: Optional[requests.Session] = None,
+) -> int:
+    """
+    Export the whole factory_iot_data table to a columnar file.
+
+    Pages are streamed and written as they are decoded. The file is written
+    under a temporary name and renamed once complete, so a failed export
+    never leaves a partial file behind.
+
+    Args:
+        url: Fabric GraphQL endpoint (directly or through APIM)
+        path: File to create
+        headers: Request headers (authentication, subscription key)
+        page_size: Rows requested per page
+        chunk_rows: Rows per row group
+        session: Session to send the requests with (default: a new one)
+
+    Returns:
+        Number of rows exported
+
+    Raises:
+        RuntimeError: If the server returns GraphQL errors
+        requests.exceptions.HTTPError: If a request fails
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix=".export-", dir=directory)
+    os.close(descriptor)
+    own_session = session is None
+    session = session or requests.Session()
+    try:
+        with ColumnarWriter(temporary, chunk_rows=chunk_rows) as writer:
+            after = None
+            while True:
+                variables = {"first": page_size, "after": after}
+                connection = stream_query(url, EXPORT_QUERY, variables, headers, root="factory_iot_datas", session=session)
+                for item in connection:
+                    writer.write(item)
+                if connection.errors:
+                    raise RuntimeError("GraphQL errors: " + json.dumps(connection.errors, indent=2))
+                if not connection.has_next_page or connection.end_cursor is None:
+                    break
+                after = connection.end_cursor
+        os.replace(temporary, path)
+        return writer.rows_written
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+
+def main():
+    """Main entry point for the export command."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Columnar export of the factory_iot_data table")
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+
+    export_parser = subparsers.add_parser("export", help="Export the table from the GraphQL API")
+    export_parser.add_argument("output", help="File to create")
+    export_parser.add_argument("--url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="GraphQL endpoint (default: FABRIC_GRAPHQL_API_URL)")
+    export_parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help=f"Rows per request (default: {DEFAULT_PAGE_SIZE})")
+    export_parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help=f"Rows per row group (default: {DEFAULT_CHUNK_ROWS})")
+
+    info_parser = subparsers.add_parser("info", help="Describe a columnar file")
+    info_parser.add_argument("input", help="File to describe")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        url = args.url
+        if not url:
+            print("Error: --url or FABRIC_GRAPHQL_API_URL is required")
+            sys.exit(1)
+        headers = {"Content-Type": "application/json"}
+        if os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY"):
+            headers["Ocp-Apim-Subscription-Key"] = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
+        count = export_factory_iot_data(url, args.output, headers, args.page_size, args.chunk_rows)
+        print(f"Exported {count} rows to {args.output} ({os.path.getsize(args.output)} bytes)")
+    elif args.command == "info":
+        with ColumnarReader(args.input) as reader:
+            print(f"Rows: {reader.rows}")
+            print(f"Row groups: {len(reader.row_groups)}")
+            print(f"Size: {os.path.getsize(args.input)} bytes")
+            for name, kind in reader.columns:
+                extra = f", {len(reader.dictionaries[name])} distinct values" if kind == DICTIONARY else ""
+                print(f"  {name}: {kind}{extra}")
+            starts = [group["min_timestamp"] for group in reader.row_groups if group["min_timestamp"] is not None]
+            ends = [group["max_timestamp"] for group in reader.row_groups if group["max_timestamp"] is not None]
+            if starts:
+                print(f"Time range: {format_timestamp(min(starts))} to {format_timestamp(max(ends))}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Parallel, range-partitioned extraction of factory_iot_data.
+
+A single cursor walk over `factory_iot_datas` is serial: every page needs the
+`endCursor` of the previous one. The extractor instead splits the work into
+partitions, each with its own `filter`, and walks them concurrently from a
+pool of workers:
+
+* by time: `filter: { Timestamp: { gte: start, lt: end } }` sub-ranges of
+  the requested window
+* by building: `filter: { BuildingID: { in: [...] } }` shards
+
+Each partition is read in Timestamp order and the partitions are merged in
+Timestamp order. Time partitions adapt to row density: whenever a worker is
+idle, the busiest partition gives away the second half of its remaining
+time range, so dense ranges are shared out and workers finish at about the
+same time.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from fabric_export import ColumnarWriter, format_timestamp, parse_timestamp
+from fabric_stream import stream_query
+
+DEFAULT_WORKERS = 4
+DEFAULT_PAGE_SIZE = 1000
+
+# A partition is only split when at least this many pages remain in it.
+MIN_SPLIT_PAGES = 2
+
+# Pages a worker reads ahead of the consumer before it waits.
+QUEUED_PAGES = 4
+
+FIELDS = ["Timestamp", "BuildingID", "DeviceID", "Location", "MetricType", "Value", "Unit", "Status"]
+
+PARTITION_QUERY = """
+query ($first: Int!, $after: String, $filter: factory_iot_dataFilterInput) {
+  factory_iot_datas(first: $first, after: $after, filter: $filter, orderBy: { Timestamp: ASC }) {
+    items { %s }
+    endCursor
+    hasNextPage
+  }
+}
+"""
+
+BOUNDARY_QUERY = """
+query ($filter: factory_iot_dataFilterInput) {
+  first: factory_iot_datas(first: 1, filter: $filter, orderBy: { Timestamp: ASC }) { items { Timestamp } }
+  last: factory_iot_datas(first: 1, filter: $filter, orderBy: { Timestamp: DESC }) { items { Timestamp } }
+}
+"""
+
+# Marks the end of a partition in its page queue.
+_DONE = object()
+
+
+class Partition:
+    """A filter walked by one worker, and the pages it produced."""
+
+    def __init__(self, label: str, filter: Dict[str, Any], start: Optional[int] = None, end: Optional[int] = None) -> None:
+        self.label = label
+        self.filter = filter
+        self.start = start
+        self.end = end
+        self.rows = 0
+        self.pages = 0
+        self.seconds = 0.0
+        self.last_timestamp = start
+        self.running = False
+        self.pages_queue: "queue.Queue[Any]" = queue.Queue(QUEUED_PAGES)
+
+    def __repr__(self) -> str:
+        return f"Partition({self.label}, rows={self.rows}, pages={self.pages}, seconds={self.seconds:.2f})"
+
+
+class ExtractStats:
+    """Counters describing an extraction."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.requests = 0
+        self.partitions = 0
+        self.splits = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a dictionary."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        return (
+            f"rows={self.rows}, requests={self.requests}, partitions={self.partitions}, "
+            f"splits={self.splits}, seconds={self.seconds:.2f}, rows/s={rate:.0f}"
+        )
+
+
+class PartitionedExtractor:
+    """Walks partitions of factory_iot_datas concurrently and merges them in Timestamp order."""
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        workers: int = DEFAULT_WORKERS,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[List[str]] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        adaptive: bool = True,
+    ) -> None:
+        """
+        Initialize the extractor.
+
+        Args:
+            url: Fabric GraphQL endpoint (directly or through APIM)
+            headers: Request headers (authentication, subscription key)
+            workers: Number of partitions walked at once
+            page_size: Rows requested per page
+            fields: Fields selected on each item (Timestamp is always included)
+            filter: Filter applied on top of the partition filters
+            adaptive: Split dense time partitions when workers are idle
+        """
+        self.url = url
+        self.headers = headers
+        self.workers = workers
+        self.page_size = page_size
+        self.fields = list(fields or FIELDS)
+        if "Timestamp" not in self.fields:
+            self.fields.insert(0, "Timestamp")
+        self.filter = filter
+        self.adaptive = adaptive
+        self.stats = ExtractStats()
+        self.partitions: List[Partition] = []
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._query = PARTITION_QUERY % " ".join(self.fields)
+        self._lock = threading.Condition()
+        self._pending: List[Partition] = []
+        self._idle = 0
+        self._cancelled = False
+
+    def time_bounds(self) -> Optional[List[int]]:
+        """Return [first, last] Timestamp matching the filter, in epoch microseconds, or None if empty."""
+        response = self._session.post(
+            self.url, json={"query": BOUNDARY_QUERY, "variables": {"filter": self.filter}}, headers=self.headers
+        )
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors"):
+            raise RuntimeError("GraphQL errors: " + json.dumps(body["errors"], indent=2))
+        first = body["data"]["first"]["items"]
+        last = body["data"]["last"]["items"]
+        if not first:
+            return None
+        return [parse_timestamp(first[0]["Timestamp"]), parse_timestamp(last[0]["Timestamp"])]
+
+    def extract_time_range(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        partitions: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Extract rows whose Timestamp is in [start, end), in Timestamp order.
+
+        Args:
+            start: First Timestamp included (default: the earliest row)
+            end: First Timestamp excluded (default: just after the latest row)
+            partitions: Initial number of sub-ranges (default: one per worker)
+
+        Returns:
+            Iterator over the rows
+        """
+        if start is None or end is None:
+            bounds = self.time_bounds()
+            if bounds is None:
+                return iter(())
+            low = parse_timestamp(start) if start is not None else bounds[0]
+            high = parse_timestamp(end) if end is not None else bounds[1] + 1
+        else:
+            low, high = parse_timestamp(start), parse_timestamp(end)
+        count = max(1, min(partitions or self.workers, high - low))
+        edges = [low + (high - low) * i // count for i in range(count)] + [high]
+        return self._run([self._time_partition(edges[i], edges[i + 1]) for i in range(count)], ordered=True)
+
+    def extract_buildings(self, building_ids: List[str], partitions: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Extract the rows of some buildings, sharded by BuildingID, in Timestamp order.
+
+        Args:
+            building_ids: Buildings to extract
+            partitions: Number of shards (default: one per worker; at most one per worker and one per building)
+
+        Returns:
+            Iterator over the rows
+        """
+        # The merge reads every shard at once: each needs a worker of its own.
+        count = max(1, min(partitions or self.workers, self.workers, len(building_ids)))
+        shards = [building_ids[i::count] for i in range(count)]
+        return self._run(
+            [Partition(",".join(shard), self._combine({"BuildingID": {"in": shard}})) for shard in shards],
+            ordered=False,
+        )
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        self._session.close()
+
+    def __enter__(self) -> "PartitionedExtractor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _combine(self, partition_filter: Dict[str, Any]) -> Dict[str, Any]:
+        return {"and": [self.filter, partition_filter]} if self.filter else partition_filter
+
+    def _time_partition(self, start: int, end: int) -> Partition:
+        label = f"{format_timestamp(start)}..{format_timestamp(end)}"
+        time_filter = {"Timestamp": {"gte": format_timestamp(start), "lt": format_timestamp(end)}}
+        return Partition(label, self._combine(time_filter), start, end)
+
+    def _run(self, partitions: List[Partition], ordered: bool) -> Iterator[Dict[str, Any]]:
+        """Walk the partitions on the worker pool and merge their rows."""
+        started = time.perf_counter()
+        self.partitions = list(partitions)
+        self._pending = list(partitions)
+        self._cancelled = False
+        self.stats.partitions += len(partitions)
+        failures: List[BaseException] = []
+
+        def worker() -> None:
+            while True:
+                with self._lock:
+                    self._idle += 1
+                    while not self._pending and any(partition.running for partition in self.partitions):
+                        self._lock.wait()
+                    self._idle -= 1
+                    if not self._pending:
+                        self._lock.notify_all()
+                        return
+                    partition = self._pending.pop(0)
+                    partition.running = True
+                try:
+                    self._walk(partition)
+                except BaseException as error:
+                    failures.append(error)
+                finally:
+                    self._put(partition, _DONE)
+                    with self._lock:
+                        partition.running = False
+                        self._lock.notify_all()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        for _ in range(self.workers):
+            executor.submit(worker)
+        try:
+            if ordered:
+                yield from self._concatenate(failures)
+            else:
+                yield from heapq.merge(
+                    *(self._drain(partition, failures) for partition in partitions),
+                    key=lambda row: parse_timestamp(row["Timestamp"]),
+                )
+        finally:
+            with self._lock:
+                self._pending = []
+                self._cancelled = True
+                self._lock.notify_all()
+            executor.shutdown(wait=True)
+            self.stats.seconds += time.perf_counter() - started
+
+    def _concatenate(self, failures: List[BaseException]) -> Iterator[Dict[str, Any]]:
+        """Yield disjoint time partitions one after the other, including those split off while running."""
+        index = 0
+        while True:
+            with self._lock:
+                if index >= len(self.partitions):
+                    return
+                partition = self.partitions[index]
+            yield from self._drain(partition, failures)
+            index += 1
+
+    def _drain(self, partition: Partition, failures: List[BaseException]) -> Iterator[Dict[str, Any]]:
+        while True:
+            page = partition.pages_queue.get()
+            if page is _DONE:
+                if failures:
+                    raise failures[0]
+                return
+            yield from page
+
+    def _put(self, partition: Partition, page: Any) -> None:
+        """Queue a page, waiting while the consumer is behind, unless the extraction is cancelled."""
+        while not self._cancelled:
+            try:
+                partition.pages_queue.put(page, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _walk(self, partition: Partition) -> None:
+        """Read a partition page by page, giving part of it away when workers are idle."""
+        after = None
+        while True:
+            started = time.perf_counter()
+            variables = {"first": self.page_size, "after": after, "filter": partition.filter}
+            connection = stream_query(self.url, self._query, variables, self.headers, root="factory_iot_datas", session=self._session)
+            items = list(connection)
+            partition.seconds += time.perf_counter() - started
+            if connection.errors:
+                raise RuntimeError("GraphQL errors: " + json.dumps(connection.errors, indent=2))
+
+            with self._lock:
+                self.stats.requests += 1
+                end = partition.end
+            if end is not None:
+                # The partition may have been cut short by a split.
+                kept = [item for item in items if parse_timestamp(item["Timestamp"]) < end]
+            else:
+                kept = items
+            partition.pages += 1
+            partition.rows += len(kept)
+            with self._lock:
+                self.stats.rows += len(kept)
+            if kept:
+                self._put(partition, kept)
+                if partition.start is not None:
+                    partition.last_timestamp = parse_timestamp(kept[-1]["Timestamp"])
+
+            if len(kept) < len(items) or not connection.has_next_page or connection.end_cursor is None or self._cancelled:
+                return
+            after = connection.end_cursor
+            if self.adaptive and partition.start is not None:
+                self._maybe_split(partition)
+
+    def _maybe_split(self, partition: Partition) -> None:
+        """Give the second half of the remaining range to an idle worker."""
+        with self._lock:
+            if not self._idle or self._pending:
+                return
+            last, end = partition.last_timestamp, partition.end
+            # Rows per microsecond observed so far predicts what remains.
+            elapsed = max(1, last - partition.start)
+            remaining_rows = partition.rows * (end - last) / elapsed
+            if remaining_rows < MIN_SPLIT_PAGES * self.page_size or end - last < 2:
+                return
+            middle = last + (end - last + 1) // 2
+            partition.end = middle
+            split = self._time_partition(middle, end)
+            self.partitions.insert(self.partitions.index(partition) + 1, split)
+            self._pending.append(split)
+            self.stats.partitions += 1
+            self.stats.splits += 1
+            self._lock.notify_all()
+
+
+def main():
+    """Main entry point for the extractor."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Parallel range-partitioned extraction of factory_iot_data")
+    parser.add_argument("--url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="GraphQL endpoint (default: FABRIC_GRAPHQL_API_URL)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Partitions walked at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--partitions", type=int, help="Initial number of partitions (default: one per worker)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help=f"Rows per request (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--start", help="First Timestamp included (default: earliest row)")
+    parser.add_argument("--end", help="First Timestamp excluded (default: after the latest row)")
+    parser.add_argument("--buildings", help="Comma-separated BuildingIDs: shard by building instead of by time")
+    parser.add_argument("--no-adaptive", action="store_true", help="Keep the initial time partitions")
+    parser.add_argument("--output", help="Write a columnar file instead of NDJSON on stdout")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("Error: --url or FABRIC_GRAPHQL_API_URL is required")
+        sys.exit(1)
+    headers = {"Content-Type": "application/json"}
+    if os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY"):
+        headers["Ocp-Apim-Subscription-Key"] = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
+
+    with PartitionedExtractor(args.url, headers, args.workers, args.page_size, adaptive=not args.no_adaptive) as extractor:
+        if args.buildings:
+            rows = extractor.extract_buildings(args.buildings.split(","), args.partitions)
+        else:
+            rows = extractor.extract_time_range(args.start, args.end, args.partitions)
+        if args.output:
+            with ColumnarWriter(args.output) as writer:
+                for row in rows:
+                    writer.write(row)
+        else:
+            out = sys.stdout
+            for row in rows:
+                out.write(json.dumps(row) + "\n")
+            out.flush()
+
+        print(f"Extracted {extractor.stats}", file=sys.stderr)
+        for partition in extractor.partitions:
+            print(f"  {partition.label}: {partition.rows} rows, {partition.pages} pages, {partition.seconds:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
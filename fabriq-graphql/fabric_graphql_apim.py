@@ -3,7 +3,14 @@ from azure.identity import ClientSecretCredential, InteractiveBrowserCredential,
 import requests
 import json
 import os
+import sys
 from dotenv import load_dotenv
+
+from fabric_output import discard_stdout, open_writer, parse_format, response_items
+from fabric_projection import items_query, parse_fields
+from fabric_query_cost import DEFAULT_BUDGET, WARN, QueryCostError, QueryCostEstimator
+from fabric_stream import stream_query
+from fabric_validation import QueryValidationError, QueryValidator
  
 load_dotenv()  # Load environment variables from .env file
 
@@ -13,49 +20,115 @@ apim_subscription_key = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
 if not fabricEndpoint or not apim_subscription_key:
     raise ValueError("FABRIC_GRAPHQL_API_URL and FABRIC_APIM_SUBSCRIPTION_KEY must be set in environment variables.")
 
+# Queries estimated above this cost are handled locally (warn, reject or split)
+query_cost_budget = float(os.getenv("FABRIC_QUERY_COST_BUDGET", DEFAULT_BUDGET))
+query_cost_action = os.getenv("FABRIC_QUERY_COST_ACTION", WARN)
+
+# Print items as they are decoded instead of buffering the whole response
+stream_response = os.getenv("FABRIC_STREAM_RESPONSE", "").lower() in ("1", "true", "yes")
+
+# Check queries and variables against factory_schema.graphql before sending them
+validate_queries = os.getenv("FABRIC_VALIDATE_QUERIES", "true").lower() in ("1", "true", "yes")
+
+# Columns to fetch (comma-separated): the query selects only these
+fields = parse_fields(os.getenv("FABRIC_FIELDS"))
+
+# Write the items as table (the whole response, pretty-printed), json, ndjson or csv;
+# with a format, messages go to stderr so stdout only holds the items
+output = open_writer(parse_format(os.getenv("FABRIC_FORMAT")), fields)
+log = sys.stdout if output is None else sys.stderr
+
 # Prepare headers
 headers = {
     'Content-Type': 'application/json',
     'Ocp-Apim-Subscription-Key': apim_subscription_key
 }
  
-query = """
-query {
-  factory_iot_datas(first: 10) {
-     items {
-        Timestamp
-        BuildingID
-        DeviceID
-
-     }
-  }
-}
-"""
+query = items_query(fields)
 
 variables = {
  
   }
 
-print(f"Using FABRIC_GRAPHQL_API_URL: {fabricEndpoint}")
-print(query)
+print(f"Using FABRIC_GRAPHQL_API_URL: {fabricEndpoint}", file=log)
+print(query, file=log)
 
- 
-# Issue GraphQL request
+estimator = QueryCostEstimator()
+validator = QueryValidator(estimator.schema)
 try:
-    print(f"Making request to: {fabricEndpoint}")
-    print(f"Headers: {dict((k, v[:50] + '...' if len(str(v)) > 50 else v) for k, v in headers.items())}")
+    document = validator.validate(query, variables) if validate_queries else query
+except QueryValidationError as validation_error:
+    print(f"Query not sent, it fails validation: {validation_error}", file=log)
+    raise validation_error
+print(f"Estimated query cost: {estimator.estimate(document, variables)} (budget: {query_cost_budget:g}, action: {query_cost_action})", file=log)
+
+
+def send(query, variables):
     response = requests.post(fabricEndpoint, json={'query': query, 'variables': variables}, headers=headers)
-    
-    print(f"Response status code: {response.status_code}")
-    print(f"Response headers: {dict(response.headers)}")
+    print(f"Response status code: {response.status_code}", file=log)
+    print(f"Response headers: {dict(response.headers)}", file=log)
     response.raise_for_status()
-    data = response.json()
-    print(json.dumps(data, indent=4))
+    return response.json()
+
+
+def stream(parts):
+    """Print (or write) each item as it is decoded, following the pages of split connections."""
+    for part in parts:
+        fetched, after = 0, part.after
+        while True:
+            page_query = part.render(min(part.page_size, part.limit - fetched), after) if part.page_size else part.query
+            connection = stream_query(fabricEndpoint, page_query, part.variables, headers, root=part.key)
+            for item in connection:
+                if output is not None:
+                    output.write(item)
+                else:
+                    print(json.dumps(item))
+            fetched += connection.item_count
+            for error in connection.errors:
+                print(f"GraphQL error: {json.dumps(error)}", file=log)
+            print(f"{connection.root}: {connection.item_count} items, endCursor: {connection.end_cursor}, hasNextPage: {connection.has_next_page}", file=log)
+            if not part.page_size or not connection.has_next_page or fetched >= part.limit:
+                break
+            after = connection.end_cursor
+
+ 
+# Issue GraphQL request
+try:
+    print(f"Making request to: {fabricEndpoint}", file=log)
+    print(f"Headers: {dict((k, v[:50] + '...' if len(str(v)) > 50 else v) for k, v in headers.items())}", file=log)
+    if stream_response:
+        stream(estimator.check(query, variables, budget=query_cost_budget, action=query_cost_action))
+    else:
+        data = estimator.execute(send, query, variables, budget=query_cost_budget, action=query_cost_action)
+        if output is not None:
+            for item in response_items(data):
+                output.write(item)
+            for error in data.get("errors") or []:
+                print(f"GraphQL error: {json.dumps(error)}", file=log)
+        else:
+            print(json.dumps(data, indent=4))
+    # Output smaller than the writer's buffer is only written here
+    if output is not None:
+        output.close()
+except BrokenPipeError:
+    # The reader of the output went away (e.g. `| head`): stop without a traceback
+    discard_stdout()
+    sys.exit(1)
+except QueryCostError as cost_error:
+    print(f"Query not sent: {cost_error}", file=log)
+    raise cost_error
 except requests.exceptions.HTTPError as http_error:
-    print(f"HTTP Error: {http_error}")
-    if hasattr(response, 'text'):
-        print(f"Response content: {response.text}")
+    print(f"HTTP Error: {http_error}", file=log)
+    if http_error.response is not None:
+        print(f"Response content: {http_error.response.text}", file=log)
     raise http_error
 except Exception as error:
-    print(f"Query failed with error: {error}")
-    raise error
\ No newline at end of file
+    print(f"Query failed with error: {error}", file=log)
+    raise error
+finally:
+    if output is not None and not output.closed:
+        # Write what was read before an error
+        try:
+            output.close()
+        except BrokenPipeError:
+            discard_stdout()
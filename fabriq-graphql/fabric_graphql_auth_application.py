@@ -2,6 +2,12 @@ from azure.identity import ClientSecretCredential, InteractiveBrowserCredential,
 
 import requests
 import json
+import os
+import sys
+
+from fabric_output import discard_stdout, open_writer, parse_format, response_items
+from fabric_projection import items_query, parse_fields
+from fabric_token_cache import TokenProvider
  
 # Acquire a token
 # DO NOT USE IN PRODUCTION.
@@ -9,19 +15,25 @@ import json
 # For production, always register an application in a Microsoft Entra ID tenant and use the appropriate client_id and scopes
 # https://learn.microsoft.com/en-us/fabric/data-engineering/connect-apps-api-graphql#create-a-microsoft-entra-app
  
+# Write the items as table (the whole response, pretty-printed), json, ndjson or csv
+output_format = parse_format(os.getenv("FABRIC_FORMAT"))
+# With a format, messages go to stderr so stdout only holds the items
+log = sys.stdout if output_format == "table" else sys.stderr
+
 #app = AzureDeveloperCliCredential()
 app = ClientSecretCredential(client_id="5dd792f1-e951-4821-afb1-488ecf1868e8",
-                             client_secret="xxxxxxx",g
+                             client_secret="xxxxxxx",
                              tenant_id="be38c437-5790-4e3a-bb56-4811371e35ea")
 
 # Get token for GraphQL API
-result = app.get_token('api://5dd792f1-e951-4821-afb1-488ecf1868e8/.default')
+# Tokens are cached across runs (FABRIC_TOKEN_CACHE) and refreshed before they expire
+result = TokenProvider(app).get_token('api://5dd792f1-e951-4821-afb1-488ecf1868e8/.default')
 
-print("Access token acquired.")
-print(f"Token: {result.token}")  # Print only the first 20 characters for security
+print("Access token acquired.", file=log)
+print(f"Token: {result.token}", file=log)  # Print only the first 20 characters for security
  
 if not result.token:
-    print('Error:', "Could not get access token")
+    print('Error:', "Could not get access token", file=log)
  
 # Prepare headers
 headers = {
@@ -30,16 +42,10 @@ headers = {
 }
  
 endpoint = 'https://cb0442cc43ea4c819fea0bba9b62f870.zcb.graphql.fabric.microsoft.com/v1/workspaces/cb0442cc-43ea-4c81-9fea-0bba9b62f870/graphqlapis/64f58335-5d12-441d-b5e5-51778048a084/graphql'
-query = """
-    query {
-  factory_iot_datas(first: 10) {
-     items {
-        Timestamp
-        DeviceID
-     }
-  }
-}
-"""
+# Columns to fetch (comma-separated): the query selects only these
+fields = parse_fields(os.getenv("FABRIC_FIELDS"), default=("Timestamp", "DeviceID"))
+query = items_query(fields, page_info=False)
+output = open_writer(output_format, fields)
 
 
 test_query = """
@@ -61,34 +67,54 @@ variables = {
  
   }
 
-print(query)
-print(endpoint)
+print(query, file=log)
+print(endpoint, file=log)
  
 # Issue GraphQL request
 try:
-    print(f"Making request to: {endpoint}")
-    print(f"Headers: {dict((k, v[:50] + '...' if len(str(v)) > 50 else v) for k, v in headers.items())}")
+    print(f"Making request to: {endpoint}", file=log)
+    print(f"Headers: {dict((k, v[:50] + '...' if len(str(v)) > 50 else v) for k, v in headers.items())}", file=log)
     response = requests.post(endpoint, json={'query': query, 'variables': variables}, headers=headers)
     
-    print(f"Response status code: {response.status_code}")
-    print(f"Response headers: {dict(response.headers)}")
+    print(f"Response status code: {response.status_code}", file=log)
+    print(f"Response headers: {dict(response.headers)}", file=log)
     
     if response.status_code == 404:
-        print("\n404 Error: This could indicate:")
-        print("1. The GraphQL endpoint URL is incorrect")
-        print("2. The workspace ID or GraphQL API ID in the URL is wrong")
-        print("3. The API might not be published or accessible")
-        print("4. Authentication scope might be incorrect")
-        print("\nPlease verify the endpoint URL in the Fabric portal")
+        print("\n404 Error: This could indicate:", file=log)
+        print("1. The GraphQL endpoint URL is incorrect", file=log)
+        print("2. The workspace ID or GraphQL API ID in the URL is wrong", file=log)
+        print("3. The API might not be published or accessible", file=log)
+        print("4. Authentication scope might be incorrect", file=log)
+        print("\nPlease verify the endpoint URL in the Fabric portal", file=log)
     
     response.raise_for_status()
     data = response.json()
-    print(json.dumps(data, indent=4))
+    if output is not None:
+        for item in response_items(data):
+            output.write(item)
+        for error in data.get("errors") or []:
+            print(f"GraphQL error: {json.dumps(error)}", file=log)
+    else:
+        print(json.dumps(data, indent=4))
+    # Output smaller than the writer's buffer is only written here
+    if output is not None:
+        output.close()
+except BrokenPipeError:
+    # The reader of the output went away (e.g. `| head`): stop without a traceback
+    discard_stdout()
+    sys.exit(1)
 except requests.exceptions.HTTPError as http_error:
-    print(f"HTTP Error: {http_error}")
+    print(f"HTTP Error: {http_error}", file=log)
     if hasattr(response, 'text'):
-        print(f"Response content: {response.text}")
+        print(f"Response content: {response.text}", file=log)
     raise http_error
 except Exception as error:
-    print(f"Query failed with error: {error}")
-    raise error
\ No newline at end of file
+    print(f"Query failed with error: {error}", file=log)
+    raise error
+finally:
+    if output is not None and not output.closed:
+        # Write what was read before an error
+        try:
+            output.close()
+        except BrokenPipeError:
+            discard_stdout()
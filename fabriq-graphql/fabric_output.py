@@ -0,0 +1,197 @@
+"""
+Machine-readable output of factory_iot_datas items.
+
+FABRIC_FORMAT selects how the sample scripts write the items they fetch to
+standard output:
+
+* table: the whole response pretty-printed (the default, not handled here)
+* ndjson: one JSON object per line
+* json: a JSON array
+* csv: a header row of the columns (FABRIC_FIELDS), then one row per item
+
+With a format set, the scripts' progress messages go to standard error so
+standard output only holds the items. Items are written one at a time as
+they are decoded (FABRIC_STREAM_RESPONSE) or as pages arrive; encoded items
+are collected and written to the binary stream in blocks of about
+`buffer_size` bytes instead of one print per line, and JSON is encoded with
+orjson when it is installed.
+"""
+
+import csv
+import json
+import os
+import sys
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+TABLE = "table"
+FORMATS = (TABLE, "json", "ndjson", "csv")
+
+# Bytes collected before a write to the stream
+BUFFER_SIZE = 64 * 1024
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encoder.encode(value).encode("utf-8")
+
+
+def parse_format(value: Optional[str]) -> str:
+    """
+    Parse an output format, e.g. the value of FABRIC_FORMAT (default: table).
+
+    Raises:
+        ValueError: If the format is not one of FORMATS
+    """
+    output_format = (value or TABLE).strip().lower()
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{value}'; choose one of {', '.join(FORMATS)}")
+    return output_format
+
+
+def response_items(body: Dict[str, Any], root: str = "factory_iot_datas") -> Iterator[Dict[str, Any]]:
+    """Items of a connection in a decoded response body (none if it has no data)."""
+    connection = (body.get("data") or {}).get(root) or {}
+    return iter(connection.get("items") or [])
+
+
+def discard_stdout() -> None:
+    """
+    Point standard output at the null device once its reader went away (e.g.
+    `| head`), so the output still buffered is dropped instead of raising
+    BrokenPipeError again when the interpreter flushes it at exit.
+    """
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+class RecordWriter:
+    """Base class of the writers: buffers encoded items and writes them in blocks."""
+
+    def __init__(self, stream: Optional[BinaryIO] = None, buffer_size: int = BUFFER_SIZE) -> None:
+        """
+        Initialize the writer.
+
+        Args:
+            stream: Binary stream to write to (default: the standard output)
+            buffer_size: Bytes collected before they are written to the stream
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def write(self, item: Dict[str, Any]) -> None:
+        """Write one item."""
+        raise NotImplementedError
+
+    def _append(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered items to the stream."""
+        if self._chunks:
+            self.stream.write(b"".join(self._chunks))
+            self._chunks.clear()
+            self._size = 0
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Finish the output and flush it; the stream is left open. Closing again does nothing."""
+        if not self.closed:
+            self.closed = True
+            self.flush()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class NdjsonWriter(RecordWriter):
+    """Writes one JSON object per line."""
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self.count += 1
+        self._append(dumps(item) + b"\n")
+
+
+class JsonWriter(RecordWriter):
+    """Writes a JSON array, one element per line."""
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self._append((b",\n" if self.count else b"[\n") + dumps(item))
+        self.count += 1
+
+    def close(self) -> None:
+        if not self.closed:
+            self._append(b"\n]\n" if self.count else b"[]\n")
+        super().close()
+
+
+class CsvWriter(RecordWriter):
+    """Writes a header row of columns, then one row per item."""
+
+    def __init__(self, columns: Sequence[str], stream: Optional[BinaryIO] = None, buffer_size: int = BUFFER_SIZE) -> None:
+        """
+        Initialize the writer and write the header row.
+
+        Args:
+            columns: Fields of the items, in column order
+            stream: Binary stream to write to (default: the standard output)
+            buffer_size: Bytes collected before they are written to the stream
+        """
+        super().__init__(stream, buffer_size)
+        self.columns = tuple(columns)
+        self._rows = csv.writer(_TextSink(self._append), lineterminator="\n")
+        self._rows.writerow(self.columns)
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self.count += 1
+        self._rows.writerow(["" if item.get(column) is None else item[column] for column in self.columns])
+
+
+class _TextSink:
+    """File-like target of csv.writer, encoding each row into a writer's buffer."""
+
+    __slots__ = ("_append",)
+
+    def __init__(self, append: Callable[[bytes], None]) -> None:
+        self._append = append
+
+    def write(self, text: str) -> None:
+        self._append(text.encode("utf-8"))
+
+
+def open_writer(output_format: str, columns: Sequence[str], stream: Optional[BinaryIO] = None) -> Optional[RecordWriter]:
+    """
+    Create the writer of a format.
+
+    Args:
+        output_format: One of FORMATS
+        columns: Fields of the items (the CSV columns)
+        stream: Binary stream to write to (default: the standard output)
+
+    Returns:
+        The writer, or None for "table" (the scripts' own output)
+    """
+    if output_format == "ndjson":
+        return NdjsonWriter(stream)
+    if output_format == "json":
+        return JsonWriter(stream)
+    if output_format == "csv":
+        return CsvWriter(columns, stream)
+    return None
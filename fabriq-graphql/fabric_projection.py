@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Projection-driven factory_iot_datas queries.
+
+Scripts name the columns they consume (e.g. `Timestamp,DeviceID`, or
+FABRIC_FIELDS) and get a query selecting only those. Columns are checked
+against the `factory_iot_data` type of factory_schema.graphql, so a typo
+fails before any request, and each query is built once per projection.
+
+`render_policy` writes the query of an APIM REST-to-GraphQL `set-body`
+policy (e.g. fabric-rest-2-graphql/fabric-rest-to-graphql-policy-base-sensors.xml)
+from a projection, so the facade only fetches the columns it returns.
+"""
+
+import argparse
+import re
+import sys
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from graphql import GraphQLSchema
+
+from fabric_query_cost import load_schema
+
+ITEM_TYPE = "factory_iot_data"
+
+# Columns shown by the sample scripts when FABRIC_FIELDS is not set
+DEFAULT_FIELDS = ("Timestamp", "BuildingID", "DeviceID")
+
+_VERBATIM_QUERY = re.compile(r'(var query = @")(.*?)(";)', re.DOTALL)
+
+
+def item_fields(schema: Optional[GraphQLSchema] = None) -> Tuple[str, ...]:
+    """Columns of factory_iot_data, in schema order."""
+    return tuple((schema or load_schema()).get_type(ITEM_TYPE).fields)
+
+
+def parse_fields(fields: Optional[str], default: Tuple[str, ...] = DEFAULT_FIELDS) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated list of columns, e.g. the value of FABRIC_FIELDS.
+
+    Blanks and duplicates are dropped; an empty list gives `default`.
+
+    Raises:
+        ValueError: If a column is not a field of factory_iot_data
+    """
+    result = []
+    for name in (fields or "").split(","):
+        name = name.strip()
+        if name and name not in result:
+            result.append(name)
+    return check_fields(result or default)
+
+
+def check_fields(fields: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Check columns against the schema.
+
+    Raises:
+        ValueError: If a column is not a field of factory_iot_data
+    """
+    fields = tuple(fields)
+    available = item_fields()
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(unknown)}; {ITEM_TYPE} fields: {', '.join(available)}")
+    if not fields:
+        raise ValueError("A projection needs at least one field")
+    return fields
+
+
+@lru_cache(maxsize=64)
+def items_query(fields: Tuple[str, ...], first: int = 10, page_info: bool = True) -> str:
+    """
+    Query of a page of factory_iot_datas selecting only `fields`.
+
+    Args:
+        fields: Columns to select
+        first: Page size
+        page_info: Select `endCursor` and `hasNextPage`
+
+    Raises:
+        ValueError: If a column is not a field of factory_iot_data
+    """
+    selection = "\n".join(f"      {name}" for name in check_fields(fields))
+    cursor = "\n    endCursor\n    hasNextPage" if page_info else ""
+    return f"""
+query {{
+  factory_iot_datas(first: {first}) {{
+    items {{
+{selection}
+    }}{cursor}
+  }}
+}}
+"""
+
+
+def render_policy(policy: str, query: str) -> str:
+    """
+    Replace the query of a REST-to-GraphQL policy.
+
+    The query is the C# verbatim string assigned by `var query = @"...";`
+    in the inbound `set-body`.
+
+    Raises:
+        ValueError: If the policy has no such assignment
+    """
+    if not _VERBATIM_QUERY.search(policy):
+        raise ValueError('No `var query = @"...";` in the policy')
+    lines = query.strip().replace('"', '""').split("\n")
+    literal = "\n".join([lines[0]] + ["            " + line for line in lines[1:]])
+    return _VERBATIM_QUERY.sub(lambda match: match.group(1) + literal + match.group(3), policy, count=1)
+
+
+def main():
+    """Print the query of a projection, or write it into a policy."""
+    parser = argparse.ArgumentParser(description="Build the minimal factory_iot_datas query for a set of columns")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS), help=f"Comma-separated columns (default: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument("--first", type=int, default=10, help="Page size (default: 10)")
+    parser.add_argument("--policy", help="REST-to-GraphQL policy file whose set-body query is rewritten")
+    args = parser.parse_args()
+
+    try:
+        fields = parse_fields(args.fields)
+        if args.policy:
+            # The policy returns the items only
+            query = items_query(fields, args.first, page_info=False)
+            with open(args.policy, encoding="utf-8") as f:
+                policy = f.read()
+            with open(args.policy, "w", encoding="utf-8") as f:
+                f.write(render_policy(policy, query))
+            print(f"Updated {args.policy}")
+            return
+        print(items_query(fields, args.first))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+Static cost estimation for Fabric GraphQL queries.
+
+The cost of a query is computed from the Fabric SDL before the query is sent,
+following the `@cost` directive the schema declares: every object returned
+costs one point, leaf fields are free unless they are computed (they take
+arguments, like the aggregation functions), and a `@cost(weight:)` on a
+field, argument, input field or type overrides the default. Everything
+selected below a list is multiplied by the size of that list, taken from the
+`first` argument of the enclosing connection.
+
+Queries over budget can be reported, rejected, or split into one request per
+root field and smaller pages, so that a heavy `factory_iot_datas` request is
+throttled locally instead of being rejected by APIM or Fabric after a full
+round trip.
+"""
+
+import argparse
+import json
+import os
+import sys
+import warnings
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from graphql import (
+    ArgumentNode,
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNamedType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    IntValueNode,
+    NameNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    StringValueNode,
+    VariableNode,
+    build_schema,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+    is_input_object_type,
+    is_list_type,
+    parse,
+    print_ast,
+    value_from_ast_untyped,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "factory_schema.graphql")
+
+# Items returned by Fabric when a connection is queried without `first`.
+DEFAULT_PAGE_SIZE = 100
+
+# Default budget, in cost points (roughly the number of objects returned).
+DEFAULT_BUDGET = 5000
+
+# Actions taken when a query exceeds its budget
+WARN = "warn"
+REJECT = "reject"
+SPLIT = "split"
+ACTIONS = (WARN, REJECT, SPLIT)
+
+# Response keys selected on split connections to follow their pages.
+PAGE_INFO_FIELDS = ("endCursor", "hasNextPage")
+
+# (query, variables) -> decoded response body
+Sender = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+
+
+class QueryCostWarning(UserWarning):
+    """Emitted when a query exceeds its budget and the action is WARN."""
+
+
+class QueryCostError(ValueError):
+    """Raised when a query exceeds its budget and cannot be sent."""
+
+    def __init__(self, message: str, estimate: "CostEstimate") -> None:
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class CostEstimate:
+    """Total cost of an operation and its cost per root field."""
+
+    __slots__ = ("total", "fields")
+
+    def __init__(self, total: float, fields: Dict[str, float]) -> None:
+        self.total = total
+        self.fields = fields
+
+    def __str__(self) -> str:
+        details = ", ".join(f"{key}={cost:g}" for key, cost in self.fields.items())
+        return f"{self.total:g} ({details})" if details else f"{self.total:g}"
+
+
+class QueryPart:
+    """One request of a checked query, possibly paged."""
+
+    __slots__ = ("query", "variables", "key", "cost", "page_size", "limit", "after", "_operation", "_field", "_fragments")
+
+    def __init__(
+        self,
+        query: str,
+        variables: Dict[str, Any],
+        key: Optional[str] = None,
+        cost: float = 0.0,
+        page_size: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> None:
+        self.query = query
+        self.variables = variables
+        self.key = key
+        self.cost = cost
+        self.page_size = page_size
+        self.limit = limit
+        self.after: Optional[str] = None
+        self._operation: Optional[OperationDefinitionNode] = None
+        self._field: Optional[FieldNode] = None
+        self._fragments: List[FragmentDefinitionNode] = []
+
+    def render(self, first: int, after: Optional[str] = None) -> str:
+        """
+        Return the query text of one page of a paged part.
+
+        Args:
+            first: Number of items to request
+            after: Cursor of the previous page
+
+        Returns:
+            The query text
+        """
+        if self._field is None:
+            return self.query
+        field = _with_paging(self._field, first, after)
+        return _print_part(self._operation, field, self._fragments)
+
+    def __repr__(self) -> str:
+        return f"QueryPart(key={self.key!r}, cost={self.cost:g}, page_size={self.page_size!r}, limit={self.limit!r})"
+
+
+@lru_cache(maxsize=8)
+def load_schema(path: str = SCHEMA_PATH) -> GraphQLSchema:
+    """Build the schema from an SDL file, once per path."""
+    with open(path, encoding="utf-8") as f:
+        return build_schema(f.read())
+
+
+@lru_cache(maxsize=256)
+def _parse(query: str) -> DocumentNode:
+    return parse(query)
+
+
+def _directive_weight(node: Any) -> Optional[float]:
+    """Return the `@cost(weight:)` of a definition, if any."""
+    for directive in getattr(node, "directives", None) or ():
+        if directive.name.value != "cost":
+            continue
+        for argument in directive.arguments:
+            if argument.name.value == "weight":
+                return float(value_from_ast_untyped(argument.value))
+    return None
+
+
+def _replace(node: Any, **changes: Any) -> Any:
+    """Copy an AST node with some attributes changed (nodes may be frozen)."""
+    attributes = {key: getattr(node, key) for key in node.keys if key != "loc"}
+    attributes.update(changes)
+    return type(node)(**attributes)
+
+
+def _with_paging(field: FieldNode, first: int, after: Optional[str]) -> FieldNode:
+    arguments = [argument for argument in field.arguments if argument.name.value not in ("first", "after")]
+    arguments.append(_argument("first", IntValueNode(value=str(first))))
+    if after is not None:
+        arguments.append(_argument("after", StringValueNode(value=after)))
+    return _replace(field, arguments=tuple(arguments))
+
+
+def _argument(name: str, value: Any) -> ArgumentNode:
+    return ArgumentNode(name=NameNode(value=name), value=value)
+
+
+def _print_part(operation: OperationDefinitionNode, field: FieldNode, fragments: List[FragmentDefinitionNode]) -> str:
+    operation = _replace(operation, selection_set=SelectionSetNode(selections=(field,)))
+    return "\n\n".join(print_ast(definition) for definition in [operation] + fragments)
+
+
+class QueryCostEstimator:
+    """Estimates, and enforces a budget on, the cost of queries against a schema."""
+
+    def __init__(
+        self,
+        schema: Optional[GraphQLSchema] = None,
+        default_page_size: int = DEFAULT_PAGE_SIZE,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Initialize the estimator.
+
+        Args:
+            schema: Schema to estimate against (default: factory_schema.graphql)
+            default_page_size: Size assumed for lists without a `first` argument
+            weights: Weight overrides keyed by "Type.field" or "Type", taking
+                precedence over `@cost` directives in the schema
+        """
+        self.schema = schema or load_schema()
+        self.default_page_size = default_page_size
+        self.weights = weights or {}
+
+    def estimate(
+        self,
+        query: Union[str, DocumentNode],
+        variables: Optional[Dict[str, Any]] = None,
+        operation_name: Optional[str] = None,
+    ) -> CostEstimate:
+        """
+        Compute the static cost of an operation.
+
+        Args:
+            query: GraphQL query string or parsed document
+            variables: Query variables
+            operation_name: Operation to estimate when the document has several
+
+        Returns:
+            The estimated cost
+
+        Raises:
+            GraphQLError: If the query does not match the schema
+        """
+        document = _parse(query) if isinstance(query, str) else query
+        operation, root_type, fragments, values = self._prepare(document, variables, operation_name)
+        fields: Dict[str, float] = {}
+        for field in self._root_fields(operation.selection_set, fragments):
+            key = field.alias.value if field.alias else field.name.value
+            fields[key] = fields.get(key, 0.0) + self._field_cost(field, root_type, 1, None, fragments, values)
+        return CostEstimate(sum(fields.values()), fields)
+
+    def check(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        budget: float = DEFAULT_BUDGET,
+        action: str = WARN,
+        operation_name: Optional[str] = None,
+    ) -> List[QueryPart]:
+        """
+        Enforce a budget on a query.
+
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            budget: Maximum cost of one request
+            action: WARN to send it anyway, REJECT to raise, or SPLIT to send
+                one request per root field, paging connections over budget
+            operation_name: Operation to check when the document has several
+
+        Returns:
+            The requests to send
+
+        Raises:
+            QueryCostError: If the query is over budget and is rejected or
+                cannot be split
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action {action!r}, expected one of {', '.join(ACTIONS)}")
+        variables = variables or {}
+        estimate = self.estimate(query, variables, operation_name)
+        if estimate.total <= budget:
+            return [QueryPart(query, variables, cost=estimate.total)]
+
+        message = f"Estimated query cost {estimate} exceeds the budget of {budget:g}"
+        if action == REJECT:
+            raise QueryCostError(message, estimate)
+        if action == WARN:
+            warnings.warn(message, QueryCostWarning, stacklevel=2)
+            return [QueryPart(query, variables, cost=estimate.total)]
+        return self.split(query, variables, budget, operation_name)
+
+    def split(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        budget: float = DEFAULT_BUDGET,
+        operation_name: Optional[str] = None,
+    ) -> List[QueryPart]:
+        """
+        Split a query into requests that each fit a budget.
+
+        Every root field becomes its own request. A root connection still over
+        budget is fetched in pages of the largest size that fits, following
+        `endCursor` until the items originally requested have been read.
+
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            budget: Maximum cost of one request
+            operation_name: Operation to split when the document has several
+
+        Returns:
+            The requests to send, in root field order
+
+        Raises:
+            QueryCostError: If a root field does not fit even one item per page
+        """
+        variables = variables or {}
+        document = _parse(query)
+        operation, root_type, fragments, values = self._prepare(document, variables, operation_name)
+        parts = []
+        for field in self._root_fields(operation.selection_set, fragments):
+            key = field.alias.value if field.alias else field.name.value
+            used_variables = self._used_variables(field, fragments)
+            used_fragments = [fragments[name] for name in self._used_fragments(field.selection_set, fragments)]
+            part_operation = _replace(
+                operation,
+                variable_definitions=tuple(
+                    definition for definition in operation.variable_definitions or ()
+                    if definition.variable.name.value in used_variables
+                ),
+            )
+            part_variables = {name: value for name, value in variables.items() if name in used_variables}
+            cost = self._field_cost(field, root_type, 1, None, fragments, values)
+            part = QueryPart(_print_part(part_operation, field, used_fragments), part_variables, key, cost)
+            if cost > budget:
+                self._page(part, part_operation, field, root_type, fragments, values, used_fragments, budget)
+            parts.append(part)
+        return parts
+
+    def execute(
+        self,
+        send: Sender,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        budget: float = DEFAULT_BUDGET,
+        action: str = WARN,
+        operation_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Check a query against a budget and send it, split if needed.
+
+        Args:
+            send: Function posting (query, variables) and returning the decoded body
+            query: GraphQL query string
+            variables: Query variables
+            budget: Maximum cost of one request
+            action: WARN, REJECT or SPLIT
+            operation_name: Operation to run when the document has several
+
+        Returns:
+            The response body; split responses are merged back into one
+        """
+        parts = self.check(query, variables, budget, action, operation_name)
+        if len(parts) == 1 and parts[0].key is None:
+            return send(parts[0].query, parts[0].variables)
+        return execute_parts(send, parts)
+
+    def _prepare(
+        self,
+        document: DocumentNode,
+        variables: Optional[Dict[str, Any]],
+        operation_name: Optional[str],
+    ) -> Tuple[OperationDefinitionNode, GraphQLNamedType, Dict[str, FragmentDefinitionNode], Dict[str, Any]]:
+        operation = get_operation_ast(document, operation_name)
+        if operation is None:
+            raise GraphQLError("Unknown operation" if operation_name else "Expected exactly one operation")
+        root_type = {
+            OperationType.QUERY: self.schema.query_type,
+            OperationType.MUTATION: self.schema.mutation_type,
+            OperationType.SUBSCRIPTION: self.schema.subscription_type,
+        }[operation.operation]
+        if root_type is None:
+            raise GraphQLError(f"Schema does not support {operation.operation.value} operations")
+        fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        values = get_variable_values(self.schema, operation.variable_definitions or (), variables or {})
+        if isinstance(values, list):
+            raise values[0]
+        return operation, root_type, fragments, values
+
+    def _root_fields(self, selection_set: SelectionSetNode, fragments: Dict[str, FragmentDefinitionNode]) -> List[FieldNode]:
+        fields = []
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                fields.extend(self._root_fields(selection.selection_set, fragments))
+            elif isinstance(selection, FragmentSpreadNode):
+                fields.extend(self._root_fields(fragments[selection.name.value].selection_set, fragments))
+        return fields
+
+    def _selection_cost(
+        self,
+        selection_set: SelectionSetNode,
+        parent_type: GraphQLNamedType,
+        multiplier: float,
+        page_size: Optional[int],
+        fragments: Dict[str, FragmentDefinitionNode],
+        values: Dict[str, Any],
+    ) -> float:
+        total = 0.0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                total += self._field_cost(selection, parent_type, multiplier, page_size, fragments, values)
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    selection = fragments[selection.name.value]
+                condition = selection.type_condition
+                fragment_type = self.schema.get_type(condition.name.value) if condition else parent_type
+                total += self._selection_cost(selection.selection_set, fragment_type, multiplier, page_size, fragments, values)
+        return total
+
+    def _field_cost(
+        self,
+        node: FieldNode,
+        parent_type: GraphQLNamedType,
+        multiplier: float,
+        page_size: Optional[int],
+        fragments: Dict[str, FragmentDefinitionNode],
+        values: Dict[str, Any],
+    ) -> float:
+        name = node.name.value
+        if name.startswith("__"):
+            return 0.0
+        definition = getattr(parent_type, "fields", {}).get(name)
+        if definition is None:
+            raise GraphQLError(f"Cannot query field '{name}' on type '{parent_type.name}'.", node)
+
+        arguments = get_argument_values(definition, node, values)
+        argument_weight = 0.0
+        for argument_name, value in arguments.items():
+            argument = definition.args[argument_name]
+            argument_weight += _directive_weight(argument.ast_node) or 0.0
+            argument_weight += self._input_cost(argument.type, value)
+
+        field_type = get_named_type(definition.type)
+        first = arguments.get("first")
+        size = 1
+        if is_list_type(get_nullable_type(definition.type)) and is_composite_type(field_type):
+            size = first if first is not None else page_size if page_size is not None else self.default_page_size
+        cost = multiplier * (self._weight(parent_type, name, definition) * size + argument_weight)
+
+        if node.selection_set is not None:
+            # A paging field sizes the lists directly below it, like the
+            # `items` and `groupBy` of a connection.
+            child_page_size = first if first is not None else (self.default_page_size if "first" in definition.args else None)
+            cost += self._selection_cost(node.selection_set, field_type, multiplier * size, child_page_size, fragments, values)
+        return cost
+
+    def _weight(self, parent_type: GraphQLNamedType, name: str, definition: Any) -> float:
+        key = f"{parent_type.name}.{name}"
+        if key in self.weights:
+            return self.weights[key]
+        weight = _directive_weight(definition.ast_node)
+        if weight is not None:
+            return weight
+        field_type = get_named_type(definition.type)
+        if field_type.name in self.weights:
+            return self.weights[field_type.name]
+        weight = _directive_weight(field_type.ast_node)
+        if weight is not None:
+            return weight
+        if is_composite_type(field_type):
+            return 1.0
+        return 1.0 if definition.args else 0.0  # Computed leaf, such as an aggregation
+
+    def _input_cost(self, input_type: Any, value: Any) -> float:
+        input_type = get_nullable_type(input_type)
+        if isinstance(input_type, GraphQLList):
+            return sum(self._input_cost(input_type.of_type, item) for item in value or ())
+        if not is_input_object_type(input_type) or not isinstance(value, dict):
+            return 0.0
+        total = 0.0
+        fields = input_type.fields  # type: ignore[union-attr]
+        for name, item in value.items():
+            if name in fields:
+                total += (_directive_weight(fields[name].ast_node) or 0.0) + self._input_cost(fields[name].type, item)
+        return total
+
+    def _used_fragments(
+        self,
+        selection_set: Optional[SelectionSetNode],
+        fragments: Dict[str, FragmentDefinitionNode],
+        found: Optional[List[str]] = None,
+    ) -> List[str]:
+        found = [] if found is None else found
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name not in found:
+                    found.append(name)
+                    self._used_fragments(fragments[name].selection_set, fragments, found)
+            else:
+                self._used_fragments(selection.selection_set, fragments, found)
+        return found
+
+    def _used_variables(self, field: FieldNode, fragments: Dict[str, FragmentDefinitionNode]) -> Set[str]:
+        names: Set[str] = set()
+        nodes: List[Any] = [field] + [fragments[name] for name in self._used_fragments(field.selection_set, fragments)]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, VariableNode):
+                names.add(node.name.value)
+                continue
+            for key in node.keys:
+                child = getattr(node, key)
+                if isinstance(child, (list, tuple)):
+                    nodes.extend(item for item in child if hasattr(item, "keys"))
+                elif hasattr(child, "keys"):
+                    nodes.append(child)
+        return names
+
+    def _page(
+        self,
+        part: QueryPart,
+        operation: OperationDefinitionNode,
+        field: FieldNode,
+        root_type: GraphQLNamedType,
+        fragments: Dict[str, FragmentDefinitionNode],
+        values: Dict[str, Any],
+        used_fragments: List[FragmentDefinitionNode],
+        budget: float,
+    ) -> None:
+        definition = root_type.fields[field.name.value]  # type: ignore[union-attr]
+        estimate = CostEstimate(part.cost, {part.key: part.cost})
+        if "first" not in definition.args or "after" not in definition.args or field.selection_set is None:
+            raise QueryCostError(f"Root field '{part.key}' costs {part.cost:g}, over the budget of {budget:g}, and cannot be paged", estimate)
+
+        arguments = get_argument_values(definition, field, values)
+        limit = arguments.get("first") or self.default_page_size
+        selected = {selection.name.value for selection in field.selection_set.selections if isinstance(selection, FieldNode) and not selection.alias}
+        missing = tuple(FieldNode(name=NameNode(value=name)) for name in PAGE_INFO_FIELDS if name not in selected)
+        field = _replace(field, selection_set=SelectionSetNode(selections=tuple(field.selection_set.selections) + missing))
+
+        # Largest page size that fits the budget; cost grows with `first`.
+        low, high, cost = 0, limit, 0.0
+        while low < high:
+            middle = (low + high + 1) // 2
+            middle_cost = self._field_cost(_with_paging(field, middle, None), root_type, 1, None, fragments, values)
+            if middle_cost <= budget:
+                low, cost = middle, middle_cost
+            else:
+                high = middle - 1
+        if low == 0:
+            raise QueryCostError(f"Root field '{part.key}' is over the budget of {budget:g} even one item at a time", estimate)
+
+        # Pages pass `first` and `after` as literals: drop the variables only they used
+        used_variables = self._used_variables(_with_paging(field, low, None), fragments)
+        operation = _replace(
+            operation,
+            variable_definitions=tuple(
+                definition for definition in operation.variable_definitions or ()
+                if definition.variable.name.value in used_variables
+            ),
+        )
+        part.cost = cost
+        part.page_size = low
+        part.limit = limit
+        part.after = arguments.get("after")
+        part.variables = {name: value for name, value in part.variables.items() if name in used_variables}
+        part._operation = operation
+        part._field = field
+        part._fragments = used_fragments
+        part.query = part.render(low, part.after)
+
+
+def execute_parts(send: Sender, parts: List[QueryPart]) -> Dict[str, Any]:
+    """
+    Send the requests of a split query and merge their responses.
+
+    Paged parts start from the cursor the query passed in `after`, if any, and
+    follow `endCursor` until their limit is reached; the lists of every page
+    are concatenated and the last page's cursor is kept.
+
+    Args:
+        send: Function posting (query, variables) and returning the decoded body
+        parts: Requests returned by QueryCostEstimator.split
+
+    Returns:
+        A single response body
+    """
+    data: Dict[str, Any] = {}
+    errors: List[Dict[str, Any]] = []
+    for part in parts:
+        if part.page_size is None:
+            body = send(part.query, part.variables)
+            errors.extend(body.get("errors") or [])
+            data[part.key] = (body.get("data") or {}).get(part.key)
+            continue
+
+        merged: Optional[Dict[str, Any]] = None
+        fetched, after = 0, part.after
+        while fetched < part.limit:
+            body = send(part.render(min(part.page_size, part.limit - fetched), after), part.variables)
+            errors.extend(body.get("errors") or [])
+            page = (body.get("data") or {}).get(part.key)
+            if page is None:
+                break
+            if merged is None:
+                merged = page
+            else:
+                for name, value in page.items():
+                    if isinstance(value, list) and isinstance(merged.get(name), list):
+                        merged[name].extend(value)
+                    else:
+                        merged[name] = value
+            fetched += max((len(value) for value in page.values() if isinstance(value, list)), default=0)
+            after = page.get("endCursor")
+            if not page.get("hasNextPage") or after is None:
+                break
+        data[part.key] = merged
+
+    body = {"data": data}
+    if errors:
+        body["errors"] = errors
+    return body
+
+
+def main():
+    """Estimate the cost of a query file."""
+    parser = argparse.ArgumentParser(description="Estimate the static cost of a Fabric GraphQL query")
+    parser.add_argument("query", help="File containing the query, or - for stdin")
+    parser.add_argument("--variables", default="{}", help="Query variables as JSON")
+    parser.add_argument("--schema", default=SCHEMA_PATH, help="SDL file of the API (default: factory_schema.graphql)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help=f"Cost budget (default: {DEFAULT_BUDGET})")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help=f"Size assumed for lists without `first` (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--split", action="store_true", help="Print the requests a query over budget is split into")
+    args = parser.parse_args()
+
+    with (sys.stdin if args.query == "-" else open(args.query, encoding="utf-8")) as f:
+        query = f.read()
+    variables = json.loads(args.variables)
+    estimator = QueryCostEstimator(load_schema(args.schema), default_page_size=args.page_size)
+
+    try:
+        estimate = estimator.estimate(query, variables)
+    except GraphQLError as error:
+        print(f"Error: {error.message}")
+        sys.exit(1)
+    print(f"Estimated cost: {estimate}")
+    if estimate.total <= args.budget:
+        print(f"Within the budget of {args.budget:g}")
+        return
+
+    print(f"Over the budget of {args.budget:g}")
+    if args.split:
+        try:
+            parts = estimator.split(query, variables, args.budget)
+        except QueryCostError as error:
+            print(f"Error: {error}")
+            sys.exit(1)
+        for part in parts:
+            pages = f" per page, {part.limit} items in pages of {part.page_size}" if part.page_size else ""
+            print(f"\n# {part.key}: cost {part.cost:g}{pages}")
+            print(part.query)
+    sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
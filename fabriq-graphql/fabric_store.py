@@ -0,0 +1,512 @@
+"""
+Indexed, column-oriented storage of the factory_iot_data table.
+
+Backs the local stand-in server. Rows are held column-wise: Timestamp as
+int64 epoch microseconds, Value as float64 (NaN for null) and the string
+columns dictionary-encoded as int32 codes (-1 for null). Two kinds of index
+answer filters without scanning the table:
+
+* a permutation of the rows sorted by Timestamp, searched with bisect for
+  `eq`/`gt`/`gte`/`lt`/`lte` ranges and walked for `orderBy: { Timestamp }`
+* posting lists of row ids per distinct value of BuildingID, DeviceID and
+  MetricType, also in Timestamp order with their timestamps alongside, so
+  that a Timestamp range is bisected within a posting list as well; string
+  operators (`in`, `contains`, `startsWith`, ...) are first evaluated on the
+  dictionary, so they resolve to a set of codes
+
+A filter is answered from its most selective indexed condition, the other
+conditions being checked row by row. Pages are read lazily from that
+candidate window, in Timestamp order, so the cost of a page does not depend
+on the size of the table; results that have to be merged or sorted are
+materialized once and cached for the following pages.
+"""
+
+import csv
+import json
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from heapq import merge
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fabric_export import NULL_TIMESTAMP, format_timestamp, parse_timestamp
+
+STRING_COLUMNS = ("BuildingID", "DeviceID", "Location", "MetricType", "Unit", "Status")
+COLUMN_NAMES = ("Timestamp", "BuildingID", "DeviceID", "Location", "MetricType", "Value", "Unit", "Status")
+
+# Columns with a hash index by default.
+INDEXED_COLUMNS = ("BuildingID", "DeviceID", "MetricType")
+
+# Sorted results kept for the following pages of a query.
+SELECTION_CACHE_SIZE = 64
+
+# Timestamp operators answered from the sorted index.
+_RANGE_OPERATORS = ("eq", "gt", "gte", "lt", "lte")
+
+# Operators of the *FilterInput types: (filter operand, row value) -> bool.
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda operand, value: value == operand,
+    "neq": lambda operand, value: value != operand,
+    "gt": lambda operand, value: value is not None and value > operand,
+    "gte": lambda operand, value: value is not None and value >= operand,
+    "lt": lambda operand, value: value is not None and value < operand,
+    "lte": lambda operand, value: value is not None and value <= operand,
+    "in": lambda operand, value: value in operand,
+    "isNull": lambda operand, value: (value is None) == operand,
+    "contains": lambda operand, value: value is not None and operand in value,
+    "notContains": lambda operand, value: value is not None and operand not in value,
+    "startsWith": lambda operand, value: value is not None and value.startswith(operand),
+    "endsWith": lambda operand, value: value is not None and value.endswith(operand),
+}
+
+Predicate = Callable[[int], bool]
+
+# Candidate rows of a query: a window [start, stop) of row ids in Timestamp order.
+Window = Tuple[Sequence[int], int, int]
+
+
+class Selection:
+    """Row ids matching a filter, in query order, read page by page."""
+
+    def __init__(
+        self,
+        ids: Sequence[int],
+        start: int = 0,
+        stop: Optional[int] = None,
+        reverse: bool = False,
+        predicate: Optional[Predicate] = None,
+    ) -> None:
+        """
+        Initialize the selection.
+
+        Args:
+            ids: Candidate row ids, in query order
+            start: First position of the candidate window in `ids`
+            stop: End of the candidate window (default: the end of `ids`)
+            reverse: Walk the window backwards
+            predicate: Check applied to each candidate (None: all match)
+        """
+        self.ids = ids
+        self.start = start
+        self.stop = len(ids) if stop is None else stop
+        self.reverse = reverse
+        self.predicate = predicate
+
+    @property
+    def candidates(self) -> int:
+        """Number of rows the selection may have to check."""
+        return max(0, self.stop - self.start)
+
+    def _id(self, offset: int) -> int:
+        return self.ids[self.stop - 1 - offset if self.reverse else self.start + offset]
+
+    def page(self, offset: int, count: int) -> Tuple[List[int], int, bool]:
+        """
+        Read a page of matching row ids.
+
+        Args:
+            offset: Position in the candidate window to resume from
+            count: Rows wanted
+
+        Returns:
+            The row ids, the offset to resume from, and whether more rows match
+        """
+        found: List[int] = []
+        size = self.candidates
+        predicate = self.predicate
+        while offset < size and len(found) < count:
+            row = self._id(offset)
+            offset += 1
+            if predicate is None or predicate(row):
+                found.append(row)
+        if predicate is None:
+            return found, offset, offset < size
+        for ahead in range(offset, size):
+            if predicate(self._id(ahead)):
+                return found, offset, True
+        return found, offset, False
+
+    def __iter__(self) -> Iterator[int]:
+        predicate = self.predicate
+        for offset in range(self.candidates):
+            row = self._id(offset)
+            if predicate is None or predicate(row):
+                yield row
+
+
+class ColumnStore:
+    """The factory_iot_data table, column-wise, with its indexes."""
+
+    def __init__(self, indexed: Sequence[str] = INDEXED_COLUMNS) -> None:
+        """
+        Initialize an empty store.
+
+        Args:
+            indexed: String columns to build hash indexes on
+        """
+        self.indexed = tuple(indexed)
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.codes: Dict[str, array] = {name: array("i") for name in STRING_COLUMNS}
+        self.dictionaries: Dict[str, List[str]] = {name: [] for name in STRING_COLUMNS}
+        self._lookup: Dict[str, Dict[str, int]] = {name: {} for name in STRING_COLUMNS}
+        self._by_time = array("i")
+        self._sorted_timestamps = array("q")
+        self._postings: Dict[str, Dict[int, array]] = {}
+        self._posting_timestamps: Dict[str, Dict[int, array]] = {}
+        self._ranks: Dict[str, List[int]] = {}
+        self._cache: "OrderedDict[str, Selection]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path: str, indexed: Sequence[str] = INDEXED_COLUMNS) -> "ColumnStore":
+        """
+        Load and index a CSV export of the table.
+
+        Args:
+            path: CSV file with a header row
+            indexed: String columns to build hash indexes on
+
+        Returns:
+            The store
+        """
+        store = cls(indexed)
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            positions = [header.index(name) for name in COLUMN_NAMES]
+            for record in reader:
+                store.append({name: record[position] or None for name, position in zip(COLUMN_NAMES, positions)})
+        store.build_indexes()
+        return store
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Append a row; call build_indexes once all rows are appended."""
+        self.timestamps.append(parse_timestamp(row.get("Timestamp")))
+        value = row.get("Value")
+        self.values.append(float(value) if value is not None else math.nan)
+        for name in STRING_COLUMNS:
+            self.codes[name].append(self._encode(name, row.get(name)))
+
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        lookup = self._lookup[name]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return code
+
+    def build_indexes(self) -> None:
+        """Build the Timestamp index, the hash indexes and the sort ranks."""
+        timestamps = self.timestamps
+        self._by_time = array("i", sorted(range(len(timestamps)), key=timestamps.__getitem__))
+        self._sorted_timestamps = array("q", (timestamps[row] for row in self._by_time))
+        self._postings = {}
+        self._posting_timestamps = {}
+        for name in self.indexed:
+            codes = self.codes[name]
+            postings: Dict[int, array] = {}
+            for row in self._by_time:
+                code = codes[row]
+                posting = postings.get(code)
+                if posting is None:
+                    posting = postings[code] = array("i")
+                posting.append(row)
+            self._postings[name] = postings
+            self._posting_timestamps[name] = {
+                code: array("q", (timestamps[row] for row in posting)) for code, posting in postings.items()
+            }
+        for name in STRING_COLUMNS:
+            order = sorted(range(len(self.dictionaries[name])), key=self.dictionaries[name].__getitem__)
+            ranks = [0] * len(order)
+            for rank, code in enumerate(order):
+                ranks[code] = rank
+            self._ranks[name] = ranks
+        with self._cache_lock:
+            self._cache.clear()
+
+    def tiled(self, rows: int) -> "ColumnStore":
+        """
+        Return a larger copy of the table for load tests.
+
+        The rows are repeated as many times as needed, each copy shifted
+        after the previous one in time so that timestamps stay distinct.
+
+        Args:
+            rows: Rows in the copy
+
+        Returns:
+            The copy, indexed
+        """
+        store = ColumnStore(self.indexed)
+        store.dictionaries = {name: list(values) for name, values in self.dictionaries.items()}
+        store._lookup = {name: dict(lookup) for name, lookup in self._lookup.items()}
+        present = [timestamp for timestamp in self.timestamps if timestamp != NULL_TIMESTAMP]
+        period = (max(present) - min(present) + 1_000_000) if present else 0
+        copy = 0
+        while len(store) < rows and len(self):
+            take = min(len(self), rows - len(store))
+            shift = copy * period
+            store.timestamps.extend(
+                timestamp + shift if timestamp != NULL_TIMESTAMP else timestamp for timestamp in self.timestamps[:take]
+            )
+            store.values.extend(self.values[:take])
+            for name in STRING_COLUMNS:
+                store.codes[name].extend(self.codes[name][:take])
+            copy += 1
+        store.build_indexes()
+        return store
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def value(self, name: str, row: int) -> Any:
+        """Return the value of a column for a row, decoded."""
+        if name == "Timestamp":
+            return format_timestamp(self.timestamps[row])
+        if name == "Value":
+            value = self.values[row]
+            return None if value != value else value
+        code = self.codes[name][row]
+        return self.dictionaries[name][code] if code >= 0 else None
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """Return a row as a factory_iot_data object."""
+        return {name: self.value(name, row) for name in COLUMN_NAMES}
+
+    def column_values(self, name: str, rows: Iterator[int]) -> Iterator[Any]:
+        """Return the values of a column for some rows, decoded."""
+        if name == "Value":
+            values = self.values
+            return (None if values[row] != values[row] else values[row] for row in rows)
+        return (self.value(name, row) for row in rows)
+
+    def select(self, filter: Optional[Dict[str, Any]] = None, order_by: Optional[Dict[str, Any]] = None) -> Selection:
+        """
+        Plan a query: the rows matching `filter`, ordered by `order_by`.
+
+        Without `orderBy`, rows come in table order when no index applies and
+        in Timestamp order otherwise.
+
+        Args:
+            filter: Coerced factory_iot_dataFilterInput
+            order_by: Coerced factory_iot_dataOrderByInput; its keys are
+                applied in order, nulls first
+
+        Returns:
+            The selection, to read page by page
+        """
+        keys = [(field, direction) for field, direction in (order_by or {}).items() if direction]
+        cache_key = json.dumps([filter, keys], sort_keys=True, default=str)
+        with self._cache_lock:
+            selection = self._cache.get(cache_key)
+            if selection is not None:
+                self._cache.move_to_end(cache_key)
+                return selection
+
+        conjuncts = _conjuncts(filter)
+        candidate, covered, materialized = self._plan(conjuncts)
+        predicate = self._all([self._predicate(*conjunct) for conjunct in conjuncts if not any(conjunct is done for done in covered)])
+        if not keys or keys == [("Timestamp", keys[0][1])]:
+            reverse = bool(keys) and keys[0][1] == "DESC"
+            if candidate is None:
+                candidate = (self._by_time, 0, len(self)) if keys else (range(len(self)), 0, len(self))
+            selection = Selection(candidate[0], candidate[1], candidate[2], reverse, predicate)
+        else:
+            if candidate is None:
+                candidate = (range(len(self)), 0, len(self))
+            rows = [row for row in Selection(*candidate, predicate=predicate)]
+            # Stable sorts applied from the least to the most significant key.
+            for field, direction in reversed(keys):
+                rows.sort(key=self._sort_key(field), reverse=direction == "DESC")
+            selection = Selection(rows)
+            materialized = True
+
+        if materialized:
+            with self._cache_lock:
+                self._cache[cache_key] = selection
+                while len(self._cache) > SELECTION_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return selection
+
+    def group(self, rows: Iterator[int], fields: Sequence[str]) -> List[Tuple[Dict[str, Any], List[int]]]:
+        """
+        Group rows by the values of some fields.
+
+        Args:
+            rows: Row ids to group
+            fields: Fields to group by
+
+        Returns:
+            (group field values, row ids) pairs, in order of first appearance
+        """
+        columns = [self.codes[name] if name in self.codes else None for name in fields]
+        groups: Dict[Tuple[Any, ...], List[int]] = {}
+        for row in rows:
+            key = tuple(
+                column[row] if column is not None else self.value(name, row) for name, column in zip(fields, columns)
+            )
+            members = groups.get(key)
+            if members is None:
+                members = groups[key] = []
+            members.append(row)
+        result = []
+        for key, members in groups.items():
+            values = {}
+            for name, column, item in zip(fields, columns, key):
+                values[name] = (self.dictionaries[name][item] if item >= 0 else None) if column is not None else item
+            result.append((values, members))
+        return result
+
+    def _plan(self, conjuncts: List[Tuple[str, Any]]) -> Tuple[Optional[Window], List[Tuple[str, Any]], bool]:
+        """
+        Choose the smallest indexed candidate window of a conjunction.
+
+        Returns:
+            The window (None to scan the table), the conjuncts it answers
+            exactly, and whether building it required materializing row ids
+        """
+        time_conjunct, bounds = None, None
+        for conjunct in conjuncts:
+            field, condition = conjunct
+            operators = {operator: operand for operator, operand in condition.items() if operand is not None} if field == "Timestamp" else {}
+            if operators and all(operator in _RANGE_OPERATORS for operator in operators):
+                time_conjunct = conjunct if len(operators) == len(condition) else None
+                bounds = {operator: parse_timestamp(operand) for operator, operand in operators.items()}
+                break
+
+        best: Optional[Window] = None
+        best_size = len(self)
+        covered: List[Tuple[str, Any]] = []
+        materialized = False
+        if bounds is not None:
+            start, stop = _time_window(self._sorted_timestamps, bounds)
+            best, best_size = (self._by_time, start, stop), stop - start
+            covered = [time_conjunct] if time_conjunct else []
+        for conjunct in conjuncts:
+            field, condition = conjunct
+            if field in self._postings:
+                windows = self._posting_windows(field, condition, bounds)
+                size = sum(stop - start for _, start, stop in windows)
+                if size < best_size:
+                    best, best_size, materialized = self._union(windows), size, len(windows) > 1
+                    covered = [conjunct] + ([time_conjunct] if time_conjunct else [])
+            elif field == "or":
+                branches = [self._plan(_conjuncts(nested))[0] for nested in condition]
+                if branches and all(branch is not None for branch in branches):
+                    size = sum(stop - start for _, start, stop in branches)
+                    if size < best_size:
+                        best, best_size, materialized = self._union(branches, distinct=True), size, True
+                        covered = []
+        return best, covered, materialized
+
+    def _posting_windows(self, field: str, condition: Dict[str, Any], bounds: Optional[Dict[str, int]]) -> List[Window]:
+        """Return the windows of the posting lists matching a condition, within Timestamp bounds."""
+        postings, timestamps = self._postings[field], self._posting_timestamps[field]
+        windows = []
+        for code in self._allowed_codes(field, condition):
+            if code in postings:
+                start, stop = _time_window(timestamps[code], bounds) if bounds else (0, len(postings[code]))
+                if stop > start:
+                    windows.append((postings[code], start, stop))
+        return windows
+
+    def _union(self, windows: List[Window], distinct: bool = False) -> Window:
+        """Merge windows into one, in Timestamp order."""
+        if len(windows) == 1 and not distinct:
+            return windows[0]
+        rows = merge(*(ids[start:stop] for ids, start, stop in windows), key=self.timestamps.__getitem__)
+        if distinct:
+            rows = iter(dict.fromkeys(rows))
+        merged = array("i", rows)
+        return merged, 0, len(merged)
+
+    def _allowed_codes(self, field: str, condition: Dict[str, Any]) -> List[int]:
+        """Evaluate a string condition on the dictionary of a column."""
+        checks = [
+            (OPERATORS[operator], operand)
+            for operator, operand in condition.items()
+            if operand is not None or operator == "eq"
+        ]
+        candidates = [(-1, None)] + list(enumerate(self.dictionaries[field]))
+        return [code for code, value in candidates if all(check(operand, value) for check, operand in checks)]
+
+    def _predicate(self, field: str, condition: Any) -> Optional[Predicate]:
+        """Compile one conjunct into a check on a row id."""
+        if field == "or":
+            branches = [self._all([self._predicate(*conjunct) for conjunct in _conjuncts(nested)]) for nested in condition]
+            return lambda row: any(branch is None or branch(row) for branch in branches)
+        if field in self.codes:
+            allowed = frozenset(self._allowed_codes(field, condition))
+            codes = self.codes[field]
+            return lambda row: codes[row] in allowed
+        checks = []
+        for operator, operand in condition.items():
+            if operand is None and operator != "eq":
+                continue
+            if field == "Timestamp" and operator == "in":
+                operand = [parse_timestamp(item) if item is not None else None for item in operand]
+            elif field == "Timestamp" and operator != "isNull" and operand is not None:
+                operand = parse_timestamp(operand)
+            checks.append((OPERATORS[operator], operand))
+        if not checks:
+            return None
+        if field == "Timestamp":
+            timestamps = self.timestamps
+            return lambda row: all(
+                check(operand, timestamps[row] if timestamps[row] != NULL_TIMESTAMP else None) for check, operand in checks
+            )
+        values = self.values
+        return lambda row: all(check(operand, values[row] if values[row] == values[row] else None) for check, operand in checks)
+
+    @staticmethod
+    def _all(predicates: List[Optional[Predicate]]) -> Optional[Predicate]:
+        predicates = [predicate for predicate in predicates if predicate is not None]
+        if not predicates:
+            return None
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda row: all(predicate(row) for predicate in predicates)
+
+    def _sort_key(self, field: str) -> Callable[[int], Any]:
+        """Sort key of a column, nulls first."""
+        if field == "Timestamp":
+            return self.timestamps.__getitem__
+        if field == "Value":
+            values = self.values
+            return lambda row: (values[row] == values[row], values[row] if values[row] == values[row] else 0.0)
+        codes, ranks = self.codes[field], self._ranks[field]
+        return lambda row: ranks[codes[row]] if codes[row] >= 0 else -1
+
+
+def _time_window(timestamps: Sequence[int], bounds: Dict[str, int]) -> Tuple[int, int]:
+    """Bisect range operators on sorted timestamps; nulls, sorted first, never match."""
+    start, stop = bisect_right(timestamps, NULL_TIMESTAMP), len(timestamps)
+    for operator, micros in bounds.items():
+        if operator in ("gte", "eq"):
+            start = max(start, bisect_left(timestamps, micros))
+        if operator == "gt":
+            start = max(start, bisect_right(timestamps, micros))
+        if operator in ("lte", "eq"):
+            stop = min(stop, bisect_right(timestamps, micros))
+        if operator == "lt":
+            stop = min(stop, bisect_left(timestamps, micros))
+    return start, max(start, stop)
+
+
+def _conjuncts(filter: Optional[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Flatten a filter and its nested `and` lists into (field, condition) pairs."""
+    conjuncts: List[Tuple[str, Any]] = []
+    for field, condition in (filter or {}).items():
+        if condition is None:
+            continue
+        if field == "and":
+            for nested in condition:
+                conjuncts.extend(_conjuncts(nested))
+        else:
+            conjuncts.append((field, condition))
+    return conjuncts
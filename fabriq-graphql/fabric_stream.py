@@ -0,0 +1,266 @@
+"""
+Streaming decoding of large Fabric GraphQL responses.
+
+`response.json()` keeps the whole body, and every decoded row, in memory
+before anything can be printed. StreamedConnection instead parses the body
+incrementally as chunks arrive and yields each element of
+`data.<root>.items` as soon as it is decoded, so memory stays flat however
+large the page. Everything else in the body (`errors`, `endCursor`,
+`hasNextPage`, other root fields) is small and is kept, available once the
+items have been consumed.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+# Bytes read from the socket at a time.
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class StreamedConnection:
+    """Iterates the items of a connection while its response body is still downloading."""
+
+    def __init__(self, chunks: Iterable[bytes], root: Optional[str] = None, items: str = "items") -> None:
+        """
+        Initialize the stream.
+
+        Args:
+            chunks: Response body, in byte chunks
+            root: Response key of the connection under `data` (default: the
+                first root field holding an object)
+            items: Name of the list to stream inside the connection
+        """
+        self.root = root
+        self.items_key = items
+        self.body: Dict[str, Any] = {}
+        self.item_count = 0
+        self.done = False
+        self._source = chunks
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        self._started = False
+
+    @property
+    def errors(self) -> List[Dict[str, Any]]:
+        """GraphQL errors of the response."""
+        return self.body.get("errors") or []
+
+    @property
+    def connection(self) -> Dict[str, Any]:
+        """Fields of the connection other than its items."""
+        return (self.body.get("data") or {}).get(self.root) or {}
+
+    @property
+    def end_cursor(self) -> Optional[str]:
+        """Cursor of the last item, to request the next page."""
+        return self.connection.get("endCursor")
+
+    @property
+    def has_next_page(self) -> bool:
+        """Whether more pages are available."""
+        return bool(self.connection.get("hasNextPage"))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._started:
+            raise RuntimeError("A streamed connection can only be iterated once")
+        self._started = True
+        try:
+            yield from self._object(self.body, depth=0)
+            self.done = True
+        finally:
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                close()
+
+    def _object(self, target: Dict[str, Any], depth: int) -> Iterator[Dict[str, Any]]:
+        """Read an object into `target`, descending into data -> root -> items."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if self._descend(depth, key):
+                if depth == 2:
+                    yield from self._items()
+                else:
+                    if depth == 1 and self.root is None:
+                        self.root = key
+                    target[key] = {}
+                    yield from self._object(target[key], depth + 1)
+            else:
+                target[key] = self._value()
+            if self._next() == "}":
+                return
+
+    def _descend(self, depth: int, key: str) -> bool:
+        if depth == 0:
+            wanted = key == "data"
+        elif depth == 1:
+            wanted = key == self.root or self.root is None
+        else:
+            wanted = key == self.items_key
+        return wanted and self._peek() == ("[" if depth == 2 else "{")
+
+    def _items(self) -> Iterator[Dict[str, Any]]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+        scan_once = _DECODER.scan_once
+        skip = _WHITESPACE.match
+        while True:
+            # Fast path: decode the items complete in the buffer directly
+            # with the C scanner.
+            buffer, position = self._buffer, self._position
+            size = len(buffer)
+            while True:
+                try:
+                    item, end = scan_once(buffer, position)
+                except StopIteration:
+                    start = skip(buffer, position).end()
+                    if start == position:
+                        break  # Incomplete item: read more of the body.
+                    position = start
+                    continue
+                except json.JSONDecodeError:
+                    break
+                separator = end
+                if separator < size and buffer[separator] not in ",]":
+                    separator = skip(buffer, separator).end()
+                if separator >= size:
+                    break  # The item may continue, or its separator is in the next chunk.
+                char = buffer[separator]
+                if char not in ",]":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, separator)
+                position = self._position = separator + 1
+                self.item_count += 1
+                yield item
+                if char == "]":
+                    return
+
+            # Slow path: the next item straddles a chunk boundary.
+            yield self._value()
+            self.item_count += 1
+            if self._next() == "]":
+                return
+
+    def _value(self) -> Any:
+        """Decode the next complete JSON value, reading more of the body as needed."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the end of the buffer may continue in
+            # the next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def _next(self) -> str:
+        """Consume the separator after a member: ',' or a closing bracket."""
+        char = self._peek()
+        self._position += 1
+        if char not in ",}]":
+            raise json.JSONDecodeError("Expecting ',' delimiter", self._buffer, self._position - 1)
+        return char
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self._buffer, self._position)
+        self._position += 1
+
+    def _peek(self) -> str:
+        self._skip_whitespace()
+        return self._buffer[self._position] if self._position < len(self._buffer) else ""
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer) or not self._fill():
+                return
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; return False at the end of the body."""
+        if self._eof:
+            return False
+        # Drop what has been consumed so that the buffer stays small.
+        if self._position:
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+
+def stream_query(
+    url: str,
+    query: str,
+    variables: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    root: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> StreamedConnection:
+    """
+    Post a query and stream the items of its connection.
+
+    Args:
+        url: GraphQL endpoint
+        query: GraphQL query string
+        variables: Query variables
+        headers: Request headers
+        root: Response key of the connection (default: the first root field)
+        session: Session to send the request with (default: a one-off request)
+        chunk_size: Bytes read from the socket at a time
+
+    Returns:
+        The stream; iterate it for the items, then read `errors`,
+        `end_cursor` and `has_next_page`
+
+    Raises:
+        requests.exceptions.HTTPError: If the response status is an error
+    """
+    sender = session or requests
+    response = sender.post(url, json={"query": query, "variables": variables or {}}, headers=headers, stream=True)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+    return StreamedConnection(_ResponseChunks(response, chunk_size), root=root)
+
+
+class _ResponseChunks:
+    """Byte chunks of a response, closing it once they are consumed or abandoned."""
+
+    def __init__(self, response: requests.Response, chunk_size: int) -> None:
+        self._response = response
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._chunks
+
+    def close(self) -> None:
+        self._response.close()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local Fabric GraphQL Stand-in Server
+
+A small HTTP/1.1 server answering `factory_iot_datas` queries from
+factory_iot_data.csv, executed against factory_schema.graphql with support
+for paging, `filter`, `orderBy` and `groupBy` aggregations. It is used to
+exercise and load-test the Fabric scripts offline, without Entra
+credentials, a Fabric workspace or an APIM deployment. The table is held in
+an indexed ColumnStore, and can be tiled to millions of rows.
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from graphql import FieldNode, GraphQLError, graphql_sync
+from graphql.execution.values import get_argument_values
+
+from fabric_aggregate import aggregate_values, having_matches
+from fabric_export import format_timestamp, parse_timestamp
+from fabric_query_cost import DEFAULT_PAGE_SIZE, load_schema
+from fabric_store import ColumnStore, Selection
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "factory_iot_data.csv")
+
+
+def load_rows(path: str = CSV_PATH) -> List[Dict[str, Any]]:
+    """
+    Load the factory_iot_data table from a CSV export.
+
+    Timestamps are converted to ISO-8601 UTC strings, as Fabric returns them,
+    and values to floats.
+
+    Args:
+        path: CSV file with a header row
+
+    Returns:
+        One dictionary per row
+    """
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row["Timestamp"] = format_timestamp(parse_timestamp(row["Timestamp"] or None))
+            row["Value"] = float(row["Value"]) if row["Value"] != "" else None
+            rows.append({key: (value if value != "" else None) for key, value in row.items()})
+    return rows
+
+
+class FabricStubServer:
+    """Fabric GraphQL stand-in server running in a background thread."""
+
+    def __init__(
+        self,
+        csv_path: str = CSV_PATH,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        rows: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the server.
+
+        Args:
+            csv_path: CSV file holding the factory_iot_data table
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Artificial delay added to every response, in seconds
+            rows: Tile the table to this many rows (default: serve the CSV as is)
+        """
+        self.store = ColumnStore.from_csv(csv_path)
+        if rows is not None:
+            self.store = self.store.tiled(rows)
+        self.schema = load_schema()
+        self.latency = latency
+        self.request_count = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._server.daemon_threads = True
+
+    def factory_iot_datas(
+        self,
+        info: Any,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        orderBy: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Resolve one page of the factory_iot_datas connection."""
+        selection = self.store.select(filter, orderBy)
+        try:
+            start = int(after) if after else 0
+        except ValueError:
+            raise GraphQLError(f"Invalid cursor: {after!r}")
+        found, end, has_next_page = selection.page(start, first if first is not None else DEFAULT_PAGE_SIZE)
+        return {
+            "items": [self.store.row(row) for row in found],
+            "endCursor": str(end) if found else after,
+            "hasNextPage": has_next_page,
+            "groupBy": lambda info, fields=None: self.group_by(info, selection, fields),
+        }
+
+    def group_by(self, info: Any, selection: Selection, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Resolve factory_iot_dataConnection.groupBy over all the filtered rows.
+
+        Groups failing the `having` condition of a selected aggregation are
+        dropped.
+        """
+        fields = fields or []
+        groups = self.store.group(iter(selection), fields)
+        if not groups and not fields:
+            groups = [({}, [])]
+
+        havings = self._havings(info)
+        result = []
+        for values, members in groups:
+            if all(
+                having_matches(
+                    aggregate_values(function, self.store.column_values(arguments["field"], iter(members)), arguments.get("distinct")),
+                    arguments["having"],
+                )
+                for function, arguments in havings
+            ):
+                result.append({"fields": values, "aggregations": self._aggregations(members)})
+        return result
+
+    def _aggregations(self, members: List[int]) -> Dict[str, Any]:
+        def resolver(function: str) -> Callable[..., Any]:
+            return lambda info, field, having=None, distinct=False: aggregate_values(
+                function, self.store.column_values(field, iter(members)), distinct
+            )
+
+        return {function: resolver(function) for function in ("max", "min", "avg", "sum", "count")}
+
+    def _havings(self, info: Any) -> List[tuple]:
+        """Return (function, arguments) of the aggregations selected with a `having` condition."""
+        aggregations_type = self.schema.get_type("factory_iot_dataAggregations")
+        havings = []
+        for node in info.field_nodes:
+            for selection in node.selection_set.selections if node.selection_set else ():
+                if not isinstance(selection, FieldNode) or selection.name.value != "aggregations" or not selection.selection_set:
+                    continue
+                for aggregation in selection.selection_set.selections:
+                    if not isinstance(aggregation, FieldNode) or aggregation.name.value not in aggregations_type.fields:
+                        continue
+                    arguments = get_argument_values(aggregations_type.fields[aggregation.name.value], aggregation, info.variable_values)
+                    if arguments.get("having"):
+                        havings.append((aggregation.name.value, arguments))
+        return havings
+
+    def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a GraphQL request payload and return the response body."""
+        result = graphql_sync(
+            self.schema,
+            payload.get("query") or "",
+            root_value={"factory_iot_datas": self.factory_iot_datas},
+            variable_values=payload.get("variables"),
+            operation_name=payload.get("operationName"),
+        )
+        return result.formatted
+
+    @property
+    def url(self) -> str:
+        """URL of the GraphQL endpoint."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def _make_request_handler(self):
+        stub = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                encoded = json.dumps(stub.execute(payload)).encode("utf-8")
+                with stub._lock:
+                    stub.request_count += 1
+                    stub.bytes_sent += len(encoded)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
+
+    def serve_forever(self) -> None:
+        """Serve requests in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "FabricStubServer":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FabricStubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main():
+    """Main entry point for the stand-in server."""
+    parser = argparse.ArgumentParser(description="Local Fabric GraphQL stand-in server")
+    parser.add_argument("--csv", default=CSV_PATH, help="CSV file holding the factory_iot_data table")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8001, help="Port to listen on (default: 8001)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial response delay in seconds")
+    parser.add_argument("--rows", type=int, help="Tile the table to this many rows, for load tests")
+    args = parser.parse_args()
+
+    server = FabricStubServer(csv_path=args.csv, host=args.host, port=args.port, latency=args.latency, rows=args.rows)
+    print(f"Serving Fabric GraphQL stand-in at {server.url} ({len(server.store)} rows)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Incremental, watermark-based sync of factory_iot_data.
+
+Each dataset (a name and an optional filter) is synced into its own
+directory, so a run only downloads the rows added since the previous one:
+
+* the watermark is the greatest (Timestamp, DeviceID) stored; a run queries
+  `Timestamp: { gte: watermark - overlap }`, ordered by Timestamp then
+  DeviceID, so rows at the watermark timestamp (the DeviceID tie) and rows
+  arriving late within the overlap window are seen again
+* rows already stored are recognized by their key (Timestamp, DeviceID,
+  MetricType by default), remembered for the overlap window, and skipped;
+  the state records the horizon from which every stored key is remembered,
+  and a run never queries earlier than it, so widening the overlap between
+  runs takes effect as new keys are remembered instead of appending rows
+  already stored
+* new rows are appended to the store as columnar segments
+  (fabric_export.ColumnarWriter), one per batch
+
+Every batch is committed in two steps: the segment is written under a
+temporary name, flushed to disk and renamed, then `state.json` (watermark,
+segment list, keys in the overlap window and its horizon) is replaced
+atomically. A segment
+the state does not list was left by a crash between the two steps and is
+deleted on the next run, whose query fetches its rows again: a crash neither
+loses nor duplicates rows.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from fabric_export import ColumnarReader, ColumnarWriter, format_timestamp, parse_timestamp
+from fabric_stream import stream_query
+from fabric_token_cache import FileLock
+
+STATE_FILE = "state.json"
+LOCK_FILE = ".lock"
+STATE_VERSION = 1
+
+DEFAULT_KEY_FIELDS = ("Timestamp", "DeviceID", "MetricType")
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_BATCH_ROWS = 50000
+
+_SEGMENT = re.compile(r"^part-(\d{6})\.fiot$")
+
+SYNC_QUERY = """
+query ($first: Int!, $after: String, $filter: factory_iot_dataFilterInput) {
+  factory_iot_datas(first: $first, after: $after, filter: $filter, orderBy: { Timestamp: ASC, DeviceID: ASC }) {
+    items {
+      Timestamp
+      BuildingID
+      DeviceID
+      Location
+      MetricType
+      Value
+      Unit
+      Status
+    }
+    endCursor
+    hasNextPage
+  }
+}
+"""
+
+
+class SyncResult:
+    """Counters of a sync run."""
+
+    def __init__(self) -> None:
+        self.fetched = 0
+        self.appended = 0
+        self.late = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.requests = 0
+        self.recovered_segments = 0
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"fetched={self.fetched}, appended={self.appended} (late={self.late}), duplicates={self.duplicates}, "
+            f"batches={self.batches}, requests={self.requests}, seconds={self.seconds:.2f}"
+        )
+
+
+def _key_order(key: Tuple[Any, ...]) -> Tuple[Tuple[bool, str], ...]:
+    """Sort order of deduplication keys whose columns may be null."""
+    return tuple((value is None, "" if value is None else str(value)) for value in key)
+
+
+class SyncStore:
+    """Local store of a synced dataset: columnar segments and a committed state."""
+
+    def __init__(self, directory: str, key_fields: Sequence[str] = DEFAULT_KEY_FIELDS) -> None:
+        """
+        Open (or create) a dataset directory.
+
+        Args:
+            directory: Directory of the dataset
+            key_fields: Fields identifying a row, for deduplication
+        """
+        self.directory = directory
+        self.key_fields = list(key_fields)
+        os.makedirs(directory, exist_ok=True)
+        self.state = self._load_state()
+
+    @property
+    def watermark(self) -> Optional[Tuple[int, str]]:
+        """Greatest (Timestamp in epoch microseconds, DeviceID) stored, or None."""
+        mark = self.state.get("watermark")
+        return (parse_timestamp(mark["Timestamp"]), mark["DeviceID"] or "") if mark else None
+
+    @property
+    def horizon(self) -> Optional[int]:
+        """
+        Timestamp (epoch microseconds) from which the keys of every stored row
+        are remembered, or None if no key is forgotten.
+        """
+        if "horizon" not in self.state:
+            # State written before the horizon was recorded: the keys at the
+            # watermark timestamp are the only ones known to be complete
+            mark = self.state.get("watermark")
+            return parse_timestamp(mark["Timestamp"]) if mark else None
+        horizon = self.state["horizon"]
+        return parse_timestamp(horizon) if horizon is not None else None
+
+    def since(self, overlap: float) -> Optional[int]:
+        """
+        Earliest Timestamp (epoch microseconds) a run queries again, or None
+        for a first run.
+
+        Args:
+            overlap: Seconds before the watermark queried again for late rows
+        """
+        watermark = self.watermark
+        if watermark is None:
+            return None
+        since = watermark[0] - int(overlap * 1_000_000)
+        horizon = self.horizon
+        return since if horizon is None else max(since, horizon)
+
+    @property
+    def rows(self) -> int:
+        """Rows committed to the store."""
+        return self.state["rows"]
+
+    def key(self, row: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Deduplication key of a row."""
+        return tuple(parse_timestamp(row[name]) if name == "Timestamp" else row.get(name) for name in self.key_fields)
+
+    def seen(self) -> set:
+        """Keys of the stored rows within the overlap window."""
+        return {tuple(key) for key in self.state["seen"]}
+
+    def recover(self) -> int:
+        """Delete segments and temporary files not listed in the committed state; return how many."""
+        committed = set(self.state["segments"])
+        removed = 0
+        for name in os.listdir(self.directory):
+            if (_SEGMENT.match(name) and name not in committed) or name.startswith(".segment-") or name.startswith(".state-"):
+                os.unlink(os.path.join(self.directory, name))
+                removed += 1
+        return removed
+
+    def commit(self, rows: List[Dict[str, Any]], watermark: Tuple[int, str], seen: set, overlap: float) -> None:
+        """
+        Append a batch of rows and advance the watermark, atomically.
+
+        Args:
+            rows: New rows
+            watermark: Watermark after the batch
+            seen: Keys of the stored rows, new ones included
+            overlap: Overlap window in seconds; older keys are forgotten
+        """
+        segments = list(self.state["segments"])
+        if rows:
+            name = f"part-{self._next_segment():06d}.fiot"
+            descriptor, temporary = tempfile.mkstemp(prefix=".segment-", dir=self.directory)
+            os.close(descriptor)
+            try:
+                with ColumnarWriter(temporary) as writer:
+                    for row in rows:
+                        writer.write(row)
+                _fsync(temporary)
+                os.replace(temporary, os.path.join(self.directory, name))
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                raise
+            segments.append(name)
+
+        position = self.key_fields.index("Timestamp") if "Timestamp" in self.key_fields else None
+        horizon = None
+        if position is not None:
+            # Keys before the previous horizon were forgotten already
+            horizon = watermark[0] - int(overlap * 1_000_000)
+            if self.horizon is not None:
+                horizon = max(horizon, self.horizon)
+        kept = sorted((key for key in seen if horizon is None or key[position] >= horizon), key=_key_order)
+        state = dict(
+            self.state,
+            watermark={"Timestamp": format_timestamp(watermark[0]), "DeviceID": watermark[1]},
+            horizon=format_timestamp(horizon) if horizon is not None else None,
+            segments=segments,
+            rows=self.state["rows"] + len(rows),
+            seen=[list(key) for key in kept],
+            updated_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        )
+        self._write_state(state)
+        self.state = state
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield the stored rows, segment by segment, with ISO-8601 timestamps."""
+        for name in self.state["segments"]:
+            with ColumnarReader(os.path.join(self.directory, name)) as reader:
+                for row in reader.iter_rows():
+                    row["Timestamp"] = format_timestamp(row["Timestamp"])
+                    yield row
+
+    def _next_segment(self) -> int:
+        numbers = [int(_SEGMENT.match(name).group(1)) for name in self.state["segments"]]
+        return max(numbers, default=0) + 1
+
+    def _load_state(self) -> Dict[str, Any]:
+        path = os.path.join(self.directory, STATE_FILE)
+        if not os.path.exists(path):
+            return {
+                "version": STATE_VERSION,
+                "key_fields": self.key_fields,
+                "watermark": None,
+                "horizon": None,
+                "segments": [],
+                "rows": 0,
+                "seen": [],
+            }
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("key_fields") != self.key_fields:
+            raise ValueError(f"Dataset {self.directory} is keyed on {state.get('key_fields')}, not {self.key_fields}")
+        return state
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        descriptor, temporary = tempfile.mkstemp(prefix=".state-", dir=self.directory)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, os.path.join(self.directory, STATE_FILE))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        _fsync_directory(self.directory)
+
+
+def _fsync(path: str) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_directory(directory: str) -> None:
+    """Make renames in a directory durable (not supported on Windows)."""
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def sync_dataset(
+    url: str,
+    store: SyncStore,
+    filter: Optional[Dict[str, Any]] = None,
+    overlap: float = 0.0,
+    headers: Optional[Dict[str, str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    session: Optional[requests.Session] = None,
+) -> SyncResult:
+    """
+    Fetch the rows added since the last run and append them to the store.
+
+    Args:
+        url: Fabric GraphQL endpoint (directly or through APIM)
+        store: Store of the dataset
+        filter: factory_iot_dataFilterInput selecting the dataset
+        overlap: Seconds before the watermark queried again for late rows
+        headers: Request headers (authentication, subscription key)
+        page_size: Rows requested per page
+        batch_rows: New rows committed at a time
+        session: Session to send the requests with (default: a new one)
+
+    Returns:
+        Counters of the run
+
+    Raises:
+        RuntimeError: If the server returns GraphQL errors
+        requests.exceptions.HTTPError: If a request fails
+    """
+    started = time.perf_counter()
+    result = SyncResult()
+    result.recovered_segments = store.recover()
+    watermark = store.watermark
+    seen = store.seen()
+
+    query_filter = filter
+    start = store.since(overlap)
+    if start is not None:
+        since = {"Timestamp": {"gte": format_timestamp(start)}}
+        query_filter = {"and": [filter, since]} if filter else since
+
+    own_session = session is None
+    session = session or requests.Session()
+    batch: List[Dict[str, Any]] = []
+    try:
+        after = None
+        while True:
+            variables = {"first": page_size, "after": after, "filter": query_filter}
+            connection = stream_query(url, SYNC_QUERY, variables, headers, root="factory_iot_datas", session=session)
+            result.requests += 1
+            for row in connection:
+                result.fetched += 1
+                key = store.key(row)
+                if key in seen:
+                    result.duplicates += 1
+                    continue
+                seen.add(key)
+                position = (parse_timestamp(row["Timestamp"]), row.get("DeviceID") or "")
+                if watermark is not None and position <= watermark:
+                    result.late += 1
+                else:
+                    watermark = position
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    store.commit(batch, watermark, seen, overlap)
+                    result.appended += len(batch)
+                    result.batches += 1
+                    batch = []
+            if connection.errors:
+                raise RuntimeError("GraphQL errors: " + json.dumps(connection.errors, indent=2))
+            if not connection.has_next_page or connection.end_cursor is None:
+                break
+            after = connection.end_cursor
+        if batch or (watermark is not None and store.watermark != watermark):
+            store.commit(batch, watermark, seen, overlap)
+            result.appended += len(batch)
+            result.batches += 1
+    finally:
+        if own_session:
+            session.close()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def main():
+    """Main entry point for the sync command."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Incremental sync of factory_iot_data")
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+
+    run_parser = subparsers.add_parser("run", help="Fetch new rows into the local store")
+    run_parser.add_argument("--url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="GraphQL endpoint (default: FABRIC_GRAPHQL_API_URL)")
+    run_parser.add_argument("--filter", help="factory_iot_dataFilterInput selecting the dataset, as JSON")
+    run_parser.add_argument("--overlap", type=float, default=0.0, help="Seconds before the watermark re-read for late rows (default: 0)")
+    run_parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help=f"Rows per request (default: {DEFAULT_PAGE_SIZE})")
+    run_parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help=f"Rows per commit (default: {DEFAULT_BATCH_ROWS})")
+
+    status_parser = subparsers.add_parser("status", help="Show the watermark and size of the local store")
+
+    for subparser in (run_parser, status_parser):
+        subparser.add_argument("--store", default="sync", help="Root directory of the synced datasets (default: sync)")
+        subparser.add_argument("--dataset", default="factory_iot_data", help="Dataset name (default: factory_iot_data)")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return
+
+    directory = os.path.join(args.store, args.dataset)
+    os.makedirs(directory, exist_ok=True)
+    # One run per dataset at a time
+    with FileLock(os.path.join(directory, LOCK_FILE)):
+        store = SyncStore(directory)
+        if args.command == "run":
+            if not args.url:
+                print("Error: --url or FABRIC_GRAPHQL_API_URL is required")
+                sys.exit(1)
+            headers = {"Content-Type": "application/json"}
+            if os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY"):
+                headers["Ocp-Apim-Subscription-Key"] = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
+            result = sync_dataset(
+                args.url,
+                store,
+                json.loads(args.filter) if args.filter else None,
+                args.overlap,
+                headers,
+                args.page_size,
+                args.batch_rows,
+            )
+            print(f"Synced {args.dataset}: {result}")
+        mark = store.state["watermark"]
+        print(f"Rows: {store.rows} in {len(store.state['segments'])} segments")
+        print(f"Watermark: {mark['Timestamp']} / {mark['DeviceID']}" if mark else "Watermark: none")
+
+
+if __name__ == "__main__":
+    main()
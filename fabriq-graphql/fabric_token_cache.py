@@ -0,0 +1,299 @@
+"""
+Shared, refresh-ahead cache of Entra access tokens.
+
+Acquiring a token from a ClientSecretCredential or an
+InteractiveBrowserCredential costs hundreds of milliseconds, or a browser
+prompt, and each short-lived job used to pay it on start. TokenProvider wraps
+any azure-identity credential and caches its tokens per scope:
+
+* in memory, so repeated calls in a process are free
+* in a JSON file (mode 0600), so the processes of a host reuse each other's
+  tokens; readers never lock, the file is replaced atomically, and refreshes
+  take an exclusive lock on a sibling `.lock` file and re-read the file
+  before calling the credential, so that only one process refreshes a scope
+* ahead of expiry: a token within `refresh_margin` seconds of `expires_on`
+  is still returned while a single background thread refreshes it, and a
+  timer refreshes long-lived processes' tokens before they get there
+
+Concurrent callers in a process share a single refresh per scope.
+
+The file holds bearer tokens: keep it in a private directory, and give
+credentials for different identities different `namespace`s (or files).
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "FABRIC_TOKEN_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "fabric-graphql", "tokens.json"),
+)
+
+# Refresh tokens this many seconds before they expire.
+DEFAULT_REFRESH_MARGIN = 300
+
+# Tokens closer than this to expiry are never returned.
+MIN_VALIDITY = 30
+
+
+class CachedToken(NamedTuple):
+    """An access token, shaped like azure.core.credentials.AccessToken."""
+
+    token: str
+    expires_on: int
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, across processes."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Any = None
+
+    def __enter__(self) -> "FileLock":
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+
+
+class TokenProvider:
+    """Caches the tokens of a credential in memory and in a shared file."""
+
+    def __init__(
+        self,
+        credential: Any,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        namespace: Optional[str] = None,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        background: bool = True,
+    ) -> None:
+        """
+        Initialize the provider.
+
+        Args:
+            credential: azure-identity credential (anything with `get_token`)
+            path: Shared cache file (None: cache in memory only)
+            namespace: Prefix of the cache keys, identifying the credential's
+                identity (default: the credential class and client id)
+            refresh_margin: Seconds before expiry at which tokens are refreshed
+            background: Refresh tokens in background threads before they expire
+        """
+        self.credential = credential
+        self.path = path
+        self.namespace = namespace or ":".join(
+            filter(None, (type(credential).__name__, getattr(credential, "_client_id", None)))
+        )
+        self.refresh_margin = refresh_margin
+        self.background = background
+        self.hits = 0
+        self.file_hits = 0
+        self.refreshes = 0
+        self.background_refreshes = 0
+        self._tokens: Dict[str, CachedToken] = {}
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._closed = False
+        # Spread the refreshes of processes started together.
+        self._jitter = random.uniform(0, min(60.0, refresh_margin / 5))
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> CachedToken:
+        """
+        Return a token for the scopes, from the cache when possible.
+
+        Requests with `claims` (a claims challenge) always go to the
+        credential.
+
+        Args:
+            scopes: Scopes of the token
+            kwargs: Passed to the credential's get_token
+
+        Returns:
+            The token, valid for at least MIN_VALIDITY seconds
+        """
+        if kwargs.get("claims"):
+            return self._fetch(scopes, kwargs)
+        key = self._key(scopes, kwargs)
+        now = time.time()
+
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on - now > MIN_VALIDITY:
+            self.hits += 1
+            if self._stale(token, now):
+                self._refresh_in_background(key, scopes, kwargs)
+            return token
+
+        token = self._read(key)
+        if token is not None and token.expires_on - now > MIN_VALIDITY:
+            self.file_hits += 1
+            self._store(key, scopes, kwargs, token)
+            if self._stale(token, now):
+                self._refresh_in_background(key, scopes, kwargs)
+            return token
+
+        return self._refresh(key, scopes, kwargs)
+
+    def close(self) -> None:
+        """Cancel the pending background refreshes."""
+        with self._lock:
+            self._closed = True
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+
+    def __enter__(self) -> "TokenProvider":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _key(self, scopes: Tuple[str, ...], kwargs: Dict[str, Any]) -> str:
+        extra = ",".join(f"{name}={kwargs[name]}" for name in sorted(kwargs) if kwargs[name] is not None)
+        return f"{self.namespace}|{' '.join(sorted(scopes))}|{extra}"
+
+    def _stale(self, token: CachedToken, now: float) -> bool:
+        return token.expires_on - now <= self.refresh_margin + self._jitter
+
+    def _refresh(self, key: str, scopes: Tuple[str, ...], kwargs: Dict[str, Any], force: bool = False) -> CachedToken:
+        """Refresh a scope once, however many threads ask for it at the same time."""
+        with self._lock:
+            event = self._in_flight.get(key)
+            leader = event is None
+            if leader:
+                event = self._in_flight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on - time.time() > MIN_VALIDITY:
+                return token
+            return self._refresh(key, scopes, kwargs, force)
+        try:
+            token = self._refresh_shared(key, scopes, kwargs, force)
+            self._store(key, scopes, kwargs, token)
+            return token
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def _refresh_shared(self, key: str, scopes: Tuple[str, ...], kwargs: Dict[str, Any], force: bool) -> CachedToken:
+        """Refresh a scope under the file lock, unless another process just did."""
+        if self.path is None:
+            return self._fetch(scopes, kwargs)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        with FileLock(self.path + ".lock"):
+            current = self._read(key)
+            held = self._tokens.get(key)
+            now = time.time()
+            if (
+                current is not None
+                and current.expires_on - now > MIN_VALIDITY
+                and (not force or (not self._stale(current, now) and current != held))
+            ):
+                self.file_hits += 1
+                return current
+            token = self._fetch(scopes, kwargs)
+            self._write(key, token)
+            return token
+
+    def _fetch(self, scopes: Tuple[str, ...], kwargs: Dict[str, Any]) -> CachedToken:
+        result = self.credential.get_token(*scopes, **kwargs)
+        self.refreshes += 1
+        return CachedToken(result.token, int(result.expires_on))
+
+    def _refresh_in_background(self, key: str, scopes: Tuple[str, ...], kwargs: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self.background or self._closed or key in self._in_flight:
+                return
+
+        def refresh() -> None:
+            try:
+                self._refresh(key, scopes, kwargs, force=True)
+                self.background_refreshes += 1
+            except Exception:
+                # The current token is still valid; the next call retries.
+                pass
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _store(self, key: str, scopes: Tuple[str, ...], kwargs: Dict[str, Any], token: CachedToken) -> None:
+        """Keep a token in memory and schedule its refresh ahead of expiry."""
+        with self._lock:
+            self._tokens[key] = token
+            if not self.background or self._closed:
+                return
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            delay = token.expires_on - time.time() - self.refresh_margin - self._jitter
+            if delay > 0:
+                timer = threading.Timer(delay, self._refresh_in_background, (key, scopes, kwargs))
+                timer.daemon = True
+                self._timers[key] = timer
+                timer.start()
+
+    def _read(self, key: str) -> Optional[CachedToken]:
+        if self.path is None:
+            return None
+        entry = self._load().get(key)
+        if not isinstance(entry, dict):
+            return None
+        try:
+            return CachedToken(entry["token"], int(entry["expires_on"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self, key: str, token: CachedToken) -> None:
+        """Add a token to the file, dropping expired ones; call with the file lock held."""
+        now = time.time()
+        entries = {name: entry for name, entry in self._load().items() if isinstance(entry, dict) and entry.get("expires_on", 0) > now}
+        entries[key] = {"token": token.token, "expires_on": token.expires_on}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary = tempfile.mkstemp(prefix=".tokens-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.chmod(temporary, 0o600)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
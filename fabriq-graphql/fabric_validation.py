@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local validation of Fabric GraphQL requests against factory_schema.graphql.
+
+A query with a typo or a variable of the wrong type is rejected by Fabric
+only after a full round trip through APIM. QueryValidator rejects it before
+it is sent. Each query is parsed and validated once: the outcome (the
+document, or its errors) is kept in an LRU keyed by the SHA-256 of the query
+text, so repeated queries skip both steps. Variables are coerced against the
+operation's variable definitions on every request.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, get_operation_ast, parse, validate
+from graphql.execution.values import get_variable_values
+
+from fabric_query_cost import SCHEMA_PATH, load_schema
+
+DEFAULT_MAX_DOCUMENTS = 256
+
+
+class QueryValidationError(ValueError):
+    """Raised when a request fails local validation; it was not sent."""
+
+    def __init__(self, errors: List[Dict[str, Any]]) -> None:
+        super().__init__("; ".join(error["message"] for error in errors))
+        self.errors = errors
+
+
+class ValidationStats:
+    """Counters of the document cache and of rejected requests."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+            f"rejected={self.rejected}, hit rate={self.hit_rate:.1%}"
+        )
+
+
+class QueryValidator:
+    """Validates requests against a schema, caching validated documents."""
+
+    def __init__(self, schema: Optional[GraphQLSchema] = None, max_documents: int = DEFAULT_MAX_DOCUMENTS) -> None:
+        """
+        Initialize the validator.
+
+        Args:
+            schema: Schema to validate against (default: factory_schema.graphql)
+            max_documents: Maximum number of documents kept in the LRU
+        """
+        self.schema = schema or load_schema()
+        self.max_documents = max_documents
+        self.stats = ValidationStats()
+        # query hash -> (document, errors)
+        self._documents: "OrderedDict[str, Tuple[Optional[DocumentNode], List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def validate(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        operation_name: Optional[str] = None,
+    ) -> DocumentNode:
+        """
+        Check a request before it is sent.
+
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            operation_name: Operation to run when the document has several
+
+        Returns:
+            The parsed document, which QueryCostEstimator.estimate accepts too
+
+        Raises:
+            QueryValidationError: If the query does not parse, does not match
+                the schema, or the variables cannot be coerced to their types
+        """
+        document, errors = self._document(query)
+        if not errors:
+            operation = get_operation_ast(document, operation_name)
+            if operation is None:
+                errors = [{"message": f"Unknown operation named '{operation_name}'." if operation_name else "Must provide operation name if query contains multiple operations."}]
+            else:
+                values = get_variable_values(self.schema, operation.variable_definitions or (), variables or {})
+                if isinstance(values, list):
+                    errors = [error.formatted for error in values]
+        if errors:
+            self.stats.rejected += 1
+            raise QueryValidationError(errors)
+        return document
+
+    def _document(self, query: str) -> Tuple[Optional[DocumentNode], List[Dict[str, Any]]]:
+        key = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                self._documents.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            self.stats.misses += 1
+
+        try:
+            document = parse(query)
+            entry = (document, [error.formatted for error in validate(self.schema, document)])
+        except GraphQLError as error:
+            entry = (None, [error.formatted])
+        with self._lock:
+            self._documents[key] = entry
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self.stats.evictions += 1
+        return entry
+
+
+def main():
+    """Validate a query file."""
+    parser = argparse.ArgumentParser(description="Validate a Fabric GraphQL query against the schema")
+    parser.add_argument("query", help="File containing the query, or - for stdin")
+    parser.add_argument("--variables", default="{}", help="Query variables as JSON")
+    parser.add_argument("--schema", default=SCHEMA_PATH, help="SDL file of the API (default: factory_schema.graphql)")
+    args = parser.parse_args()
+
+    with (sys.stdin if args.query == "-" else open(args.query, encoding="utf-8")) as f:
+        query = f.read()
+    try:
+        QueryValidator(load_schema(args.schema)).validate(query, json.loads(args.variables))
+    except QueryValidationError as error:
+        for entry in error.errors:
+            locations = ", ".join(f"{location['line']}:{location['column']}" for location in entry.get("locations") or [])
+            print(f"Error{' at ' + locations if locations else ''}: {entry['message']}")
+        sys.exit(1)
+    print("Valid")
+
+
+if __name__ == "__main__":
+    main()
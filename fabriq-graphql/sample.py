@@ -2,6 +2,13 @@ from azure.identity import InteractiveBrowserCredential, DefaultAzureCredential,
 
 import requests
 import json
+import os
+import sys
+
+from fabric_output import discard_stdout, open_writer, parse_format, response_items
+from fabric_projection import items_query, parse_fields
+from fabric_stream import stream_query
+from fabric_token_cache import TokenProvider
  
 # Acquire a token
 # DO NOT USE IN PRODUCTION.
@@ -9,15 +16,21 @@ import json
 # For production, always register an application in a Microsoft Entra ID tenant and use the appropriate client_id and scopes
 # https://learn.microsoft.com/en-us/fabric/data-engineering/connect-apps-api-graphql#create-a-microsoft-entra-app
  
+# Write the items as table (the whole response, pretty-printed), json, ndjson or csv
+output_format = parse_format(os.getenv("FABRIC_FORMAT"))
+# With a format, messages go to stderr so stdout only holds the items
+log = sys.stdout if output_format == "table" else sys.stderr
+
 #app = AzureDeveloperCliCredential(tenant_id="de0dfa5c-3de9-4321-90aa-13727d0ca0b4")
 app = InteractiveBrowserCredential()
 scp = 'https://analysis.windows.net/powerbi/api/user_impersonation'
-result = app.get_token(scp)
-print("Access token acquired.")
-print(f"Token: {result.token}...")  # Print only the first 20 characters for security
+# Tokens are cached across runs (FABRIC_TOKEN_CACHE): the browser only opens once the cached one expires
+result = TokenProvider(app).get_token(scp)
+print("Access token acquired.", file=log)
+print(f"Token: {result.token}...", file=log)  # Print only the first 20 characters for security
  
 if not result.token:
-    print('Error:', "Could not get access token")
+    print('Error:', "Could not get access token", file=log)
  
 # Prepare headers
 headers = {
@@ -29,16 +42,13 @@ endpoint = 'https://f8266fef6a6b42e7aed3e2c8d8b4ab75.zf8.graphql.fabric.microsof
 endpoint='https://apim-tgebslojbs6y2.azure-api.net/fabric-graphql'
 endpoint = 'https://cb0442cc43ea4c819fea0bba9b62f870.zcb.graphql.fabric.microsoft.com/v1/workspaces/cb0442cc-43ea-4c81-9fea-0bba9b62f870/graphqlapis/64f58335-5d12-441d-b5e5-51778048a084/graphql'
 
-query = """
-    query {
-  factory_iot_datas(first: 10) {
-     items {
-        Timestamp
-        DeviceID
-     }
-  }
-}
-"""
+# Print items as they are decoded instead of buffering the whole response
+stream_response = os.getenv("FABRIC_STREAM_RESPONSE", "").lower() in ("1", "true", "yes")
+
+# Columns to fetch (comma-separated): the query selects only these
+fields = parse_fields(os.getenv("FABRIC_FIELDS"), default=("Timestamp", "DeviceID"))
+query = items_query(fields)
+output = open_writer(output_format, fields)
 
 
 test_query = """
@@ -60,15 +70,46 @@ variables = {
  
   }
 
-print(query)
-print(endpoint)
+print(query, file=log)
+print(endpoint, file=log)
  
 # Issue GraphQL request
 try:
-    response = requests.post(endpoint, json={'query': query, 'variables': variables}, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    print(json.dumps(data, indent=4))
+    if stream_response:
+        connection = stream_query(endpoint, query, variables, headers)
+        for item in connection:
+            if output is not None:
+                output.write(item)
+            else:
+                print(json.dumps(item))
+        for error in connection.errors:
+            print(f"GraphQL error: {json.dumps(error)}", file=log)
+        print(f"{connection.item_count} items, endCursor: {connection.end_cursor}, hasNextPage: {connection.has_next_page}", file=log)
+    else:
+        response = requests.post(endpoint, json={'query': query, 'variables': variables}, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        if output is not None:
+            for item in response_items(data):
+                output.write(item)
+            for error in data.get("errors") or []:
+                print(f"GraphQL error: {json.dumps(error)}", file=log)
+        else:
+            print(json.dumps(data, indent=4))
+    # Output smaller than the writer's buffer is only written here
+    if output is not None:
+        output.close()
+except BrokenPipeError:
+    # The reader of the output went away (e.g. `| head`): stop without a traceback
+    discard_stdout()
+    sys.exit(1)
 except Exception as error:
-    print(f"Query failed with error: {error}")
-    raise error
\ No newline at end of file
+    print(f"Query failed with error: {error}", file=log)
+    raise error
+finally:
+    if output is not None and not output.closed:
+        # Write what was read before an error
+        try:
+            output.close()
+        except BrokenPipeError:
+            discard_stdout()
@@ -0,0 +1,42 @@
+"""Round trip of the columnar export through the local stand-in server."""
+
+import os
+
+import pytest
+import requests
+
+from fabric_export import COLUMNS, ColumnarReader, export_factory_iot_data, parse_timestamp
+from fabric_stub_server import CSV_PATH, FabricStubServer, load_rows
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FabricStubServer(CSV_PATH) as stub:
+        yield stub
+
+
+@pytest.mark.parametrize(
+    "page_size, chunk_rows",
+    [(2000, 65536), (100, 256), (7, 1000)],
+    ids=["defaults", "small-pages-and-row-groups", "uneven-boundaries"],
+)
+def test_export_matches_csv(server, tmp_path, page_size, chunk_rows):
+    expected = [dict(row, Timestamp=parse_timestamp(row["Timestamp"])) for row in load_rows(CSV_PATH)]
+    path = str(tmp_path / "factory_iot_data.fiot")
+
+    count = export_factory_iot_data(server.url, path, page_size=page_size, chunk_rows=chunk_rows)
+
+    with ColumnarReader(path) as reader:
+        assert count == reader.rows == len(expected)
+        assert reader.columns == COLUMNS
+        assert len(reader.row_groups) == -(-len(expected) // chunk_rows)
+        assert list(reader.iter_rows()) == expected
+
+
+def test_failed_export_leaves_no_file(tmp_path):
+    path = str(tmp_path / "factory_iot_data.fiot")
+
+    with pytest.raises(requests.ConnectionError):
+        export_factory_iot_data("http://127.0.0.1:9/graphql", path)
+
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,84 @@
+"""Partitioned extraction against the local stand-in server, compared with a single cursor walk."""
+
+import time
+
+import pytest
+import requests
+
+from fabric_extract import FIELDS, PARTITION_QUERY, QUEUED_PAGES, PartitionedExtractor
+from fabric_stream import stream_query
+from fabric_stub_server import CSV_PATH, FabricStubServer
+
+BUILDINGS = ["BLD-PAR-001", "BLD-LYO-002", "BLD-MAR-003"]
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FabricStubServer(CSV_PATH) as stub:
+        yield stub
+
+
+def cursor_walk(url, filter=None, page_size=100):
+    """Every row matching the filter, read in Timestamp order one page after the other."""
+    query = PARTITION_QUERY % " ".join(FIELDS)
+    rows, after = [], None
+    with requests.Session() as session:
+        while True:
+            variables = {"first": page_size, "after": after, "filter": filter}
+            connection = stream_query(url, query, variables, root="factory_iot_datas", session=session)
+            rows.extend(connection)
+            assert not connection.errors
+            if not connection.has_next_page:
+                return rows
+            after = connection.end_cursor
+
+
+@pytest.mark.parametrize(
+    "adaptive, partitions",
+    [(False, None), (False, 7), (True, 1), (True, 2)],
+    ids=["fixed", "more-partitions-than-workers", "split-from-one", "split-from-two"],
+)
+def test_time_partitions_match_a_cursor_walk(server, adaptive, partitions):
+    expected = cursor_walk(server.url)
+
+    with PartitionedExtractor(server.url, workers=4, page_size=20, adaptive=adaptive) as extractor:
+        rows = list(extractor.extract_time_range(partitions=partitions))
+
+    assert rows == expected
+    assert extractor.stats.rows == len(expected)
+    assert (extractor.stats.splits > 0) == adaptive
+
+
+def test_time_partitions_of_a_filtered_window(server):
+    filter = {"BuildingID": {"eq": "BLD-PAR-001"}}
+    start, end = "2025-11-11T12:00:00Z", "2025-11-12T12:00:00Z"
+    expected = cursor_walk(server.url, {"and": [filter, {"Timestamp": {"gte": start, "lt": end}}]})
+
+    with PartitionedExtractor(server.url, workers=3, page_size=10, filter=filter) as extractor:
+        rows = list(extractor.extract_time_range(start, end))
+
+    assert rows and rows == expected
+
+
+@pytest.mark.parametrize("partitions", [None, 2, 5])
+def test_building_shards_match_a_cursor_walk(server, partitions):
+    expected = cursor_walk(server.url, {"BuildingID": {"in": BUILDINGS}})
+
+    with PartitionedExtractor(server.url, workers=2, page_size=15) as extractor:
+        rows = list(extractor.extract_buildings(BUILDINGS, partitions))
+
+    assert rows == expected
+    assert len(extractor.partitions) <= 2
+
+
+def test_workers_wait_for_a_slow_consumer(server):
+    with PartitionedExtractor(server.url, workers=2, page_size=10, adaptive=False) as extractor:
+        rows = extractor.extract_time_range(partitions=2)
+        next(rows)
+        time.sleep(0.5)
+        # Each partition has one page held by the consumer or a worker, besides its queue
+        assert extractor.stats.requests <= 2 * (QUEUED_PAGES + 2)
+
+        started = time.perf_counter()
+        rows.close()
+        assert time.perf_counter() - started < 5
@@ -0,0 +1,24 @@
+"""Machine-readable output of factory_iot_datas items (fabric_output)."""
+
+import io
+import json
+
+import pytest
+
+from fabric_output import open_writer
+
+
+@pytest.mark.parametrize("output_format", ["json", "ndjson", "csv"])
+def test_closing_again_writes_nothing(output_format):
+    stream = io.BytesIO()
+    writer = open_writer(output_format, ["DeviceID", "Value"], stream)
+    writer.write({"DeviceID": "EM-05B-G1", "Value": 4.53})
+    writer.close()
+    written = stream.getvalue()
+
+    writer.close()
+
+    assert writer.closed
+    assert stream.getvalue() == written
+    if output_format == "json":
+        assert json.loads(written) == [{"DeviceID": "EM-05B-G1", "Value": 4.53}]
@@ -0,0 +1,139 @@
+"""Static cost estimation, and budget enforcement against the local stand-in server."""
+
+import pytest
+import requests
+
+from fabric_query_cost import (
+    REJECT,
+    SPLIT,
+    WARN,
+    QueryCostError,
+    QueryCostEstimator,
+    QueryCostWarning,
+    execute_parts,
+)
+from fabric_stub_server import CSV_PATH, FabricStubServer
+
+ITEMS_QUERY = """
+query ($n: Int, $c: String, $building: String) {
+  factory_iot_datas(first: $n, after: $c, filter: { BuildingID: { eq: $building } }, orderBy: { Timestamp: ASC }) {
+    items { Timestamp DeviceID Value }
+  }
+}
+"""
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FabricStubServer(CSV_PATH) as stub:
+        yield stub
+
+
+@pytest.fixture
+def send(server):
+    session = requests.Session()
+    sent = []
+
+    def post(query, variables):
+        sent.append((query, variables))
+        response = session.post(server.url, json={"query": query, "variables": variables})
+        response.raise_for_status()
+        return response.json()
+
+    post.sent = sent
+    yield post
+    session.close()
+
+
+def items_of(body):
+    return body["data"]["factory_iot_datas"]["items"]
+
+
+def test_estimate_multiplies_items_by_first():
+    estimator = QueryCostEstimator()
+
+    estimate = estimator.estimate("{ factory_iot_datas(first: 250) { items { Timestamp } endCursor } }")
+
+    assert estimate.total == 251
+    assert estimate.fields == {"factory_iot_datas": 251}
+
+
+def test_estimate_reads_first_from_variables_and_sums_aliases():
+    estimator = QueryCostEstimator(default_page_size=10)
+    query = "query ($n: Int) { a: factory_iot_datas(first: $n) { items { Value } } b: factory_iot_datas { items { Value } } }"
+
+    estimate = estimator.estimate(query, {"n": 40})
+
+    assert estimate.fields == {"a": 41, "b": 11}
+    assert estimate.total == 52
+
+
+def test_within_budget_is_sent_as_is():
+    parts = QueryCostEstimator().check(ITEMS_QUERY, {"n": 10}, budget=100, action=REJECT)
+
+    assert len(parts) == 1
+    assert parts[0].query == ITEMS_QUERY
+    assert parts[0].key is None
+
+
+def test_warn_sends_the_query_anyway():
+    with pytest.warns(QueryCostWarning, match="exceeds the budget of 100"):
+        parts = QueryCostEstimator().check(ITEMS_QUERY, {"n": 1000}, budget=100, action=WARN)
+
+    assert [part.query for part in parts] == [ITEMS_QUERY]
+
+
+def test_reject_raises_with_the_estimate():
+    with pytest.raises(QueryCostError) as raised:
+        QueryCostEstimator().check(ITEMS_QUERY, {"n": 1000}, budget=100, action=REJECT)
+
+    assert raised.value.estimate.total == 1001
+
+
+def test_split_pages_an_over_budget_connection_with_variables(server, send):
+    variables = {"n": 230, "c": None, "building": "BLD-PAR-001"}
+    expected = send(ITEMS_QUERY, variables)
+    send.sent.clear()
+
+    parts = QueryCostEstimator().check(ITEMS_QUERY, variables, budget=100, action=SPLIT)
+    assert [(part.page_size, part.limit) for part in parts] == [(99, 230)]
+    assert "$n" not in parts[0].query and "$c" not in parts[0].query
+    assert parts[0].variables == {"building": "BLD-PAR-001"}
+
+    body = execute_parts(send, parts)
+
+    assert "errors" not in body
+    assert len(send.sent) == 3
+    assert items_of(body) == items_of(expected)
+    assert len(items_of(body)) == 230
+
+
+def test_split_starts_from_the_cursor_of_the_query(server, send):
+    variables = {"n": 50, "c": "100", "building": "BLD-PAR-001"}
+    expected = send(ITEMS_QUERY, variables)
+
+    body = QueryCostEstimator().execute(send, ITEMS_QUERY, variables, budget=20, action=SPLIT)
+
+    assert "errors" not in body
+    assert items_of(body) == items_of(expected)
+
+
+def test_split_sends_one_request_per_root_field(send):
+    query = """
+    query ($a: Int, $b: Int) {
+      first: factory_iot_datas(first: $a) { items { DeviceID } }
+      second: factory_iot_datas(first: $b, orderBy: { Timestamp: DESC }) { items { DeviceID } }
+    }
+    """
+
+    parts = QueryCostEstimator().split(query, {"a": 5, "b": 7}, budget=10)
+    body = execute_parts(send, parts)
+
+    assert [(part.key, part.variables) for part in parts] == [("first", {"a": 5}), ("second", {"b": 7})]
+    assert "errors" not in body
+    assert [len(body["data"][key]["items"]) for key in ("first", "second")] == [5, 7]
+
+
+def test_split_rejects_a_field_that_cannot_be_paged():
+    with pytest.raises(QueryCostError, match="even one item at a time"):
+        QueryCostEstimator().split("{ factory_iot_datas(first: 10) { items { Value } } }", budget=1)
@@ -0,0 +1,186 @@
+"""Query planning of the indexed column store, against a row-by-row evaluator."""
+
+import random
+
+import pytest
+
+from fabric_export import parse_timestamp
+from fabric_store import COLUMN_NAMES, OPERATORS, ColumnStore
+from fabric_stub_server import CSV_PATH, load_rows
+
+CASES = 3000
+PAGE_SIZES = (1, 7, 50)
+
+# Rows with null columns, added to the CSV
+NULL_ROWS = [
+    {"Timestamp": None, "BuildingID": "BLD-PAR-001", "DeviceID": "EM-05B-G1", "MetricType": "Current_A", "Value": 1.5},
+    {"Timestamp": "2025-11-12T05:36:24.407284Z", "BuildingID": None, "DeviceID": None, "Location": None, "Value": None},
+    {"Timestamp": "2025-11-12T11:00:00Z", "BuildingID": "BLD-LYO-002", "MetricType": None, "Unit": None, "Status": None},
+]
+
+
+def _timestamps(filter):
+    """Copy of a filter with its Timestamp operands parsed, as the rows' timestamps are."""
+    if filter is None:
+        return None
+    parsed = {}
+    for field, condition in filter.items():
+        if field in ("and", "or"):
+            parsed[field] = [_timestamps(nested) for nested in condition]
+        elif field == "Timestamp":
+            parsed[field] = {
+                operator: operand if operator == "isNull" or operand is None
+                else [parse_timestamp(item) if item is not None else None for item in operand] if operator == "in"
+                else parse_timestamp(operand)
+                for operator, operand in condition.items()
+            }
+        else:
+            parsed[field] = condition
+    return parsed
+
+
+def matches(row, filter):
+    """Evaluate a factory_iot_dataFilterInput (with parsed timestamps) against a row, one condition at a time."""
+    for field, condition in (filter or {}).items():
+        if condition is None:
+            continue
+        if field == "and":
+            if not all(matches(row, nested) for nested in condition):
+                return False
+        elif field == "or":
+            if not any(matches(row, nested) for nested in condition):
+                return False
+        else:
+            value = row.get(field)
+            for operator, operand in condition.items():
+                if operand is None and operator != "eq":
+                    continue
+                if not OPERATORS[operator](operand, value):
+                    return False
+    return True
+
+
+def order_key(row, keys):
+    """Sort key of a row under an orderBy, nulls first."""
+    key = []
+    for field, direction in keys:
+        value = row.get(field)
+        item = (value is not None, value if value is not None else 0)
+        key.append(item if direction == "ASC" else _Reversed(item))
+    return tuple(key)
+
+
+class _Reversed:
+    __slots__ = ("item",)
+
+    def __init__(self, item):
+        self.item = item
+
+    def __lt__(self, other):
+        return other.item < self.item
+
+    def __eq__(self, other):
+        return self.item == other.item
+
+
+@pytest.fixture(scope="module")
+def store():
+    store = ColumnStore()
+    for row in load_rows(CSV_PATH) + NULL_ROWS:
+        store.append(row)
+    store.build_indexes()
+    return store
+
+
+class FilterGenerator:
+    """Random filters and orderBy inputs drawn from the values of the table."""
+
+    def __init__(self, rng, rows):
+        self.rng = rng
+        self.values = {name: sorted({row[name] for row in rows if row[name] is not None}) for name in COLUMN_NAMES}
+
+    def value(self, field):
+        return self.rng.choice(self.values[field])
+
+    def condition(self, field):
+        rng = self.rng
+        if rng.random() < 0.05:
+            return {"isNull": rng.random() < 0.5}
+        if field == "Timestamp":
+            low, high = sorted((self.value(field), self.value(field)))
+            return rng.choice([
+                {"gte": low, "lt": high},
+                {"gt": low, "lte": high},
+                {"gte": low},
+                {"lt": high},
+                {"eq": low},
+                {"in": [low, high]},
+                {"gte": low, "neq": high},
+            ])
+        if field == "Value":
+            low, high = sorted((self.value(field), self.value(field)))
+            return rng.choice([{"gte": low, "lte": high}, {"gt": low}, {"lt": high}, {"eq": low}, {"neq": low}])
+        value = self.value(field)
+        return rng.choice([
+            {"eq": value},
+            {"eq": None},
+            {"neq": value},
+            {"in": [value, self.value(field)]},
+            {"in": [value, None]},
+            {"contains": value[2:5]},
+            {"notContains": value[:3]},
+            {"startsWith": value[:4]},
+            {"endsWith": value[-2:]},
+            {"startsWith": value[:4], "neq": value},
+        ])
+
+    def filter(self, depth=0):
+        rng = self.rng
+        filter = {}
+        for field in rng.sample(COLUMN_NAMES, rng.choice([0, 1, 1, 2, 2, 3])):
+            filter[field] = self.condition(field)
+        if depth < 2 and rng.random() < 0.3:
+            filter["or"] = [self.filter(depth + 1) for _ in range(rng.choice([1, 2, 3]))]
+        if depth < 2 and rng.random() < 0.2:
+            filter["and"] = [self.filter(depth + 1) for _ in range(rng.choice([1, 2]))]
+        return filter or None
+
+    def order_by(self):
+        rng = self.rng
+        if rng.random() < 0.4:
+            return None
+        fields = rng.sample(COLUMN_NAMES, rng.choice([1, 1, 2]))
+        return {field: rng.choice(["ASC", "DESC"]) for field in fields}
+
+
+def read_pages(selection, page_size):
+    rows, offset = [], 0
+    while True:
+        found, offset, has_next_page = selection.page(offset, page_size)
+        rows.extend(found)
+        if not has_next_page:
+            return rows
+        assert found or offset > 0
+
+
+def test_queries_match_a_row_by_row_evaluation(store):
+    rng = random.Random(14)
+    table = [store.row(row) for row in range(len(store))]
+    generator = FilterGenerator(rng, table)
+    for row in table:
+        row["Timestamp"] = parse_timestamp(row["Timestamp"]) if row["Timestamp"] is not None else None
+
+    for case in range(CASES):
+        filter, order_by = generator.filter(), generator.order_by()
+        parsed = _timestamps(filter)
+        expected = [row for row in range(len(store)) if matches(table[row], parsed)]
+        keys = list((order_by or {}).items())
+        # The cached selection of a repeated query is read again
+        for _ in range(2):
+            rows = read_pages(store.select(filter, order_by), rng.choice(PAGE_SIZES))
+
+            context = f"case {case}: filter={filter!r} orderBy={order_by!r}"
+            assert sorted(rows) == expected, context
+            # Without orderBy, rows come in table or Timestamp order
+            ordered = [order_key(table[row], keys or [("Timestamp", "ASC")]) for row in rows]
+            assert ordered == sorted(ordered) or (not keys and rows == expected), context
@@ -0,0 +1,141 @@
+"""Incremental sync of factory_iot_data against the local stand-in server."""
+
+import csv
+from collections import Counter
+
+import pytest
+
+import fabric_sync
+from fabric_export import parse_timestamp
+from fabric_store import ColumnStore
+from fabric_stub_server import CSV_PATH, FabricStubServer
+from fabric_sync import SyncStore, sync_dataset
+
+TEN_DAYS = 10 * 24 * 3600
+
+
+def _table():
+    """Header and data rows of the CSV, in Timestamp order."""
+    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    rows.sort(key=lambda row: row[0])
+    return header, rows
+
+
+HEADER, ROWS = _table()
+
+
+@pytest.fixture
+def server():
+    with FabricStubServer(CSV_PATH) as stub:
+        yield stub
+
+
+def serve(server, tmp_path, rows):
+    """Make the server answer from `rows` only."""
+    path = tmp_path / f"table-{len(rows)}.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    server.store = ColumnStore.from_csv(str(path))
+
+
+def stored_keys(store):
+    return Counter(store.key(row) for row in store.iter_rows())
+
+
+def expected_keys(store, rows):
+    return Counter(store.key({"Timestamp": row[0], "DeviceID": row[2], "MetricType": row[4]}) for row in rows)
+
+
+def test_commit_keeps_keys_with_null_columns(tmp_path):
+    store = SyncStore(str(tmp_path))
+    timestamp = parse_timestamp("2025-11-11T17:36:24Z")
+    rows = [
+        {"Timestamp": "2025-11-11T17:36:24Z", "DeviceID": "EM-05B-G1", "MetricType": "Power", "Value": 1.0},
+        {"Timestamp": "2025-11-11T17:36:24Z", "DeviceID": None, "MetricType": "Power", "Value": 2.0},
+        {"Timestamp": "2025-11-11T17:36:24Z", "DeviceID": "EM-04A-F3", "MetricType": None, "Value": 3.0},
+    ]
+    seen = {store.key(row) for row in rows}
+
+    store.commit(rows, (timestamp, "EM-05B-G1"), seen, overlap=3600)
+
+    reopened = SyncStore(str(tmp_path))
+    assert reopened.seen() == seen
+    assert reopened.rows == 3
+    assert [row["Value"] for row in reopened.iter_rows()] == [1.0, 2.0, 3.0]
+
+
+def test_reruns_fetch_new_and_late_rows_once(server, tmp_path):
+    store = SyncStore(str(tmp_path / "store"))
+    late = ROWS[690:695]
+    first = [row for row in ROWS[:700] if row not in late]
+    serve(server, tmp_path, first)
+
+    result = sync_dataset(server.url, store, overlap=3600, page_size=100, batch_rows=250)
+    assert (result.appended, result.late, result.duplicates) == (len(first), 0, 0)
+
+    result = sync_dataset(server.url, store, overlap=3600, page_size=100)
+    assert result.appended == 0
+    assert result.duplicates == result.fetched > 0
+
+    serve(server, tmp_path, ROWS[:1100])
+    result = sync_dataset(server.url, store, overlap=3600, page_size=100, batch_rows=250)
+    assert (result.appended, result.late) == (1100 - len(first), len(late))
+
+    reopened = SyncStore(str(tmp_path / "store"))
+    assert reopened.rows == 1100
+    assert stored_keys(reopened) == expected_keys(reopened, ROWS[:1100])
+
+
+@pytest.mark.parametrize(
+    "overlap, widened",
+    [(3600, 7200), (0, TEN_DAYS)],
+    ids=["one-hour-to-two", "none-to-ten-days"],
+)
+def test_widened_overlap_appends_no_stored_rows(server, tmp_path, overlap, widened):
+    store = SyncStore(str(tmp_path / "store"))
+    serve(server, tmp_path, ROWS[:700])
+    sync_dataset(server.url, store, overlap=overlap, page_size=100)
+    sync_dataset(server.url, store, overlap=overlap, page_size=100)
+
+    result = sync_dataset(server.url, store, overlap=widened, page_size=100)
+    assert (result.appended, result.late) == (0, 0)
+
+    serve(server, tmp_path, ROWS)
+    result = sync_dataset(server.url, store, overlap=widened, page_size=100)
+    assert (result.appended, result.late) == (len(ROWS) - 700, 0)
+    assert stored_keys(store) == expected_keys(store, ROWS)
+
+    result = sync_dataset(server.url, store, overlap=widened, page_size=100)
+    assert result.appended == 0
+    assert result.duplicates == result.fetched
+
+
+def test_crash_between_segment_and_state_loses_and_duplicates_nothing(server, tmp_path, monkeypatch):
+    store = SyncStore(str(tmp_path / "store"))
+    write_state = SyncStore._write_state
+    calls = []
+
+    def crash_on_third_commit(self, state):
+        calls.append(state)
+        if len(calls) == 3:
+            raise OSError("crashed before the state was written")
+        write_state(self, state)
+
+    monkeypatch.setattr(fabric_sync.SyncStore, "_write_state", crash_on_third_commit)
+    with pytest.raises(OSError):
+        sync_dataset(server.url, store, overlap=3600, page_size=100, batch_rows=200)
+    monkeypatch.undo()
+
+    reopened = SyncStore(str(tmp_path / "store"))
+    assert reopened.rows == 400
+    assert len(list((tmp_path / "store").glob("part-*.fiot"))) == 3
+
+    result = sync_dataset(server.url, reopened, overlap=3600, page_size=100, batch_rows=200)
+    assert result.recovered_segments == 1
+    assert result.appended == len(ROWS) - 400
+    assert stored_keys(reopened) == expected_keys(reopened, ROWS)
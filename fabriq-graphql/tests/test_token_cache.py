@@ -0,0 +1,145 @@
+"""Token caching of TokenProvider, with a fake credential counting its calls."""
+
+import collections
+import os
+import threading
+import time
+
+import pytest
+
+import fabric_token_cache
+from fabric_token_cache import CachedToken, TokenProvider
+
+SCOPE = "https://api.fabric.microsoft.com/.default"
+OTHER_SCOPE = "https://management.azure.com/.default"
+
+
+class FakeCredential:
+    """Hands out numbered tokens, slowly, and counts the calls per scope."""
+
+    def __init__(self, lifetimes=(3600,), delay=0.0, name="fake"):
+        self.lifetimes = list(lifetimes)
+        self.delay = delay
+        self.name = name
+        self.calls = collections.Counter()
+        self.issued = []
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls[scopes] += 1
+            lifetime = self.lifetimes[min(len(self.issued), len(self.lifetimes) - 1)]
+            token = CachedToken(f"{self.name}-{len(self.issued) + 1}", int(time.time() + lifetime))
+            self.issued.append((time.time(), token))
+        return token
+
+
+def in_threads(count, target):
+    """Run target(index) in threads started together; return the results in order."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = target(index)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("in_file", [False, True], ids=["memory", "file"])
+def test_concurrent_callers_share_one_refresh_per_scope(tmp_path, in_file):
+    credential = FakeCredential(delay=0.2)
+    path = str(tmp_path / "tokens.json") if in_file else None
+
+    with TokenProvider(credential, path=path, background=False) as provider:
+        tokens = in_threads(20, lambda index: provider.get_token(SCOPE if index % 2 else OTHER_SCOPE))
+
+    assert credential.calls == {(SCOPE,): 1, (OTHER_SCOPE,): 1}
+    assert len(set(tokens[1::2])) == len(set(tokens[::2])) == 1
+    assert tokens[0] != tokens[1]
+
+
+def test_processes_share_tokens_through_the_file(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    first, second = FakeCredential(delay=0.2, name="first"), FakeCredential(delay=0.2, name="second")
+
+    with TokenProvider(first, path=path, namespace="app", background=False) as one, TokenProvider(
+        second, path=path, namespace="app", background=False
+    ) as other:
+        # Each provider stands for a process: they only share the locked file
+        tokens = in_threads(20, lambda index: (one if index % 2 else other).get_token(SCOPE))
+
+        assert sum(first.calls.values()) + sum(second.calls.values()) == 1
+        assert len(set(tokens)) == 1
+        assert one.file_hits + other.file_hits >= 1
+
+    with TokenProvider(FakeCredential(name="third"), path=path, namespace="app", background=False) as later:
+        assert later.get_token(SCOPE) == tokens[0]
+        assert later.refreshes == 0 and later.file_hits == 1
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_namespaces_keep_identities_apart(tmp_path):
+    path = str(tmp_path / "tokens.json")
+
+    with TokenProvider(FakeCredential(name="a"), path=path, namespace="a") as a, TokenProvider(
+        FakeCredential(name="b"), path=path, namespace="b"
+    ) as b:
+        assert a.get_token(SCOPE).token == "a-1"
+        assert b.get_token(SCOPE).token == "b-1"
+
+
+def test_stale_token_is_returned_while_refreshed_in_the_background(tmp_path):
+    # The first token is already within the refresh margin
+    credential = FakeCredential(lifetimes=(200, 3600))
+
+    with TokenProvider(credential, path=str(tmp_path / "tokens.json"), refresh_margin=300) as provider:
+        first = provider.get_token(SCOPE)
+        assert provider.get_token(SCOPE) == first
+
+        wait_for(lambda: provider.background_refreshes == 1)
+        second = provider.get_token(SCOPE)
+
+    assert second != first and second.expires_on > first.expires_on
+    assert credential.calls[(SCOPE,)] == 2
+
+
+def test_timer_refreshes_before_expires_on(monkeypatch):
+    monkeypatch.setattr(fabric_token_cache, "MIN_VALIDITY", 0)
+    credential = FakeCredential(lifetimes=(3, 3600))
+
+    with TokenProvider(credential, path=None, refresh_margin=1) as provider:
+        first = provider.get_token(SCOPE)
+        wait_for(lambda: provider.background_refreshes == 1)
+        second = provider.get_token(SCOPE)
+
+    refreshed_at = credential.issued[1][0]
+    assert refreshed_at < first.expires_on
+    assert second.token == credential.issued[1][1].token
+    assert provider.refreshes == 2 and provider.hits == 1
+
+
+def test_claims_bypass_the_cache(tmp_path):
+    credential = FakeCredential()
+
+    with TokenProvider(credential, path=str(tmp_path / "tokens.json"), background=False) as provider:
+        cached = provider.get_token(SCOPE)
+        challenged = [provider.get_token(SCOPE, claims='{"access_token": {}}') for _ in range(2)]
+
+        assert credential.calls[(SCOPE,)] == 3
+        assert len({cached, *challenged}) == 3
+        # The token obtained for the claims challenge does not replace the cached one
+        assert provider.get_token(SCOPE) == cached
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Dataloader Benchmark
+
+Simulates the N+1 pattern of higher-level tooling: many worker threads each
+resolve a list of repositories and their owners, one lookup at a time, with
+overlapping lists. The same workload runs against a local stand-in server
+with plain GitHubGraphQLClient calls, then through a DataLoader, and the
+requests sent, dedup ratio, batch sizes and wall time are compared.
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from github_graphql_client import REPOSITORY_INFO_QUERY, GitHubGraphQLClient
+from graphql_dataloader import DEFAULT_WINDOW, DataLoader
+from graphql_projection import USER_PATHS, user_fragment
+from graphql_stub_server import StubGraphQLServer
+from graphql_transport import PooledTransport
+
+USER_QUERY = """
+query($login: String!) {
+    user(login: $login) {
+        ...UserFields
+    }
+}
+""" + user_fragment(USER_PATHS)
+
+
+def workload(workers: int, lookups: int, owners: int, repositories: int, seed: int) -> List[List[Tuple[str, str]]]:
+    """Return the (owner, name) lookups of each worker, drawn from a shared pool."""
+    rng = random.Random(seed)
+    pool = [(f"owner-{i % owners}", f"repo-{i}") for i in range(repositories)]
+    return [[rng.choice(pool) for _ in range(lookups)] for _ in range(workers)]
+
+
+def run(
+    tasks: List[List[Tuple[str, str]]],
+    load_repository: Callable[[str, str], object],
+    load_user: Callable[[str], object],
+) -> float:
+    """Resolve every lookup of every worker concurrently; return the wall time in seconds."""
+
+    def worker(lookups: List[Tuple[str, str]]) -> None:
+        for owner, name in lookups:
+            load_repository(owner, name)
+            load_user(owner)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        list(executor.map(worker, tasks))
+    return time.perf_counter() - start
+
+
+def main():
+    """Main entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark request coalescing with a DataLoader")
+    parser.add_argument("--workers", type=int, default=32, help="Concurrent worker threads (default: 32)")
+    parser.add_argument("--lookups", type=int, default=20, help="Repositories resolved by each worker (default: 20)")
+    parser.add_argument("--owners", type=int, default=10, help="Distinct owners (default: 10)")
+    parser.add_argument("--repositories", type=int, default=200, help="Distinct repositories (default: 200)")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW, help=f"Batch window in seconds (default: {DEFAULT_WINDOW})")
+    parser.add_argument("--max-batch", type=int, default=50, help="Maximum lookups per batch (default: 50)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stand-in server latency in seconds (default: 0.02)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the workload (default: 1)")
+    args = parser.parse_args()
+
+    tasks = workload(args.workers, args.lookups, args.owners, args.repositories, args.seed)
+    calls = 2 * args.workers * args.lookups
+    print(f"{args.workers} workers x {args.lookups} repositories + owners ({calls} lookups), {args.latency * 1000:.0f} ms latency")
+    print("=" * 50)
+
+    with StubGraphQLServer(latency=args.latency) as server:
+        with GitHubGraphQLClient("stub-token", api_url=server.url, transport=PooledTransport(pool_maxsize=args.workers)) as client:
+            elapsed = run(
+                tasks,
+                lambda owner, name: client.execute_query(REPOSITORY_INFO_QUERY, {"owner": owner, "name": name}),
+                lambda login: client.execute_query(USER_QUERY, {"login": login}),
+            )
+        print(f"{'direct':<10} {server.request_count:6d} requests  {elapsed:7.2f} s")
+
+    with StubGraphQLServer(latency=args.latency) as server:
+        with GitHubGraphQLClient("stub-token", api_url=server.url, transport=PooledTransport(pool_maxsize=args.workers)) as client:
+            loader = DataLoader(client, window=args.window, max_batch=args.max_batch)
+            elapsed = run(tasks, loader.load_repository, loader.load_user)
+        print(f"{'dataloader':<10} {server.request_count:6d} requests  {elapsed:7.2f} s")
+        print(f"Loader: {loader.stats}")
+
+
+if __name__ == "__main__":
+    main()
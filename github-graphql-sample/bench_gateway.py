@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Gateway Benchmark
+
+Measures what the REST-to-GraphQL facades cost, offline:
+
+* transforms: the time the gateway spends building the GraphQL request of
+  a facade call and reshaping the response, for growing result sizes
+* end to end: the latency of the same query sent directly to a stand-in
+  backend, through the gateway's pass-through route, through the REST
+  facade, and through the facade with its response cache
+"""
+
+import argparse
+import json
+import statistics
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+import requests
+
+from graphql_rest_gateway import FACADES, RestGateway, load_routes, transform_request, transform_response
+from graphql_stub_server import StubGraphQLServer, fake_repository
+
+REPOSITORY_KEYS = ("name", "description", "url", "stargazerCount", "forkCount", "isPrivate", "primaryLanguage", "updatedAt")
+
+
+def repositories_response(count: int) -> Dict[str, Any]:
+    """Backend response of the repositories facade query, with `count` repositories."""
+    nodes = []
+    for i in range(count):
+        repo = fake_repository("octocat", f"repo-{i}")
+        nodes.append({key: repo[key] for key in REPOSITORY_KEYS})
+    return {"data": {"user": {"login": "octocat", "repositories": {"nodes": nodes}}}}
+
+
+def sensors_response(count: int) -> Dict[str, Any]:
+    """Backend response of the sensors facade query, with `count` items."""
+    items = [
+        {"Timestamp": f"2025-11-11T17:{i // 60 % 60:02d}:{i % 60:02d}Z", "BuildingID": f"BLD-PAR-{i % 3:03d}", "DeviceID": f"EM-{i:05d}"}
+        for i in range(count)
+    ]
+    return {"data": {"factory_iot_datas": {"items": items}}}
+
+
+def sensors_handler(payload: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+    """Stand-in Fabric backend answering every query with 10 canned items."""
+    return 200, sensors_response(10), {}
+
+
+def bench_transforms(sizes: List[int], number: int) -> None:
+    """Print the per-call cost of the request and response transforms."""
+    print("Transforms (per call)")
+    print("=" * 72)
+    print(f"{'facade':<13} {'items':>6} {'request':>10} {'response':>10} {'backend B':>10} {'REST B':>9}")
+    for facade, build, path in (
+        (FACADES[0], repositories_response, {"username": "octocat"}),
+        (FACADES[1], sensors_response, {}),
+    ):
+        route = load_routes(facade)[1]
+        for size in sizes:
+            body = json.dumps(build(size)).encode("utf-8")
+            query = {"limit": [str(size)]}
+            request_seconds = timeit.timeit(lambda: transform_request(route, path, query), number=number) / number
+            response_seconds = timeit.timeit(lambda: transform_response(facade, 200, "OK", body), number=number) / number
+            rest = transform_response(facade, 200, "OK", body)
+            print(
+                f"{facade.operation:<13} {size:6d} {request_seconds * 1e6:7.1f} us {response_seconds * 1e6:7.1f} us "
+                f"{len(body):10d} {len(rest.encode('utf-8')):9d}"
+            )
+    print()
+
+
+def run(send: Callable[[int], requests.Response], requests_count: int) -> Tuple[List[float], int]:
+    """Send requests one at a time; return each latency in seconds and the mean response size."""
+    latencies, size = [], 0
+    for i in range(requests_count):
+        start = time.perf_counter()
+        response = send(i)
+        response.raise_for_status()
+        size += len(response.content)
+        latencies.append(time.perf_counter() - start)
+    return latencies, size // requests_count
+
+
+def report(label: str, latencies: List[float], size: int) -> None:
+    """Print latency statistics in milliseconds."""
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<24} mean {statistics.mean(ordered) * 1000:7.3f} ms   "
+        f"p50 {statistics.median(ordered) * 1000:7.3f} ms   "
+        f"p99 {p99 * 1000:7.3f} ms   {size:6d} B"
+    )
+
+
+def bench_end_to_end(requests_count: int, latency: float, limit: int, users: int) -> None:
+    """Print the latency of the direct, pass-through, facade and cached facade designs."""
+    print(f"End to end ({requests_count} sequential requests, {latency * 1000:.0f} ms backend latency)")
+    print("=" * 72)
+    github = StubGraphQLServer(latency=latency).start()
+    fabric = StubGraphQLServer(handler=sensors_handler, latency=latency).start()
+    session = requests.Session()
+    try:
+        backends = {"github": github.url, "fabric": fabric.url}
+        with RestGateway(backends) as gateway, RestGateway(backends, cache_ttl=300) as cached:
+            repositories, sensors = (route.query for route in gateway.routes)
+
+            def graphql(url: str, query: str, variables: Callable[[int], Dict[str, Any]]) -> Callable[[int], requests.Response]:
+                return lambda i: session.post(url, json={"query": query, "variables": variables(i)})
+
+            def rest(url: str) -> Callable[[int], requests.Response]:
+                return lambda i: session.get(url.format(user=f"user-{i % users}", limit=limit))
+
+            def user_variables(i: int) -> Dict[str, Any]:
+                return {"username": f"user-{i % users}", "limit": limit}
+
+            designs = (
+                ("repositories direct", graphql(github.url, repositories, user_variables)),
+                ("repositories passthru", graphql(f"{gateway.url}/github-rest/graphql", repositories, user_variables)),
+                ("repositories facade", rest(gateway.url + "/github-rest/user/{user}/repositories?limit={limit}")),
+                ("repositories cached", rest(cached.url + "/github-rest/user/{user}/repositories?limit={limit}")),
+                ("sensors direct", graphql(fabric.url, sensors, lambda i: {})),
+                ("sensors passthru", graphql(f"{gateway.url}/factory-rest/graphql", sensors, lambda i: {})),
+                ("sensors facade", rest(gateway.url + "/factory-rest/sensors")),
+                ("sensors cached", rest(cached.url + "/factory-rest/sensors")),
+            )
+            for label, send in designs:
+                run(send, min(20, requests_count))  # warm up connections
+                report(label, *run(send, requests_count))
+            print(f"Gateway: {gateway.stats}")
+            print(f"Cached gateway: {cached.stats}")
+    finally:
+        session.close()
+        github.stop()
+        fabric.stop()
+
+
+def main():
+    """Main entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the REST-to-GraphQL facade transforms and designs")
+    parser.add_argument("--sizes", default="10,100,1000", help="Result sizes of the transform benchmark (default: 10,100,1000)")
+    parser.add_argument("--number", type=int, default=200, help="Calls per transform measurement (default: 200)")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per design (default: 300)")
+    parser.add_argument("--latency", type=float, default=0.005, help="Stand-in backend latency in seconds (default: 0.005)")
+    parser.add_argument("--limit", type=int, default=10, help="Repositories per facade call (default: 10)")
+    parser.add_argument("--users", type=int, default=10, help="Distinct usernames requested (default: 10)")
+    args = parser.parse_args()
+
+    bench_transforms([int(size) for size in args.sizes.split(",")], args.number)
+    bench_end_to_end(args.requests, args.latency, args.limit, args.users)
+
+
+if __name__ == "__main__":
+    main()
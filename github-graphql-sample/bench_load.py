@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Load Benchmark
+
+Replays a weighted mix of the sample's GraphQL operations against any
+endpoint and reports latency percentiles (p50/p95/p99/p99.9), throughput,
+error rates and bytes on the wire, per operation and overall:
+
+* viewer, repos, repo: the queries of github_graphql_client.py
+* factory: the factory_iot_datas query of fabric_graphql_apim.py
+
+Two load models are available. In closed loop, a fixed number of workers
+each send a request and wait for its response before sending the next, so
+the offered load drops when the server slows down. In open loop, requests
+start at a fixed arrival rate whatever the response times, and latency is
+measured from the scheduled start, so queueing delay is counted instead of
+hidden (no coordinated omission).
+
+A sweep over several concurrencies (or arrival rates) can be written to a
+JSON results file and compared with a previous one.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from github_graphql_client import REPOSITORY_INFO_QUERY, USER_REPOSITORIES_QUERY, VIEWER_QUERY
+from graphql_stub_server import StubGraphQLServer
+
+# Same query as fabriq-graphql/fabric_graphql_apim.py.
+FACTORY_IOT_DATAS_QUERY = """
+query {
+  factory_iot_datas(first: 10) {
+     items {
+        Timestamp
+        BuildingID
+        DeviceID
+     }
+     endCursor
+     hasNextPage
+  }
+}
+"""
+
+CLOSED = "closed"
+OPEN = "open"
+
+DEFAULT_MIX = "viewer=1,repos=2,repo=5"
+PERCENTILES = (50, 95, 99, 99.9)
+RESULTS_VERSION = 1
+
+# Endpoints an operation can target
+GITHUB = "github"
+FABRIC = "fabric"
+
+
+class Operation:
+    """A GraphQL operation of the mix."""
+
+    def __init__(self, name: str, query: str, variables: Callable[[random.Random], Dict[str, Any]], target: str = GITHUB) -> None:
+        self.name = name
+        self.query = query
+        self.variables = variables
+        self.target = target
+
+
+OPERATIONS: Dict[str, Operation] = {
+    "viewer": Operation("viewer", VIEWER_QUERY, lambda rng: {}),
+    "repos": Operation("repos", USER_REPOSITORIES_QUERY, lambda rng: {"username": "octocat", "limit": 10, "cursor": None}),
+    "repo": Operation("repo", REPOSITORY_INFO_QUERY, lambda rng: {"owner": "octocat", "name": f"repo-{rng.randrange(1000)}"}),
+    "factory": Operation("factory", FACTORY_IOT_DATAS_QUERY, lambda rng: {}, target=FABRIC),
+}
+
+
+class Sample:
+    """Outcome of one request."""
+
+    __slots__ = ("operation", "start", "latency", "error", "bytes_sent", "bytes_received")
+
+    def __init__(self, operation: str, start: float, latency: float, error: Optional[str], bytes_sent: int, bytes_received: int) -> None:
+        self.operation = operation
+        self.start = start
+        self.latency = latency
+        self.error = error
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+
+
+def parse_mix(spec: str) -> List[Tuple[Operation, float]]:
+    """
+    Parse an operation mix such as `viewer=1,repos=2,repo=5,factory=2`.
+
+    Args:
+        spec: Comma-separated name=weight pairs (a bare name weighs 1)
+
+    Returns:
+        (operation, weight) pairs
+
+    Raises:
+        ValueError: If an operation is unknown or no weight is positive
+    """
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r} (expected one of {', '.join(OPERATIONS)})")
+        mix.append((OPERATIONS[name], float(weight or 1)))
+    if not any(weight > 0 for _, weight in mix):
+        raise ValueError("The mix needs at least one positive weight")
+    return mix
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    """
+    Aggregate samples into the statistics reported for a run.
+
+    Args:
+        samples: Samples of the run
+        elapsed: Duration of the run, in seconds
+
+    Returns:
+        Request and error counts, throughput, latency percentiles in
+        milliseconds and bytes on the wire
+    """
+    ordered = sorted(sample.latency for sample in samples)
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if sample.error:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+    failed = sum(errors.values())
+    sent = sum(sample.bytes_sent for sample in samples)
+    received = sum(sample.bytes_received for sample in samples)
+    return {
+        "requests": len(samples),
+        "errors": failed,
+        "error_rate": failed / len(samples) if samples else 0.0,
+        "error_kinds": errors,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "latency_ms": dict(
+            {f"p{p:g}": percentile(ordered, p) * 1000 for p in PERCENTILES},
+            mean=(sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+            max=(ordered[-1] * 1000) if ordered else 0.0,
+        ),
+        "bytes_sent": sent,
+        "bytes_received": received,
+        "bytes_per_request": (sent + received) / len(samples) if samples else 0.0,
+    }
+
+
+class LoadGenerator:
+    """Sends the operation mix to the endpoints and records every request."""
+
+    def __init__(
+        self,
+        endpoints: Dict[str, str],
+        mix: List[Tuple[Operation, float]],
+        headers: Optional[Dict[str, Dict[str, str]]] = None,
+        timeout: float = 30.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the generator.
+
+        Args:
+            endpoints: URL of each target (GITHUB, FABRIC)
+            mix: (operation, weight) pairs
+            headers: Extra request headers of each target
+            timeout: Request timeout, in seconds
+            seed: Seed of the operation and variable choices
+        """
+        missing = sorted({operation.target for operation, _ in mix} - set(endpoints))
+        if missing:
+            raise ValueError(f"No endpoint for {', '.join(missing)} operations")
+        self.endpoints = endpoints
+        self.operations = [operation for operation, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.headers = headers or {}
+        self.timeout = timeout
+        self._seed = seed
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+            with self._lock:
+                self._sessions.append(session)
+                seed = None if self._seed is None else self._seed + len(self._sessions)
+            self._local.session = session
+            self._local.rng = random.Random(seed)
+        return session
+
+    def request(self, scheduled: Optional[float] = None) -> Sample:
+        """
+        Send one operation drawn from the mix.
+
+        Args:
+            scheduled: perf_counter time the request was due, in open loop;
+                latency is measured from it rather than from the actual send
+
+        Returns:
+            The sample
+        """
+        session = self._session()
+        rng: random.Random = self._local.rng
+        operation = rng.choices(self.operations, self.weights)[0]
+        url = self.endpoints[operation.target]
+        body = json.dumps({"query": operation.query, "variables": operation.variables(rng)}).encode("utf-8")
+        headers = dict(self.headers.get(operation.target, {}), **{"Content-Type": "application/json"})
+        error = None
+        received = 0
+        start = time.perf_counter()
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=self.timeout)
+            content = response.content
+            received = response.raw.tell() or len(content)
+            received += _header_bytes(f"HTTP/1.1 {response.status_code} {response.reason}", response.headers)
+            if response.status_code >= 400:
+                error = f"http_{response.status_code}"
+            elif json.loads(content).get("errors"):
+                error = "graphql"
+        except (requests.exceptions.RequestException, ValueError) as exc:
+            error = type(exc).__name__
+        end = time.perf_counter()
+        sent = len(body) + _header_bytes(f"POST {urlsplit(url).path or '/'} HTTP/1.1", headers)
+        begin = scheduled if scheduled is not None else start
+        return Sample(operation.name, begin, end - begin, error, sent, received)
+
+    def closed_loop(self, concurrency: int, duration: float, warmup: float = 0.0) -> Tuple[List[Sample], float]:
+        """
+        Run `concurrency` workers back to back for `duration` seconds.
+
+        Args:
+            concurrency: Number of workers
+            duration: Measured duration, in seconds
+            warmup: Unmeasured duration before it, in seconds
+
+        Returns:
+            The samples and the measured duration
+        """
+        samples: List[Sample] = []
+        measure_from = time.perf_counter() + warmup
+        deadline = measure_from + duration
+
+        def worker() -> None:
+            own = []
+            while time.perf_counter() < deadline:
+                sample = self.request()
+                if sample.start >= measure_from:
+                    own.append(sample)
+            with self._lock:
+                samples.extend(own)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, max(duration, time.perf_counter() - measure_from)
+
+    def open_loop(
+        self,
+        rate: float,
+        duration: float,
+        warmup: float = 0.0,
+        max_in_flight: int = 256,
+        poisson: bool = False,
+    ) -> Tuple[List[Sample], float]:
+        """
+        Start requests at `rate` per second for `duration` seconds.
+
+        Requests due while `max_in_flight` are outstanding wait for a free
+        worker; the wait is part of their latency.
+
+        Args:
+            rate: Arrival rate, in requests per second
+            duration: Measured duration, in seconds
+            warmup: Unmeasured duration before it, in seconds
+            max_in_flight: Maximum concurrent requests
+            poisson: Exponential inter-arrival times instead of a fixed interval
+
+        Returns:
+            The samples and the measured duration
+        """
+        samples: List[Sample] = []
+        arrivals = random.Random(self._seed)
+        start = time.perf_counter()
+        measure_from = start + warmup
+        deadline = measure_from + duration
+        futures = []
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            due = start
+            while due < deadline:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(self.request, due))
+                due += arrivals.expovariate(rate) if poisson else 1.0 / rate
+        for future in futures:
+            sample = future.result()
+            if sample.start >= measure_from:
+                samples.append(sample)
+        return samples, duration
+
+    def close(self) -> None:
+        """Close the connections of every worker."""
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._local = threading.local()
+
+
+def _header_bytes(start_line: str, headers: Any) -> int:
+    """Size of an HTTP/1.1 header block."""
+    return len(start_line) + 2 + sum(len(name) + len(value) + 4 for name, value in headers.items()) + 2
+
+
+def run_level(generator: LoadGenerator, mode: str, level: float, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one load level and return its results."""
+    if mode == CLOSED:
+        samples, elapsed = generator.closed_loop(int(level), args.duration, args.warmup)
+    else:
+        samples, elapsed = generator.open_loop(level, args.duration, args.warmup, args.max_in_flight, args.poisson)
+    by_operation: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_operation.setdefault(sample.operation, []).append(sample)
+    return {
+        "mode": mode,
+        "concurrency" if mode == CLOSED else "rate": level,
+        "duration": elapsed,
+        "total": summarize(samples, elapsed),
+        "operations": {name: summarize(group, elapsed) for name, group in sorted(by_operation.items())},
+    }
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    """Print the results of one load level."""
+    level = f"concurrency {run['concurrency']:g}" if run["mode"] == CLOSED else f"rate {run['rate']:g}/s"
+    print(f"\n{run['mode']} loop, {level}, {run['duration']:.1f}s")
+    print(f"  {'operation':<10} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'p99.9':>8} {'bytes/req':>10}")
+    for name, stats in list(run["operations"].items()) + [("total", run["total"])]:
+        latency = stats["latency_ms"]
+        print(
+            f"  {name:<10} {stats['requests']:>8} {stats['throughput']:>8.1f} {stats['error_rate']:>6.1%} "
+            f"{latency['p50']:>7.2f}ms {latency['p95']:>6.2f}ms {latency['p99']:>6.2f}ms {latency['p99.9']:>6.2f}ms "
+            f"{stats['bytes_per_request']:>10.0f}"
+        )
+    if run["total"]["error_kinds"]:
+        print(f"  errors: {run['total']['error_kinds']}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> float:
+    """
+    Print the change of each load level against a baseline results file.
+
+    Returns:
+        The worst regression, in percent: throughput drop or p99 increase
+    """
+    previous = {(run["mode"], run.get("concurrency", run.get("rate"))): run for run in baseline.get("runs", [])}
+    worst = 0.0
+    print(f"\nCompared with {baseline.get('started_at', 'baseline')}")
+    for run in results["runs"]:
+        key = (run["mode"], run.get("concurrency", run.get("rate")))
+        old = previous.get(key)
+        if old is None:
+            continue
+        throughput = _change(old["total"]["throughput"], run["total"]["throughput"])
+        p50 = _change(old["total"]["latency_ms"]["p50"], run["total"]["latency_ms"]["p50"])
+        p99 = _change(old["total"]["latency_ms"]["p99"], run["total"]["latency_ms"]["p99"])
+        print(f"  {key[0]} {key[1]:g}: throughput {throughput:+.1f}%, p50 {p50:+.1f}%, p99 {p99:+.1f}%")
+        worst = max(worst, -throughput, p99)
+    return worst
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    """Main entry point for the benchmark."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark for the GraphQL endpoints")
+    parser.add_argument("--url", default=os.getenv("GITHUB_GRAPHQL_API_URL"), help="Endpoint of the viewer/repos/repo operations (default: GITHUB_GRAPHQL_API_URL)")
+    parser.add_argument("--fabric-url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="Endpoint of the factory operation (default: FABRIC_GRAPHQL_API_URL)")
+    parser.add_argument("--stub", action="store_true", help="Send the GitHub operations to a local stand-in server")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Response delay of the stand-in server, in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operations, e.g. viewer=1,repo=5,factory=2 (default: {DEFAULT_MIX})")
+    parser.add_argument("--mode", choices=(CLOSED, OPEN), default=CLOSED, help="Fixed concurrency (closed) or fixed arrival rate (open)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Workers in closed loop (default: 4)")
+    parser.add_argument("--rate", type=float, default=50.0, help="Requests per second in open loop (default: 50)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals in open loop")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Concurrent requests cap in open loop (default: 256)")
+    parser.add_argument("--sweep", help="Comma-separated concurrencies (closed) or rates (open) to run in turn")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level (default: 10)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each level (default: 1)")
+    parser.add_argument("--seed", type=int, help="Seed of the operation choices")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, help="Exit with status 1 if throughput drops or p99 grows by more than this percentage")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    headers: Dict[str, Dict[str, str]] = {GITHUB: {}, FABRIC: {}}
+    if os.getenv("GITHUB_TOKEN"):
+        headers[GITHUB]["Authorization"] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+    if os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY"):
+        headers[GITHUB]["Ocp-Apim-Subscription-Key"] = os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY")
+    if os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY"):
+        headers[FABRIC]["Ocp-Apim-Subscription-Key"] = os.getenv("FABRIC_APIM_SUBSCRIPTION_KEY")
+
+    server = StubGraphQLServer(latency=args.stub_latency).start() if args.stub else None
+    endpoints = {}
+    if server or args.url:
+        endpoints[GITHUB] = server.url if server else args.url
+    if args.fabric_url:
+        endpoints[FABRIC] = args.fabric_url
+
+    default_level = args.concurrency if args.mode == CLOSED else args.rate
+    levels = [float(level) for level in args.sweep.split(",")] if args.sweep else [default_level]
+    results: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "endpoints": endpoints,
+        "mix": {operation.name: weight for operation, weight in mix},
+        "mode": args.mode,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "runs": [],
+    }
+    try:
+        generator = LoadGenerator(endpoints, mix, headers, seed=args.seed)
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        for level in levels:
+            run = run_level(generator, args.mode, level, args)
+            results["runs"].append(run)
+            print_run(run)
+    finally:
+        generator.close()
+        if server:
+            server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            worst = compare(results, json.load(f))
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"Regression of {worst:.1f}% exceeds {args.max_regression:g}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Output Benchmark
+
+Renders the repositories of a user through `get_user_repositories` in every
+`--format`, from canned pages served by an in-process client (no network),
+into a byte-counting sink. JSON encoding is measured with orjson when it is
+installed and with the standard library, and compared to pretty-printing the
+whole response at once with `json.dumps(indent=4)`.
+"""
+
+import argparse
+import contextlib
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+import graphql_output
+from github_graphql_client import USER_REPOSITORY_PATHS, get_user_repositories
+from graphql_output import FORMATS, TABLE, open_writer
+from graphql_stub_server import fake_repository
+
+
+class CannedClient:
+    """Stands in for GitHubGraphQLClient, answering repository pages from memory."""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.node = {key: fake_repository("octocat", "Hello-World")[key] for key in USER_REPOSITORY_PATHS}
+
+    def page(self, start: int, count: int) -> Dict[str, Any]:
+        end = min(start + count, self.total)
+        return {
+            "nodes": [dict(self.node, name=f"repo-{i}") for i in range(start, end)],
+            "pageInfo": {"endCursor": str(end), "hasNextPage": end < self.total},
+        }
+
+    def execute_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        start = int(variables.get("cursor") or 0)
+        return {"data": {"repositoryOwner": {"login": "octocat", "repositories": self.page(start, variables["limit"])}}}
+
+
+class CountingSink:
+    """Binary or text stream discarding what it is given, counting the bytes."""
+
+    def __init__(self) -> None:
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, data: Any) -> int:
+        self.writes += 1
+        self.bytes += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def render(output_format: str, records: int) -> CountingSink:
+    """Render `records` repositories in a format; return the sink."""
+    sink = CountingSink()
+    client = CannedClient(records)
+    if output_format == TABLE:
+        with contextlib.redirect_stdout(sink):
+            get_user_repositories(client, "octocat", limit=None)
+        return sink
+    with open_writer(output_format, USER_REPOSITORY_PATHS, sink) as output:
+        get_user_repositories(client, "octocat", limit=None, output=output)
+    return sink
+
+
+def render_pretty(records: int) -> CountingSink:
+    """Fetch every page, then pretty-print the whole response at once."""
+    sink = CountingSink()
+    client = CannedClient(records)
+    nodes = []
+    for start in range(0, records, 100):
+        nodes.extend(client.page(start, 100)["nodes"])
+    sink.write(json.dumps({"data": {"repositoryOwner": {"repositories": {"nodes": nodes}}}}, indent=4))
+    return sink
+
+
+def report(label: str, records: int, run: Callable[[], CountingSink]) -> None:
+    """Time a rendering and print its throughput."""
+    start = time.perf_counter()
+    sink = run()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<16} {elapsed:7.3f} s  {records / elapsed:10,.0f} records/s  "
+        f"{sink.bytes / 1e6:7.1f} MB  {sink.writes:8d} writes"
+    )
+
+
+def main():
+    """Main entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the output formats of github_graphql_client.py")
+    parser.add_argument("--records", type=int, default=100_000, help="Repositories rendered per format (default: 100000)")
+    args = parser.parse_args()
+
+    print(f"Rendering {args.records:,} repositories (orjson: {'yes' if graphql_output.orjson else 'not installed'})")
+    print("=" * 72)
+    for output_format in FORMATS:
+        report(output_format, args.records, lambda: render(output_format, args.records))
+    if graphql_output.orjson is not None:
+        fast, graphql_output.orjson = graphql_output.orjson, None
+        try:
+            for output_format in ("json", "ndjson"):
+                report(f"{output_format} (stdlib)", args.records, lambda: render(output_format, args.records))
+        finally:
+            graphql_output.orjson = fast
+    report("json indent=4", args.records, lambda: render_pretty(args.records))
+
+
+if __name__ == "__main__":
+    main()
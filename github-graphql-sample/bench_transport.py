@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Transport Benchmark
+
+Measures the per-query latency of GitHubGraphQLClient.execute_query against a
+local stand-in server, with a new connection per query (SimpleTransport) and
+with pooled keep-alive connections (PooledTransport).
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from github_graphql_client import GitHubGraphQLClient
+from graphql_stub_server import StubGraphQLServer
+from graphql_transport import PooledTransport, SimpleTransport, Transport
+
+QUERY = """
+query($owner: String!, $name: String!) {
+    repository(owner: $owner, name: $name) {
+        name
+        stargazerCount
+    }
+}
+"""
+
+
+def run(url: str, transport: Transport, queries: int) -> List[float]:
+    """Execute `queries` repository lookups and return each latency in seconds."""
+    latencies = []
+    with GitHubGraphQLClient("stub-token", api_url=url, transport=transport) as client:
+        for i in range(queries):
+            start = time.perf_counter()
+            client.execute_query(QUERY, {"owner": "octocat", "name": f"repo-{i}"})
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label: str, latencies: List[float], connections: int) -> None:
+    """Print latency statistics in milliseconds."""
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<10} mean {statistics.mean(ordered) * 1000:7.3f} ms   "
+        f"p50 {statistics.median(ordered) * 1000:7.3f} ms   "
+        f"p99 {p99 * 1000:7.3f} ms   connections {connections}"
+    )
+
+
+def main():
+    """Main entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs unpooled transports")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per transport (default: 500)")
+    args = parser.parse_args()
+
+    print(f"Per-query latency over {args.queries} queries")
+    print("=" * 50)
+    for label, transport in (
+        ("unpooled", SimpleTransport()),
+        ("pooled", PooledTransport()),
+    ):
+        with StubGraphQLServer() as server:
+            latencies = run(server.url, transport, args.queries)
+            report(label, latencies, server.connection_count)
+
+
+if __name__ == "__main__":
+    main()
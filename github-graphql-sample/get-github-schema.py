@@ -2,77 +2,92 @@
 """
 GitHub GraphQL Schema Fetcher
 
-This script fetches the GitHub GraphQL schema using a simplified approach
-and saves it in a format suitable for Azure API Management.
+This script fetches the complete GitHub GraphQL schema by introspection and
+saves it as SDL, suitable for Azure API Management, and as a compact snapshot
+(see graphql_schema.py). A cheap probe query runs first: the full schema is
+downloaded again only when the probe hash differs from the snapshot's.
 """
 
+import argparse
 import os
-import json
+import sys
+from typing import Any, Dict, Optional
+
 import requests
 from dotenv import load_dotenv
 
-def get_github_graphql_schema(token: str) -> str:
+from graphql_schema import (
+    GITHUB_GRAPHQL_URL,
+    SchemaSnapshot,
+    content_hash,
+    fetch_probe_hash,
+    fetch_schema,
+    print_schema,
+    read_snapshot_hashes,
+    write_snapshot,
+)
+
+def get_github_graphql_schema(token: str, url: str = GITHUB_GRAPHQL_URL) -> Optional[Dict[str, Any]]:
     """
-    Fetch a simplified GitHub GraphQL schema representation.
+    Fetch the complete GitHub GraphQL schema by introspection.
     
     Args:
         token: GitHub personal access token
+        url: GraphQL endpoint (GitHub, or an APIM pass-through API)
         
     Returns:
-        GraphQL schema information as text
-    """
-    
-    # Simple query to test connectivity and get basic schema info
-    test_query = """
-    query {
-      __schema {
-        queryType { name }
-        mutationType { name }
-        subscriptionType { name }
-        types {
-          name
-          kind
-          description
-        }
-      }
-    }
+        The `__schema` object of the introspection result, or None on failure
     """
+    print(f"📡 Sending introspection query to {url}...")
+    try:
+        schema = fetch_schema(token, url)
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ HTTP Error: {e.response.status_code}")
+        print(f"Response: {e.response.text}")
+        return None
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return None
     
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-        "User-Agent": "GraphQL Schema Fetcher"
-    }
+    print(f"📊 Received {len(schema.get('types', []))} types")
+    return schema
 
-    print("headers prepared for request.")
-    print(f"Headers: {headers}")
-    
-    payload = {"query": test_query}
-    
-    print(f"📡 Sending request to GitHub GraphQL API...")
-    response = requests.post(
-        "https://api.github.com/graphql",
-        headers=headers,
-        json=payload,
-        timeout=30
-    )
-    
-    print(f"📊 Response status: {response.status_code}")
+def update_schema(token: str, url: str, sdl_path: str, snapshot_path: str, force: bool = False) -> bool:
+    """
+    Refresh the SDL file and the snapshot, downloading the full schema only when it changed.
     
-    if response.status_code != 200:
-        print(f"❌ HTTP Error: {response.status_code}")
-        print(f"Response: {response.text}")
-        return None
+    Args:
+        token: GitHub personal access token
+        url: GraphQL endpoint
+        sdl_path: SDL file to write
+        snapshot_path: Snapshot file to write
+        force: Download the full schema even if the probe hash is unchanged
         
-    response.raise_for_status()
-    
-    result = response.json()
+    Returns:
+        True if the files were written, False if they were already up to date
+    """
+    stored_hash, stored_probe = read_snapshot_hashes(snapshot_path)
+    probe_hash = fetch_probe_hash(token, url)
+    if not force and stored_probe == probe_hash and os.path.exists(sdl_path):
+        print(f"✅ Schema unchanged (probe {probe_hash[:12]}), skipping the full download")
+        return False
     
-    if "errors" in result:
-        print(f"❌ GraphQL errors: {json.dumps(result['errors'], indent=2)}")
-        return None
+    schema = get_github_graphql_schema(token, url)
+    if schema is None:
+        raise RuntimeError("Failed to fetch schema data")
+    digest = content_hash(schema)
+    if digest == stored_hash and os.path.exists(sdl_path):
+        # Same content: only record the new probe hash
+        write_snapshot(snapshot_path, schema, probe_hash)
+        print(f"✅ Schema content unchanged ({digest[:12]})")
+        return False
     
-    return result["data"]
+    sdl = print_schema(schema)
+    with open(sdl_path, "w", encoding="utf-8") as f:
+        f.write(f"# GitHub GraphQL API Schema\n# sha256: {digest}\n\n{sdl}")
+    write_snapshot(snapshot_path, schema, probe_hash)
+    print(f"✅ Schema {digest[:12]} written ({len(sdl)} characters of SDL)")
+    return True
 
 def create_minimal_schema() -> str:
     """
@@ -183,6 +198,22 @@ type PageInfo {
 
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="GitHub GraphQL Schema Fetcher for Azure API Management")
+    parser.add_argument("--url", default=GITHUB_GRAPHQL_URL, help=f"GraphQL endpoint (default: {GITHUB_GRAPHQL_URL})")
+    parser.add_argument("--output", default="github-schema.graphql", help="SDL file (default: github-schema.graphql)")
+    parser.add_argument("--snapshot", default="github-schema.snapshot", help="Schema snapshot file (default: github-schema.snapshot)")
+    parser.add_argument("--force", action="store_true", help="Download the full schema even if it looks unchanged")
+    parser.add_argument("--type", dest="type_name", help="Print one type from the snapshot and exit (no request)")
+    args = parser.parse_args()
+    
+    if args.type_name:
+        with SchemaSnapshot(args.snapshot) as snapshot:
+            if args.type_name not in snapshot:
+                print(f"❌ Type {args.type_name} not found in {args.snapshot}")
+                sys.exit(1)
+            print(snapshot.type_sdl(args.type_name))
+        return
+    
     print("🚀 GitHub GraphQL Schema Fetcher for Azure API Management")
     print("=" * 60)
     
@@ -191,56 +222,36 @@ def main():
     
     # Get GitHub token
     github_token = os.getenv("GITHUB_TOKEN")
+    output_file = args.output
     if not github_token:
         print("⚠️  GITHUB_TOKEN not found in environment.")
         print("📝 Creating a minimal schema file without API introspection...")
-        
-        # Create minimal schema
-        schema_content = create_minimal_schema()
         output_file = "github-schema-minimal.graphql"
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(create_minimal_schema())
         
     else:
         print(f"🔑 Found GitHub token (length: {len(github_token)})")
         
         try:
-            schema_data = get_github_graphql_schema(github_token)
-            
-            if schema_data:
-                print("✅ Successfully connected to GitHub GraphQL API!")
+            update_schema(github_token, args.url, output_file, args.snapshot, args.force)
+            with SchemaSnapshot(args.snapshot) as snapshot:
                 print(f"📋 Schema info:")
-                schema_info = schema_data.get("__schema", {})
-                print(f"   Query type: {schema_info.get('queryType', {}).get('name', 'Unknown')}")
-                print(f"   Mutation type: {schema_info.get('mutationType', {}).get('name', 'None')}")
-                print(f"   Subscription type: {schema_info.get('subscriptionType', {}).get('name', 'None')}")
-                print(f"   Total types: {len(schema_info.get('types', []))}")
-                
-                # For now, create the minimal schema with a note
-                schema_content = f"""# GitHub GraphQL API Schema
-# Connection successful! Found {len(schema_info.get('types', []))} types
-# 
-# Note: This is a minimal schema for Azure API Management testing.
-# For the full schema, consider using GraphQL introspection tools or
-# GitHub's schema.docs.graphql file from their public repository.
-
-{create_minimal_schema()}"""
-                output_file = "github-schema-connected.graphql"
-            else:
-                print("❌ Failed to fetch schema data.")
-                schema_content = create_minimal_schema()
-                output_file = "github-schema-minimal.graphql"
+                print(f"   Query type: {snapshot.roots.get('query') or 'Unknown'}")
+                print(f"   Mutation type: {snapshot.roots.get('mutation') or 'None'}")
+                print(f"   Subscription type: {snapshot.roots.get('subscription') or 'None'}")
+                print(f"   Total types: {len(snapshot)}")
+                print(f"   Content hash: {snapshot.hash}")
                 
         except Exception as e:
             print(f"❌ Error: {e}")
             print("📝 Creating minimal schema as fallback...")
-            schema_content = create_minimal_schema()
             output_file = "github-schema-minimal.graphql"
-    
-    # Save schema to file
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(schema_content)
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(create_minimal_schema())
     
     print(f"\n✅ Schema saved to: {output_file}")
-    print(f"📁 File size: {len(schema_content)} characters")
+    print(f"📁 File size: {os.path.getsize(output_file)} bytes")
     
     print(f"\n🔧 Next steps for Azure API Management:")
     print("1. In Azure Portal, go to your API Management instance")
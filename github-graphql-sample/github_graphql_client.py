@@ -8,24 +8,52 @@ with personal access token authentication.
 
 import os
 import sys
-import json
 import argparse
-from typing import Dict, Any, Optional
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
 import requests
 from dotenv import load_dotenv
 
+from graphql_batch import DEFAULT_MAX_NODES, afetch_repositories
+from graphql_cache import FRESH, STALE, ResponseCache, cache_key
+from graphql_errors import GraphQLError
+from graphql_output import FORMATS, TABLE, RecordWriter, discard_stdout, open_writer
+from graphql_projection import REPOSITORY_PATHS, USER_PATHS, parse_fields, projection, repository_fragment, repository_query, user_repositories_query, viewer_query
+from graphql_persisted import is_not_found, is_not_supported, persisted_query_extension, query_hash
+from graphql_ratelimit import RateLimitScheduler
+from graphql_resilience import Hedger, RetryPolicy, is_idempotent
+from graphql_tracing import Tracer, TracingTransport
+from graphql_transport import PooledTransport, Transport
+from graphql_validation import QueryValidator
+from graphql_wire import ENCODINGS, CompressingTransport, minify_query
+
 
 class GitHubGraphQLClient:
     """Client for interacting with GitHub's GraphQL API."""
 
     
 
-    def __init__(self, token: str, api_url: Optional[str] = "https://api.github.com/graphql", extra_headers: Optional[Dict[str, str]] = None) -> None:
+    def __init__(self, token: str, api_url: Optional[str] = "https://api.github.com/graphql", extra_headers: Optional[Dict[str, str]] = None, transport: Optional[Transport] = None, cache: Optional[ResponseCache] = None, persisted_queries: bool = False, scheduler: Optional[RateLimitScheduler] = None, retry_policy: Optional[RetryPolicy] = None, hedger: Optional[Hedger] = None, validator: Optional[QueryValidator] = None, minify_queries: bool = False) -> None:
         """
         Initialize the GitHub GraphQL client.
 
         Args:
             token: GitHub personal access token
+            transport: HTTP transport shared by all queries
+                (default: a PooledTransport with keep-alive connections)
+            cache: Response cache for queries (default: no caching)
+            persisted_queries: Send query hashes instead of query text
+                (automatic persisted queries)
+            scheduler: Rate-limit scheduler pacing requests (default: none)
+            retry_policy: Retry policy for transient failures (default: no retries)
+            hedger: Hedger for slow idempotent queries (default: no hedging)
+            validator: Validates queries and variables against a local schema
+                before they are sent (default: no local validation)
+            minify_queries: Send queries without indentation, comments and
+                optional spaces (see graphql_wire.minify_query)
         """
         self.token = token
         self.headers = {
@@ -34,6 +62,32 @@ class GitHubGraphQLClient:
         }
         self.headers.update(extra_headers or {})
         self.api_url = api_url
+        self.transport = transport or PooledTransport()
+        self.cache = cache
+        self.persisted_queries = persisted_queries
+        self.registered_hashes: set = set()
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy
+        self.hedger = hedger
+        self.validator = validator
+        self.minify_queries = minify_queries
+        self._revalidating: set = set()
+        self._revalidation_lock = threading.Lock()
+        self._revalidation_executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        """Close the underlying transport and its pooled connections."""
+        if self._revalidation_executor is not None:
+            self._revalidation_executor.shutdown(wait=True)
+        if self.hedger is not None:
+            self.hedger.close()
+        self.transport.close()
+
+    def __enter__(self) -> "GitHubGraphQLClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
 
     def execute_query(
         self, query: str, variables: Optional[Dict[str, Any]] = None
@@ -50,58 +104,311 @@ class GitHubGraphQLClient:
 
         Raises:
             requests.RequestException: If the API request fails
+            GraphQLError: If the response carries GraphQL errors, or the
+                request fails local validation
         """
-        payload = {"query": query}
+        if self.validator is not None:
+            self.validator.validate(query, variables)
+        if self.cache is None or not is_idempotent(query):
+            return self._send(query, variables)
+
+        key = cache_key(query, variables, self.token)
+        entry, state = self.cache.lookup(key)
+        if state == FRESH:
+            return entry.value
+        if state == STALE:
+            self._revalidate_in_background(key, query, variables, entry.etag)
+            return entry.value
+        return self._send(query, variables, key=key, etag=entry.etag if entry else None)
+
+    def _send(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]],
+        key: Optional[str] = None,
+        etag: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {}
+        wire_query = minify_query(query) if self.minify_queries else query
+        if self.persisted_queries:
+            digest = query_hash(wire_query)
+            payload["extensions"] = persisted_query_extension(digest)
+        else:
+            payload["query"] = wire_query
         if variables:
             payload["variables"] = variables
 
-        response = requests.post(
-            self.api_url, headers=self.headers, json=payload, timeout=30
-        )
+        headers = self.headers
+        if etag:
+            headers = dict(headers, **{"If-None-Match": etag})
+
+        response = self._post(query, payload, headers)
+        if response.status_code == 304 and key:
+            cached = self.cache.refresh(key)
+            if cached is not None:
+                return cached
+            return self._send(query, variables, key=key)
+
+        if self.persisted_queries:
+            errors = self._persisted_query_errors(response)
+            if errors and is_not_supported(errors):
+                self.persisted_queries = False
+                return self._send(query, variables, key=key)
+            if errors and is_not_found(errors) and "query" not in payload:
+                payload["query"] = wire_query
+                response = self._post(query, payload, headers)
+            if response.ok:
+                self.registered_hashes.add(digest)
         response.raise_for_status()
 
-        result = response.json()
+        result = response.graphql_body
+        if not isinstance(result, dict):
+            result = response.json()  # Raises the decoding error
 
         if "errors" in result:
-            raise Exception(f"GraphQL errors: {json.dumps(result['errors'], indent=2)}")
+            raise GraphQLError(result["errors"], result.get("data"))
 
+        if key:
+            self.cache.store(key, result, response.headers.get("ETag"))
         return result
 
+    def _post(self, query: str, payload: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        if self.retry_policy is None and self.hedger is None:
+            return self._post_once(query, payload, headers)
+
+        idempotent = is_idempotent(query)
+        attempt = 0
+        while True:
+            attempt += 1
+            response, error = None, None
+            try:
+                if self.hedger is not None and idempotent:
+                    response = self.hedger.run(self.api_url, lambda: self._post_once(query, payload, headers))
+                else:
+                    response = self._post_once(query, payload, headers)
+            except requests.RequestException as e:
+                error = e
+
+            delay = None
+            if self.retry_policy is not None:
+                body = response.graphql_body if response is not None else None
+                delay = self.retry_policy.retry_delay(attempt, response, error, idempotent, body)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            self.retry_policy.sleep(delay)
+
+    def _post_once(self, query: str, payload: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        if self.scheduler is None:
+            response = self.transport.post(self.api_url, headers=headers, json=payload)
+            self._decode(response)
+            return response
+
+        query_key = query_hash(query)
+        cost = self.scheduler.expected_cost(query_key)
+        self.scheduler.acquire(cost)
+        try:
+            response = self.transport.post(self.api_url, headers=headers, json=payload)
+        finally:
+            self.scheduler.release(cost)
+
+        self.scheduler.observe(response.status_code, response.headers, self._decode(response), query_key)
+        return response
+
+    @staticmethod
+    def _decode(response: requests.Response) -> Optional[Any]:
+        """
+        Decode the JSON body of a response, once per response.
+
+        The body is kept as `response.graphql_body` (None when it is empty or
+        not JSON) for the scheduler, the retry policy, the persisted-query
+        fallback and `_send`.
+        """
+        body = None
+        if response.content:
+            started = time.perf_counter()
+            try:
+                body = response.json()
+            except ValueError:
+                pass
+            # Set by graphql_tracing.TracingTransport
+            span = getattr(response, "trace_span", None)
+            if span is not None:
+                span.parsed(time.perf_counter() - started)
+        response.graphql_body = body
+        return body
+
+    @staticmethod
+    def _persisted_query_errors(response: requests.Response) -> List[Dict[str, Any]]:
+        """Return the errors of a hash-only response, which may come with a 200 or a 400."""
+        if response.status_code not in (200, 400) or not isinstance(response.graphql_body, dict):
+            return []
+        return response.graphql_body.get("errors") or []
+
+    def _revalidate_in_background(
+        self, key: str, query: str, variables: Optional[Dict[str, Any]], etag: Optional[str]
+    ) -> None:
+        with self._revalidation_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+            if self._revalidation_executor is None:
+                self._revalidation_executor = ThreadPoolExecutor(max_workers=2)
+        self.cache.stats.revalidations += 1
+
+        def revalidate() -> None:
+            try:
+                self._send(query, variables, key=key, etag=etag)
+            except Exception:
+                pass  # Keep serving the stale entry; the next lookup retries.
+            finally:
+                with self._revalidation_lock:
+                    self._revalidating.discard(key)
+
+        self._revalidation_executor.submit(revalidate)
+
+
+class AsyncGitHubGraphQLClient:
+    """Asyncio client for interacting with GitHub's GraphQL API."""
+
+    def __init__(self, token: str, api_url: Optional[str] = "https://api.github.com/graphql", extra_headers: Optional[Dict[str, str]] = None, transport: Optional[Transport] = None, cache: Optional[ResponseCache] = None, persisted_queries: bool = False, scheduler: Optional[RateLimitScheduler] = None, retry_policy: Optional[RetryPolicy] = None, hedger: Optional[Hedger] = None, validator: Optional[QueryValidator] = None, minify_queries: bool = False, max_workers: int = 10) -> None:
+        """
+        Initialize the asyncio GitHub GraphQL client.
+
+        Requests are sent through the same pooled transport as
+        GitHubGraphQLClient, from a thread pool so that the event loop is
+        never blocked on the network.
+
+        Args:
+            token: GitHub personal access token
+            transport: HTTP transport shared by all queries
+            cache: Response cache for queries (default: no caching)
+            persisted_queries: Send query hashes instead of query text
+            scheduler: Rate-limit scheduler pacing requests (default: none)
+            retry_policy: Retry policy for transient failures (default: no retries)
+            hedger: Hedger for slow idempotent queries (default: no hedging)
+            validator: Validates requests against a local schema (default: none)
+            minify_queries: Send minified query text
+            max_workers: Maximum number of requests in flight at once
+        """
+        self.client = GitHubGraphQLClient(token, api_url=api_url, extra_headers=extra_headers, transport=transport, cache=cache, persisted_queries=persisted_queries, scheduler=scheduler, retry_policy=retry_policy, hedger=hedger, validator=validator, minify_queries=minify_queries)
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def close(self) -> None:
+        """Close the worker threads and the underlying transport."""
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self) -> "AsyncGitHubGraphQLClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def execute_query(
+        self, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a GraphQL query against GitHub's API.
+
+        Args:
+            query: GraphQL query string
+            variables: Optional variables for the query
+
+        Returns:
+            Response data from the API
+
+        Raises:
+            requests.RequestException: If the API request fails
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.client.execute_query, query, variables
+        )
+
+    async def execute_many(
+        self,
+        queries: Sequence[Tuple[str, Optional[Dict[str, Any]]]],
+        concurrency: int = 10,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        Execute several GraphQL queries concurrently.
+
+        Args:
+            queries: (query, variables) pairs
+            concurrency: Maximum number of queries in flight at once
+            return_exceptions: Return failures in place of their result
+                instead of raising the first one
 
-def get_viewer_info(client: GitHubGraphQLClient) -> None:
+        Returns:
+            Response data for each query, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(query: str, variables: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.execute_query(query, variables)
+
+        return await asyncio.gather(
+            *(run(query, variables) for query, variables in queries),
+            return_exceptions=return_exceptions,
+        )
+
+
+# Fields shown by `repos` when no --fields are given
+USER_REPOSITORY_PATHS = ("name", "description", "url", "stargazerCount", "forkCount", "isPrivate", "primaryLanguage", "updatedAt")
+
+VIEWER_QUERY = viewer_query(USER_PATHS)
+
+
+def print_projected(type_name: str, fields: Sequence[str], record: Dict[str, Any], indent: str = "") -> None:
+    """
+    Display the requested fields of a record, one `path: value` line each.
+
+    Args:
+        type_name: GraphQL type of the record
+        fields: Field paths the record was fetched with
+        record: Object returned by the query
+        indent: Prefix of every line
+    """
+    values = projection(type_name, tuple(fields)).extract(record)
+    width = max(len(path) for path in values) + 1
+    for path, value in values.items():
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value) if value else "N/A"
+        elif value is None:
+            value = "N/A"
+        print(f"{indent}{path + ':':<{width}} {value}")
+
+
+def get_viewer_info(client: GitHubGraphQLClient, fields: Optional[Sequence[str]] = None, output: Optional[RecordWriter] = None) -> None:
     """
     Fetch and display information about the authenticated user.
 
     Args:
         client: GitHubGraphQLClient instance
+        fields: Field paths to fetch and show (default: the standard summary)
+        output: Writer of the record, instead of the report (see graphql_output)
     """
-    query = """
-    query {
-        viewer {
-            login
-            name
-            email
-            bio
-            company
-            location
-            createdAt
-            followers {
-                totalCount
-            }
-            following {
-                totalCount
-            }
-            repositories {
-                totalCount
-            }
-        }
-    }
-    """
+    if output is not None:
+        result = client.execute_query(viewer_query(tuple(fields)) if fields else VIEWER_QUERY)
+        output.write(projection("User", tuple(fields or USER_PATHS)).extract(result["data"]["viewer"]))
+        return
 
     print("Fetching authenticated user information...\n")
-    result = client.execute_query(query)
+    result = client.execute_query(viewer_query(tuple(fields)) if fields else VIEWER_QUERY)
     viewer = result["data"]["viewer"]
 
+    if fields:
+        print(f"GitHub User Information")
+        print(f"=" * 50)
+        print_projected("User", fields, viewer)
+        print()
+        return
+
     print(f"GitHub User Information")
     print(f"=" * 50)
     print(f"Username:     {viewer['login']}")
@@ -117,122 +424,165 @@ def get_viewer_info(client: GitHubGraphQLClient) -> None:
     print()
 
 
+USER_REPOSITORIES_QUERY = user_repositories_query(USER_REPOSITORY_PATHS)
+
+# GitHub caps connection pages at 100 nodes.
+MAX_PAGE_SIZE = 100
+
+
+def iter_user_repositories(
+    client: GitHubGraphQLClient,
+    username: str,
+    page_size: int = MAX_PAGE_SIZE,
+    limit: Optional[int] = None,
+    fields: Sequence[str] = USER_REPOSITORY_PATHS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the repositories of a user or organization, page by page.
+
+    Pages are followed through `endCursor`/`hasNextPage`. The next page is
+    fetched in the background while the caller handles the current one, so
+    at most two pages are held in memory at any time.
+
+    Args:
+        client: GitHubGraphQLClient instance
+        username: GitHub user or organization login
+        page_size: Number of repositories per request (at most 100)
+        limit: Maximum number of repositories to yield (default: all)
+        fields: Repository field paths to fetch (see graphql_projection)
+
+    Yields:
+        Repository nodes, most recently updated first
+
+    Raises:
+        LookupError: If the user or organization does not exist
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    remaining = limit
+    query = user_repositories_query(tuple(fields))
+
+    def fetch(cursor: Optional[str], count: int) -> Dict[str, Any]:
+        variables = {"username": username, "limit": count, "cursor": cursor}
+        owner = client.execute_query(query, variables)["data"]["repositoryOwner"]
+        if not owner:
+            raise LookupError(f"User '{username}' not found.")
+        return owner["repositories"]
+
+    def next_count() -> int:
+        return page_size if remaining is None else min(page_size, remaining)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        pending = executor.submit(fetch, None, next_count()) if next_count() > 0 else None
+        while pending is not None:
+            page = pending.result()
+            nodes = page["nodes"]
+            if remaining is not None:
+                nodes = nodes[:remaining]
+                remaining -= len(nodes)
+
+            page_info = page["pageInfo"]
+            pending = None
+            if page_info["hasNextPage"] and nodes and next_count() > 0:
+                pending = executor.submit(fetch, page_info["endCursor"], next_count())
+
+            yield from nodes
+    finally:
+        executor.shutdown(wait=False)
+
+
 def get_user_repositories(
-    client: GitHubGraphQLClient, username: str, limit: int = 10
+    client: GitHubGraphQLClient,
+    username: str,
+    limit: Optional[int] = 10,
+    page_size: int = MAX_PAGE_SIZE,
+    fields: Optional[Sequence[str]] = None,
+    output: Optional[RecordWriter] = None,
 ) -> None:
     """
-    Fetch and display repositories for a specific user.
+    Fetch and display repositories for a specific user, streaming page by page.
 
     Args:
         client: GitHubGraphQLClient instance
         username: GitHub username
-        limit: Number of repositories to fetch (default: 10)
+        limit: Number of repositories to fetch (default: 10, None for all)
+        page_size: Number of repositories per request (default: 100)
+        fields: Field paths to fetch and show (default: the standard summary)
+        output: Writer of one record per repository, instead of the report
     """
-    query = """
-    query($username: String!, $limit: Int!) {
-        user(login: $username) {
-            login
-            repositories(first: $limit, orderBy: {field: UPDATED_AT, direction: DESC}) {
-                nodes {
-                    name
-                    description
-                    url
-                    stargazerCount
-                    forkCount
-                    isPrivate
-                    primaryLanguage {
-                        name
-                    }
-                    updatedAt
-                }
-            }
-        }
-    }
-    """
-
-    variables = {"username": username, "limit": limit}
+    if output is not None:
+        paths = tuple(fields or USER_REPOSITORY_PATHS)
+        records = projection("Repository", paths)
+        try:
+            for repo in iter_user_repositories(client, username, page_size=page_size, limit=limit, fields=paths):
+                output.write(records.extract(repo))
+        except LookupError as e:
+            print(e, file=sys.stderr)
+        return
 
     print(f"Fetching repositories for user '{username}'...\n")
-    result = client.execute_query(query, variables)
 
-    user = result["data"]["user"]
-    if not user:
-        print(f"User '{username}' not found.")
-        return
+    count = 0
+    try:
+        for count, repo in enumerate(
+            iter_user_repositories(client, username, page_size=page_size, limit=limit, fields=fields or USER_REPOSITORY_PATHS), 1
+        ):
+            if count == 1:
+                print(f"Repositories for {username}")
+                print(f"=" * 50)
 
-    repositories = user["repositories"]["nodes"]
+            if fields:
+                print(f"\n{count}.")
+                print_projected("Repository", fields, repo, indent="   ")
+                continue
 
-    print(f"Top {len(repositories)} Repositories for {user['login']}")
-    print(f"=" * 50)
+            language = repo["primaryLanguage"]["name"] if repo["primaryLanguage"] else "N/A"
+            visibility = "Private" if repo["isPrivate"] else "Public"
 
-    for i, repo in enumerate(repositories, 1):
-        language = repo["primaryLanguage"]["name"] if repo["primaryLanguage"] else "N/A"
-        visibility = "Private" if repo["isPrivate"] else "Public"
-
-        print(f"\n{i}. {repo['name']} ({visibility})")
-        print(f"   URL:         {repo['url']}")
-        print(f"   Description: {repo.get('description', 'No description')}")
-        print(f"   Language:    {language}")
-        print(f"   Stars:       {repo['stargazerCount']}")
-        print(f"   Forks:       {repo['forkCount']}")
-        print(f"   Updated:     {repo['updatedAt']}")
+            print(f"\n{count}. {repo['name']} ({visibility})")
+            print(f"   URL:         {repo['url']}")
+            print(f"   Description: {repo.get('description', 'No description')}")
+            print(f"   Language:    {language}")
+            print(f"   Stars:       {repo['stargazerCount']}")
+            print(f"   Forks:       {repo['forkCount']}")
+            print(f"   Updated:     {repo['updatedAt']}")
+    except LookupError as e:
+        print(e)
+        return
+
+    if count == 0:
+        print(f"No repositories found for {username}.")
     print()
 
 
-def get_repository_info(client: GitHubGraphQLClient, owner: str, name: str) -> None:
+REPOSITORY_FIELDS = repository_fragment(REPOSITORY_PATHS)
+
+REPOSITORY_INFO_QUERY = repository_query(REPOSITORY_PATHS)
+
+
+def print_repository_info(owner: str, name: str, repo: Optional[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> None:
     """
-    Fetch and display detailed information about a specific repository.
+    Display detailed information about a repository.
 
     Args:
-        client: GitHubGraphQLClient instance
         owner: Repository owner
         name: Repository name
+        repo: `repository` object returned by REPOSITORY_INFO_QUERY, or
+            by the query of `fields`
+        fields: Field paths the repository was fetched with (default: the
+            standard details)
     """
-    query = """
-    query($owner: String!, $name: String!) {
-        repository(owner: $owner, name: $name) {
-            name
-            description
-            url
-            isPrivate
-            stargazerCount
-            forkCount
-            watchers {
-                totalCount
-            }
-            issues {
-                totalCount
-            }
-            pullRequests {
-                totalCount
-            }
-            primaryLanguage {
-                name
-            }
-            languages(first: 5) {
-                nodes {
-                    name
-                }
-            }
-            createdAt
-            updatedAt
-            defaultBranchRef {
-                name
-            }
-        }
-    }
-    """
-
-    variables = {"owner": owner, "name": name}
-
-    print(f"Fetching repository information for '{owner}/{name}'...\n")
-    result = client.execute_query(query, variables)
-
-    repo = result["data"]["repository"]
     if not repo:
         print(f"Repository '{owner}/{name}' not found.")
         return
 
+    if fields:
+        print(f"Repository: {owner}/{name}")
+        print(f"=" * 50)
+        print_projected("Repository", fields, repo)
+        print()
+        return
+
     languages = [lang["name"] for lang in repo["languages"]["nodes"]]
     primary_language = (
         repo["primaryLanguage"]["name"] if repo["primaryLanguage"] else "N/A"
@@ -258,6 +608,127 @@ def get_repository_info(client: GitHubGraphQLClient, owner: str, name: str) -> N
     print()
 
 
+def write_repository_info(output: RecordWriter, owner: str, name: str, repo: Optional[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> None:
+    """
+    Write a repository as a record; a missing one is reported on stderr.
+
+    Args:
+        output: Record writer
+        owner: Repository owner
+        name: Repository name
+        repo: `repository` object, or None if it was not found
+        fields: Field paths the repository was fetched with (default: the
+            standard details)
+    """
+    if not repo:
+        print(f"Repository '{owner}/{name}' not found.", file=sys.stderr)
+        return
+    output.write(projection("Repository", tuple(fields or REPOSITORY_PATHS)).extract(repo))
+
+
+def get_repository_info(client: GitHubGraphQLClient, owner: str, name: str, fields: Optional[Sequence[str]] = None, output: Optional[RecordWriter] = None) -> None:
+    """
+    Fetch and display detailed information about a specific repository.
+
+    Args:
+        client: GitHubGraphQLClient instance
+        owner: Repository owner
+        name: Repository name
+        fields: Field paths to fetch and show (default: the standard details)
+        output: Writer of the record, instead of the report
+    """
+    variables = {"owner": owner, "name": name}
+
+    if output is None:
+        print(f"Fetching repository information for '{owner}/{name}'...\n")
+    try:
+        result = client.execute_query(repository_query(tuple(fields)) if fields else REPOSITORY_INFO_QUERY, variables)
+    except GraphQLError as e:
+        if not e.is_not_found():
+            raise
+        result = {"data": e.data or {}}
+
+    if output is not None:
+        write_repository_info(output, owner, name, result["data"].get("repository"), fields)
+        return
+    print_repository_info(owner, name, result["data"].get("repository"), fields)
+
+
+async def get_repositories_info(
+    client: AsyncGitHubGraphQLClient,
+    repositories: Sequence[Tuple[str, str]],
+    concurrency: int = 10,
+    batch_size: int = DEFAULT_MAX_NODES,
+    fields: Optional[Sequence[str]] = None,
+    output: Optional[RecordWriter] = None,
+) -> None:
+    """
+    Fetch and display detailed information about many repositories concurrently.
+
+    Lookups are coalesced into aliased documents of up to `batch_size`
+    repositories, and the documents are sent concurrently.
+
+    Args:
+        client: AsyncGitHubGraphQLClient instance
+        repositories: (owner, name) pairs
+        concurrency: Maximum number of queries in flight at once
+        batch_size: Maximum number of repositories per query
+        fields: Field paths to fetch and show (default: the standard details)
+        output: Writer of one record per repository, instead of the report
+    """
+    if output is None:
+        print(
+            f"Fetching repository information for {len(repositories)} repositories "
+            f"(concurrency: {concurrency}, batch size: {batch_size})...\n"
+        )
+    results = await afetch_repositories(
+        client,
+        repositories,
+        repository_fragment(tuple(fields)) if fields else REPOSITORY_FIELDS,
+        max_nodes=batch_size,
+        concurrency=concurrency,
+    )
+
+    for (owner, name), result in zip(repositories, results):
+        if isinstance(result, Exception):
+            print(f"Error: failed to fetch '{owner}/{name}': {result}\n", file=sys.stderr)
+            continue
+        if output is not None:
+            write_repository_info(output, owner, name, result, fields)
+            continue
+        print_repository_info(owner, name, result, fields)
+
+
+def read_repository_list(path: str) -> List[Tuple[str, str]]:
+    """
+    Read `owner/name` pairs from a file, one per line.
+
+    Blank lines and lines starting with `#` are ignored. Use `-` to read
+    from standard input.
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        (owner, name) pairs in file order
+    """
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        repositories = []
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            owner, sep, name = line.partition("/")
+            if not sep or not owner or not name:
+                raise ValueError(f"{path}:{line_number}: expected 'owner/name', got '{line}'")
+            repositories.append((owner, name))
+        return repositories
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
 def main():
     """Main entry point for the application."""
     parser = argparse.ArgumentParser(
@@ -273,13 +744,149 @@ Examples:
   
   # Get detailed repository info
   python github_graphql_client.py repo octocat Hello-World
+
+  # Fetch only the fields you need
+  python github_graphql_client.py repos octocat --fields name,stargazerCount,languages.name
+
+  # Get repository info for every owner/name listed in a file
+  python github_graphql_client.py repo --file repos.txt --concurrency 20
+
+  # Stream repositories as JSON lines (or csv) for other tools
+  python github_graphql_client.py --format ndjson repos octocat --limit 0 --fields name,stargazerCount
         """,
     )
 
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=10,
+        help="Maximum number of keep-alive connections per host (default: 10)",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=5.0,
+        help="Connection timeout in seconds (default: 5)",
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=30.0,
+        help="Read timeout in seconds (default: 30)",
+    )
+
+    parser.add_argument(
+        "--persisted-queries",
+        action="store_true",
+        help="Send query hashes instead of query text (automatic persisted queries)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="Pace requests from the rate-limit headers and rateLimit data, and report delays",
+    )
+    parser.add_argument(
+        "--rate-limit-budget",
+        type=float,
+        default=5000,
+        help="Points per hour assumed until the server reports its own (default: 5000)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        help="Retries for 5xx, 429 and connection failures, with jittered backoff, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=0,
+        help="Send a second copy of queries slower than this latency percentile, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=0,
+        help="Cache responses for this many seconds, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--cache-stale",
+        type=float,
+        default=0,
+        help="Serve expired responses for this many extra seconds while revalidating (default: 0)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Maximum number of responses cached in memory (default: 256)",
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="SQLite file persisting cached responses across runs",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Print cache hit/miss/eviction counters on exit",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Send minified query text",
+    )
+    parser.add_argument(
+        "--compress-requests",
+        choices=ENCODINGS,
+        help="Compress request bodies with this encoding (the backend must accept it)",
+    )
+    parser.add_argument(
+        "--compress-min-bytes",
+        type=int,
+        default=1024,
+        help="Smallest request body compressed, in bytes (default: 1024)",
+    )
+    parser.add_argument(
+        "--wire-report",
+        action="store_true",
+        help="Print the bytes of every request and response, before and after compression",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Time the DNS, connect, TLS, send, TTFB, download and parse phases of every request and print them",
+    )
+    parser.add_argument(
+        "--trace-jsonl",
+        help="Write the spans of every request to this JSONL file on exit (implies --trace)",
+    )
+    parser.add_argument(
+        "--trace-prometheus",
+        help="Write phase histograms to this file in the Prometheus text format on exit (implies --trace)",
+    )
+    parser.add_argument(
+        "--validate-schema",
+        help="Validate queries locally against this schema (SDL, .snapshot or introspection .json) before sending them",
+    )
+    parser.add_argument(
+        "--validation-stats",
+        action="store_true",
+        help="Print the validated-document cache hit rate on exit",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=TABLE,
+        help="Output format: a readable report, or json, ndjson or csv records of the fetched fields (default: table)",
+    )
+
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
+    fields_help = "Comma-separated field paths to fetch and show, e.g. name,stargazerCount,languages.name (default: all shown fields)"
+
     # Viewer command
-    subparsers.add_parser("viewer", help="Show authenticated user information")
+    viewer_parser = subparsers.add_parser("viewer", help="Show authenticated user information")
+    viewer_parser.add_argument("--fields", help=fields_help)
 
     # Repositories command
     repos_parser = subparsers.add_parser("repos", help="List user repositories")
@@ -288,13 +895,37 @@ Examples:
         "--limit",
         type=int,
         default=10,
-        help="Number of repositories to show (default: 10)",
+        help="Number of repositories to show, 0 for all (default: 10)",
     )
+    repos_parser.add_argument(
+        "--page-size",
+        type=int,
+        default=MAX_PAGE_SIZE,
+        help=f"Number of repositories fetched per request (default: {MAX_PAGE_SIZE})",
+    )
+    repos_parser.add_argument("--fields", help=fields_help)
 
     # Repository command
     repo_parser = subparsers.add_parser("repo", help="Show repository details")
-    repo_parser.add_argument("owner", help="Repository owner")
-    repo_parser.add_argument("name", help="Repository name")
+    repo_parser.add_argument("owner", nargs="?", help="Repository owner")
+    repo_parser.add_argument("name", nargs="?", help="Repository name")
+    repo_parser.add_argument(
+        "--file",
+        help="File of 'owner/name' lines to fetch concurrently ('-' for stdin)",
+    )
+    repo_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of queries in flight with --file (default: 10)",
+    )
+    repo_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_MAX_NODES,
+        help=f"Maximum number of repositories per query with --file (default: {DEFAULT_MAX_NODES})",
+    )
+    repo_parser.add_argument("--fields", help=fields_help)
 
     args = parser.parse_args()
 
@@ -302,6 +933,22 @@ Examples:
         parser.print_help()
         sys.exit(1)
 
+    if args.command == "repo" and not args.file and not (args.owner and args.name):
+        repo_parser.error("either owner and name, or --file, is required")
+
+    fields = None
+    if args.fields:
+        fields = parse_fields([args.fields])
+        try:
+            projection("User" if args.command == "viewer" else "Repository", fields)
+        except ValueError as e:
+            parser.error(str(e))
+
+    output = None
+    if args.format != TABLE:
+        defaults = {"viewer": USER_PATHS, "repos": USER_REPOSITORY_PATHS, "repo": REPOSITORY_PATHS}
+        output = open_writer(args.format, fields or defaults[args.command])
+
     # Load environment variables from .env file
     load_dotenv()
 
@@ -318,23 +965,105 @@ Examples:
 
     github_graphql_api_url = os.getenv("GITHUB_GRAPHQL_API_URL", "https://api.github.com/graphql")
 
+    concurrency = args.concurrency if args.command == "repo" and args.file else 1
+    pool_options = {
+        "pool_maxsize": max(args.pool_size, concurrency),
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.read_timeout,
+    }
+    tracer = None
+    if args.trace or args.trace_jsonl or args.trace_prometheus:
+        tracer = Tracer()
+        transport = TracingTransport(tracer, **pool_options)
+    else:
+        transport = PooledTransport(**pool_options)
+    wire = None
+    if args.compress_requests or args.wire_report:
+        wire = transport = CompressingTransport(
+            transport,
+            encoding=args.compress_requests,
+            min_size=args.compress_min_bytes,
+            on_report=(lambda report: print(f"Wire: {report}", file=sys.stderr)) if args.wire_report else None,
+        )
+    extra_headers = {"Ocp-Apim-Subscription-Key": os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY")} if os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY") else None
+    scheduler = None
+    if args.rate_limit:
+        scheduler = RateLimitScheduler(budget=args.rate_limit_budget, max_concurrency=concurrency)
+    retry_policy = RetryPolicy(max_attempts=args.retries + 1) if args.retries > 0 else None
+    hedger = Hedger(percentile=args.hedge_percentile, max_workers=2 * concurrency) if args.hedge_percentile > 0 else None
+    cache = None
+    if args.cache_ttl > 0:
+        cache = ResponseCache(
+            max_entries=args.cache_size,
+            ttl=args.cache_ttl,
+            stale_ttl=args.cache_stale,
+            path=args.cache_file,
+        )
+    validator = QueryValidator.from_file(args.validate_schema) if args.validate_schema else None
+
     # Create GitHub GraphQL client
     try:
-        client = GitHubGraphQLClient(github_token, api_url=github_graphql_api_url,extra_headers={"Ocp-Apim-Subscription-Key": os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY")} if os.getenv("GITHUB_APIM_SUBSCRIPTION_KEY") else None)
-        # Execute the requested command
-        if args.command == "viewer":
-            get_viewer_info(client)
-        elif args.command == "repos":
-            get_user_repositories(client, args.username, args.limit)
-        elif args.command == "repo":
-            get_repository_info(client, args.owner, args.name)
+        if args.command == "repo" and args.file:
+            repositories = read_repository_list(args.file)
+            async_client = AsyncGitHubGraphQLClient(github_token, api_url=github_graphql_api_url, extra_headers=extra_headers, transport=transport, cache=cache, persisted_queries=args.persisted_queries, scheduler=scheduler, retry_policy=retry_policy, hedger=hedger, validator=validator, minify_queries=args.minify, max_workers=concurrency)
+
+            async def run() -> None:
+                async with async_client:
+                    await get_repositories_info(async_client, repositories, concurrency, args.batch_size, fields, output)
 
+            asyncio.run(run())
+        else:
+            client = GitHubGraphQLClient(github_token, api_url=github_graphql_api_url, extra_headers=extra_headers, transport=transport, cache=cache, persisted_queries=args.persisted_queries, scheduler=scheduler, retry_policy=retry_policy, hedger=hedger, validator=validator, minify_queries=args.minify)
+            with client:
+                # Execute the requested command
+                if args.command == "viewer":
+                    get_viewer_info(client, fields, output)
+                elif args.command == "repos":
+                    get_user_repositories(client, args.username, args.limit or None, args.page_size, fields, output)
+                elif args.command == "repo":
+                    get_repository_info(client, args.owner, args.name, fields, output)
+
+        # Output smaller than the writer's buffer is only written here
+        if output is not None:
+            output.close()
+
+    except BrokenPipeError:
+        # The reader of the output went away (e.g. `| head`): stop without a traceback
+        discard_stdout()
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Error: API request failed: {e}", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if output is not None and not output.closed:
+            # Write what was read before an error
+            try:
+                output.close()
+            except BrokenPipeError:
+                discard_stdout()
+        if scheduler is not None:
+            for reason, (count, seconds) in scheduler.delay_summary().items():
+                print(f"Rate limit: {count} requests delayed by {reason} ({seconds:.2f}s)", file=sys.stderr)
+        if cache is not None:
+            if args.cache_stats:
+                print(f"Cache: {cache.stats}", file=sys.stderr)
+            cache.close()
+        if wire is not None and args.wire_report:
+            print(f"Wire totals: {wire.stats}", file=sys.stderr)
+        if validator is not None and args.validation_stats:
+            print(f"Validation: {validator.stats}", file=sys.stderr)
+        if tracer is not None:
+            if args.trace:
+                for span in tracer.spans:
+                    print(f"Trace: {span}", file=sys.stderr)
+            if args.trace_jsonl:
+                with open(args.trace_jsonl, "w", encoding="utf-8") as f:
+                    tracer.write_jsonl(f)
+            if args.trace_prometheus:
+                tracer.write_prometheus(args.trace_prometheus)
 
 
 if __name__ == "__main__":
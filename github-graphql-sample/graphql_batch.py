@@ -0,0 +1,258 @@
+"""
+Alias-based coalescing of repository and user lookups.
+
+Many `repository(owner, name)` lookups are merged into a single GraphQL
+document using field aliases (`r0: repository(...)`, `r1: ...`), and so are
+`user(login)` lookups (`u0: user(...)`), so N lookups
+cost one round trip instead of N. Batches are split by a node and cost limit,
+and the aliased results are fanned back out in input order.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from graphql_errors import GraphQLError
+
+# Default maximum number of aliased lookups per document.
+DEFAULT_MAX_NODES = 50
+
+# A lookup result: the repository object, None when it does not exist, or
+# the exception that prevented fetching it.
+LookupResult = Union[Dict[str, Any], None, Exception]
+
+
+def fragment_name(fragment: str) -> str:
+    """Return the name of the first fragment defined in `fragment`."""
+    match = re.search(r"\bfragment\s+(\w+)\s+on\s+\w+", fragment)
+    if not match:
+        raise ValueError("Expected a 'fragment <Name> on <Type>' definition")
+    return match.group(1)
+
+
+def estimate_lookup_cost(fragment: str) -> int:
+    """
+    Estimate the node cost of one lookup.
+
+    Counts the repository itself plus the page size of every nested
+    connection requested with `first: N`.
+
+    Args:
+        fragment: Repository fragment used for each lookup
+
+    Returns:
+        Estimated number of nodes per lookup
+    """
+    return 1 + sum(int(size) for size in re.findall(r"\bfirst:\s*(\d+)", fragment))
+
+
+def plan_batches(
+    count: int,
+    max_nodes: int = DEFAULT_MAX_NODES,
+    max_cost: Optional[int] = None,
+    lookup_cost: int = 1,
+) -> List[range]:
+    """
+    Split `count` lookups into batches.
+
+    Args:
+        count: Number of lookups
+        max_nodes: Maximum number of lookups per batch
+        max_cost: Maximum estimated cost per batch (default: unlimited)
+        lookup_cost: Estimated cost of one lookup
+
+    Returns:
+        Index ranges, one per batch
+    """
+    size = max(1, max_nodes)
+    if max_cost is not None:
+        size = max(1, min(size, max_cost // max(1, lookup_cost)))
+    return [range(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def build_repository_batch(
+    repositories: Sequence[Tuple[str, str]], fragment: str
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build one aliased document looking up every repository.
+
+    The document also selects GitHub's `rateLimit` so that a rate-limit
+    scheduler can learn the cost of each batch.
+
+    Args:
+        repositories: (owner, name) pairs
+        fragment: Repository fragment selected for each lookup
+
+    Returns:
+        The query and its variables
+    """
+    name = fragment_name(fragment)
+    definitions = []
+    selections = []
+    variables: Dict[str, Any] = {}
+    for i, (owner, repo) in enumerate(repositories):
+        definitions.append(f"$o{i}: String!, $n{i}: String!")
+        selections.append(f"    r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...{name} }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+
+    selections.append("    rateLimit { cost remaining resetAt }")
+    query = (
+        f"query({', '.join(definitions)}) {{\n"
+        + "\n".join(selections)
+        + "\n}\n"
+        + fragment
+    )
+    return query, variables
+
+
+def build_user_batch(logins: Sequence[str], fragment: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build one aliased document looking up every user.
+
+    Args:
+        logins: User logins
+        fragment: User fragment selected for each lookup
+
+    Returns:
+        The query and its variables
+    """
+    name = fragment_name(fragment)
+    definitions = []
+    selections = []
+    variables: Dict[str, Any] = {}
+    for i, login in enumerate(logins):
+        definitions.append(f"$l{i}: String!")
+        selections.append(f"    u{i}: user(login: $l{i}) {{ ...{name} }}")
+        variables[f"l{i}"] = login
+
+    selections.append("    rateLimit { cost remaining resetAt }")
+    query = (
+        f"query({', '.join(definitions)}) {{\n"
+        + "\n".join(selections)
+        + "\n}\n"
+        + fragment
+    )
+    return query, variables
+
+
+def split_batch_result(
+    count: int,
+    outcome: Union[Dict[str, Any], Exception],
+    prefix: str = "r",
+    field: str = "repository",
+) -> List[LookupResult]:
+    """
+    Fan a batched response back out to each lookup.
+
+    Errors whose `path` starts with an alias only affect that lookup; a
+    NOT_FOUND error makes it None. Errors without a path, and transport
+    failures, affect every lookup of the batch.
+
+    Args:
+        count: Number of lookups in the batch
+        outcome: The response of the batched query, or the exception it raised
+        prefix: Alias prefix of the lookups ("r" for repositories, "u" for users)
+        field: Field looked up, used as the `data` of per-lookup errors
+
+    Returns:
+        One result per lookup, in batch order
+    """
+    if isinstance(outcome, GraphQLError):
+        data, errors = outcome.data or {}, outcome.errors
+    elif isinstance(outcome, Exception):
+        return [outcome] * count
+    else:
+        data, errors = outcome.get("data") or {}, []
+
+    alias_errors: Dict[str, List[Dict[str, Any]]] = {}
+    batch_errors = []
+    for error in errors:
+        path = error.get("path") or []
+        if path:
+            alias_errors.setdefault(str(path[0]), []).append(error)
+        else:
+            batch_errors.append(error)
+
+    results: List[LookupResult] = []
+    for i in range(count):
+        alias = f"{prefix}{i}"
+        value = data.get(alias)
+        if alias in alias_errors:
+            error = GraphQLError(alias_errors[alias], {field: value})
+            results.append(None if error.is_not_found() else error)
+        elif value is None and batch_errors:
+            results.append(GraphQLError(batch_errors))
+        else:
+            results.append(value)
+    return results
+
+
+def fetch_repositories(
+    client: Any,
+    repositories: Sequence[Tuple[str, str]],
+    fragment: str,
+    max_nodes: int = DEFAULT_MAX_NODES,
+    max_cost: Optional[int] = None,
+) -> List[LookupResult]:
+    """
+    Look up many repositories with one round trip per batch.
+
+    Args:
+        client: GitHubGraphQLClient instance
+        repositories: (owner, name) pairs
+        fragment: Repository fragment selected for each lookup
+        max_nodes: Maximum number of lookups per request
+        max_cost: Maximum estimated cost per request (default: unlimited)
+
+    Returns:
+        One result per input pair, in input order
+    """
+    results: List[LookupResult] = []
+    for batch in plan_batches(len(repositories), max_nodes, max_cost, estimate_lookup_cost(fragment)):
+        pairs = [repositories[i] for i in batch]
+        try:
+            outcome: Union[Dict[str, Any], Exception] = client.execute_query(
+                *build_repository_batch(pairs, fragment)
+            )
+        except Exception as error:
+            outcome = error
+        results.extend(split_batch_result(len(pairs), outcome))
+    return results
+
+
+async def afetch_repositories(
+    client: Any,
+    repositories: Sequence[Tuple[str, str]],
+    fragment: str,
+    max_nodes: int = DEFAULT_MAX_NODES,
+    max_cost: Optional[int] = None,
+    concurrency: int = 10,
+) -> List[LookupResult]:
+    """
+    Look up many repositories with one round trip per batch, running batches concurrently.
+
+    Args:
+        client: AsyncGitHubGraphQLClient instance
+        repositories: (owner, name) pairs
+        fragment: Repository fragment selected for each lookup
+        max_nodes: Maximum number of lookups per request
+        max_cost: Maximum estimated cost per request (default: unlimited)
+        concurrency: Maximum number of batches in flight at once
+
+    Returns:
+        One result per input pair, in input order
+    """
+    batches = [
+        [repositories[i] for i in batch]
+        for batch in plan_batches(len(repositories), max_nodes, max_cost, estimate_lookup_cost(fragment))
+    ]
+    outcomes = await client.execute_many(
+        [build_repository_batch(pairs, fragment) for pairs in batches],
+        concurrency=concurrency,
+        return_exceptions=True,
+    )
+
+    results: List[LookupResult] = []
+    for pairs, outcome in zip(batches, outcomes):
+        results.extend(split_batch_result(len(pairs), outcome))
+    return results
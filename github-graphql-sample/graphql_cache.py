@@ -0,0 +1,270 @@
+"""
+Response cache for the GitHub GraphQL client.
+
+Responses are keyed by the normalized query text, the canonicalized
+variables and a hash of the token. Entries live in a bounded in-memory LRU
+with a per-entry TTL, optionally backed by an SQLite file that survives
+process restarts. Entries past their TTL can still be served for a
+stale-while-revalidate window, and their ETag allows conditional
+revalidation.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Entry states returned by ResponseCache.lookup
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+_STRING = re.compile(r'"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\\n]|\\.)*"')
+_COMMENT = re.compile(r"#[^\n]*")
+_SPACE_AROUND_PUNCTUATION = re.compile(r"\s*([{}()\[\]:,!=@$|&])\s*")
+_WHITESPACE = re.compile(r"[\s,]+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query so that formatting differences map to the same key.
+
+    Comments are dropped and whitespace (and commas, which GraphQL ignores)
+    is collapsed, while string literals are preserved verbatim.
+
+    Args:
+        query: GraphQL query string
+
+    Returns:
+        The normalized query
+    """
+    parts = []
+    position = 0
+    for match in _STRING.finditer(query):
+        parts.append(_normalize_code(query[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_normalize_code(query[position:]))
+    return "".join(parts).strip()
+
+
+def _normalize_code(text: str) -> str:
+    text = _COMMENT.sub(" ", text)
+    text = _WHITESPACE.sub(" ", text)
+    return _SPACE_AROUND_PUNCTUATION.sub(r"\1", text)
+
+
+def cache_key(query: str, variables: Optional[Dict[str, Any]], token: str) -> str:
+    """
+    Build the cache key of a request.
+
+    Args:
+        query: GraphQL query string
+        variables: Query variables
+        token: Token the request is sent with
+
+    Returns:
+        A hex SHA-256 digest
+    """
+    token_identity = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    material = json.dumps(
+        [normalize_query(query), variables or {}, token_identity],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    """A cached response."""
+
+    __slots__ = ("value", "etag", "stored_at", "expires_at")
+
+    def __init__(self, value: Dict[str, Any], etag: Optional[str], stored_at: float, expires_at: float) -> None:
+        self.value = value
+        self.etag = etag
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.revalidations = 0
+        self.not_modified = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return the counters as a dictionary."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+
+class ResponseCache:
+    """Bounded LRU response cache with TTL, stale-while-revalidate and an optional disk tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 300.0,
+        stale_ttl: float = 0.0,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl: Seconds an entry is served as fresh
+            stale_ttl: Seconds past the TTL an entry may still be served
+                while it is revalidated in the background
+            path: SQLite file for the on-disk tier (default: memory only)
+            clock: Time source, in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, etag TEXT, "
+                "stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE expires_at < ?",
+                (self.clock() - self.stale_ttl,),
+            )
+            self._db.commit()
+
+    def lookup(self, key: str) -> Tuple[Optional[CacheEntry], str]:
+        """
+        Look up an entry and classify it.
+
+        Expired entries are still returned so that their ETag can be used
+        for a conditional request.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The entry (or None) and its state: FRESH, STALE or EXPIRED
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = self._load(key)
+                if entry is not None:
+                    self.stats.disk_hits += 1
+                    self._remember(key, entry)
+
+            now = self.clock()
+            if entry is not None and now < entry.expires_at:
+                self.stats.hits += 1
+                return entry, FRESH
+            if entry is not None and now < entry.expires_at + self.stale_ttl:
+                self.stats.stale_hits += 1
+                return entry, STALE
+            self.stats.misses += 1
+            return entry, EXPIRED
+
+    def store(self, key: str, value: Dict[str, Any], etag: Optional[str] = None) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Cache key
+            value: Response to cache
+            etag: ETag of the response, if any
+        """
+        now = self.clock()
+        entry = CacheEntry(value, etag, now, now + self.ttl)
+        with self._lock:
+            self._remember(key, entry)
+            self._save(key, entry)
+
+    def refresh(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Restart the TTL of an entry confirmed unchanged by the server.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached response, or None if the entry is gone
+        """
+        with self._lock:
+            entry = self._entries.get(key) or self._load(key)
+            if entry is None:
+                return None
+            self.stats.not_modified += 1
+            now = self.clock()
+            entry = CacheEntry(entry.value, entry.etag, now, now + self.ttl)
+            self._remember(key, entry)
+            self._save(key, entry)
+            return entry.value
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, etag, stored_at, expires_at FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def _save(self, key: str, entry: CacheEntry) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, value, etag, stored_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(entry.value), entry.etag, entry.stored_at, entry.expires_at),
+        )
+        self._db.commit()
@@ -0,0 +1,383 @@
+"""
+In-process request coalescing above GitHubGraphQLClient.
+
+When many threads or tasks of one worker resolve the same objects, each
+would otherwise send its own request (the N+1 problem). A DataLoader sits
+between them and the client:
+
+* single flight: identical requests in flight at the same time, keyed by
+  query hash and variables, share one call to the client
+* micro-batching: `repository(owner, name)` and `user(login)` lookups
+  arriving within `window` seconds of the first one are sent as a single
+  aliased document (graphql_batch), up to `max_batch` lookups per document;
+  a lookup already pending or in flight is shared as well
+
+DataLoader serves threads using a GitHubGraphQLClient; AsyncDataLoader serves
+asyncio tasks using an AsyncGitHubGraphQLClient. Callers sharing a request
+receive the same result object and must not modify it. Results are not kept
+once delivered: caching is the job of the client's ResponseCache.
+"""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from graphql_batch import DEFAULT_MAX_NODES, LookupResult, build_repository_batch, build_user_batch, split_batch_result
+from graphql_persisted import query_hash
+from graphql_projection import REPOSITORY_PATHS, USER_PATHS, repository_fragment, user_fragment
+
+# Seconds a batch stays open for more lookups after the first one.
+DEFAULT_WINDOW = 0.005
+
+REPOSITORY = "repository"
+USER = "user"
+
+
+def request_key(query: str, variables: Optional[Dict[str, Any]]) -> str:
+    """Return the single-flight key of a request: its query hash and canonical variables."""
+    return query_hash(query) + ":" + json.dumps(variables or {}, sort_keys=True, separators=(",", ":"))
+
+
+def lookup_key(kind: str, args: Tuple[str, ...]) -> str:
+    """Return the single-flight key of a lookup; GitHub logins and names are case-insensitive."""
+    return kind + ":" + "/".join(arg.lower() for arg in args)
+
+
+class LoaderStats:
+    """Counters of coalesced requests and batch sizes."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self.requests = 0
+        self.batches = 0
+        self.batched_lookups = 0
+        self.max_batch_size = 0
+        # batch size -> number of batches
+        self.batch_sizes: Dict[int, int] = {}
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Share of calls served by a request already pending or in flight."""
+        return self.shared / self.calls if self.calls else 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        """Average number of lookups per batched request."""
+        return self.batched_lookups / self.batches if self.batches else 0.0
+
+    def add_batch(self, size: int) -> None:
+        """Count a batched request of `size` lookups."""
+        self.requests += 1
+        self.batches += 1
+        self.batched_lookups += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters, dedup ratio and mean batch size as a dictionary."""
+        values = dict(vars(self), dedup_ratio=round(self.dedup_ratio, 4), mean_batch_size=round(self.mean_batch_size, 2))
+        values["batch_sizes"] = dict(sorted(self.batch_sizes.items()))
+        return values
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+
+class _Batch:
+    """Lookups of one kind waiting to be sent together."""
+
+    __slots__ = ("keys", "args", "futures", "full", "handle")
+
+    def __init__(self) -> None:
+        self.keys: List[str] = []
+        self.args: List[Tuple[str, ...]] = []
+        self.futures: List[Any] = []
+        # Set when the batch reaches max_batch (threads)
+        self.full = threading.Event()
+        # Timer closing the batch (asyncio)
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class _LoaderBase:
+    """Batch building and result fan-out shared by both loaders."""
+
+    def __init__(self, window: float, max_batch: int, repository_fields: Optional[str], user_fields: Optional[str]) -> None:
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.fragments = {
+            REPOSITORY: repository_fields or repository_fragment(REPOSITORY_PATHS),
+            USER: user_fields or user_fragment(USER_PATHS),
+        }
+        self.stats = LoaderStats()
+        self._inflight: Dict[str, Any] = {}
+        self._open: Dict[str, _Batch] = {}
+
+    def _batch_request(self, kind: str, batch: _Batch) -> Tuple[str, Dict[str, Any]]:
+        if kind == REPOSITORY:
+            return build_repository_batch(batch.args, self.fragments[kind])
+        return build_user_batch([args[0] for args in batch.args], self.fragments[kind])
+
+    def _split(self, kind: str, batch: _Batch, outcome: Any) -> List[LookupResult]:
+        self.stats.add_batch(len(batch.keys))
+        if kind == REPOSITORY:
+            return split_batch_result(len(batch.keys), outcome)
+        return split_batch_result(len(batch.keys), outcome, prefix="u", field=USER)
+
+
+class DataLoader(_LoaderBase):
+    """Coalesces the requests of many threads sharing a GitHubGraphQLClient."""
+
+    def __init__(
+        self,
+        client: Any,
+        window: float = DEFAULT_WINDOW,
+        max_batch: int = DEFAULT_MAX_NODES,
+        repository_fields: Optional[str] = None,
+        user_fields: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the loader.
+
+        Args:
+            client: GitHubGraphQLClient sending the requests
+            window: Seconds a batch waits for more lookups after the first
+                one (0: send at once, only sharing identical lookups)
+            max_batch: Maximum number of lookups per batched request
+            repository_fields: Repository fragment of each lookup
+                (default: the fields of the `repo` command)
+            user_fields: User fragment of each lookup (default: the fields
+                of the `viewer` command)
+        """
+        super().__init__(window, max_batch, repository_fields, user_fields)
+        self.client = client
+        self._lock = threading.Lock()
+
+    def execute_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Execute a query, sharing the call with identical requests in flight.
+
+        Raises:
+            The exception of the shared call, in every caller
+        """
+        key = request_key(query, variables)
+        with self._lock:
+            self.stats.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats.shared += 1
+                leader = False
+            else:
+                future = self._inflight[key] = Future()
+                self.stats.requests += 1
+                leader = True
+
+        if leader:
+            try:
+                future.set_result(self.client.execute_query(query, variables))
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+        return future.result()
+
+    def load_repository(self, owner: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a repository, batched with the lookups of other threads.
+
+        Returns:
+            The repository, or None if it does not exist
+
+        Raises:
+            GraphQLError or requests.RequestException: If the lookup failed
+        """
+        return self._load(REPOSITORY, (owner, name))
+
+    def load_user(self, login: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a user, batched with the lookups of other threads.
+
+        Returns:
+            The user, or None if it does not exist
+
+        Raises:
+            GraphQLError or requests.RequestException: If the lookup failed
+        """
+        return self._load(USER, (login,))
+
+    def load_repositories(self, repositories: Sequence[Tuple[str, str]]) -> List[LookupResult]:
+        """Look up many repositories; failures are returned in place of their result."""
+        futures, opened = [], []
+        for owner, name in repositories:
+            future, batch = self._enqueue(REPOSITORY, (owner, name))
+            futures.append(future)
+            if batch is not None:
+                opened.append(batch)
+        # Lookups coming from one caller need no window
+        for batch in opened:
+            self._send(REPOSITORY, batch)
+        return [future.exception() or future.result() for future in futures]
+
+    def _load(self, kind: str, args: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        future, batch = self._enqueue(kind, args)
+        if batch is not None:
+            # This caller opened the batch: wait for the window, then send it
+            batch.full.wait(self.window)
+            self._send(kind, batch)
+        return future.result()
+
+    def _enqueue(self, kind: str, args: Tuple[str, ...]) -> Tuple[Future, Optional[_Batch]]:
+        """Add a lookup to the open batch; return its future, and the batch if this call opened it."""
+        key = lookup_key(kind, args)
+        with self._lock:
+            self.stats.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats.shared += 1
+                return future, None
+            future = self._inflight[key] = Future()
+            batch = self._open.get(kind)
+            opened = batch is None
+            if opened:
+                batch = self._open[kind] = _Batch()
+            batch.keys.append(key)
+            batch.args.append(args)
+            batch.futures.append(future)
+            if len(batch.keys) >= self.max_batch:
+                # Closed: the next lookup opens a new batch
+                del self._open[kind]
+                batch.full.set()
+        return future, batch if opened else None
+
+    def _send(self, kind: str, batch: _Batch) -> None:
+        """Close a batch, send it and resolve its lookups; only the caller that opened it does this."""
+        with self._lock:
+            if self._open.get(kind) is batch:
+                del self._open[kind]
+
+        query, variables = self._batch_request(kind, batch)
+        try:
+            outcome: Any = self.client.execute_query(query, variables)
+        except Exception as error:
+            outcome = error
+        with self._lock:
+            results = self._split(kind, batch, outcome)
+            for key in batch.keys:
+                del self._inflight[key]
+        for future, result in zip(batch.futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class AsyncDataLoader(_LoaderBase):
+    """Coalesces the requests of many asyncio tasks sharing an AsyncGitHubGraphQLClient."""
+
+    def __init__(
+        self,
+        client: Any,
+        window: float = DEFAULT_WINDOW,
+        max_batch: int = DEFAULT_MAX_NODES,
+        repository_fields: Optional[str] = None,
+        user_fields: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the loader.
+
+        Args:
+            client: AsyncGitHubGraphQLClient sending the requests
+            window: Seconds a batch waits for more lookups after the first one
+            max_batch: Maximum number of lookups per batched request
+            repository_fields: Repository fragment of each lookup
+            user_fields: User fragment of each lookup
+        """
+        super().__init__(window, max_batch, repository_fields, user_fields)
+        self.client = client
+        self._tasks: set = set()
+
+    async def execute_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a query, sharing the call with identical requests in flight."""
+        key = request_key(query, variables)
+        self.stats.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.shared += 1
+            # A cancelled caller must not cancel the call it shares
+            return await asyncio.shield(future)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        self.stats.requests += 1
+        try:
+            future.set_result(await self.client.execute_query(query, variables))
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                future.cancel()
+        return future.result()
+
+    async def load_repository(self, owner: str, name: str) -> Optional[Dict[str, Any]]:
+        """Look up a repository, batched with the lookups of other tasks."""
+        return await asyncio.shield(self._enqueue(REPOSITORY, (owner, name)))
+
+    async def load_user(self, login: str) -> Optional[Dict[str, Any]]:
+        """Look up a user, batched with the lookups of other tasks."""
+        return await asyncio.shield(self._enqueue(USER, (login,)))
+
+    async def close(self) -> None:
+        """Send the open batches and wait for every batch in flight."""
+        for kind in list(self._open):
+            self._flush(kind, self._open[kind])
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _enqueue(self, kind: str, args: Tuple[str, ...]) -> "asyncio.Future":
+        key = lookup_key(kind, args)
+        self.stats.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.shared += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        batch = self._open.get(kind)
+        if batch is None:
+            batch = self._open[kind] = _Batch()
+            batch.handle = loop.call_later(self.window, self._flush, kind, batch)
+        batch.keys.append(key)
+        batch.args.append(args)
+        batch.futures.append(future)
+        if len(batch.keys) >= self.max_batch:
+            self._flush(kind, batch)
+        return future
+
+    def _flush(self, kind: str, batch: _Batch) -> None:
+        if self._open.get(kind) is not batch:
+            return
+        del self._open[kind]
+        batch.handle.cancel()
+        task = asyncio.ensure_future(self._dispatch(kind, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, kind: str, batch: _Batch) -> None:
+        query, variables = self._batch_request(kind, batch)
+        try:
+            outcome: Any = await self.client.execute_query(query, variables)
+        except Exception as error:
+            outcome = error
+        results = self._split(kind, batch, outcome)
+        for key, future, result in zip(batch.keys, batch.futures, results):
+            del self._inflight[key]
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,34 @@
+"""
+Exceptions raised by the GitHub GraphQL client.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class GraphQLError(Exception):
+    """A GraphQL response carried an `errors` array."""
+
+    def __init__(self, errors: List[Dict[str, Any]], data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Initialize the error.
+
+        Args:
+            errors: The `errors` array of the response
+            data: The (possibly partial) `data` of the response
+        """
+        super().__init__(f"GraphQL errors: {json.dumps(errors, indent=2)}")
+        self.errors = errors
+        self.data = data
+
+    @property
+    def codes(self) -> List[str]:
+        """Error codes from each error's `type` or `extensions.code`."""
+        return [
+            error.get("type") or (error.get("extensions") or {}).get("code") or ""
+            for error in self.errors
+        ]
+
+    def is_not_found(self) -> bool:
+        """True when every error reports a missing object."""
+        return bool(self.errors) and all(code == "NOT_FOUND" for code in self.codes)
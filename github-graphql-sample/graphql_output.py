@@ -0,0 +1,191 @@
+"""
+Machine-readable output for the GitHub GraphQL client.
+
+`--format` selects how records (the viewer, repository nodes, repository
+details) are written to standard output:
+
+* table: the human-readable report (the default, not handled here)
+* ndjson: one JSON object per line
+* json: a JSON array
+* csv: a header row of field paths, then one row per record
+
+Records are written one at a time as pages arrive. Encoded records are
+collected and written to the binary stream in blocks of about `buffer_size`
+bytes, instead of one print per line, and JSON is encoded with orjson
+when it is installed.
+"""
+
+import csv
+import json
+import os
+import sys
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+TABLE = "table"
+FORMATS = (TABLE, "json", "ndjson", "csv")
+
+# Bytes collected before a write to the stream
+BUFFER_SIZE = 64 * 1024
+
+# Separator of list values (e.g. `languages.name`) in a CSV cell
+LIST_SEPARATOR = ";"
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encoder.encode(value).encode("utf-8")
+
+
+def discard_stdout() -> None:
+    """
+    Point standard output at the null device once its reader went away (e.g.
+    `| head`), so the output still buffered is dropped instead of raising
+    BrokenPipeError again when the interpreter flushes it at exit.
+    """
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+class RecordWriter:
+    """Base class of the writers: buffers encoded records and writes them in blocks."""
+
+    def __init__(self, stream: Optional[BinaryIO] = None, buffer_size: int = BUFFER_SIZE) -> None:
+        """
+        Initialize the writer.
+
+        Args:
+            stream: Binary stream to write to (default: the standard output)
+            buffer_size: Bytes collected before they are written to the stream
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write one record."""
+        raise NotImplementedError
+
+    def _append(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records to the stream."""
+        if self._chunks:
+            self.stream.write(b"".join(self._chunks))
+            self._chunks.clear()
+            self._size = 0
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Finish the output and flush it; the stream is left open. Closing again does nothing."""
+        if not self.closed:
+            self.closed = True
+            self.flush()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class NdjsonWriter(RecordWriter):
+    """Writes one JSON object per line."""
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.count += 1
+        self._append(dumps(record) + b"\n")
+
+
+class JsonWriter(RecordWriter):
+    """Writes a JSON array, one element per line."""
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._append((b",\n" if self.count else b"[\n") + dumps(record))
+        self.count += 1
+
+    def close(self) -> None:
+        if not self.closed:
+            self._append(b"\n]\n" if self.count else b"[]\n")
+        super().close()
+
+
+class CsvWriter(RecordWriter):
+    """Writes a header row of columns, then one row per record."""
+
+    def __init__(self, columns: Sequence[str], stream: Optional[BinaryIO] = None, buffer_size: int = BUFFER_SIZE) -> None:
+        """
+        Initialize the writer and write the header row.
+
+        Args:
+            columns: Keys of the records, in column order
+            stream: Binary stream to write to (default: the standard output)
+            buffer_size: Bytes collected before they are written to the stream
+        """
+        super().__init__(stream, buffer_size)
+        self.columns = tuple(columns)
+        self._rows = csv.writer(_TextSink(self._append), lineterminator="\n")
+        self._rows.writerow(self.columns)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.count += 1
+        self._rows.writerow([_cell(record.get(column)) for column in self.columns])
+
+
+class _TextSink:
+    """File-like target of csv.writer, encoding each row into a writer's buffer."""
+
+    __slots__ = ("_append",)
+
+    def __init__(self, append: Callable[[bytes], None]) -> None:
+        self._append = append
+
+    def write(self, text: str) -> None:
+        self._append(text.encode("utf-8"))
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join("" if item is None else str(item) for item in value)
+    if isinstance(value, dict):
+        return _encoder.encode(value)
+    return value
+
+
+def open_writer(output_format: str, columns: Sequence[str], stream: Optional[BinaryIO] = None) -> RecordWriter:
+    """
+    Create the writer of a format.
+
+    Args:
+        output_format: "json", "ndjson" or "csv"
+        columns: Keys of the records (the CSV columns)
+        stream: Binary stream to write to (default: the standard output)
+
+    Raises:
+        ValueError: If the format has no writer (e.g. "table")
+    """
+    if output_format == "ndjson":
+        return NdjsonWriter(stream)
+    if output_format == "json":
+        return JsonWriter(stream)
+    if output_format == "csv":
+        return CsvWriter(columns, stream)
+    raise ValueError(f"No record writer for format '{output_format}'; choose one of {', '.join(FORMATS[1:])}")
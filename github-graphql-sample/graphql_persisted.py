@@ -0,0 +1,88 @@
+"""
+Automatic persisted queries (APQ).
+
+With APQ the client sends only the SHA-256 hash of a query, plus its
+variables. When the server does not know the hash yet it answers
+"PersistedQueryNotFound" and the client retries once with the full text,
+which the server then registers under that hash.
+"""
+
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+APQ_VERSION = 1
+NOT_FOUND = "PERSISTED_QUERY_NOT_FOUND"
+NOT_SUPPORTED = "PERSISTED_QUERY_NOT_SUPPORTED"
+
+
+@lru_cache(maxsize=256)
+def query_hash(query: str) -> str:
+    """Return the hex SHA-256 of a query, as used by APQ."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def persisted_query_extension(digest: str) -> Dict[str, Any]:
+    """Return the `extensions` entry announcing a persisted query hash."""
+    return {"persistedQuery": {"version": APQ_VERSION, "sha256Hash": digest}}
+
+
+def _has_error(errors: List[Dict[str, Any]], code: str, message: str) -> bool:
+    return any(
+        (error.get("extensions") or {}).get("code") == code or error.get("message") == message
+        for error in errors
+    )
+
+
+def is_not_found(errors: List[Dict[str, Any]]) -> bool:
+    """True when the server does not know the hash yet."""
+    return _has_error(errors, NOT_FOUND, "PersistedQueryNotFound")
+
+
+def is_not_supported(errors: List[Dict[str, Any]]) -> bool:
+    """True when the server does not implement APQ."""
+    return _has_error(errors, NOT_SUPPORTED, "PersistedQueryNotSupported")
+
+
+class PersistedQueryRegistry:
+    """Server-side registry of persisted queries, used by the stand-in server."""
+
+    def __init__(self) -> None:
+        self._queries: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Resolve the query text of an APQ request.
+
+        Fills in `payload["query"]` from the registry, or registers the
+        query when the request carries both the text and its hash.
+
+        Args:
+            payload: Decoded request payload, updated in place
+
+        Returns:
+            None on success, or an error response body
+        """
+        digest = ((payload.get("extensions") or {}).get("persistedQuery") or {}).get("sha256Hash")
+        if not digest:
+            return None
+
+        query = payload.get("query")
+        if query:
+            if query_hash(query) != digest:
+                return {"errors": [{"message": "provided sha does not match query"}]}
+            with self._lock:
+                self._queries[digest] = query
+            return None
+
+        with self._lock:
+            query = self._queries.get(digest)
+        if query is None:
+            return {"errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": NOT_FOUND}}]}
+        payload["query"] = query
+        return None
+
+    def __len__(self) -> int:
+        return len(self._queries)
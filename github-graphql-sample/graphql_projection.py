@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Projection-driven query builder.
+
+Callers name the fields they consume as dotted paths, e.g.
+`name,stargazerCount,languages.name`, and the builder produces the minimal
+selection set for them:
+
+* paths are checked against a typed catalog of the GitHub types the client
+  queries (TYPES), so a typo fails before any request
+* a connection field is walked through its `nodes`: `languages.name`
+  becomes `languages(first: 5) { nodes { name } }`
+* a path stopping at an object field selects that field's default
+  sub-fields: `watchers` becomes `watchers { totalCount }`
+
+Documents are generated once per projection (lru_cache). `render_policy`
+writes the query of an APIM REST-to-GraphQL `set-body` policy from a
+projection, so the facade only fetches what it returns.
+"""
+
+import argparse
+import re
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+INDENT = "    "
+
+
+class FieldSpec(NamedTuple):
+    """Type information about a field of the catalog."""
+
+    # Object type of the field (None for scalars)
+    type: Optional[str] = None
+    # Arguments, e.g. "(first: 5)"
+    arguments: str = ""
+    # Paths continue below `nodes`
+    connection: bool = False
+    # Sub-fields selected when a path stops at this field
+    default: Tuple[str, ...] = ()
+
+
+SCALAR = FieldSpec()
+COUNT = FieldSpec("Count", default=("totalCount",))
+
+TYPES: Dict[str, Dict[str, FieldSpec]] = {
+    "Repository": {
+        "name": SCALAR,
+        "nameWithOwner": SCALAR,
+        "description": SCALAR,
+        "url": SCALAR,
+        "homepageUrl": SCALAR,
+        "isPrivate": SCALAR,
+        "isFork": SCALAR,
+        "isArchived": SCALAR,
+        "stargazerCount": SCALAR,
+        "forkCount": SCALAR,
+        "diskUsage": SCALAR,
+        "createdAt": SCALAR,
+        "updatedAt": SCALAR,
+        "pushedAt": SCALAR,
+        "watchers": COUNT,
+        "issues": COUNT,
+        "pullRequests": COUNT,
+        "owner": FieldSpec("RepositoryOwner", default=("login",)),
+        "primaryLanguage": FieldSpec("Language", default=("name",)),
+        "languages": FieldSpec("Language", "(first: 5)", connection=True, default=("name",)),
+        "defaultBranchRef": FieldSpec("Ref", default=("name",)),
+        "licenseInfo": FieldSpec("License", default=("spdxId",)),
+    },
+    "User": {
+        "login": SCALAR,
+        "name": SCALAR,
+        "email": SCALAR,
+        "bio": SCALAR,
+        "company": SCALAR,
+        "location": SCALAR,
+        "createdAt": SCALAR,
+        "followers": COUNT,
+        "following": COUNT,
+        "repositories": COUNT,
+    },
+    "RepositoryOwner": {"login": SCALAR, "url": SCALAR},
+    "Language": {"name": SCALAR, "color": SCALAR},
+    "Ref": {"name": SCALAR, "prefix": SCALAR},
+    "License": {"name": SCALAR, "spdxId": SCALAR},
+    "Count": {"totalCount": SCALAR},
+}
+
+# Fields of the standard `repo` and `viewer` output of github_graphql_client.py
+REPOSITORY_PATHS = (
+    "name", "description", "url", "isPrivate", "stargazerCount", "forkCount", "watchers", "issues",
+    "pullRequests", "primaryLanguage", "languages", "createdAt", "updatedAt", "defaultBranchRef",
+)
+USER_PATHS = ("login", "name", "email", "bio", "company", "location", "createdAt", "followers", "following", "repositories")
+
+_VERBATIM_QUERY = re.compile(r'(var query = @")(.*?)(";)', re.DOTALL)
+
+
+def parse_fields(paths: Iterable[str]) -> Tuple[str, ...]:
+    """Split comma-separated paths, dropping blanks and duplicates but keeping their order."""
+    result: List[str] = []
+    for item in paths:
+        for path in item.split(","):
+            path = path.strip()
+            if path and path not in result:
+                result.append(path)
+    return tuple(result)
+
+
+class Projection:
+    """A set of field paths on a type of the catalog, as a selection tree."""
+
+    def __init__(self, type_name: str, paths: Iterable[str]) -> None:
+        """
+        Build the selection tree of the paths.
+
+        Args:
+            type_name: Type of the catalog the paths start from
+            paths: Dotted field paths (comma-separated lists are accepted)
+
+        Raises:
+            ValueError: If a path names a field the type does not have
+        """
+        self.type_name = type_name
+        self.paths = parse_fields(paths)
+        if not self.paths:
+            raise ValueError("A projection needs at least one field")
+        self.tree: Dict[str, Any] = {}
+        for path in self.paths:
+            self._add(self.tree, type_name, path.split("."), path)
+
+    def _add(self, tree: Dict[str, Any], type_name: str, names: List[str], path: str) -> None:
+        fields = TYPES[type_name]
+        spec = fields.get(names[0])
+        if spec is None:
+            raise ValueError(f"Unknown field '{names[0]}' in '{path}'; {type_name} fields: {', '.join(fields)}")
+        if spec.type is None:
+            if len(names) > 1:
+                raise ValueError(f"'{names[0]}' in '{path}' is a scalar and has no sub-fields")
+            tree[names[0]] = None
+            return
+        subtree = tree.get(names[0]) or {}
+        tree[names[0]] = subtree
+        if len(names) > 1:
+            self._add(subtree, spec.type, names[1:], path)
+            return
+        for name in spec.default:
+            self._add(subtree, spec.type, [name], path)
+
+    def selection(self, depth: int = 1) -> str:
+        """Selection set of the projection (without braces), indented for `depth`."""
+        return _render(self.tree, self.type_name, depth)
+
+    def extract(self, record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Flatten a response object into {path: value}, in projection order.
+
+        Connection paths give the list of node values, e.g. `languages.name`
+        gives ["Python", "Shell"]; paths stopping at an object field give its
+        default sub-field, e.g. `watchers` gives the total count.
+        """
+        values: Dict[str, Any] = {}
+        for path in self.paths:
+            values[path] = _extract(record, self.type_name, path.split("."))
+        return values
+
+
+def _render(tree: Dict[str, Any], type_name: str, depth: int) -> str:
+    lines = []
+    pad = INDENT * depth
+    for name, subtree in tree.items():
+        spec = TYPES[type_name][name]
+        if subtree is None:
+            lines.append(pad + name)
+            continue
+        inner = _render(subtree, spec.type, depth + (2 if spec.connection else 1))
+        if spec.connection:
+            inner = f"{pad}{INDENT}nodes {{\n{inner}\n{pad}{INDENT}}}"
+        lines.append(f"{pad}{name}{spec.arguments} {{\n{inner}\n{pad}}}")
+    return "\n".join(lines)
+
+
+def _extract(value: Any, type_name: str, names: List[str]) -> Any:
+    if value is None:
+        return None
+    spec = TYPES[type_name][names[0]]
+    value = value.get(names[0])
+    if spec.type is None or value is None:
+        return value
+    rest = names[1:] or list(spec.default[:1])
+    if spec.connection:
+        return [_extract(node, spec.type, rest) for node in value.get("nodes") or []]
+    return _extract(value, spec.type, rest)
+
+
+@lru_cache(maxsize=64)
+def projection(type_name: str, paths: Tuple[str, ...]) -> Projection:
+    """Return the (cached) projection of paths on a type."""
+    return Projection(type_name, paths)
+
+
+@lru_cache(maxsize=64)
+def viewer_query(paths: Tuple[str, ...]) -> str:
+    """Query of the authenticated user selecting the paths of a User."""
+    return f"\nquery {{\n    viewer {{\n{projection('User', paths).selection(depth=2)}\n    }}\n}}\n"
+
+
+@lru_cache(maxsize=64)
+def repository_fragment(paths: Tuple[str, ...]) -> str:
+    """`RepositoryFields` fragment selecting the paths of a Repository."""
+    selection = projection("Repository", paths).selection()
+    return f"\nfragment RepositoryFields on Repository {{\n{selection}\n}}\n"
+
+
+@lru_cache(maxsize=64)
+def user_fragment(paths: Tuple[str, ...]) -> str:
+    """`UserFields` fragment selecting the paths of a User."""
+    selection = projection("User", paths).selection()
+    return f"\nfragment UserFields on User {{\n{selection}\n}}\n"
+
+
+@lru_cache(maxsize=64)
+def repository_query(paths: Tuple[str, ...]) -> str:
+    """Query of one repository (variables: owner, name) selecting the paths."""
+    return """
+query($owner: String!, $name: String!) {
+    repository(owner: $owner, name: $name) {
+        ...RepositoryFields
+    }
+}
+""" + repository_fragment(paths)
+
+
+@lru_cache(maxsize=64)
+def user_repositories_query(paths: Tuple[str, ...], root: str = "repositoryOwner", cursor: bool = True) -> str:
+    """
+    Query of a page of a user's repositories (variables: username, limit, cursor).
+
+    Args:
+        paths: Repository paths to select
+        root: Root field looking up the owner (`repositoryOwner`, or `user`)
+        cursor: Take an `$cursor` variable and select `pageInfo` for pagination
+    """
+    selection = projection("Repository", paths).selection(depth=4)
+    after = ", after: $cursor" if cursor else ""
+    page_info = """
+            pageInfo {
+                endCursor
+                hasNextPage
+            }""" if cursor else ""
+    return f"""
+query($username: String!, $limit: Int!{", $cursor: String" if cursor else ""}) {{
+    {root}(login: $username) {{
+        login
+        repositories(first: $limit{after}, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+            nodes {{
+{selection}
+            }}{page_info}
+        }}
+    }}
+}}
+"""
+
+
+def render_policy(policy: str, query: str) -> str:
+    """
+    Replace the query of a REST-to-GraphQL policy.
+
+    The query is the C# verbatim string assigned by `var query = @"...";`
+    in the inbound `set-body`.
+
+    Raises:
+        ValueError: If the policy has no such assignment
+    """
+    if not _VERBATIM_QUERY.search(policy):
+        raise ValueError('No `var query = @"...";` in the policy')
+    lines = query.strip().replace('"', '""').split("\n")
+    literal = "\n".join([lines[0]] + ["            " + line for line in lines[1:]])
+    return _VERBATIM_QUERY.sub(lambda match: match.group(1) + literal + match.group(3), policy, count=1)
+
+
+def policy_query(policy: str) -> str:
+    """
+    Return the query of a REST-to-GraphQL policy, as the policy sends it.
+
+    Raises:
+        ValueError: If the policy has no `var query = @"...";` assignment
+    """
+    match = _VERBATIM_QUERY.search(policy)
+    if not match:
+        raise ValueError('No `var query = @"...";` in the policy')
+    return match.group(2).replace('""', '"')
+
+
+def main():
+    """Print the query of a projection, or write it into a policy."""
+    parser = argparse.ArgumentParser(description="Build the minimal query for a set of repository fields")
+    parser.add_argument("--fields", required=True, help="Comma-separated field paths, e.g. name,stargazerCount,languages.name")
+    parser.add_argument("--query", choices=("repo", "repos"), default="repo", help="Query to build (default: repo)")
+    parser.add_argument("--policy", help="REST-to-GraphQL policy file whose set-body query is rewritten (implies --query repos)")
+    args = parser.parse_args()
+
+    paths = parse_fields([args.fields])
+    try:
+        if args.policy:
+            query = user_repositories_query(paths, root="user", cursor=False)
+            with open(args.policy, encoding="utf-8") as f:
+                policy = f.read()
+            with open(args.policy, "w", encoding="utf-8") as f:
+                f.write(render_policy(policy, query))
+            print(f"Updated {args.policy}")
+            return
+        print(repository_query(paths) if args.query == "repo" else user_repositories_query(paths))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Rate-limit-aware request scheduling.
+
+The scheduler paces requests with a token bucket whose budget and refill
+rate follow what the server reports: the X-RateLimit-* and Retry-After
+headers forwarded by APIM, the RATE_LIMITED `retryAfter` extension written
+by the on-error policy, and GitHub's `rateLimit { cost remaining resetAt }`
+data. Concurrency is adjusted additively on success and halved when a limit
+is hit, and every delay is recorded with the reason for it.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Mapping, Optional, Tuple
+
+# Delay reasons
+CONCURRENCY = "concurrency"
+BUDGET = "budget"
+RETRY_AFTER = "retry_after"
+
+RATE_LIMIT_CODES = ("RATE_LIMITED",)
+
+# Reset times are reported with one-second resolution; wait this long past
+# them before assuming the window rolled over.
+RESET_GRACE = 1.0
+
+
+class DelayRecord:
+    """A request held back by the scheduler."""
+
+    __slots__ = ("reason", "seconds", "timestamp")
+
+    def __init__(self, reason: str, seconds: float, timestamp: float) -> None:
+        self.reason = reason
+        self.seconds = seconds
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return f"DelayRecord(reason={self.reason!r}, seconds={self.seconds:.3f})"
+
+
+def _parse_reset(value: Any) -> Optional[float]:
+    """Parse an epoch-seconds or ISO-8601 reset time into epoch seconds."""
+    if value in (None, "", "Unknown"):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_float(value: Any) -> Optional[float]:
+    if value in (None, "", "Unknown"):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """Token-bucket pacing and adaptive concurrency driven by rate-limit signals."""
+
+    def __init__(
+        self,
+        budget: float = 5000,
+        window: float = 3600.0,
+        burst: float = 100,
+        reserve: float = 0,
+        max_concurrency: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+        sleep: Optional[Callable[[float], None]] = None,
+        history: int = 1000,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            budget: Points available per window before the server reports any
+            window: Length of the rate-limit window, in seconds
+            burst: Maximum number of points spent back-to-back
+            reserve: Points never spent, left for other clients of the same token
+            max_concurrency: Upper bound for the adaptive concurrency limit
+            clock: Monotonic time source, in seconds
+            wall_clock: Wall-clock time source, in epoch seconds
+            sleep: Function used to wait for the budget or a pause (default:
+                wait on the scheduler, woken early by `observe` and `release`)
+            history: Number of delay records kept
+        """
+        self.budget = budget
+        self.window = window
+        self.burst = burst
+        self.reserve = reserve
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = max_concurrency
+        self.in_flight = 0
+        self.in_flight_cost = 0.0
+        self.remaining: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.delays: Deque[DelayRecord] = deque(maxlen=history)
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.sleep = sleep
+
+        self._capacity = min(burst, budget)
+        self._tokens = self._capacity
+        self._rate = budget / window
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._successes = 0
+        self._costs: Dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def expected_cost(self, query_key: str) -> float:
+        """Return the last observed cost of a query, or 1 if unknown."""
+        return self._costs.get(query_key, 1.0)
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """
+        Wait until a request of the given cost may be sent.
+
+        Args:
+            cost: Expected rate-limit cost of the request
+
+        Returns:
+            Seconds spent waiting
+        """
+        cost = min(cost, self._capacity) if self._capacity > 0 else cost
+        started = self.clock()
+        waited: Dict[str, float] = {}
+        with self._cond:
+            while True:
+                now = self.clock()
+                self._refill(now)
+                if self._paused_until > now:
+                    reason, timeout = RETRY_AFTER, self._paused_until - now
+                elif self.in_flight >= self.concurrency_limit:
+                    reason, timeout = CONCURRENCY, None
+                elif self._tokens < cost:
+                    reason = BUDGET
+                    timeout = (cost - self._tokens) / self._rate if self._rate > 0 else self._until_reset(now)
+                else:
+                    self._tokens -= cost
+                    self.in_flight += 1
+                    self.in_flight_cost += cost
+                    break
+                self._wait(timeout)
+                waited[reason] = waited.get(reason, 0.0) + self.clock() - now
+
+        for reason, seconds in waited.items():
+            self.delays.append(DelayRecord(reason, seconds, self.wall_clock()))
+        return self.clock() - started
+
+    def release(self, cost: float = 1.0) -> None:
+        """
+        Mark a request acquired with `acquire` as finished.
+
+        Args:
+            cost: Cost passed to `acquire`
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self.in_flight_cost = max(0.0, self.in_flight_cost - cost)
+            self._cond.notify_all()
+
+    def observe(
+        self,
+        status_code: int,
+        headers: Mapping[str, str],
+        body: Optional[Dict[str, Any]] = None,
+        query_key: Optional[str] = None,
+    ) -> None:
+        """
+        Update the budget from a response.
+
+        Args:
+            status_code: HTTP status of the response
+            headers: Response headers
+            body: Decoded GraphQL response, if any
+            query_key: Key of the query, used to learn its cost
+        """
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        reset_at = _parse_reset(headers.get("X-RateLimit-Reset"))
+        retry_after = _parse_float(headers.get("Retry-After"))
+        limited = status_code == 429
+
+        body = body or {}
+        rate_limit = (body.get("data") or {}).get("rateLimit") or {}
+        if rate_limit:
+            remaining = _parse_float(rate_limit.get("remaining"))
+            reset_at = _parse_reset(rate_limit.get("resetAt")) or reset_at
+            cost = _parse_float(rate_limit.get("cost"))
+            if cost is not None and query_key:
+                self._costs[query_key] = max(cost, 1.0)
+        for error in body.get("errors") or []:
+            extensions = error.get("extensions") or {}
+            if extensions.get("code") in RATE_LIMIT_CODES or error.get("type") in RATE_LIMIT_CODES:
+                limited = True
+                retry_after = _parse_float(extensions.get("retryAfter")) or retry_after
+            elif extensions.get("code") == "FORBIDDEN" and extensions.get("rateLimitRemaining") == "0":
+                limited = True
+        if status_code == 403 and retry_after is not None:
+            limited = True  # GitHub secondary rate limit
+
+        with self._cond:
+            now = self.clock()
+            self._refill(now)
+            if remaining is not None and (self.remaining is None or reset_at != self.reset_at or remaining <= self.remaining):
+                self.remaining = remaining
+                if reset_at is not None:
+                    self.reset_at = reset_at
+                self._apply_server_budget(now)
+
+            if limited:
+                self.concurrency_limit = max(1, self.concurrency_limit // 2)
+                self._successes = 0
+                if retry_after is None and self.reset_at is not None:
+                    retry_after = max(0.0, self.reset_at - self.wall_clock())
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            elif 200 <= status_code < 300:
+                self._successes += 1
+                if self._successes >= self.concurrency_limit and self.concurrency_limit < self.max_concurrency:
+                    self.concurrency_limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def delay_summary(self) -> Dict[str, Tuple[int, float]]:
+        """Return (count, total seconds) of recorded delays for each reason."""
+        summary: Dict[str, Tuple[int, float]] = {}
+        for record in self.delays:
+            count, total = summary.get(record.reason, (0, 0.0))
+            summary[record.reason] = (count + 1, total + record.seconds)
+        return summary
+
+    def _wait(self, timeout: Optional[float]) -> None:
+        """Wait with the condition held; a concurrency wait (no timeout) always waits for `release`."""
+        if timeout is None or self.sleep is None:
+            self._cond.wait(timeout)
+            return
+        self._cond.release()
+        try:
+            self.sleep(timeout)
+        finally:
+            self._cond.acquire()
+
+    def _refill(self, now: float) -> None:
+        if self.reset_at is not None and self.wall_clock() >= self.reset_at + RESET_GRACE:
+            # The server window rolled over: send a single probe request and
+            # let its response report the new budget.
+            self.remaining = None
+            self.reset_at = None
+            self._capacity = min(self.burst, self.budget)
+            self._rate = self.budget / self.window
+            self._tokens = min(1.0, self._capacity)
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _apply_server_budget(self, now: float) -> None:
+        # Requests still in flight have been paid for locally but are not yet
+        # reflected in the remaining budget reported by the server.
+        available = max(0.0, self.remaining - self.reserve - self.in_flight_cost)
+        self._capacity = min(self.burst, available)
+        self._tokens = min(self._tokens, self._capacity)
+        seconds_left = self._until_reset(now)
+        self._rate = max(0.0, available - self._capacity) / seconds_left if seconds_left > 0 else self._rate
+
+    def _until_reset(self, now: float) -> float:
+        if self.reset_at is None:
+            return self.window
+        return max(0.0, self.reset_at + RESET_GRACE - self.wall_clock())
@@ -0,0 +1,310 @@
+"""
+Retries and hedged requests for the GitHub GraphQL client.
+
+Transient failures (5xx, 429 and the INTERNAL_ERROR / RATE_LIMITED errors
+written by the APIM on-error policy) are retried with exponential backoff and
+full jitter, honoring Retry-After and the `retryAfter` extension. Idempotent
+queries can be hedged: when the first attempt is slower than a latency
+percentile learned from per-endpoint histograms, a second copy is sent and
+whichever answer arrives first wins. Mutations are never retried or hedged.
+"""
+
+import bisect
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_CODES = ("RATE_LIMITED", "INTERNAL_ERROR")
+
+# Block strings, strings and comments, skipped when classifying operations
+_IGNORED = re.compile(r'"""(?:\\.|[^"]|"(?!""))*"""|"(?:\\.|[^"\\\n])*"|#[^\n]*')
+_TOKEN = re.compile(r"[{}()]|\$?\w+")
+
+# Histogram bucket upper bounds, in seconds: 0.5 ms to about 2 minutes, 20% apart.
+BUCKET_BOUNDS = [0.0005 * 1.2 ** i for i in range(70)]
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record one latency, in seconds."""
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Return the upper bound of the bucket holding a percentile.
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None when nothing was recorded
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = max(1, int(round(self.count * percentile / 100.0)))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+            return BUCKET_BOUNDS[-1]
+
+
+def is_idempotent(query: str) -> bool:
+    """
+    True for documents of queries only, false when any operation is a mutation or subscription.
+
+    Comments, strings and the bodies of definitions are skipped, so a
+    mutation after a comment or after a fragment definition is found. The
+    response cache and the retry and hedging paths all classify requests
+    with this function.
+    """
+    depth, definition_start = 0, True
+    for token in _TOKEN.findall(_IGNORED.sub(" ", query)):
+        if token in ("{", "("):
+            depth += 1
+            definition_start = False
+        elif token in ("}", ")"):
+            depth -= 1
+            definition_start = depth == 0 and token == "}"
+        elif depth == 0:
+            if definition_start and token in ("mutation", "subscription"):
+                return False
+            definition_start = False
+    return True
+
+
+def _parse_seconds(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient failures."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.2,
+        max_delay: float = 10.0,
+        max_retry_after: float = 60.0,
+        rng: Callable[[], float] = random.random,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Maximum number of attempts, including the first one
+            base_delay: Backoff before the first retry, before jitter
+            max_delay: Upper bound of the backoff, before jitter
+            max_retry_after: Give up instead of waiting when the server asks
+                for a longer pause, in seconds
+            rng: Random source returning floats in [0, 1)
+            sleep: Function used to wait
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.rng = rng
+        self.sleep = sleep
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Return the delay before the next attempt.
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+            retry_after: Pause requested by the server, in seconds
+
+        Returns:
+            Seconds to wait: full jitter over the exponential backoff, but
+            never less than the server's Retry-After
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = self.rng() * ceiling
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def retry_delay(
+        self,
+        attempt: int,
+        response: Optional[requests.Response],
+        error: Optional[BaseException],
+        idempotent: bool,
+        body: Optional[Any] = None,
+    ) -> Optional[float]:
+        """
+        Decide whether to retry a failed attempt.
+
+        Args:
+            attempt: Number of attempts made so far
+            response: Response of the attempt, if any
+            error: Exception raised by the attempt, if any
+            idempotent: Whether the request may safely be repeated; requests
+                that may not (mutations) are never retried
+            body: Decoded body of the response, when the caller already
+                parsed it (default: decoded here when needed)
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if attempt >= self.max_attempts or not idempotent:
+            return None
+
+        if error is not None:
+            if not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+                return None
+            return self.backoff(attempt)
+
+        retry_after = _parse_seconds(response.headers.get("Retry-After"))
+        codes = []
+        if response.status_code >= 400:
+            try:
+                if body is None:
+                    body = response.json()
+                for body_error in body.get("errors") or []:
+                    extensions = body_error.get("extensions") or {}
+                    codes.append(extensions.get("code") or body_error.get("type"))
+                    retry_after = _parse_seconds(extensions.get("retryAfter")) or retry_after
+            except (ValueError, AttributeError):
+                pass
+
+        if not (response.status_code in RETRY_STATUSES or any(code in RETRY_CODES for code in codes)):
+            return None
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        return self.backoff(attempt, retry_after)
+
+
+class Hedger:
+    """Sends a second copy of slow idempotent requests and keeps the first answer."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay: float = 0.005,
+        max_workers: int = 16,
+    ) -> None:
+        """
+        Initialize the hedger.
+
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            min_samples: Samples needed for an endpoint before hedging it
+            min_delay: Lower bound for the hedge delay, in seconds
+            max_workers: Maximum number of attempts running at once
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.attempts_cancelled = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def histogram(self, endpoint: str) -> LatencyHistogram:
+        """Return the latency histogram of an endpoint."""
+        with self._lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = LatencyHistogram()
+            return self.histograms[endpoint]
+
+    def threshold(self, endpoint: str) -> Optional[float]:
+        """Return the hedge delay of an endpoint, or None until enough samples exist."""
+        histogram = self.histogram(endpoint)
+        if histogram.count < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile) or 0.0)
+
+    def run(self, endpoint: str, attempt: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Run an idempotent request, hedging it when it is slow.
+
+        Args:
+            endpoint: Key of the latency histogram
+            attempt: Function sending the request once
+
+        Returns:
+            The first successful response, or the last failure. The other
+            attempt is cancelled if it has not started, and its response is
+            closed when it arrives otherwise.
+        """
+        delay = self.threshold(endpoint)
+        timed = self._timed(endpoint, attempt)
+        if delay is None:
+            return timed()
+
+        futures: List[Future] = [self._executor.submit(timed)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            with self._lock:
+                self.hedges_sent += 1
+            futures.append(self._executor.submit(timed))
+
+        pending = set(futures)
+        failure: Optional[Future] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code < 500:
+                    if len(futures) > 1 and future is futures[1]:
+                        with self._lock:
+                            self.hedges_won += 1
+                    for loser in pending:
+                        self._cancel(loser)
+                    return future.result()
+                failure = future
+        return failure.result()
+
+    def _cancel(self, future: Future) -> None:
+        with self._lock:
+            self.attempts_cancelled += 1
+        if not future.cancel():
+            future.add_done_callback(_close_response)
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False)
+
+    def _timed(self, endpoint: str, attempt: Callable[[], requests.Response]) -> Callable[[], requests.Response]:
+        histogram = self.histogram(endpoint)
+
+        def run() -> requests.Response:
+            start = time.perf_counter()
+            response = attempt()
+            histogram.record(time.perf_counter() - start)
+            return response
+
+        return run
+
+
+def _close_response(future: Future) -> None:
+    """Release the connection of a losing attempt once it completes."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Local REST-to-GraphQL Gateway
+
+An offline stand-in for the APIM REST facades of github-rest-2-graphql and
+fabric-rest-2-graphql. It serves the GET operations of their swagger.json
+files (under the API path of the swagger `servers` URL, e.g.
+`/github-rest/user/{username}/repositories` and `/factory-rest/sensors`)
+and applies the transforms of their policies:
+
+* inbound: the GraphQL body is built from the query of the policy's
+  `set-body` (read from the XML, so regenerated policies are picked up) and
+  the variables taken from the path and query string
+* outbound: the GraphQL response is reshaped as the policy's `choose`
+  does: the selected connection, a "GraphQL Error", an "Unexpected
+  response format", or the backend error
+
+`POST <API path>/graphql` forwards bodies unchanged, like the
+pass-through policies (`*-policy-base.xml`), so both designs can be
+compared against the same backend. Complete facade responses can be
+cached, keyed by path, query string and the credential forwarded to the
+backend. Every response carries the X-Apim-Request-Id and
+Server-Timing headers of the APIM policies.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+
+from graphql_cache import FRESH, ResponseCache
+from graphql_projection import policy_query
+from graphql_stub_server import StubGraphQLServer
+from graphql_transport import PooledTransport
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Query parameter carrying the APIM subscription key; it never selects a response
+SUBSCRIPTION_KEY_PARAMETER = "subscription-key"
+
+_PATH_PARAMETER = re.compile(r"\{(\w+)\}")
+
+
+def _repositories_variables(path: Dict[str, str], query: Dict[str, List[str]]) -> Dict[str, Any]:
+    # var limit = int.Parse(context.Request.Url.Query.GetValueOrDefault("limit", "10"))
+    return {"username": path["username"], "limit": int(query.get("limit", ["10"])[0])}
+
+
+class Facade(NamedTuple):
+    """A REST operation of a facade API and the transforms of its policy."""
+
+    # Key of the API, naming its backend
+    api: str
+    # Directory holding swagger.json and the policy
+    directory: str
+    # operationId of the swagger operation
+    operation: str
+    # Policy file, relative to directory
+    policy: str
+    # Variables of the GraphQL request, from the path and query parameters
+    variables: Callable[[Dict[str, str], Dict[str, List[str]]], Dict[str, Any]]
+    # The response holds data[container][field] ...
+    container: str
+    field: str
+    # ... returned as {wrapper: ...}
+    wrapper: str
+    # "error" of non-200 backend responses
+    backend_error: str
+    # The policy's on-error section writes an "APIM Policy Error" body
+    policy_error_body: bool
+
+
+FACADES = (
+    Facade(
+        "github", os.path.join(REPOSITORY_ROOT, "github-rest-2-graphql"), "repositories",
+        "github-rest-to-graphql-policy-repositories.xml", _repositories_variables,
+        "user", "repositories", "repositories", "GitHub API Error", True,
+    ),
+    Facade(
+        "fabric", os.path.join(REPOSITORY_ROOT, "fabric-rest-2-graphql"), "sensors",
+        "fabric-rest-to-graphql-policy-base-sensors.xml", lambda path, query: {},
+        "factory_iot_datas", "items", "sensors", "Fabric API Error", False,
+    ),
+)
+
+
+class Route(NamedTuple):
+    """A facade operation served by the gateway."""
+
+    facade: Facade
+    # Full path template, e.g. /github-rest/user/{username}/repositories
+    template: str
+    pattern: "re.Pattern[str]"
+    # Query of the policy's set-body
+    query: str
+
+
+def load_routes(facade: Facade) -> Tuple[str, Route]:
+    """
+    Read the API path and the route of a facade from its swagger.json and policy.
+
+    Returns:
+        The API path (e.g. /github-rest) and the route of the operation
+
+    Raises:
+        ValueError: If the swagger has no GET operation with the facade's operationId
+    """
+    with open(os.path.join(facade.directory, "swagger.json"), encoding="utf-8") as f:
+        swagger = json.load(f)
+    with open(os.path.join(facade.directory, facade.policy), encoding="utf-8") as f:
+        query = policy_query(f.read())
+    prefix = urlsplit(swagger["servers"][0]["url"]).path.rstrip("/")
+    for path, operations in swagger["paths"].items():
+        if operations.get("get", {}).get("operationId") == facade.operation:
+            template = prefix + path
+            # "/user/{username}/repositories" -> "/user/(?P<username>[^/]+)/repositories"
+            parts = _PATH_PARAMETER.split(template)
+            pattern = "".join(f"(?P<{part}>[^/]+)" if i % 2 else re.escape(part) for i, part in enumerate(parts))
+            return prefix, Route(facade, template, re.compile(pattern + "$"), query)
+    raise ValueError(f"No GET operation {facade.operation} in {facade.directory}/swagger.json")
+
+
+def _dumps(value: Any) -> str:
+    # JsonConvert.SerializeObject writes compact JSON
+    return json.dumps(value, separators=(",", ":"))
+
+
+def transform_request(route: Route, path: Dict[str, str], query: Dict[str, List[str]]) -> bytes:
+    """
+    Build the GraphQL request of a facade call (the policy's inbound `set-body`).
+
+    Raises:
+        ValueError: If a parameter cannot be parsed (e.g. a non-numeric limit)
+    """
+    return _dumps({"query": route.query, "variables": route.facade.variables(path, query)}).encode("utf-8")
+
+
+def transform_response(facade: Facade, status: int, reason: str, body: bytes) -> str:
+    """Reshape a backend response as the policy's outbound `choose` does."""
+    return _transform_response(facade, status, reason, body)[0]
+
+
+def _transform_response(facade: Facade, status: int, reason: str, body: bytes) -> Tuple[str, bool]:
+    """Return the reshaped response, and whether it is a complete result (without errors) that may be cached."""
+    if status != 200:
+        return _dumps({
+            "error": facade.backend_error,
+            "statusCode": status,
+            "statusReason": reason,
+            "body": body.decode("utf-8", "replace"),
+        }), False
+    response = json.loads(body)
+    data = response.get("data") if isinstance(response, dict) else None
+    if isinstance(data, dict) and data.get(facade.container) is not None:
+        return _dumps({facade.wrapper: data[facade.container][facade.field]}), not response.get("errors")
+    if isinstance(response, dict) and response.get("errors") is not None:
+        return _dumps({"error": "GraphQL Error", "details": response["errors"]}), False
+    return _dumps({"error": "Unexpected response format", "response": response}), False
+
+
+def policy_error(facade: Facade, error: Exception) -> Tuple[int, str]:
+    """Return the status and body of a request failing inside the policy (the on-error section)."""
+    if facade.policy_error_body:
+        return 500, _dumps({
+            "error": "APIM Policy Error",
+            "message": str(error),
+            "source": type(error).__name__,
+            "reason": None,
+            "scope": None,
+        })
+    # Default APIM error body
+    return 500, _dumps({"statusCode": 500, "message": "Internal server error", "activityId": str(uuid.uuid4())})
+
+
+def cache_key(path: str, query: str, credential: Optional[str] = None) -> str:
+    """
+    Key of a facade response: the path and the sorted query parameters,
+    without the subscription key, and a hash of the credential forwarded to
+    the backend, so callers never share responses fetched with another's.
+    """
+    parameters = sorted(
+        (name, value)
+        for name, values in parse_qs(query, keep_blank_values=True).items()
+        if name != SUBSCRIPTION_KEY_PARAMETER
+        for value in values
+    )
+    key = path + "?" + "&".join(f"{name}={value}" for name, value in parameters)
+    if credential:
+        key += "#" + hashlib.sha256(credential.encode("utf-8")).hexdigest()
+    return key
+
+
+class GatewayStats:
+    """Counters and cumulative timings of the gateway."""
+
+    def __init__(self) -> None:
+        self.facade_requests = 0
+        self.passthrough_requests = 0
+        self.cache_hits = 0
+        self.backend_requests = 0
+        self.policy_errors = 0
+        self.inbound_seconds = 0.0
+        self.backend_seconds = 0.0
+        self.outbound_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a dictionary."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in self.as_dict().items()
+        )
+
+
+class RestGateway:
+    """REST-to-GraphQL gateway running in a background thread."""
+
+    def __init__(
+        self,
+        backends: Dict[str, str],
+        tokens: Optional[Dict[str, str]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        cache_ttl: float = 0.0,
+        cache_entries: int = 1024,
+        pool_size: int = 16,
+    ) -> None:
+        """
+        Initialize the gateway.
+
+        Args:
+            backends: GraphQL endpoint of each API ("github", "fabric"); the
+                routes of an API without a backend are not served
+            tokens: Bearer token sent to the backend of each API (the
+                policies' named value or managed identity); without one, the
+                client's Authorization header is forwarded
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            cache_ttl: Seconds a facade response is cached (0 disables caching)
+            cache_entries: Maximum number of cached responses
+            pool_size: Keep-alive connections kept per backend
+        """
+        self.backends = dict(backends)
+        self.tokens = dict(tokens or {})
+        self.routes: List[Route] = []
+        # API path (e.g. /github-rest) -> API key, for pass-through requests
+        self.passthrough: Dict[str, str] = {}
+        for facade in FACADES:
+            if facade.api in self.backends:
+                prefix, route = load_routes(facade)
+                self.routes.append(route)
+                self.passthrough[prefix + "/graphql"] = facade.api
+        self.cache = ResponseCache(max_entries=cache_entries, ttl=cache_ttl) if cache_ttl > 0 else None
+        self.stats = GatewayStats()
+        self.transport = PooledTransport(pool_maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL of the gateway."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _forward(self, api: str, body: bytes, authorization: Optional[str]) -> requests.Response:
+        headers = {"Content-Type": "application/json"}
+        token = self.tokens.get(api)
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        elif authorization:
+            headers["Authorization"] = authorization
+        return self.transport.post(self.backends[api], headers=headers, data=body)
+
+    def _count(self, **timings: float) -> None:
+        with self._lock:
+            for name, value in timings.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def facade(self, route: Route, match: "re.Match[str]", path: str, query: str, authorization: Optional[str]) -> Tuple[int, str, Dict[str, str]]:
+        """Serve a facade call; return (status, body, extra headers)."""
+        self._count(facade_requests=1)
+        started = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            # Without a gateway token the caller's own credential reaches the backend
+            key = cache_key(path, query, None if self.tokens.get(route.facade.api) else authorization)
+        if key is not None:
+            entry, state = self.cache.lookup(key)
+            if state == FRESH:
+                self._count(cache_hits=1)
+                return 200, entry.value["body"], {"X-Cache": "HIT", "Server-Timing": _server_timing(time.perf_counter() - started)}
+        try:
+            parameters = {name: unquote(value) for name, value in match.groupdict().items()}
+            request = transform_request(route, parameters, parse_qs(query, keep_blank_values=True))
+        except (KeyError, ValueError) as e:
+            self._count(policy_errors=1)
+            status, body = policy_error(route.facade, e)
+            return status, body, {}
+        forwarded = time.perf_counter()
+        try:
+            response = self._forward(route.facade.api, request, authorization)
+        except requests.RequestException as e:
+            self._count(policy_errors=1)
+            status, body = policy_error(route.facade, e)
+            return status, body, {}
+        received = time.perf_counter()
+        try:
+            body, complete = _transform_response(route.facade, response.status_code, response.reason, response.content)
+        except ValueError as e:
+            self._count(policy_errors=1)
+            status, body = policy_error(route.facade, e)
+            return status, body, {}
+        finished = time.perf_counter()
+        self._count(
+            backend_requests=1,
+            inbound_seconds=forwarded - started,
+            backend_seconds=received - forwarded,
+            outbound_seconds=finished - received,
+        )
+        headers = {"Server-Timing": _server_timing(forwarded - started, received - forwarded, finished - received)}
+        if key is not None:
+            headers["X-Cache"] = "MISS"
+            # Errors (e.g. RATE_LIMITED) and partial results are not replayed
+            if complete:
+                self.cache.store(key, {"body": body})
+        return response.status_code, body, headers
+
+    def forward(self, api: str, body: bytes, authorization: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+        """Forward a GraphQL request unchanged; return (status, body, extra headers)."""
+        self._count(passthrough_requests=1)
+        started = time.perf_counter()
+        try:
+            response = self._forward(api, body, authorization)
+        except requests.RequestException as e:
+            self._count(policy_errors=1)
+            return 500, _dumps({"statusCode": 500, "message": str(e)}).encode("utf-8"), {}
+        elapsed = time.perf_counter() - started
+        self._count(backend_requests=1, backend_seconds=elapsed)
+        return response.status_code, response.content, {"Server-Timing": _server_timing(0.0, elapsed, 0.0)}
+
+    def _make_request_handler(self):
+        gateway = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                for route in gateway.routes:
+                    match = route.pattern.match(url.path)
+                    if match:
+                        status, body, headers = gateway.facade(route, match, url.path, url.query, self.headers.get("Authorization"))
+                        self._respond(status, body.encode("utf-8"), headers)
+                        return
+                self._not_found()
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                api = gateway.passthrough.get(urlsplit(self.path).path)
+                if api is None:
+                    self._not_found()
+                    return
+                status, body, headers = gateway.forward(api, body, self.headers.get("Authorization"))
+                self._respond(status, body, headers)
+
+            def _not_found(self) -> None:
+                self._respond(404, _dumps({"statusCode": 404, "message": "Resource not found"}).encode("utf-8"), {})
+
+            def _respond(self, status: int, body: bytes, extra_headers: Dict[str, str]) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("X-Apim-Request-Id", str(uuid.uuid4()))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
+
+    def serve_forever(self) -> None:
+        """Serve requests in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "RestGateway":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving, close the listening socket and the backend connections."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+        self.transport.close()
+
+    def __enter__(self) -> "RestGateway":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def _server_timing(inbound: float, backend: Optional[float] = None, outbound: Optional[float] = None) -> str:
+    """Server-Timing header in the format of the APIM policies (a cache hit has no backend phase)."""
+    timings = [("apim-inbound", inbound), ("backend", backend), ("apim-outbound", outbound)]
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings if seconds is not None)
+
+
+def main():
+    """Main entry point for the gateway."""
+    parser = argparse.ArgumentParser(description="Local REST-to-GraphQL gateway emulating the APIM facade policies")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--github-url", default=os.getenv("GITHUB_GRAPHQL_API_URL"), help="GraphQL backend of /github-rest (default: GITHUB_GRAPHQL_API_URL)")
+    parser.add_argument("--fabric-url", default=os.getenv("FABRIC_GRAPHQL_API_URL"), help="GraphQL backend of /factory-rest (default: FABRIC_GRAPHQL_API_URL)")
+    parser.add_argument("--stub", action="store_true", help="Serve /github-rest from a local GitHub stand-in server")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Response delay of the stand-in server, in seconds")
+    parser.add_argument("--cache-ttl", type=float, default=0.0, help="Seconds facade responses are cached (default: 0, no caching)")
+    parser.add_argument("--cache-entries", type=int, default=1024, help="Maximum number of cached responses (default: 1024)")
+    args = parser.parse_args()
+
+    stub = StubGraphQLServer(latency=args.stub_latency).start() if args.stub else None
+    backends = {}
+    if stub is not None or args.github_url:
+        backends["github"] = stub.url if stub is not None else args.github_url
+    if args.fabric_url:
+        backends["fabric"] = args.fabric_url
+    if not backends:
+        print("Error: no backend; pass --stub, --github-url or --fabric-url", file=sys.stderr)
+        sys.exit(1)
+    tokens = {"github": os.getenv("GITHUB_TOKEN")} if os.getenv("GITHUB_TOKEN") and stub is None else {}
+
+    gateway = RestGateway(backends, tokens, host=args.host, port=args.port, cache_ttl=args.cache_ttl, cache_entries=args.cache_entries)
+    for route in gateway.routes:
+        print(f"GET  {gateway.url}{route.template} -> {backends[route.facade.api]}")
+    for path, api in gateway.passthrough.items():
+        print(f"POST {gateway.url}{path} -> {backends[api]}")
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Gateway: {gateway.stats}")
+        if stub is not None:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+Full schema introspection, SDL printing and compact schema snapshots.
+
+The complete introspection result of the GitHub API is several megabytes of
+JSON, slow to download and to parse. This module fetches it once and keeps:
+
+* the SDL of the schema, printed from the introspection result
+* a snapshot file holding one zlib-compressed JSON record per type behind a
+  small index (type name -> kind, offset, length) and the SHA-256 of the
+  schema content. Opening a snapshot only reads the index; looking up a type
+  decompresses that type alone.
+
+Before downloading the full schema again, a cheap probe query fetches the
+names and kinds of the types, the names of their fields, arguments and enum
+values, their interfaces and possible types, and the types and default
+values of the fields, arguments and input fields. When their hash matches
+the one recorded in the snapshot, the schema is left as is.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+SNAPSHOT_MAGIC = b"GQLSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sI")
+
+# Scalars and directives every GraphQL schema defines; they are not printed.
+BUILTIN_SCALARS = {"String", "Int", "Float", "Boolean", "ID"}
+BUILTIN_DIRECTIVES = {"skip", "include", "deprecated", "specifiedBy", "oneOf"}
+DEFAULT_DEPRECATION_REASON = "No longer supported"
+
+# Type references, wrappers (NON_NULL, LIST) included, down to seven levels
+TYPE_REF_FRAGMENT = """
+fragment TypeRef on __Type {
+  kind
+  name
+  ofType {
+    kind
+    name
+    ofType {
+      kind
+      name
+      ofType {
+        kind
+        name
+        ofType {
+          kind
+          name
+          ofType {
+            kind
+            name
+            ofType {
+              kind
+              name
+              ofType {
+                kind
+                name
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+INTROSPECTION_QUERY = """
+query IntrospectionQuery {
+  __schema {
+    queryType { name }
+    mutationType { name }
+    subscriptionType { name }
+    types { ...FullType }
+    directives {
+      name
+      description
+      locations
+      args { ...InputValue }
+    }
+  }
+}
+
+fragment FullType on __Type {
+  kind
+  name
+  description
+  fields(includeDeprecated: true) {
+    name
+    description
+    args { ...InputValue }
+    type { ...TypeRef }
+    isDeprecated
+    deprecationReason
+  }
+  inputFields { ...InputValue }
+  interfaces { ...TypeRef }
+  enumValues(includeDeprecated: true) {
+    name
+    description
+    isDeprecated
+    deprecationReason
+  }
+  possibleTypes { ...TypeRef }
+}
+
+fragment InputValue on __InputValue {
+  name
+  description
+  type { ...TypeRef }
+  defaultValue
+}
+""" + TYPE_REF_FRAGMENT
+
+# Names, kinds, type references and defaults, without descriptions: a
+# fraction of the size of the full introspection result, and enough to notice
+# added, removed, renamed or deprecated types and fields, any change to the
+# type or nullability of a field, argument or input field (`String` to
+# `String!`) or to a default value, and changes to the interfaces of a type
+# or the members of a union.
+PROBE_QUERY = """
+query SchemaProbe {
+  __schema {
+    types {
+      kind
+      name
+      interfaces { name }
+      possibleTypes { name }
+      fields(includeDeprecated: true) {
+        name
+        isDeprecated
+        args { name defaultValue type { ...TypeRef } }
+        type { ...TypeRef }
+      }
+      inputFields { name defaultValue type { ...TypeRef } }
+      enumValues(includeDeprecated: true) { name isDeprecated }
+    }
+    directives { name args { name defaultValue type { ...TypeRef } } }
+  }
+}
+""" + TYPE_REF_FRAGMENT
+
+
+def _post(url: str, query: str, headers: Dict[str, str], session: Optional[requests.Session], timeout: float) -> Dict[str, Any]:
+    sender = session or requests
+    response = sender.post(url, json={"query": query}, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    result = response.json()
+    if result.get("errors"):
+        raise RuntimeError("GraphQL errors: " + json.dumps(result["errors"], indent=2))
+    return result["data"]["__schema"]
+
+
+def fetch_schema(
+    token: Optional[str] = None,
+    url: str = GITHUB_GRAPHQL_URL,
+    headers: Optional[Dict[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = 120,
+) -> Dict[str, Any]:
+    """
+    Run the full introspection query.
+
+    Args:
+        token: Bearer token (GitHub personal access token)
+        url: GraphQL endpoint
+        headers: Extra request headers (e.g. an APIM subscription key)
+        session: Session to send the request with (default: a one-off request)
+        timeout: Request timeout in seconds
+
+    Returns:
+        The `__schema` object of the introspection result
+
+    Raises:
+        RuntimeError: If the server returns GraphQL errors
+        requests.exceptions.HTTPError: If the request fails
+    """
+    return _post(url, INTROSPECTION_QUERY, _headers(token, headers), session, timeout)
+
+
+def fetch_probe_hash(
+    token: Optional[str] = None,
+    url: str = GITHUB_GRAPHQL_URL,
+    headers: Optional[Dict[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = 30,
+) -> str:
+    """Run the probe query and return the hash of its (canonicalized) result."""
+    return content_hash(_post(url, PROBE_QUERY, _headers(token, headers), session, timeout))
+
+
+def _headers(token: Optional[str], extra: Optional[Dict[str, str]]) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json", "User-Agent": "GraphQL Schema Fetcher"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    headers.update(extra or {})
+    return headers
+
+
+def normalize(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Sort types and directives by name, so equal schemas serialize identically."""
+    result = dict(schema)
+    result["types"] = sorted(schema.get("types") or [], key=lambda item: item["name"])
+    result["directives"] = sorted(schema.get("directives") or [], key=lambda item: item["name"])
+    return result
+
+
+def content_hash(schema: Dict[str, Any]) -> str:
+    """Hex SHA-256 of a schema (or probe) result, independent of type order."""
+    canonical = json.dumps(normalize(schema), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# SDL printing
+
+
+def type_reference(ref: Dict[str, Any]) -> str:
+    """Print a type reference, e.g. `[String!]!`."""
+    if ref["kind"] == "NON_NULL":
+        return type_reference(ref["ofType"]) + "!"
+    if ref["kind"] == "LIST":
+        return "[" + type_reference(ref["ofType"]) + "]"
+    return ref["name"]
+
+
+def _description(description: Optional[str], indent: str = "") -> List[str]:
+    if not description:
+        return []
+    text = description.replace('"""', '\\"""')
+    return [indent + '"""'] + [(indent + line) if line else "" for line in text.split("\n")] + [indent + '"""']
+
+
+def _deprecated(item: Dict[str, Any]) -> str:
+    if not item.get("isDeprecated"):
+        return ""
+    reason = item.get("deprecationReason")
+    if reason is None or reason == DEFAULT_DEPRECATION_REASON:
+        return " @deprecated"
+    return f" @deprecated(reason: {json.dumps(reason, ensure_ascii=False)})"
+
+
+def _input_value(value: Dict[str, Any]) -> str:
+    text = f"{value['name']}: {type_reference(value['type'])}"
+    if value.get("defaultValue") is not None:
+        text += f" = {value['defaultValue']}"
+    return text + _deprecated(value)
+
+
+def _arguments(args: List[Dict[str, Any]], indent: str) -> str:
+    if not args:
+        return ""
+    if not any(arg.get("description") for arg in args):
+        return "(" + ", ".join(_input_value(arg) for arg in args) + ")"
+    lines = ["("]
+    for arg in args:
+        lines.extend(_description(arg.get("description"), indent + "  "))
+        lines.append(indent + "  " + _input_value(arg))
+    lines.append(indent + ")")
+    return "\n".join(lines)
+
+
+def _implements(item: Dict[str, Any]) -> str:
+    interfaces = [type_reference(ref) for ref in item.get("interfaces") or []]
+    return " implements " + " & ".join(interfaces) if interfaces else ""
+
+
+def print_type(item: Dict[str, Any]) -> str:
+    """Print the SDL definition of one introspected type."""
+    kind, name = item["kind"], item["name"]
+    lines = _description(item.get("description"))
+    if kind == "SCALAR":
+        lines.append(f"scalar {name}")
+    elif kind == "UNION":
+        members = " | ".join(type_reference(ref) for ref in item.get("possibleTypes") or [])
+        lines.append(f"union {name}" + (f" = {members}" if members else ""))
+    elif kind == "ENUM":
+        lines.append(f"enum {name} {{")
+        for value in item.get("enumValues") or []:
+            lines.extend(_description(value.get("description"), "  "))
+            lines.append(f"  {value['name']}{_deprecated(value)}")
+        lines.append("}")
+    elif kind == "INPUT_OBJECT":
+        lines.append(f"input {name} {{")
+        for field in item.get("inputFields") or []:
+            lines.extend(_description(field.get("description"), "  "))
+            lines.append("  " + _input_value(field))
+        lines.append("}")
+    else:
+        keyword = "interface" if kind == "INTERFACE" else "type"
+        lines.append(f"{keyword} {name}{_implements(item)} {{")
+        for field in item.get("fields") or []:
+            lines.extend(_description(field.get("description"), "  "))
+            lines.append(
+                f"  {field['name']}{_arguments(field.get('args') or [], '  ')}: "
+                f"{type_reference(field['type'])}{_deprecated(field)}"
+            )
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def print_directive(directive: Dict[str, Any]) -> str:
+    """Print the SDL definition of a directive."""
+    lines = _description(directive.get("description"))
+    arguments = _arguments(directive.get("args") or [], "")
+    lines.append(f"directive @{directive['name']}{arguments} on {' | '.join(directive['locations'])}")
+    return "\n".join(lines)
+
+
+def _root_names(schema: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    return {
+        operation: (schema.get(f"{operation}Type") or {}).get("name")
+        for operation in ("query", "mutation", "subscription")
+    }
+
+
+def is_printed(item: Dict[str, Any]) -> bool:
+    """False for introspection types and built-in scalars."""
+    return not item["name"].startswith("__") and item["name"] not in BUILTIN_SCALARS
+
+
+def print_schema(schema: Dict[str, Any]) -> str:
+    """
+    Print the SDL of an introspected schema.
+
+    Args:
+        schema: The `__schema` object of an introspection result
+
+    Returns:
+        SDL text: custom directives, then the types, sorted by name
+    """
+    schema = normalize(schema)
+    blocks = []
+    roots = _root_names(schema)
+    if any(name is not None and name != operation.capitalize() for operation, name in roots.items()):
+        operations = [f"  {operation}: {name}" for operation, name in roots.items() if name]
+        blocks.append("schema {\n" + "\n".join(operations) + "\n}")
+    blocks.extend(print_directive(item) for item in schema["directives"] if item["name"] not in BUILTIN_DIRECTIVES)
+    blocks.extend(print_type(item) for item in schema["types"] if is_printed(item))
+    return "\n\n".join(blocks) + "\n"
+
+
+# Snapshots
+
+
+def write_snapshot(path: str, schema: Dict[str, Any], probe_hash: Optional[str] = None) -> str:
+    """
+    Write a schema snapshot, atomically.
+
+    Args:
+        path: Snapshot file
+        schema: The `__schema` object of an introspection result
+        probe_hash: Hash of the probe query result for the same schema
+
+    Returns:
+        The content hash of the schema
+    """
+    schema = normalize(schema)
+    digest = content_hash(schema)
+    records = []
+    index: Dict[str, Tuple[str, int, int]] = {}
+    offset = 0
+    for item in schema["types"] + [{"name": "@directives", "kind": "DIRECTIVES", "directives": schema["directives"]}]:
+        record = zlib.compress(json.dumps(item, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 9)
+        index[item["name"]] = (item["kind"], offset, len(record))
+        records.append(record)
+        offset += len(record)
+    header = json.dumps(
+        {
+            "hash": digest,
+            "probe_hash": probe_hash,
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "roots": _root_names(schema),
+            "types": index,
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(header)))
+            f.write(header)
+            for record in records:
+                f.write(record)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return digest
+
+
+class SchemaSnapshot:
+    """Lazily loaded schema snapshot: types are decompressed on first lookup."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open a snapshot and read its index.
+
+        Args:
+            path: Snapshot file written by write_snapshot
+
+        Raises:
+            ValueError: If the file is not a schema snapshot
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            magic, length = SNAPSHOT_HEADER.unpack(self._file.read(SNAPSHOT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a schema snapshot")
+            header = json.loads(self._file.read(length).decode("utf-8"))
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self._base = SNAPSHOT_HEADER.size + length
+        self.hash: str = header["hash"]
+        self.probe_hash: Optional[str] = header.get("probe_hash")
+        self.fetched_at: Optional[str] = header.get("fetched_at")
+        self.roots: Dict[str, Optional[str]] = header["roots"]
+        self._index: Dict[str, List[Any]] = header["types"]
+        self._types: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index and not name.startswith("@")
+
+    def __len__(self) -> int:
+        return len(self.type_names())
+
+    def type_names(self, kind: Optional[str] = None) -> List[str]:
+        """Names of the types, optionally of one kind (e.g. "OBJECT"), without loading them."""
+        return [
+            name for name, (type_kind, _, _) in self._index.items()
+            if not name.startswith("@") and (kind is None or type_kind == kind)
+        ]
+
+    def kind(self, name: str) -> str:
+        """Kind of a type, without loading it."""
+        return self._index[name][0]
+
+    def get_type(self, name: str) -> Dict[str, Any]:
+        """
+        Return the introspection object of a type, decompressing only that type.
+
+        Raises:
+            KeyError: If the schema has no such type
+        """
+        item = self._types.get(name)
+        if item is None:
+            _, offset, length = self._index[name]
+            start = self._base + offset
+            item = json.loads(zlib.decompress(self._map[start:start + length]).decode("utf-8"))
+            with self._lock:
+                self._types[name] = item
+        return item
+
+    def field(self, type_name: str, field_name: str) -> Dict[str, Any]:
+        """
+        Return a field (or input field) of a type.
+
+        Raises:
+            KeyError: If the type or the field does not exist
+        """
+        item = self.get_type(type_name)
+        for field in (item.get("fields") or []) + (item.get("inputFields") or []):
+            if field["name"] == field_name:
+                return field
+        raise KeyError(f"{type_name}.{field_name}")
+
+    def type_sdl(self, name: str) -> str:
+        """SDL definition of one type."""
+        return print_type(self.get_type(name))
+
+    def directives(self) -> List[Dict[str, Any]]:
+        """Directives of the schema."""
+        return self.get_type("@directives")["directives"]
+
+    def iter_types(self) -> Iterator[Dict[str, Any]]:
+        """Yield every type, loading them one by one."""
+        for name in self.type_names():
+            yield self.get_type(name)
+
+    def to_introspection(self) -> Dict[str, Any]:
+        """Rebuild the complete `__schema` object (loads every type)."""
+        return {
+            **{f"{operation}Type": {"name": name} if name else None for operation, name in self.roots.items()},
+            "types": list(self.iter_types()),
+            "directives": self.directives(),
+        }
+
+    def close(self) -> None:
+        """Release the file."""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "SchemaSnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def read_snapshot_hashes(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return the (content hash, probe hash) of a snapshot, or (None, None) if it is missing or invalid."""
+    try:
+        with SchemaSnapshot(path) as snapshot:
+            return snapshot.hash, snapshot.probe_hash
+    except (OSError, ValueError, KeyError, struct.error):
+        return None, None
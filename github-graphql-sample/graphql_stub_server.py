@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Local GitHub GraphQL Stand-in Server
+
+A small HTTP/1.1 server answering the queries issued by github_graphql_client.py
+with canned data. It is used to exercise and benchmark the client offline,
+without a GitHub token or an APIM deployment.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from graphql_persisted import PersistedQueryRegistry
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+# A handler receives the decoded request payload and the request headers and
+# returns (status code, response body, extra response headers).
+Handler = Callable[[Dict[str, Any], Dict[str, str]], Tuple[int, Dict[str, Any], Dict[str, str]]]
+
+# Number of repositories owned by every canned repository owner.
+FAKE_REPOSITORY_COUNT = 250
+
+# A (possibly aliased) repository lookup taking its arguments from variables.
+REPOSITORY_FIELD = re.compile(r"(?:(\w+)\s*:\s*)?\brepository\(\s*owner:\s*\$(\w+)[\s,]*name:\s*\$(\w+)\s*\)")
+
+# A (possibly aliased) user lookup taking its login from a variable.
+USER_FIELD = re.compile(r"(?:(\w+)\s*:\s*)?\buser\(\s*login:\s*\$(\w+)\s*\)")
+
+
+def fake_viewer() -> Dict[str, Any]:
+    """Return a canned `viewer` object."""
+    return {
+        "login": "octocat",
+        "name": "The Octocat",
+        "email": "octocat@github.com",
+        "bio": "GitHub's mascot",
+        "company": "@github",
+        "location": "San Francisco",
+        "createdAt": "2011-01-25T18:44:36Z",
+        "followers": {"totalCount": 5000},
+        "following": {"totalCount": 0},
+        "repositories": {"totalCount": 8},
+    }
+
+
+def fake_user(login: str) -> Dict[str, Any]:
+    """Return a canned `user` object for login."""
+    return dict(fake_viewer(), login=login, name=login.capitalize(), email=f"{login}@example.com")
+
+
+def fake_repository(owner: str, name: str) -> Dict[str, Any]:
+    """Return a canned `repository` object for owner/name."""
+    return {
+        "name": name,
+        "description": f"Repository {owner}/{name}",
+        "url": f"https://github.com/{owner}/{name}",
+        "isPrivate": False,
+        "stargazerCount": len(name) * 10,
+        "forkCount": len(name),
+        "watchers": {"totalCount": 3},
+        "issues": {"totalCount": 5},
+        "pullRequests": {"totalCount": 2},
+        "primaryLanguage": {"name": "Python"},
+        "languages": {"nodes": [{"name": "Python"}, {"name": "Shell"}]},
+        "createdAt": "2011-01-26T19:01:12Z",
+        "updatedAt": "2024-01-15T10:30:00Z",
+        "defaultBranchRef": {"name": "main"},
+    }
+
+
+def fake_owner(login: str, first: int, after: Optional[str] = None) -> Dict[str, Any]:
+    """Return one page of a canned `repositoryOwner` owning FAKE_REPOSITORY_COUNT repositories."""
+    start = int(after) if after else 0
+    end = min(start + first, FAKE_REPOSITORY_COUNT)
+    nodes = []
+    for i in range(start, end):
+        repo = fake_repository(login, f"repo-{i}")
+        nodes.append(
+            {key: repo[key] for key in (
+                "name", "description", "url", "stargazerCount", "forkCount",
+                "isPrivate", "primaryLanguage", "updatedAt",
+            )}
+        )
+    return {
+        "login": login,
+        "repositories": {
+            "nodes": nodes,
+            "pageInfo": {"endCursor": str(end), "hasNextPage": end < FAKE_REPOSITORY_COUNT},
+        },
+    }
+
+
+def resolve_repository(owner: str, name: str, path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Resolve a repository lookup to (repository, error).
+
+    Repositories named `missing*` do not exist and those named `forbidden*`
+    cannot be accessed, mirroring the errors GitHub returns for them.
+    """
+    if name.startswith("missing"):
+        return None, {
+            "type": "NOT_FOUND",
+            "path": [path],
+            "message": f"Could not resolve to a Repository with the name '{owner}/{name}'.",
+        }
+    if name.startswith("forbidden"):
+        return None, {
+            "type": "FORBIDDEN",
+            "path": [path],
+            "message": "Resource not accessible by personal access token",
+        }
+    return fake_repository(owner, name), None
+
+
+def resolve_user(login: str, path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Resolve a user lookup to (user, error); logins starting with `missing` do not exist."""
+    if login.startswith("missing"):
+        return None, {
+            "type": "NOT_FOUND",
+            "path": [path],
+            "message": f"Could not resolve to a User with the login of '{login}'.",
+        }
+    return fake_user(login), None
+
+
+def default_handler(payload: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+    """Answer the viewer, repos and repo queries of github_graphql_client.py, batched user lookups and the REST facade query."""
+    query = payload.get("query") or ""
+    variables = payload.get("variables") or {}
+
+    if "viewer" in query:
+        data = {"viewer": fake_viewer()}
+    elif USER_FIELD.search(query) and "repositories(first:" in query:
+        # The query of the REST-to-GraphQL facade (github-rest-to-graphql-policy-repositories.xml)
+        data = {"user": fake_owner(variables.get("username", "octocat"), variables.get("limit", 10))}
+    elif REPOSITORY_FIELD.search(query) or USER_FIELD.search(query):
+        data, errors = {}, []
+        for alias, owner_variable, name_variable in REPOSITORY_FIELD.findall(query):
+            path = alias or "repository"
+            data[path], error = resolve_repository(variables.get(owner_variable, ""), variables.get(name_variable, ""), path)
+            if error:
+                errors.append(error)
+        for alias, login_variable in USER_FIELD.findall(query):
+            path = alias or "user"
+            data[path], error = resolve_user(variables.get(login_variable, ""), path)
+            if error:
+                errors.append(error)
+        if errors:
+            return 200, {"data": data, "errors": errors}, {}
+    elif "repositoryOwner(" in query:
+        data = {"repositoryOwner": fake_owner(variables.get("username", "octocat"), variables.get("limit", 10), variables.get("cursor"))}
+    else:
+        return 200, {"errors": [{"message": "Unsupported query"}]}, {}
+    return 200, {"data": data}, {}
+
+
+def rate_limited_body(retry_after: str) -> Dict[str, Any]:
+    """Return the error body the APIM on-error policy writes for a 429."""
+    return {
+        "errors": [
+            {
+                "message": "Rate limit exceeded. Please try again later.",
+                "extensions": {
+                    "code": "RATE_LIMITED",
+                    "retryAfter": retry_after,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                },
+            }
+        ]
+    }
+
+
+def internal_error_body() -> Dict[str, Any]:
+    """Return the error body the APIM on-error policy writes for a backend failure."""
+    return {
+        "errors": [
+            {
+                "message": "An internal error occurred while processing your request.",
+                "extensions": {
+                    "code": "INTERNAL_ERROR",
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                },
+            }
+        ]
+    }
+
+
+class StubGraphQLServer:
+    """GraphQL stand-in server running in a background thread."""
+
+    def __init__(
+        self,
+        handler: Optional[Handler] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        persisted_queries: bool = True,
+        rate_limit: Optional[int] = None,
+        rate_limit_window: float = 3600.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        seed: Optional[int] = None,
+        gzip_min_size: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the server.
+
+        Args:
+            handler: Function answering each request (default: default_handler)
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Artificial delay added to every response, in seconds
+            persisted_queries: Accept automatic persisted queries (hash-only requests)
+            rate_limit: Points available per window (default: unlimited). Each
+                request costs one point per repository or user lookup, at least one.
+            rate_limit_window: Length of the rate-limit window, in seconds
+            error_rate: Fraction of requests failed with a 503 INTERNAL_ERROR
+            slow_rate: Fraction of requests delayed by `slow_latency`
+            slow_latency: Extra delay of slow requests, in seconds
+            seed: Seed of the fault-injection random generator
+            gzip_min_size: Gzip response bodies of at least this many bytes
+                when the client accepts it (default: never)
+        """
+        self.handler = handler or default_handler
+        self.latency = latency
+        self.persisted_queries = PersistedQueryRegistry() if persisted_queries else None
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.rate_limit_used = 0
+        self.rate_limit_reset = time.time() + rate_limit_window
+        self.rate_limited_count = 0
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.injected_errors = 0
+        self.injected_slow = 0
+        self._random = random.Random(seed)
+        self.request_count = 0
+        self.connection_count = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.gzip_min_size = gzip_min_size
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._server.daemon_threads = True
+
+    def _charge(self, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """Charge a request against the rate limit; return (rateLimit data or None if limited, headers)."""
+        if self.rate_limit is None:
+            return {}, {}
+        query = payload.get("query") or ""
+        cost = max(1, len(REPOSITORY_FIELD.findall(query)) + len(USER_FIELD.findall(query)))
+        with self._lock:
+            now = time.time()
+            if now >= self.rate_limit_reset:
+                self.rate_limit_used = 0
+                self.rate_limit_reset = now + self.rate_limit_window
+            allowed = self.rate_limit_used + cost <= self.rate_limit
+            if allowed:
+                self.rate_limit_used += cost
+            else:
+                self.rate_limited_count += 1
+            remaining = self.rate_limit - self.rate_limit_used
+            headers = {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Used": str(self.rate_limit_used),
+                "X-RateLimit-Reset": str(int(self.rate_limit_reset)),
+            }
+            if not allowed:
+                headers["Retry-After"] = str(max(1, int(self.rate_limit_reset - now)))
+                return None, headers
+            reset_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.rate_limit_reset))
+            return {"cost": cost, "remaining": remaining, "resetAt": reset_at}, headers
+
+    def _inject_faults(self) -> Tuple[float, bool]:
+        """Draw the faults of a request; return (extra delay, whether to fail it)."""
+        if not (self.error_rate or self.slow_rate):
+            return 0.0, False
+        with self._lock:
+            slow = self._random.random() < self.slow_rate
+            failed = self._random.random() < self.error_rate
+            self.injected_slow += slow
+            self.injected_errors += failed
+        return (self.slow_latency if slow else 0.0), failed
+
+    @property
+    def url(self) -> str:
+        """URL of the GraphQL endpoint."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def _make_request_handler(self):
+        stub = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with stub._lock:
+                    stub.connection_count += 1
+
+            def do_POST(self) -> None:
+                self.received_at = time.perf_counter()
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                encoding = self.headers.get("Content-Encoding", "identity").strip().lower()
+                if encoding == "gzip":
+                    body = gzip.decompress(body)
+                elif encoding == "br" and brotli is not None:
+                    body = brotli.decompress(body)
+                elif encoding != "identity":
+                    self._respond(415, {"errors": [{"message": f"Unsupported Content-Encoding {encoding}"}]}, {})
+                    return
+                payload = json.loads(body or b"{}")
+                with stub._lock:
+                    stub.request_count += 1
+                    stub.bytes_received += length
+                delay, failed = stub._inject_faults()
+                if stub.latency or delay:
+                    time.sleep(stub.latency + delay)
+
+                if failed:
+                    self._respond(503, internal_error_body(), {})
+                    return
+
+                error = None
+                if "extensions" in payload:
+                    if stub.persisted_queries is None:
+                        error = {"errors": [{"message": "PersistedQueryNotSupported", "extensions": {"code": "PERSISTED_QUERY_NOT_SUPPORTED"}}]}
+                    else:
+                        error = stub.persisted_queries.resolve(payload)
+                rate_limit, rate_limit_headers = ({}, {}) if error else stub._charge(payload)
+                if error:
+                    status, body, extra_headers = 200, error, {}
+                elif rate_limit is None:
+                    status, body, extra_headers = 429, rate_limited_body(rate_limit_headers["Retry-After"]), {}
+                else:
+                    status, body, extra_headers = stub.handler(payload, dict(self.headers))
+                    if rate_limit and "rateLimit" in payload.get("query", "") and isinstance(body.get("data"), dict):
+                        body["data"]["rateLimit"] = rate_limit
+                self._respond(status, body, dict(rate_limit_headers, **extra_headers))
+
+            def _respond(self, status: int, body: Dict[str, Any], extra_headers: Dict[str, str]) -> None:
+                encoded = json.dumps(body).encode("utf-8") if status not in (204, 304) else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if (
+                    stub.gzip_min_size is not None
+                    and len(encoded) >= stub.gzip_min_size
+                    and "gzip" in self.headers.get("Accept-Encoding", "")
+                ):
+                    encoded = gzip.compress(encoded, compresslevel=6)
+                    self.send_header("Content-Encoding", "gzip")
+                with stub._lock:
+                    stub.bytes_sent += len(encoded)
+                self.send_header("Content-Length", str(len(encoded)))
+                # Headers added by the APIM policy, recorded by client-side phase timing
+                self.send_header("X-Apim-Request-Id", str(uuid.uuid4()))
+                self.send_header("Server-Timing", f"backend;dur={(time.perf_counter() - self.received_at) * 1000:.1f}")
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
+
+    def serve_forever(self) -> None:
+        """Serve requests in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "StubGraphQLServer":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "StubGraphQLServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main():
+    """Main entry point for the stand-in server."""
+    parser = argparse.ArgumentParser(description="Local GitHub GraphQL stand-in server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial response delay in seconds")
+    parser.add_argument("--no-persisted-queries", action="store_true", help="Reject automatic persisted queries")
+    parser.add_argument("--rate-limit", type=int, help="Points available per window (default: unlimited)")
+    parser.add_argument("--rate-limit-window", type=float, default=3600.0, help="Rate-limit window in seconds (default: 3600)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed with a 503 (default: 0)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests delayed by --slow-latency (default: 0)")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Extra delay of slow requests in seconds (default: 1)")
+    parser.add_argument("--seed", type=int, help="Seed of the fault-injection random generator")
+    parser.add_argument("--gzip-min-size", type=int, help="Gzip responses of at least this many bytes when accepted (default: never)")
+    args = parser.parse_args()
+
+    server = StubGraphQLServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        persisted_queries=not args.no_persisted_queries,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        seed=args.seed,
+        gzip_min_size=args.gzip_min_size,
+    )
+    print(f"Serving GraphQL stand-in at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Phase-level timing of GraphQL requests.
+
+TracingTransport is a PooledTransport whose connections time each phase of
+a request into a Span:
+
+* dns, connect, tls: only for requests that opened a new connection
+  (`reused` tells the others apart). dns is the address lookup; connect
+  tries the resolved addresses in turn, as urllib3 does, within one connect
+  timeout.
+* send: writing the request
+* ttfb: from the request sent to the status line and headers received
+  (APIM policies, the backend and the network round trip)
+* download: reading the body
+* parse: decoding the JSON body, timed by GitHubGraphQLClient when the
+  response carries a span
+
+Each span also records the request and response bytes, the status, the APIM
+request id and the response headers traced by the APIM policies, and the
+`Server-Timing` entries they emit (`apim-inbound` and `backend`), which split
+the time to first byte between APIM and the backend. The local
+graphql_rest_gateway.py also reports `apim-outbound`.
+
+A Tracer aggregates the spans into per-phase histograms exported in the
+Prometheus text format, and keeps the most recent spans for export as JSONL.
+Without a TracingTransport nothing is timed: the client only looks up a
+missing attribute on each response.
+"""
+
+import bisect
+import json
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, IO, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from graphql_transport import PooledTransport
+
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "download", "parse", "total")
+
+# Upper bounds of the histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Header carrying the APIM request id (set by github-graphql-policy.xml).
+REQUEST_ID_HEADER = "X-Apim-Request-Id"
+
+# Response headers copied into each span: those traced by the APIM policies,
+# and the ones explaining the response size and timing.
+CAPTURED_HEADERS = (
+    REQUEST_ID_HEADER,
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+    "Server-Timing",
+    "Content-Encoding",
+    "Content-Length",
+)
+
+# Span being recorded by the current thread, read by the timed connections.
+_active = threading.local()
+
+
+class Span:
+    """Timings and metadata of one HTTP request."""
+
+    __slots__ = (
+        "url", "started_at", "dns", "connect", "tls", "send", "ttfb", "download", "parse", "total",
+        "reused", "status", "request_bytes", "response_bytes", "response_wire_bytes",
+        "request_id", "headers", "server_timing", "error", "headers_at", "_tracer",
+    )
+
+    def __init__(self, url: str, tracer: "Tracer") -> None:
+        self.url = url
+        self.started_at = time.time()
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.send = 0.0
+        self.ttfb = 0.0
+        self.download = 0.0
+        self.parse: Optional[float] = None
+        self.total = 0.0
+        self.reused = True
+        self.status: Optional[int] = None
+        self.request_bytes = 0
+        self.response_bytes: Optional[int] = None
+        self.response_wire_bytes: Optional[int] = None
+        self.request_id: Optional[str] = None
+        self.headers: Dict[str, str] = {}
+        # Server-Timing entry name -> seconds
+        self.server_timing: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        # perf_counter() when the response headers arrived
+        self.headers_at = 0.0
+        self._tracer = tracer
+
+    def parsed(self, seconds: float) -> None:
+        """Record the time spent decoding the response body."""
+        self.parse = seconds
+        self._tracer.observe("parse", seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the span as a dictionary, durations in seconds."""
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("headers_at", "_tracer")}
+
+    def __str__(self) -> str:
+        phases = ", ".join(
+            f"{name} {value * 1000:.1f} ms"
+            for name in PHASES
+            for value in (getattr(self, name),)
+            if value and name != "total"
+        )
+        server = ", ".join(f"{name} {value * 1000:.1f} ms" for name, value in self.server_timing.items())
+        return (
+            f"{self.status or self.error} in {self.total * 1000:.1f} ms ({phases})"
+            + (f", server: {server}" if server else "")
+            + (f", request id {self.request_id}" if self.request_id else "")
+        )
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus model."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Count one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, cumulative count) pairs, ending with +Inf."""
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return pairs
+
+
+class Tracer:
+    """Aggregates spans into histograms and keeps the most recent ones."""
+
+    def __init__(self, keep_spans: int = 10000, buckets: Sequence[float] = DEFAULT_BUCKETS, captured_headers: Sequence[str] = CAPTURED_HEADERS) -> None:
+        """
+        Initialize the tracer.
+
+        Args:
+            keep_spans: Number of recent spans kept for export
+            buckets: Histogram bucket upper bounds, in seconds
+            captured_headers: Response headers copied into each span
+        """
+        self.buckets = tuple(buckets)
+        self.captured_headers = tuple(captured_headers)
+        self.spans: Deque[Span] = deque(maxlen=keep_spans)
+        self.phases: Dict[str, Histogram] = {}
+        self.server_timing: Dict[str, Histogram] = {}
+        self.requests: Dict[str, int] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, seconds: float, histograms: Optional[Dict[str, Histogram]] = None) -> None:
+        """Add a duration to the histogram of a phase."""
+        histograms = self.phases if histograms is None else histograms
+        with self._lock:
+            histogram = histograms.get(phase)
+            if histogram is None:
+                histogram = histograms[phase] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record(self, span: Span) -> None:
+        """Add a finished span (all phases but parse) to the aggregates."""
+        for phase in PHASES:
+            value = getattr(span, phase)
+            if phase == "parse" or (phase in ("dns", "connect", "tls") and span.reused):
+                continue
+            if phase == "tls" and not span.url.startswith("https:"):
+                continue
+            self.observe(phase, value)
+        for name, seconds in span.server_timing.items():
+            self.observe(name, seconds, self.server_timing)
+        status = str(span.status) if span.status is not None else "error"
+        with self._lock:
+            self.spans.append(span)
+            self.requests[status] = self.requests.get(status, 0) + 1
+            self.request_bytes += span.request_bytes
+            self.response_bytes += span.response_bytes or 0
+            self.response_wire_bytes += span.response_wire_bytes or span.response_bytes or 0
+
+    def prometheus(self) -> str:
+        """Return the aggregates in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def histogram(name: str, help_text: str, label: str, histograms: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, values in sorted(histograms.items()):
+                for bound, count in values.cumulative():
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {values.sum:.9f}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {values.count}')
+
+        with self._lock:
+            histogram("graphql_request_phase_seconds", "Time spent in each phase of a GraphQL request.", "phase", self.phases)
+            histogram("graphql_server_timing_seconds", "Server-Timing durations reported by APIM.", "name", self.server_timing)
+            lines.append("# HELP graphql_requests_total GraphQL requests by HTTP status.")
+            lines.append("# TYPE graphql_requests_total counter")
+            for status, count in sorted(self.requests.items()):
+                lines.append(f'graphql_requests_total{{status="{status}"}} {count}')
+            for name, help_text, value in (
+                ("graphql_request_bytes_total", "Request body bytes sent.", self.request_bytes),
+                ("graphql_response_bytes_total", "Response body bytes, decoded.", self.response_bytes),
+                ("graphql_response_wire_bytes_total", "Response body bytes as received.", self.response_wire_bytes),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the aggregates to a Prometheus text file (e.g. for the node exporter textfile collector)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+    def write_jsonl(self, stream: IO[str]) -> int:
+        """Write the kept spans, one JSON object per line; return the number written."""
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stream.write(json.dumps(span.as_dict(), separators=(",", ":")) + "\n")
+        return len(spans)
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """Parse a `Server-Timing` header into {name: seconds}; entries without `dur` are skipped."""
+    timings = {}
+    for entry in value.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, duration = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(duration.strip('"')) / 1000
+                except ValueError:
+                    pass
+    return timings
+
+
+def _span() -> Optional[Span]:
+    return getattr(_active, "span", None)
+
+
+class _TimedConnectionMixin:
+    """Times connection setup, request writing and the wait for the response headers."""
+
+    def _new_conn(self) -> socket.socket:
+        span = _span()
+        if span is None:
+            return super()._new_conn()
+        span.reused = False
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as error:
+            raise NameResolutionError(self.host, self, error) from error
+        finally:
+            span.dns = time.perf_counter() - started
+        resolved = time.perf_counter()
+        try:
+            return self._connect(addresses)
+        finally:
+            span.connect = time.perf_counter() - resolved
+
+    def _connect(self, addresses: List[Tuple[Any, ...]]) -> socket.socket:
+        """
+        Connect to the first resolved address that accepts, like urllib3's
+        create_connection, with the connect timeout covering every attempt.
+        """
+        timeout = self.timeout if self.timeout is not _DEFAULT_TIMEOUT else socket.getdefaulttimeout()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        error: Optional[OSError] = None
+        for family, kind, protocol, _, address in addresses:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                error = socket.timeout("timed out")
+                break
+            sock = None
+            try:
+                sock = socket.socket(family, kind, protocol)
+                for option in self.socket_options or ():
+                    sock.setsockopt(*option)
+                sock.settimeout(remaining)
+                if self.source_address:
+                    sock.bind(self.source_address)
+                sock.connect(address)
+                return sock
+            except OSError as failure:
+                if sock is not None:
+                    sock.close()
+                error = failure
+        if isinstance(error, socket.timeout):
+            raise ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from error
+        error = error or OSError("getaddrinfo returns an empty list")
+        raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        span = _span()
+        if span is None:
+            return super().request(*args, **kwargs)
+        started = time.perf_counter()
+        setup = span.dns + span.connect + span.tls
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            # Plain HTTP connections are opened by the first request
+            span.send = time.perf_counter() - started - (span.dns + span.connect + span.tls - setup)
+
+    def getresponse(self) -> Any:
+        span = _span()
+        if span is None:
+            return super().getresponse()
+        started = time.perf_counter()
+        try:
+            return super().getresponse()
+        finally:
+            span.headers_at = time.perf_counter()
+            span.ttfb = span.headers_at - started
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTP connection recording its phases into the active span."""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS connection recording its phases, including the TLS handshake, into the active span."""
+
+    def connect(self) -> None:
+        span = _span()
+        if span is None:
+            return super().connect()
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            span.tls = max(0.0, time.perf_counter() - started - span.dns - span.connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """Adapter whose pools open timed connections."""
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class TracingTransport(PooledTransport):
+    """PooledTransport recording a Span for every request."""
+
+    def __init__(self, tracer: Tracer, **kwargs: Any) -> None:
+        """
+        Initialize the transport.
+
+        Args:
+            tracer: Tracer receiving the spans
+            **kwargs: PooledTransport options (pool size, timeouts, keep-alive)
+        """
+        super().__init__(**kwargs)
+        self.tracer = tracer
+        adapter = _TimedAdapter(
+            pool_connections=kwargs.get("pool_connections", 4),
+            pool_maxsize=self.pool_maxsize,
+            pool_block=kwargs.get("pool_block", False),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url, headers, json=None, data=None, stream=False):
+        span = Span(url, self.tracer)
+        _active.span = span
+        started = time.perf_counter()
+        try:
+            response = super().post(url, headers, json=json, data=data, stream=stream)
+        except requests.RequestException as error:
+            span.error = type(error).__name__
+            span.total = time.perf_counter() - started
+            self.tracer.record(span)
+            raise
+        finally:
+            _active.span = None
+        finished = time.perf_counter()
+        span.total = finished - started
+        if not stream and span.headers_at:
+            span.download = finished - span.headers_at
+
+        body = response.request.body
+        span.request_bytes = len(body) if body else 0
+        span.status = response.status_code
+        span.headers = {name: response.headers[name] for name in self.tracer.captured_headers if name in response.headers}
+        span.request_id = span.headers.get(REQUEST_ID_HEADER)
+        if "Server-Timing" in span.headers:
+            span.server_timing = parse_server_timing(span.headers["Server-Timing"])
+        if not stream:
+            span.response_bytes = len(response.content)
+            span.response_wire_bytes = _wire_length(response, span.response_bytes)
+        response.trace_span = span
+        self.tracer.record(span)
+        return response
+
+
+def _wire_length(response: requests.Response, decoded: int) -> int:
+    """Bytes of the response body as received, before decoding."""
+    try:
+        received = response.raw.tell()
+        if received:
+            return received
+    except (AttributeError, OSError, ValueError):
+        pass
+    return decoded
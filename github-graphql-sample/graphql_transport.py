@@ -0,0 +1,113 @@
+"""
+HTTP transports for the GitHub GraphQL client.
+
+A transport owns the connections used by GitHubGraphQLClient.execute_query.
+The pooled transport keeps a persistent requests.Session so that repeated
+queries reuse the same TCP/TLS connection to APIM instead of paying a new
+handshake for every call.
+"""
+
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Transport:
+    """Base class for the transports used by GitHubGraphQLClient."""
+
+    def post(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        json: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        Send a POST request.
+
+        Args:
+            url: Endpoint URL
+            headers: Request headers
+            json: JSON payload (mutually exclusive with data)
+            data: Raw request body
+            stream: Defer downloading the response body
+
+        Returns:
+            The HTTP response
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release any resources held by the transport."""
+
+    def __enter__(self) -> "Transport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class SimpleTransport(Transport):
+    """Transport opening a new connection for every request."""
+
+    def __init__(self, timeout: float = 30) -> None:
+        """
+        Initialize the transport.
+
+        Args:
+            timeout: Request timeout in seconds
+        """
+        self.timeout = timeout
+
+    def post(self, url, headers, json=None, data=None, stream=False):
+        return requests.post(
+            url, headers=headers, json=json, data=data, stream=stream, timeout=self.timeout
+        )
+
+
+class PooledTransport(Transport):
+    """Transport reusing keep-alive connections from a persistent session."""
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        keep_alive: bool = True,
+    ) -> None:
+        """
+        Initialize the transport.
+
+        Args:
+            pool_connections: Number of per-host pools to keep
+            pool_maxsize: Maximum number of connections kept per host
+            pool_block: Wait for a free connection instead of opening an
+                extra one when a host has pool_maxsize connections in use
+            connect_timeout: Timeout for establishing a connection, in seconds
+            read_timeout: Timeout for reading the response, in seconds
+            keep_alive: Keep connections open between requests
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def post(self, url, headers, json=None, data=None, stream=False):
+        return self.session.post(
+            url, headers=headers, json=json, data=data, stream=stream, timeout=self.timeout
+        )
+
+    def close(self) -> None:
+        self.session.close()
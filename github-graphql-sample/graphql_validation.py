@@ -0,0 +1,201 @@
+"""
+Local validation of GraphQL requests against a cached schema.
+
+A malformed query or a variable of the wrong type otherwise costs a full
+round trip through APIM before the server's `errors` array comes back.
+QueryValidator checks requests before they are sent:
+
+* the document is parsed and validated against the schema once, and the
+  result (the document, or its errors) is kept in an LRU keyed by the
+  query hash, so repeated queries skip both steps
+* variables are coerced against the operation's variable definitions on
+  every request
+
+Invalid requests raise GraphQLError with the same error format as a server
+response. The schema comes from an SDL file (e.g. github-schema.graphql or
+factory_schema.graphql), a snapshot written by get-github-schema.py, or an
+introspection result in JSON.
+
+Requires graphql-core (`pip install graphql-core`).
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    from graphql import GraphQLSchema, build_client_schema, build_schema, get_operation_ast, parse, validate
+    from graphql import GraphQLError as DocumentError
+    from graphql.execution.values import get_variable_values
+except ImportError:  # graphql-core is optional
+    GraphQLSchema = None
+
+from graphql_errors import GraphQLError
+from graphql_persisted import query_hash
+from graphql_schema import SchemaSnapshot
+
+DEFAULT_MAX_DOCUMENTS = 256
+
+# `extensions.code` of locally detected errors
+PARSE_FAILED = "GRAPHQL_PARSE_FAILED"
+VALIDATION_FAILED = "GRAPHQL_VALIDATION_FAILED"
+BAD_USER_INPUT = "BAD_USER_INPUT"
+
+
+def load_schema(path: str) -> "GraphQLSchema":
+    """
+    Build a schema from an SDL file, a schema snapshot or an introspection JSON file.
+
+    Raises:
+        RuntimeError: If graphql-core is not installed
+    """
+    if GraphQLSchema is None:
+        raise RuntimeError("Local validation requires graphql-core: pip install graphql-core")
+    if path.endswith(".snapshot"):
+        with SchemaSnapshot(path) as snapshot:
+            return build_client_schema({"__schema": snapshot.to_introspection()})
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        result = json.loads(text)
+        result = result.get("data", result)
+        return build_client_schema(result if "__schema" in result else {"__schema": result})
+    return build_schema(text)
+
+
+def _errors(errors: List[Any], code: str) -> List[Dict[str, Any]]:
+    """Format graphql-core errors like the errors of a response."""
+    formatted = []
+    for error in errors:
+        entry = dict(error.formatted)
+        entry["extensions"] = dict(entry.get("extensions") or {}, code=code)
+        formatted.append(entry)
+    return formatted
+
+
+class ValidationStats:
+    """Counters of the document cache and of rejected requests."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters, and the hit rate, as a dictionary."""
+        return dict(vars(self), hit_rate=round(self.hit_rate, 4))
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+
+class ValidatedDocument:
+    """Outcome of parsing and validating a query: the document, or its errors."""
+
+    __slots__ = ("document", "operation", "errors")
+
+    def __init__(self, document: Any, operation: Any, errors: List[Dict[str, Any]]) -> None:
+        self.document = document
+        self.operation = operation
+        self.errors = errors
+
+
+class QueryValidator:
+    """Validates requests against a schema, caching validated documents."""
+
+    def __init__(self, schema: "GraphQLSchema", max_documents: int = DEFAULT_MAX_DOCUMENTS) -> None:
+        """
+        Initialize the validator.
+
+        Args:
+            schema: Schema to validate against (see load_schema)
+            max_documents: Maximum number of documents kept in the LRU
+        """
+        if GraphQLSchema is None:
+            raise RuntimeError("Local validation requires graphql-core: pip install graphql-core")
+        self.schema = schema
+        self.max_documents = max_documents
+        self.stats = ValidationStats()
+        self._documents: "OrderedDict[str, ValidatedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, max_documents: int = DEFAULT_MAX_DOCUMENTS) -> "QueryValidator":
+        """Create a validator for the schema in an SDL, snapshot or introspection file."""
+        return cls(load_schema(path), max_documents)
+
+    def document(self, query: str) -> ValidatedDocument:
+        """Return the parsed and validated document of a query, from the cache when possible."""
+        key = query_hash(query)
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                self._documents.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            self.stats.misses += 1
+
+        entry = self._validate_document(query)
+        with self._lock:
+            self._documents[key] = entry
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self.stats.evictions += 1
+        return entry
+
+    def validate(self, query: str, variables: Optional[Dict[str, Any]] = None) -> ValidatedDocument:
+        """
+        Check a request before it is sent.
+
+        Args:
+            query: GraphQL query string
+            variables: Variables of the request
+
+        Returns:
+            The validated document
+
+        Raises:
+            GraphQLError: If the query does not parse, does not match the
+                schema, or the variables cannot be coerced to their types
+        """
+        entry = self.document(query)
+        if entry.errors:
+            self.stats.rejected += 1
+            raise GraphQLError(entry.errors)
+        coerced = get_variable_values(self.schema, entry.operation.variable_definitions or (), variables or {})
+        if isinstance(coerced, list):
+            self.stats.rejected += 1
+            raise GraphQLError(_errors(coerced, BAD_USER_INPUT))
+        return entry
+
+    def clear(self) -> None:
+        """Drop the cached documents."""
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _validate_document(self, query: str) -> ValidatedDocument:
+        try:
+            document = parse(query)
+        except DocumentError as error:
+            return ValidatedDocument(None, None, _errors([error], PARSE_FAILED))
+        errors = validate(self.schema, document)
+        if errors:
+            return ValidatedDocument(document, None, _errors(errors, VALIDATION_FAILED))
+        # Requests are sent without an operationName
+        operation = get_operation_ast(document)
+        if operation is None:
+            message = "Must provide operation name if query contains multiple operations."
+            return ValidatedDocument(document, None, [{"message": message, "extensions": {"code": VALIDATION_FAILED}}])
+        return ValidatedDocument(document, operation, [])
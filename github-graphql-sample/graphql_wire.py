@@ -0,0 +1,282 @@
+"""
+Wire efficiency: query minification and compressed request/response bodies.
+
+* minify_query strips the indentation, comments and commas of a query, and
+  the spaces around punctuation, keeping string literals verbatim. The result
+  is cached per query text.
+* CompressingTransport wraps another transport. It gzip- or
+  brotli-compresses request bodies above a size threshold, for backends that
+  accept a `Content-Encoding` on requests, and advertises the response
+  encodings the client can decode. If the server answers 415 to a compressed
+  body, it resends the body uncompressed and stops compressing for that URL.
+  Every request produces a WireReport of its bytes before and after
+  compression.
+
+Brotli needs the `brotli` package, for requests and responses alike.
+"""
+
+import gzip
+import json
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import requests
+
+from graphql_transport import Transport
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+ENCODINGS = (GZIP, BROTLI)
+
+# Request bodies smaller than this are sent uncompressed.
+DEFAULT_MIN_SIZE = 1024
+
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 5
+
+# Block strings, strings, comments, spreads, names and numbers, punctuators
+_TOKEN = re.compile(
+    r'"""(?:\\"""|[^"]|"(?!""))*"""'
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|#[^\n\r]*"
+    r"|\.\.\."
+    r"|[_A-Za-z0-9.+-]+"
+    r"|[!$&()\[\]{}:=@|]"
+)
+_IGNORED = re.compile(r"[\s,\ufeff]+")
+
+
+@lru_cache(maxsize=512)
+def minify_query(query: str) -> str:
+    """
+    Return the canonical minified form of a query.
+
+    Comments, commas and whitespace are dropped; a single space is kept only
+    between two names or numbers. String and block string literals are
+    copied verbatim.
+
+    Args:
+        query: GraphQL query string
+
+    Returns:
+        The minified query
+    """
+    parts: List[str] = []
+    previous_word = False
+    position = 0
+    length = len(query)
+    while position < length:
+        ignored = _IGNORED.match(query, position)
+        if ignored:
+            position = ignored.end()
+            continue
+        match = _TOKEN.match(query, position)
+        if match is None:
+            # Not a GraphQL token: leave the query to the server to reject
+            return query
+        token = match.group(0)
+        position = match.end()
+        if token[0] == "#":
+            continue
+        word = token[0].isalnum() or token[0] in "_-"
+        if word and previous_word:
+            parts.append(" ")
+        parts.append(token)
+        previous_word = word
+    return "".join(parts)
+
+
+def accept_encoding() -> str:
+    """`Accept-Encoding` listing the response encodings this client can decode."""
+    return "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress a request body.
+
+    Raises:
+        ValueError: If the encoding is unknown, or is br without the brotli package
+    """
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=DEFAULT_GZIP_LEVEL if level is None else level, mtime=0)
+    if encoding == BROTLI:
+        if brotli is None:
+            raise ValueError("br compression requires the brotli package")
+        return brotli.compress(body, quality=DEFAULT_BROTLI_QUALITY if level is None else level)
+    raise ValueError(f"Unknown encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+
+
+class WireReport:
+    """Bytes of one request and its response, before and after compression."""
+
+    __slots__ = (
+        "url", "request_bytes", "request_wire_bytes", "request_encoding",
+        "response_bytes", "response_wire_bytes", "response_encoding", "status", "seconds",
+    )
+
+    def __init__(self, url: str, request_bytes: int, request_wire_bytes: int, request_encoding: Optional[str]) -> None:
+        self.url = url
+        self.request_bytes = request_bytes
+        self.request_wire_bytes = request_wire_bytes
+        self.request_encoding = request_encoding
+        self.response_bytes: Optional[int] = None
+        self.response_wire_bytes: Optional[int] = None
+        self.response_encoding: Optional[str] = None
+        self.status: Optional[int] = None
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as a dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self) -> str:
+        def side(raw: Optional[int], wire: Optional[int], encoding: Optional[str]) -> str:
+            if raw is None:
+                return "streamed"
+            if not encoding or wire is None:
+                return f"{raw} B"
+            return f"{raw} B -> {wire} B {encoding} ({wire / raw:.0%})" if raw else f"0 B {encoding}"
+
+        return (
+            f"{self.status} in {self.seconds * 1000:.1f} ms, "
+            f"request {side(self.request_bytes, self.request_wire_bytes, self.request_encoding)}, "
+            f"response {side(self.response_bytes, self.response_wire_bytes, self.response_encoding)}"
+        )
+
+
+class WireStats:
+    """Totals over every request of a transport."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.request_bytes = 0
+        self.request_wire_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+        self.compressed_requests = 0
+        self.compressed_responses = 0
+        self.rejected_encodings = 0
+
+    def add(self, report: WireReport) -> None:
+        """Count a finished request."""
+        self.requests += 1
+        self.request_bytes += report.request_bytes
+        self.request_wire_bytes += report.request_wire_bytes
+        self.compressed_requests += bool(report.request_encoding)
+        if report.response_bytes is not None:
+            self.response_bytes += report.response_bytes
+            self.response_wire_bytes += report.response_wire_bytes or report.response_bytes
+            self.compressed_responses += bool(report.response_encoding)
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return the counters as a dictionary."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+
+class CompressingTransport(Transport):
+    """Transport compressing request bodies and negotiating compressed responses."""
+
+    def __init__(
+        self,
+        transport: Transport,
+        encoding: Optional[str] = GZIP,
+        min_size: int = DEFAULT_MIN_SIZE,
+        level: Optional[int] = None,
+        on_report: Optional[Callable[[WireReport], None]] = None,
+        keep_reports: int = 100,
+    ) -> None:
+        """
+        Initialize the transport.
+
+        Args:
+            transport: Transport sending the requests
+            encoding: Request body encoding, "gzip" or "br" (None: never
+                compress request bodies, only negotiate responses)
+            min_size: Smallest request body compressed, in bytes
+            level: Compression level (gzip 1-9, brotli quality 0-11)
+            on_report: Called with the report of every request
+            keep_reports: Number of recent reports kept in `reports`
+        """
+        if encoding is not None:
+            compress(b"", encoding, level)  # Fail early on an unusable encoding
+        self.transport = transport
+        self.encoding = encoding
+        self.min_size = min_size
+        self.level = level
+        self.on_report = on_report
+        self.reports: Deque[WireReport] = deque(maxlen=keep_reports)
+        self.stats = WireStats()
+        self._uncompressed_urls: set = set()
+        self._lock = threading.Lock()
+
+    def post(self, url, headers, json=None, data=None, stream=False):
+        if json is not None:
+            data = _dumps(json)
+        body = data if isinstance(data, bytes) else (data or "").encode("utf-8")
+        headers = dict(headers, **{"Accept-Encoding": accept_encoding()})
+
+        wire, encoding = body, None
+        if self.encoding and len(body) >= self.min_size and url not in self._uncompressed_urls:
+            wire, encoding = compress(body, self.encoding, self.level), self.encoding
+        started = time.perf_counter()
+        response = self.transport.post(url, headers=_with_encoding(headers, encoding), data=wire, stream=stream)
+        if encoding and response.status_code == 415:
+            # The backend does not accept compressed requests
+            with self._lock:
+                self._uncompressed_urls.add(url)
+                self.stats.rejected_encodings += 1
+            response.close()
+            wire, encoding = body, None
+            response = self.transport.post(url, headers=headers, data=wire, stream=stream)
+
+        report = WireReport(url, len(body), len(wire), encoding)
+        report.status = response.status_code
+        report.seconds = time.perf_counter() - started
+        if not stream:
+            report.response_bytes = len(response.content)
+            report.response_encoding = response.headers.get("Content-Encoding")
+            report.response_wire_bytes = _wire_length(response, report.response_bytes)
+        with self._lock:
+            self.reports.append(report)
+            self.stats.add(report)
+        if self.on_report is not None:
+            self.on_report(report)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _with_encoding(headers: Dict[str, str], encoding: Optional[str]) -> Dict[str, str]:
+    if encoding is None:
+        return headers
+    return dict(headers, **{"Content-Encoding": encoding})
+
+
+def _wire_length(response: requests.Response, decoded: int) -> int:
+    """Bytes of the response body as received, before decoding."""
+    try:
+        received = response.raw.tell()
+        if received:
+            return received
+    except (AttributeError, OSError, ValueError):
+        pass
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else decoded
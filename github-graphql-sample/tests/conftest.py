@@ -0,0 +1,22 @@
+"""Shared fixtures: a local stand-in server and a client pointed at it."""
+
+from typing import Iterator
+
+import pytest
+
+from github_graphql_client import GitHubGraphQLClient
+from graphql_stub_server import StubGraphQLServer
+
+
+@pytest.fixture
+def stub() -> Iterator[StubGraphQLServer]:
+    """Stand-in GitHub GraphQL server on a free port."""
+    with StubGraphQLServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(stub: StubGraphQLServer) -> Iterator[GitHubGraphQLClient]:
+    """Client sending its queries to the `stub` server."""
+    with GitHubGraphQLClient("test-token", api_url=stub.url) as github:
+        yield github
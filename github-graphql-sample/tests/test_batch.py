@@ -0,0 +1,74 @@
+"""Batched repository lookups (graphql_batch) against the local stand-in server."""
+
+from graphql_batch import fetch_repositories, split_batch_result
+from graphql_errors import GraphQLError
+from graphql_projection import repository_fragment
+
+FRAGMENT = repository_fragment(("name", "stargazerCount"))
+
+
+def test_results_follow_input_order(stub, client):
+    pairs = [("octocat", f"repo-{i}") for i in range(5)]
+
+    results = fetch_repositories(client, pairs, FRAGMENT)
+
+    assert [repo["name"] for repo in results] == [name for _, name in pairs]
+    assert stub.request_count == 1
+
+
+def test_missing_repository_is_none(client):
+    pairs = [("octocat", "Hello-World"), ("octocat", "missing-repo"), ("octocat", "Spoon-Knife")]
+
+    results = fetch_repositories(client, pairs, FRAGMENT)
+
+    assert results[0]["name"] == "Hello-World"
+    assert results[1] is None
+    assert results[2]["name"] == "Spoon-Knife"
+
+
+def test_forbidden_repository_is_a_per_alias_error(client):
+    pairs = [("octocat", "forbidden-repo"), ("octocat", "Hello-World"), ("octocat", "missing-repo")]
+
+    results = fetch_repositories(client, pairs, FRAGMENT)
+
+    assert isinstance(results[0], GraphQLError)
+    assert results[0].codes == ["FORBIDDEN"]
+    assert [error["path"] for error in results[0].errors] == [["r0"]]
+    assert results[0].data == {"repository": None}
+    assert results[1]["name"] == "Hello-World"
+    assert results[2] is None
+
+
+def test_oversized_lists_are_split_by_node_limit(stub, client):
+    pairs = [("octocat", f"repo-{i}") for i in range(120)]
+
+    results = fetch_repositories(client, pairs, FRAGMENT, max_nodes=50)
+
+    assert stub.request_count == 3
+    assert [repo["name"] for repo in results] == [name for _, name in pairs]
+
+
+def test_oversized_lists_are_split_by_cost(stub, client):
+    # One node for the repository plus five for `languages(first: 5)`
+    fragment = repository_fragment(("name", "languages"))
+    pairs = [("octocat", f"repo-{i}") for i in range(12)]
+
+    results = fetch_repositories(client, pairs, fragment, max_cost=30)
+
+    assert stub.request_count == 3
+    assert len(results) == 12 and all(repo["name"] == name for repo, (_, name) in zip(results, pairs))
+
+
+def test_transport_failure_fails_the_whole_batch():
+    failure = ConnectionError("connection reset")
+
+    assert split_batch_result(3, failure) == [failure] * 3
+
+
+def test_errors_without_path_fail_lookups_without_data():
+    outcome = GraphQLError([{"message": "Something went wrong"}], {"r0": {"name": "a"}, "r1": None})
+
+    results = split_batch_result(2, outcome)
+
+    assert results[0] == {"name": "a"}
+    assert isinstance(results[1], GraphQLError)
@@ -0,0 +1,230 @@
+"""Response caching in GitHubGraphQLClient, against the local stand-in server."""
+
+import pytest
+
+from github_graphql_client import VIEWER_QUERY, GitHubGraphQLClient
+from graphql_cache import EXPIRED, FRESH, ResponseCache, cache_key
+from graphql_resilience import is_idempotent
+from graphql_stub_server import StubGraphQLServer
+
+STAR_MUTATION = """
+mutation Star($id: ID!) {
+    addStar(input: {starrableId: $id}) { starrable { ...Starred } }
+}
+"""
+STARRED_FRAGMENT = """
+fragment Starred on Repository {
+    stargazerCount
+}
+"""
+
+
+def echo_handler(payload, headers):
+    """Answer every operation, mutations included, with the same data."""
+    return 200, {"data": {"addStar": {"starrable": {"stargazerCount": 1}}}}, {}
+
+
+@pytest.fixture
+def cached_client():
+    with StubGraphQLServer(handler=echo_handler) as server:
+        with GitHubGraphQLClient("test-token", api_url=server.url, cache=ResponseCache(ttl=60)) as client:
+            yield server, client
+
+
+def test_repeated_query_is_served_from_the_cache(stub):
+    with GitHubGraphQLClient("test-token", api_url=stub.url, cache=ResponseCache(ttl=60)) as client:
+        first = client.execute_query(VIEWER_QUERY)
+        second = client.execute_query(VIEWER_QUERY)
+
+    assert first == second
+    assert stub.request_count == 1
+    assert client.cache.stats.hits == 1
+
+
+@pytest.mark.parametrize(
+    "mutation",
+    [
+        STAR_MUTATION,
+        "# Star a repository\n" + STAR_MUTATION,
+        STARRED_FRAGMENT + STAR_MUTATION,
+    ],
+    ids=["plain", "after-comment", "after-fragment"],
+)
+def test_mutations_are_never_cached(cached_client, mutation):
+    server, client = cached_client
+
+    client.execute_query(mutation, {"id": "R_1"})
+    client.execute_query(mutation, {"id": "R_1"})
+
+    assert server.request_count == 2
+    assert client.cache.stats.hits == client.cache.stats.misses == 0
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("query { viewer { login } }", True),
+        ("{ viewer { login } }", True),
+        ("# mutation in a comment\nquery { viewer { login } }", True),
+        ('query($mutation: String) { search(query: "mutation") { issueCount } }', True),
+        ('query { search(query: """\nmutation\n""") { issueCount } }', True),
+        ("# Star a repository\n" + STAR_MUTATION, False),
+        (STARRED_FRAGMENT + STAR_MUTATION, False),
+        ("query A { viewer { login } }\nmutation B { addStar }", False),
+        ("  subscription { issueAdded }", False),
+    ],
+)
+def test_is_idempotent(query, expected):
+    assert is_idempotent(query) is expected
+
+
+class FakeClock:
+    """Time that only moves when the test says so."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Versioned:
+    """Handler answering the viewer query with a version and its ETag, and 304 to a matching If-None-Match."""
+
+    def __init__(self):
+        self.version = 1
+        self.conditions = []
+
+    def __call__(self, payload, headers):
+        etag = f'"v{self.version}"'
+        self.conditions.append(headers.get("If-None-Match"))
+        if headers.get("If-None-Match") == etag:
+            return 304, {}, {"ETag": etag}
+        return 200, {"data": {"viewer": {"login": "octocat", "version": self.version}}}, {"ETag": etag}
+
+
+@pytest.fixture
+def versioned():
+    handler = Versioned()
+    with StubGraphQLServer(handler=handler) as server:
+        yield server, handler
+
+
+def version_of(result):
+    return result["data"]["viewer"]["version"]
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.store("key", {"data": 1})
+
+    clock.now += 59
+    assert cache.lookup("key")[1] == FRESH
+
+    clock.now += 1
+    entry, state = cache.lookup("key")
+    # Expired entries are still returned for their ETag
+    assert state == EXPIRED and entry.value == {"data": 1}
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.store("a", {"data": "a"})
+    cache.store("b", {"data": "b"})
+    cache.lookup("a")
+
+    cache.store("c", {"data": "c"})
+
+    assert len(cache) == 2 and cache.stats.evictions == 1
+    assert cache.lookup("b") == (None, EXPIRED)
+    assert cache.lookup("a")[1] == cache.lookup("c")[1] == FRESH
+
+
+def test_client_sends_the_query_again_after_the_ttl(versioned):
+    server, handler = versioned
+    clock = FakeClock()
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=ResponseCache(ttl=60, clock=clock)) as client:
+        client.execute_query(VIEWER_QUERY)
+        clock.now += 30
+        client.execute_query(VIEWER_QUERY)
+        assert server.request_count == 1
+
+        handler.version = 2
+        clock.now += 30
+        assert version_of(client.execute_query(VIEWER_QUERY)) == 2
+        assert server.request_count == 2
+
+
+def test_stale_entry_is_served_while_revalidated_in_the_background(versioned):
+    server, handler = versioned
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, stale_ttl=30, clock=clock)
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=cache) as client:
+        client.execute_query(VIEWER_QUERY)
+        handler.version = 2
+        clock.now += 70
+
+        assert version_of(client.execute_query(VIEWER_QUERY)) == 1
+        client._revalidation_executor.shutdown(wait=True)
+        assert server.request_count == 2 and cache.stats.revalidations == 1
+
+        assert version_of(client.execute_query(VIEWER_QUERY)) == 2
+        assert server.request_count == 2
+
+    # Past the stale window the client waits for the server
+    handler.version = 3
+    clock.now += 100
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=cache) as client:
+        assert version_of(client.execute_query(VIEWER_QUERY)) == 3
+    assert cache.stats.revalidations == 1
+
+
+def test_expired_entry_is_revalidated_with_its_etag(versioned):
+    server, handler = versioned
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=cache) as client:
+        first = client.execute_query(VIEWER_QUERY)
+        clock.now += 60
+
+        assert client.execute_query(VIEWER_QUERY) == first
+        assert cache.stats.not_modified == 1
+        # The 304 restarted the TTL
+        clock.now += 30
+        client.execute_query(VIEWER_QUERY)
+
+        handler.version = 2
+        clock.now += 30
+        assert version_of(client.execute_query(VIEWER_QUERY)) == 2
+
+    assert handler.conditions == [None, '"v1"', '"v1"']
+    assert server.request_count == 3
+
+
+def test_disk_tier_survives_a_new_cache(versioned, tmp_path):
+    server, handler = versioned
+    path = str(tmp_path / "responses.sqlite")
+    clock = FakeClock()
+
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=ResponseCache(ttl=60, path=path, clock=clock)) as client:
+        first = client.execute_query(VIEWER_QUERY)
+        client.cache.close()
+
+    cache = ResponseCache(ttl=60, path=path, clock=clock)
+    with GitHubGraphQLClient("test-token", api_url=server.url, cache=cache) as client:
+        assert client.execute_query(VIEWER_QUERY) == first
+    assert cache.stats.disk_hits == 1 and server.request_count == 1
+
+    # Another token does not read the entry
+    with GitHubGraphQLClient("other-token", api_url=server.url, cache=cache) as client:
+        client.execute_query(VIEWER_QUERY)
+    assert server.request_count == 2
+    cache.close()
+
+    # Entries past their stale window are dropped when the file is opened
+    clock.now += 61
+    cache = ResponseCache(ttl=60, path=path, clock=clock)
+    assert cache.lookup(cache_key(VIEWER_QUERY, None, "test-token")) == (None, EXPIRED)
+    cache.close()
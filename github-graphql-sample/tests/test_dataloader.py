@@ -0,0 +1,133 @@
+"""Request coalescing of DataLoader and AsyncDataLoader against the local stand-in server."""
+
+import asyncio
+import threading
+
+import pytest
+
+from github_graphql_client import AsyncGitHubGraphQLClient
+from graphql_dataloader import AsyncDataLoader, DataLoader
+from graphql_errors import GraphQLError
+
+VIEWER_QUERY = "query { viewer { login name } }"
+
+
+def in_threads(count, target):
+    """Run target(index) in threads started together; return the results, or exceptions, in order."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        try:
+            results[index] = target(index)
+        except Exception as error:
+            results[index] = error
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_queries_share_one_request(stub, client):
+    stub.latency = 0.3
+    loader = DataLoader(client)
+
+    results = in_threads(10, lambda index: loader.execute_query(VIEWER_QUERY))
+
+    assert stub.request_count == 1
+    assert all(result is results[0] for result in results)
+    assert loader.stats.calls == 10 and loader.stats.shared == 9
+    # Once delivered, results are not kept
+    loader.execute_query(VIEWER_QUERY)
+    assert stub.request_count == 2
+
+
+def test_concurrent_identical_lookups_share_one_request(stub, client):
+    stub.latency = 0.3
+    loader = DataLoader(client, window=0)
+
+    results = in_threads(10, lambda index: loader.load_repository("octocat", "Hello-World" if index % 2 else "hello-world"))
+
+    assert stub.request_count == 1
+    assert all(result is results[0] for result in results)
+    assert loader.stats.batches == 1 and loader.stats.max_batch_size == 1
+
+
+def test_lookups_in_one_window_share_one_batch(stub, client):
+    loader = DataLoader(client, window=0.5)
+
+    results = in_threads(12, lambda index: loader.load_repository("octocat", f"repo-{index}") if index % 3 else loader.load_user(f"user-{index}"))
+
+    assert stub.request_count == 2
+    assert loader.stats.batch_sizes == {4: 1, 8: 1}
+    assert [result["name"] if index % 3 else result["login"] for index, result in enumerate(results)] == [
+        f"repo-{index}" if index % 3 else f"user-{index}" for index in range(12)
+    ]
+
+
+def test_full_batches_are_sent_without_waiting(stub, client):
+    loader = DataLoader(client, max_batch=4)
+
+    results = loader.load_repositories([("octocat", f"repo-{index}") for index in range(10)])
+
+    assert stub.request_count == 3
+    assert loader.stats.batch_sizes == {2: 1, 4: 2}
+    assert [repository["name"] for repository in results] == [f"repo-{index}" for index in range(10)]
+
+
+def test_an_error_for_one_lookup_does_not_fail_the_others(stub, client):
+    loader = DataLoader(client, window=0.5)
+    names = ["Hello-World", "forbidden-repo", "missing-repo", "Spoon-Knife"]
+
+    results = in_threads(len(names), lambda index: loader.load_repository("octocat", names[index]))
+
+    assert stub.request_count == 1
+    assert results[0]["name"] == "Hello-World" and results[3]["name"] == "Spoon-Knife"
+    assert isinstance(results[1], GraphQLError) and results[1].codes == ["FORBIDDEN"]
+    assert results[2] is None
+
+
+def test_a_failed_request_fails_every_caller_sharing_it(stub, client):
+    stub.latency = 0.3
+    loader = DataLoader(client)
+
+    results = in_threads(5, lambda index: loader.execute_query("query { unsupported }"))
+
+    assert stub.request_count == 1
+    assert all(isinstance(result, GraphQLError) for result in results)
+
+
+def test_async_lookups_share_one_batch(stub):
+    async def load():
+        client = AsyncGitHubGraphQLClient("test-token", api_url=stub.url)
+        loader = AsyncDataLoader(client, window=0.05)
+        try:
+            return await asyncio.gather(
+                *(loader.load_repository("octocat", name) for name in ["Hello-World", "forbidden-repo", "hello-world", "Spoon-Knife"]),
+                return_exceptions=True,
+            ), loader.stats
+        finally:
+            await loader.close()
+            await client.close()
+
+    results, stats = asyncio.run(load())
+
+    assert stub.request_count == 1
+    assert stats.batch_sizes == {3: 1} and stats.shared == 1
+    assert results[0] is results[2] and results[3]["name"] == "Spoon-Knife"
+    assert isinstance(results[1], GraphQLError)
+
+
+@pytest.mark.parametrize("window", [0, 0.05])
+def test_sequential_lookups_are_not_shared(stub, client, window):
+    loader = DataLoader(client, window=window)
+
+    first = loader.load_user("octocat")
+    second = loader.load_user("octocat")
+
+    assert first == second and first is not second
+    assert stub.request_count == 2 and loader.stats.shared == 0
@@ -0,0 +1,51 @@
+"""Response cache of the REST facade gateway (graphql_rest_gateway)."""
+
+import pytest
+import requests
+
+from graphql_rest_gateway import RestGateway, cache_key
+from graphql_stub_server import StubGraphQLServer, default_handler, rate_limited_body
+
+REPOSITORIES = "/github-rest/user/octocat/repositories?limit=5"
+
+
+def get(gateway, authorization=None):
+    headers = {"Authorization": authorization} if authorization else {}
+    response = requests.get(gateway.url + REPOSITORIES, headers=headers, timeout=10)
+    return response.json(), response.headers.get("X-Cache")
+
+
+def test_cache_key_ignores_the_subscription_key_and_parameter_order():
+    assert cache_key("/r", "b=2&subscription-key=x&a=1") == cache_key("/r", "a=1&b=2")
+    assert cache_key("/r", "a=1", "Bearer one") != cache_key("/r", "a=1", "Bearer two")
+    assert "Bearer" not in cache_key("/r", "a=1", "Bearer one")
+
+
+def test_errors_are_not_cached():
+    answers = [(200, rate_limited_body("60"), {})]
+
+    def handler(payload, headers):
+        return answers.pop() if answers else default_handler(payload, headers)
+
+    with StubGraphQLServer(handler=handler) as stub, RestGateway({"github": stub.url}, {"github": "t"}, cache_ttl=60) as gateway:
+        body, state = get(gateway)
+        assert body["error"] == "GraphQL Error" and state == "MISS"
+
+        body, state = get(gateway)
+        assert len(body["repositories"]["nodes"]) == 5 and state == "MISS"
+
+        assert get(gateway) == (body, "HIT")
+        assert stub.request_count == 2
+
+
+@pytest.mark.parametrize(
+    "tokens, shared",
+    [({}, False), ({"github": "gateway-token"}, True)],
+    ids=["forwarded-credential", "gateway-token"],
+)
+def test_callers_share_responses_only_with_a_gateway_token(tokens, shared):
+    with StubGraphQLServer() as stub, RestGateway({"github": stub.url}, tokens, cache_ttl=60) as gateway:
+        assert get(gateway, "Bearer one")[1] == "MISS"
+        assert get(gateway, "Bearer two")[1] == ("HIT" if shared else "MISS")
+        assert get(gateway, "Bearer one")[1] == "HIT"
+        assert stub.request_count == (1 if shared else 2)
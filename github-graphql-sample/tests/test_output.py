@@ -0,0 +1,46 @@
+"""Output formats (graphql_output) and the client's output to a closed pipe."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+from graphql_output import JsonWriter
+
+CLIENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "github_graphql_client.py")
+
+
+def test_json_writer_closes_once():
+    stream = io.BytesIO()
+    writer = JsonWriter(stream)
+    writer.write({"name": "Hello-World"})
+
+    writer.close()
+    writer.close()
+
+    assert json.loads(stream.getvalue()) == [{"name": "Hello-World"}]
+
+
+def test_closed_pipe_ends_the_run_quietly(stub, tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    env = dict(os.environ, GITHUB_TOKEN="test-token", GITHUB_GRAPHQL_API_URL=stub.url)
+    read, write = os.pipe()
+    os.close(read)
+    try:
+        # 50 records fit in the writer's buffer: the only write is the final flush
+        run = subprocess.run(
+            [sys.executable, CLIENT, "--format", "ndjson", "--trace-jsonl", str(trace), "repos", "octocat", "--limit", "50"],
+            stdout=write,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=str(tmp_path),
+            timeout=60,
+        )
+    finally:
+        os.close(write)
+
+    assert run.returncode == 1
+    assert b"Traceback" not in run.stderr and b"BrokenPipeError" not in run.stderr
+    # The cleanup after the output still runs
+    assert len(trace.read_text().splitlines()) == stub.request_count > 0
@@ -0,0 +1,166 @@
+"""Pacing of RateLimitScheduler, with an injected clock and sleep."""
+
+import threading
+
+import pytest
+
+from graphql_ratelimit import BUDGET, CONCURRENCY, RETRY_AFTER, RateLimitScheduler
+
+# Wall-clock time at which the fake clock starts
+EPOCH = 1_700_000_000.0
+
+
+class FakeClock:
+    """Monotonic and wall-clock time that only move when slept on."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def wall(self):
+        return EPOCH + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def scheduler(clock, **kwargs):
+    return RateLimitScheduler(clock=clock, wall_clock=clock.wall, sleep=clock.sleep, **kwargs)
+
+
+def send(limiter, count, cost=1.0):
+    for _ in range(count):
+        limiter.acquire(cost)
+        limiter.release(cost)
+
+
+def test_bucket_spends_the_burst_then_refills_at_the_budget_rate():
+    clock = FakeClock()
+    limiter = scheduler(clock, budget=3600, window=3600, burst=5)
+
+    send(limiter, 5)
+    assert clock.sleeps == []
+
+    send(limiter, 1)
+    send(limiter, 1, cost=3)
+    assert clock.sleeps == [1.0, 3.0]
+
+    clock.now += 60
+    send(limiter, 5)
+    assert clock.sleeps == [1.0, 3.0]
+    assert limiter.delay_summary() == {BUDGET: (2, 4.0)}
+
+
+def test_cost_above_the_burst_waits_for_a_full_bucket():
+    clock = FakeClock()
+    limiter = scheduler(clock, budget=3600, window=3600, burst=5)
+    send(limiter, 5)
+
+    assert limiter.acquire(cost=50) == 5.0
+
+
+def test_server_budget_sets_the_burst_and_the_rate():
+    clock = FakeClock()
+    limiter = scheduler(clock, burst=100, reserve=100)
+
+    # 1000 points to spend in the 100 seconds left: the burst, then 9 points a second
+    limiter.observe(200, {"X-RateLimit-Remaining": "1100", "X-RateLimit-Reset": str(EPOCH + 99)})
+    send(limiter, 100)
+    assert clock.sleeps == []
+
+    send(limiter, 1, cost=9)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_exhausted_budget_waits_for_the_reset():
+    clock = FakeClock()
+    limiter = scheduler(clock)
+
+    limiter.observe(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(EPOCH + 60)})
+    send(limiter, 1)
+
+    # The reset time has one-second resolution: one more second of grace
+    assert clock.sleeps == [61.0]
+    assert limiter.remaining is None and limiter.reset_at is None
+
+
+def test_rate_limit_data_in_the_body_is_read():
+    clock = FakeClock()
+    limiter = scheduler(clock)
+    # EPOCH + 60
+    body = {"data": {"rateLimit": {"cost": 7, "remaining": 0, "resetAt": "2023-11-14T22:14:20Z"}}}
+
+    limiter.observe(200, {}, body, query_key="search")
+    send(limiter, 1)
+
+    assert limiter.expected_cost("search") == 7.0 and limiter.expected_cost("other") == 1.0
+    assert clock.sleeps == [61.0]
+
+
+@pytest.mark.parametrize(
+    "status, headers, body, pause",
+    [
+        (429, {"Retry-After": "7"}, None, 7.0),
+        (200, {}, {"errors": [{"message": "Rate limited", "extensions": {"code": "RATE_LIMITED", "retryAfter": "4"}}]}, 4.0),
+        (403, {"Retry-After": "30"}, None, 30.0),
+        (429, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(EPOCH + 20)}, None, 20.0),
+    ],
+    ids=["retry-after-header", "retry-after-extension", "secondary-limit", "reset-time"],
+)
+def test_rate_limit_responses_pause_requests(status, headers, body, pause):
+    clock = FakeClock()
+    limiter = scheduler(clock, max_concurrency=8)
+
+    limiter.observe(status, headers, body)
+    send(limiter, 1)
+
+    assert clock.sleeps[0] == pause
+    assert limiter.delay_summary()[RETRY_AFTER] == (1, pause)
+    assert limiter.concurrency_limit == 4
+
+
+def test_pauses_are_not_shortened_by_a_later_retry_after():
+    clock = FakeClock()
+    limiter = scheduler(clock)
+
+    limiter.observe(429, {"Retry-After": "10"})
+    clock.now += 2
+    limiter.observe(429, {"Retry-After": "3"})
+    send(limiter, 1)
+
+    assert clock.sleeps == [8.0]
+
+
+def test_concurrency_is_halved_on_limits_and_raised_on_successes():
+    limiter = scheduler(FakeClock(), max_concurrency=4)
+
+    limiter.observe(429, {})
+    limiter.observe(429, {})
+    assert limiter.concurrency_limit == 1
+
+    limits = []
+    for _ in range(8):
+        limiter.observe(200, {})
+        limits.append(limiter.concurrency_limit)
+    assert limits == [2, 2, 3, 3, 3, 4, 4, 4]
+
+
+def test_requests_above_the_concurrency_limit_wait_for_a_release():
+    clock = FakeClock()
+    limiter = scheduler(clock, max_concurrency=2)
+    limiter.acquire()
+    limiter.acquire()
+
+    waiting = threading.Thread(target=limiter.acquire)
+    waiting.start()
+    waiting.join(0.2)
+    assert waiting.is_alive() and limiter.in_flight == 2
+
+    limiter.release()
+    waiting.join(5)
+    assert not waiting.is_alive() and limiter.in_flight == 2
+    assert CONCURRENCY in limiter.delay_summary() and clock.sleeps == []
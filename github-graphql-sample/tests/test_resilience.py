@@ -0,0 +1,156 @@
+"""Retries and hedged requests (graphql_resilience) against the fault-injecting stand-in server."""
+
+import random
+import threading
+import time
+
+import pytest
+import requests
+
+from github_graphql_client import VIEWER_QUERY, GitHubGraphQLClient
+from graphql_resilience import Hedger, RetryPolicy, is_idempotent
+from graphql_stub_server import StubGraphQLServer, default_handler, rate_limited_body
+
+MUTATION = "# Star a repository\nmutation { addStar(input: {starrableId: \"R_1\"}) { clientMutationId } }"
+
+
+def answer_everything(payload, headers):
+    """Answer queries like the default handler, and mutations with empty data."""
+    if not is_idempotent(payload.get("query") or ""):
+        return 200, {"data": {"addStar": {"clientMutationId": None}}}, {}
+    return default_handler(payload, headers)
+
+
+def failing_first(status, body, headers, failures=1):
+    """Handler failing its first `failures` requests with a canned response."""
+    calls = []
+    lock = threading.Lock()
+
+    def handler(payload, request_headers):
+        with lock:
+            calls.append(payload)
+            failed = len(calls) <= failures
+        if failed:
+            return status, body, headers
+        return default_handler(payload, request_headers)
+
+    return handler
+
+
+def retrying_client(server, sleeps, max_attempts=4, hedger=None):
+    policy = RetryPolicy(max_attempts=max_attempts, rng=random.Random(42).random, sleep=sleeps.append)
+    return GitHubGraphQLClient("test-token", api_url=server.url, retry_policy=policy, hedger=hedger)
+
+
+def test_retry_honors_retry_after_header():
+    sleeps = []
+    handler = failing_first(429, {"errors": [{"message": "Too many requests"}]}, {"Retry-After": "2"})
+    with StubGraphQLServer(handler=handler) as server, retrying_client(server, sleeps) as client:
+        result = client.execute_query(VIEWER_QUERY)
+
+    assert result["data"]["viewer"]["login"]
+    assert server.request_count == 2
+    assert sleeps == [2.0]
+
+
+def test_retry_honors_retry_after_extension():
+    sleeps = []
+    handler = failing_first(429, rate_limited_body("3"), {})
+    with StubGraphQLServer(handler=handler) as server, retrying_client(server, sleeps) as client:
+        client.execute_query(VIEWER_QUERY)
+
+    assert server.request_count == 2
+    assert sleeps == [3.0]
+
+
+def test_long_retry_after_fails_immediately():
+    sleeps = []
+    handler = failing_first(429, rate_limited_body("3600"), {})
+    with StubGraphQLServer(handler=handler) as server, retrying_client(server, sleeps) as client:
+        with pytest.raises(requests.HTTPError):
+            client.execute_query(VIEWER_QUERY)
+
+    assert server.request_count == 1
+    assert sleeps == []
+
+
+def test_retry_stops_after_max_attempts():
+    sleeps = []
+    with StubGraphQLServer(error_rate=1.0, seed=7) as server, retrying_client(server, sleeps, max_attempts=3) as client:
+        with pytest.raises(requests.HTTPError) as failure:
+            client.execute_query(VIEWER_QUERY)
+
+    assert failure.value.response.status_code == 503
+    assert server.request_count == 3
+    assert len(sleeps) == 2
+    # Full jitter below the exponential ceiling: 0.2 s, then 0.4 s
+    assert 0 <= sleeps[0] <= 0.2 and 0 <= sleeps[1] <= 0.4
+
+
+def test_retries_recover_from_injected_errors():
+    sleeps = []
+    with StubGraphQLServer(error_rate=0.3, seed=3) as server, retrying_client(server, sleeps, max_attempts=10) as client:
+        for _ in range(30):
+            assert client.execute_query(VIEWER_QUERY)["data"]["viewer"]
+
+    assert server.injected_errors > 0
+    assert server.request_count == 30 + server.injected_errors
+    assert len(sleeps) == server.injected_errors
+
+
+@pytest.mark.parametrize(
+    "status, body, headers",
+    [
+        (503, {"errors": [{"message": "Internal error", "extensions": {"code": "INTERNAL_ERROR"}}]}, {}),
+        (429, rate_limited_body("1"), {"Retry-After": "1"}),
+    ],
+    ids=["internal-error", "rate-limited"],
+)
+def test_mutations_are_never_retried(status, body, headers):
+    sleeps = []
+    with StubGraphQLServer(handler=failing_first(status, body, headers)) as server, retrying_client(server, sleeps) as client:
+        with pytest.raises(requests.HTTPError):
+            client.execute_query(MUTATION)
+
+    assert server.request_count == 1
+    assert sleeps == []
+
+
+def warm_up(client, hedger, url):
+    """Send fast queries until the hedger has enough samples to hedge."""
+    while hedger.threshold(url) is None:
+        client.execute_query(VIEWER_QUERY)
+
+
+def test_mutations_are_never_hedged():
+    hedger = Hedger(min_samples=5)
+    with StubGraphQLServer(handler=answer_everything, slow_latency=0.3, seed=1) as server:
+        with GitHubGraphQLClient("test-token", api_url=server.url, hedger=hedger) as client:
+            warm_up(client, hedger, server.url)
+            requests_before = server.request_count
+            server.slow_rate = 1.0
+
+            client.execute_query(MUTATION)
+
+    assert server.request_count == requests_before + 1
+    assert hedger.hedges_sent == 0
+
+
+def test_hedge_returns_the_fast_response_and_cancels_the_slow_one():
+    hedger = Hedger(min_samples=5)
+    with StubGraphQLServer(slow_latency=1.0, seed=1) as server:
+        with GitHubGraphQLClient("test-token", api_url=server.url, hedger=hedger) as client:
+            warm_up(client, hedger, server.url)
+            # With seed 1, the first attempt draws a slow delay and the hedge a fast one
+            server.slow_rate = 0.5
+
+            started = time.perf_counter()
+            result = client.execute_query(VIEWER_QUERY)
+            elapsed = time.perf_counter() - started
+
+    assert result["data"]["viewer"]["login"]
+    assert elapsed < server.slow_latency / 2
+    assert server.injected_slow == 1
+    assert hedger.hedges_sent == 1
+    assert hedger.hedges_won == 1
+    assert hedger.attempts_cancelled == 1
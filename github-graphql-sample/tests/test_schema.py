@@ -0,0 +1,93 @@
+"""Schema probe hashes (graphql_schema), computed with graphql-core."""
+
+import pytest
+
+from graphql_schema import INTROSPECTION_QUERY, PROBE_QUERY, content_hash
+
+graphql = pytest.importorskip("graphql")
+
+SCHEMA = """
+type Query {
+  repository(owner: String!, name: String!): Repository
+  search(filter: SearchFilter, first: Int = 10): [Repository!]!
+  lookup(query: String!): [SearchResult!]!
+}
+
+interface Node {
+  id: ID!
+}
+
+type Repository implements Node {
+  id: ID!
+  name: String!
+  description: String
+}
+
+type Issue {
+  id: ID!
+  title: String
+}
+
+union SearchResult = Repository
+
+input SearchFilter {
+  language: String
+  archived: Boolean = false
+}
+"""
+
+
+def probe_hash(sdl: str) -> str:
+    result = graphql.graphql_sync(graphql.build_schema(sdl), PROBE_QUERY)
+    assert result.errors is None
+    return content_hash(result.data["__schema"])
+
+
+def test_probe_hash_is_stable():
+    assert probe_hash(SCHEMA) == probe_hash(SCHEMA)
+
+
+@pytest.mark.parametrize(
+    "before, after",
+    [
+        ("  description: String\n", "  description: String!\n"),
+        ("  name: String!\n", "  name: String\n"),
+        ("repository(owner: String!,", "repository(owner: String,"),
+        ("  language: String\n", "  language: [String!]\n"),
+        ("[Repository!]!", "[Repository]!"),
+        ("  description: String\n", "  description: Int\n"),
+        ("union SearchResult = Repository\n", "union SearchResult = Repository | Issue\n"),
+        ("type Issue {", "type Issue implements Node {"),
+        ("type Issue {", "interface Issue {"),
+        ("first: Int = 10", "first: Int = 20"),
+        ("archived: Boolean = false", "archived: Boolean = true"),
+    ],
+    ids=[
+        "field-non-null",
+        "field-nullable",
+        "argument",
+        "input-field",
+        "list-item",
+        "field-type",
+        "union-member",
+        "interface",
+        "kind",
+        "argument-default",
+        "input-field-default",
+    ],
+)
+def test_probe_hash_changes_with_types(before, after):
+    assert before in SCHEMA
+    assert probe_hash(SCHEMA.replace(before, after, 1)) != probe_hash(SCHEMA)
+
+
+def test_probe_hash_ignores_descriptions():
+    described = SCHEMA.replace("type Repository {", '"A repository"\ntype Repository {')
+
+    assert probe_hash(described) == probe_hash(SCHEMA)
+
+
+def test_introspection_query_runs():
+    result = graphql.graphql_sync(graphql.build_schema(SCHEMA), INTROSPECTION_QUERY)
+
+    assert result.errors is None
@@ -0,0 +1,110 @@
+"""Phase timing (graphql_tracing) against the local stand-in server."""
+
+import socket
+import time
+import types
+
+import pytest
+import requests
+
+import graphql_tracing
+from github_graphql_client import VIEWER_QUERY, GitHubGraphQLClient
+from graphql_tracing import Tracer, TracingTransport
+
+
+def test_spans_record_phases_and_server_timing(stub):
+    tracer = Tracer()
+    with GitHubGraphQLClient("test-token", api_url=stub.url, transport=TracingTransport(tracer)) as client:
+        client.execute_query(VIEWER_QUERY)
+        client.execute_query(VIEWER_QUERY)
+
+    first, second = tracer.spans
+    assert not first.reused and second.reused
+    assert first.status == second.status == 200
+    assert first.request_id and first.request_id != second.request_id
+    assert set(first.server_timing) == {"backend"}
+    assert first.ttfb > 0 and first.parse > 0
+    assert tracer.requests == {"200": 2}
+
+
+def resolving(name, addresses):
+    """Stand-in for getaddrinfo resolving `name` to `addresses` (family, sockaddr), in order."""
+    lookup = socket.getaddrinfo
+
+    def getaddrinfo(host, port, family=0, kind=0, *args):
+        if host != name:
+            return lookup(host, port, family, kind, *args)
+        return [(address_family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", address) for address_family, address in addresses]
+
+    return getaddrinfo
+
+
+def test_connect_falls_back_to_the_next_address(stub, monkeypatch):
+    port = int(stub.url.split(":")[2].split("/")[0])
+    # localhost resolving to ::1 first, with the server listening on IPv4 only
+    resolve = resolving("localhost", [(socket.AF_INET6, ("::1", port, 0, 0)), (socket.AF_INET, ("127.0.0.1", port))])
+    monkeypatch.setattr(graphql_tracing.socket, "getaddrinfo", resolve)
+    tracer = Tracer()
+    transport = TracingTransport(tracer)
+    try:
+        response = transport.post(stub.url.replace("127.0.0.1", "localhost"), headers={}, json={"query": VIEWER_QUERY})
+    finally:
+        transport.close()
+
+    assert response.status_code == 200
+    (span,) = tracer.spans
+    assert not span.reused and span.error is None
+    assert span.dns >= 0 and span.connect > 0
+
+
+class BlackholeSocket:
+    """Socket whose connect waits for its whole timeout, recording it."""
+
+    timeouts = []
+
+    def __init__(self, *args):
+        self.timeout = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def setsockopt(self, *args):
+        pass
+
+    def connect(self, address):
+        BlackholeSocket.timeouts.append(self.timeout)
+        if address[0] == "192.0.2.1":
+            time.sleep(0.2)
+            raise ConnectionRefusedError(111, "Connection refused")
+        time.sleep(self.timeout)
+        raise socket.timeout("timed out")
+
+    def close(self):
+        pass
+
+
+def test_connect_timeout_covers_every_address(monkeypatch):
+    resolve = resolving("blackhole.test", [(socket.AF_INET, ("192.0.2.1", 80)), (socket.AF_INET, ("192.0.2.2", 80)), (socket.AF_INET, ("192.0.2.3", 80))])
+    fake = types.SimpleNamespace(**vars(socket))
+    fake.getaddrinfo = resolve
+    fake.socket = BlackholeSocket
+    monkeypatch.setattr(graphql_tracing, "socket", fake)
+    BlackholeSocket.timeouts = []
+    tracer = Tracer()
+    transport = TracingTransport(tracer, connect_timeout=0.5)
+    started = time.monotonic()
+    try:
+        with pytest.raises(requests.ConnectTimeout):
+            transport.post("http://blackhole.test/graphql", headers={}, json={"query": VIEWER_QUERY})
+    finally:
+        transport.close()
+
+    # The refused address leaves the rest of the timeout to the next one;
+    # the third is not tried once it has run out
+    elapsed = time.monotonic() - started
+    assert 0.45 < elapsed < 0.8
+    first, second = BlackholeSocket.timeouts
+    assert first == pytest.approx(0.5, abs=0.01)
+    assert second == pytest.approx(0.3, abs=0.05)
+    (span,) = tracer.spans
+    assert span.error == "ConnectTimeout"